@@ -9,7 +9,7 @@ from typing import Dict, Any
 import logging
 from pathlib import Path
 
-from nlp.pipeline import parse_hpi
+from src.core.case_store import get_case_store
 from risk_engine.baseline import BaselineRiskEngine
 from risk_engine.schema import RiskConfig, AgeBand, SurgeryType, Urgency, TimeWindow
 from services.meds_engine import create_meds_engine, PatientParameters
@@ -29,7 +29,8 @@ def recommend_medications():
     """
     Generate medication recommendations based on HPI and risk assessment
 
-    Request JSON:
+    Request JSON (send "case_id" from /api/analyze along with "hpi_text"; the case_id reuses the
+    parse when this worker holds the case, otherwise the text re-creates it under the same id):
     {
         "hpi_text": "4-year-old for T&A with asthma and recent URI",
         "patient_params": {
@@ -56,12 +57,15 @@ def recommend_medications():
         if not data:
             return jsonify({'error': 'No JSON data provided'}), 400
 
-        hpi_text = data.get('hpi_text', '')
-        if not hpi_text:
-            return jsonify({'error': 'hpi_text is required'}), 400
+        try:
+            case = get_case_store().resolve(data.get('case_id'), data.get('hpi_text', ''))
+        except KeyError as e:
+            return jsonify({'error': e.args[0]}), 404
+        except ValueError:
+            return jsonify({'error': 'hpi_text or case_id is required'}), 400
 
-        # Parse HPI
-        parsed_hpi = parse_hpi(hpi_text)
+        # Parse HPI (once per case)
+        parsed_hpi = case.nlp
 
         # Extract patient parameters
         patient_data = data.get('patient_params', {})
@@ -88,6 +92,7 @@ def recommend_medications():
             risk_summary=risk_summary,
             patient_params=patient_params
         )
+        recommendations['case_id'] = case.case_id
 
         return jsonify(recommendations)
 
@@ -135,7 +140,7 @@ def calculate_dose():
         # Calculate dose using meds engine
         dose_calc = meds_engine._calculate_dose(
             agent=agent,
-            dose_info=meds_engine.dosing_rules.get('dosing_rules', {}).get(agent, {}),
+            dose_info=meds_engine.tables.dosing.get(agent, {}),
             patient_params=patient_params
         )
 
@@ -173,7 +178,8 @@ def check_contraindications():
     """
     Check contraindications for specific medications
 
-    Request JSON:
+    Request JSON ("features" defaults to the parsed features of the case named by
+    "case_id", or of "hpi_text" when this worker does not hold that case):
     {
         "agents": ["Succinylcholine", "Propofol"],
         "features": ["MH_HISTORY", "ASTHMA"],
@@ -186,7 +192,16 @@ def check_contraindications():
         data = request.get_json()
 
         agents = data.get('agents', [])
-        features = data.get('features', [])
+        features = data.get('features')
+        if features is None and (data.get('case_id') or data.get('hpi_text')):
+            try:
+                case = get_case_store().resolve(data.get('case_id'), data.get('hpi_text', ''))
+            except KeyError as e:
+                return jsonify({'error': e.args[0]}), 404
+            except ValueError:
+                return jsonify({'error': 'hpi_text is empty'}), 400
+            features = case.nlp.get_feature_codes()
+        features = features or []
         allergies = data.get('allergies', [])
 
         patient_params = PatientParameters(
@@ -196,14 +211,11 @@ def check_contraindications():
         )
 
         results = {}
+        tables = meds_engine.tables
 
         for agent in agents:
             # Find medication class for this agent
-            med_class = None
-            for class_name, class_info in meds_engine.formulary.get('medication_classes', {}).items():
-                if agent in class_info.get('agents', {}):
-                    med_class = class_name
-                    break
+            med_class = tables.agent_class(agent)
 
             if med_class:
                 is_contraindicated, reason = meds_engine._check_contraindications(
@@ -239,12 +251,11 @@ def get_formulary():
     try:
         formulary_summary = {}
 
-        for class_name, class_info in meds_engine.formulary.get('medication_classes', {}).items():
-            agents = list(class_info.get('agents', {}).keys())
-            preferred = class_info.get('preferred_agent')
+        for class_name, class_record in meds_engine.tables.classes.items():
+            agents = list(class_record.agents)
 
             formulary_summary[class_name] = {
-                'preferred_agent': preferred,
+                'preferred_agent': class_record.preferred_agent,
                 'available_agents': agents,
                 'agent_count': len(agents)
             }
@@ -266,14 +277,16 @@ def get_guidelines(outcome: str):
     """Get guideline information for specific outcome"""
     try:
         outcome_upper = outcome.upper()
-        guideline_info = meds_engine.guideline_map.get('guideline_mapping', {}).get(outcome_upper, {})
+        tables = meds_engine.tables
+        guideline_info = tables.guideline_map.get('guideline_mapping', {}).get(outcome_upper, {})
 
         if not guideline_info:
             return jsonify({'error': f'No guidelines found for {outcome}'}), 404
 
         return jsonify({
             'outcome': outcome_upper,
-            'guidelines': guideline_info
+            'guidelines': guideline_info,
+            'recommended_classes': list(tables.outcome_classes.get(outcome_upper, ()))
         })
 
     except Exception as e:
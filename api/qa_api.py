@@ -14,6 +14,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.qa_service import QAService
+from src.core.case_store import get_case_store
 
 logger = logging.getLogger(__name__)
 
@@ -308,10 +309,14 @@ def get_cache_stats():
 def _get_case_bundle(case_id: str) -> Dict[str, Any]:
     """
     Get case bundle data for the case
-    In production, this would query the database
-    For now, return mock data or use app state
+    Cases analyzed through /api/analyze come from the shared case store;
+    other ids fall back to mock data
     """
     try:
+        case = get_case_store().get(case_id)
+        if case is not None:
+            return _case_bundle_from_case(case)
+
         # Try to get current app state (if available)
         # This is a simplified approach - in production you'd have
         # a proper case management system
@@ -367,6 +372,22 @@ def _get_case_bundle(case_id: str) -> Dict[str, Any]:
         logger.error(f"Error getting case bundle for {case_id}: {e}")
         return {}
 
+def _case_bundle_from_case(case) -> Dict[str, Any]:
+    """Case bundle from a parsed case; parses are shared with the other blueprints"""
+    demographics = case.analysis.get('demographics', {})
+    return {
+        'hpi_features': {
+            'age': demographics.get('age'),
+            'weight_kg': demographics.get('weight_kg', 70),
+            'surgery_domain': case.context['surgery_domain'],
+            'urgency': case.context['urgency'],
+            'meridian_codes': [f['token'] for f in case.analysis.get('extracted_factors', [])]
+        },
+        'risk_summary': {'risks': case.get('risk_assessments', [])},
+        'med_plan': case.get('medication_plan', {}),
+        'evidence_cards': {}
+    }
+
 def _log_qa_metrics(question: str, audit: Dict[str, Any], case_id: str) -> None:
     """
     Log privacy-safe Q+A metrics for analytics
@@ -9,6 +9,7 @@ from typing import List, Dict, Optional, Any
 from pathlib import Path
 from flask import Blueprint, request, jsonify
 import logging
+import numpy as np
 
 from risk_engine.schema import (RiskConfig, AgeBand, SurgeryType, Urgency, TimeWindow,
                                OutcomeRisk, ConfidenceLevel)
@@ -16,6 +17,7 @@ from risk_engine.pool import MetaAnalysisEngine
 from risk_engine.convert import RiskConverter
 from risk_engine.baseline import BaselineRiskEngine
 from risk_engine.confidence import ConfidenceScorer
+from risk_engine.bundle import get_risk_bundle
 
 logger = logging.getLogger(__name__)
 
@@ -26,8 +28,9 @@ risk_bp = Blueprint('risk', __name__, url_prefix='/api/risk')
 _config = None
 _meta_engine = None
 _converter = None
-_baseline_engine = None
 _confidence_scorer = None
+# (artifact hash of the bundle its strata came from, or None for the built-in table; engine)
+_baseline_state = (None, None)
 
 def _get_config() -> RiskConfig:
     """Load risk configuration"""
@@ -44,18 +47,29 @@ def _get_config() -> RiskConfig:
     return _config
 
 def _get_engines():
-    """Initialize all risk engine components"""
-    global _meta_engine, _converter, _baseline_engine, _confidence_scorer
+    """Initialize all risk engine components; the baseline engine follows the current risk bundle"""
+    global _meta_engine, _converter, _confidence_scorer
 
     if _meta_engine is None:
         config = _get_config()
         _meta_engine = MetaAnalysisEngine(config)
         _converter = RiskConverter(mc_draws=config.monte_carlo.n_draws,
-                                  seed=config.monte_carlo.seed)
-        _baseline_engine = BaselineRiskEngine(config)
+                                  seed=config.monte_carlo.seed,
+                                  sampling=config.monte_carlo.sampling)
         _confidence_scorer = ConfidenceScorer(config)
 
-    return _meta_engine, _converter, _baseline_engine, _confidence_scorer
+    return _meta_engine, _converter, _baseline_engine_for(get_risk_bundle()), _confidence_scorer
+
+def _baseline_engine_for(bundle) -> BaselineRiskEngine:
+    """Baseline engine over this bundle's strata (built-in strata without a bundle), rebuilt when the bundle changes"""
+    global _baseline_state
+
+    artifact_hash = bundle.artifact_hash if bundle is not None else None
+    built_for, engine = _baseline_state
+    if engine is None or built_for != artifact_hash:
+        engine = BaselineRiskEngine(_get_config(), bundle.baseline_risks() if bundle is not None else None)
+        _baseline_state = (artifact_hash, engine)
+    return engine
 
 @risk_bp.route('/score', methods=['POST'])
 def calculate_risk_score():
@@ -93,8 +107,10 @@ def calculate_risk_score():
         outcome = data["outcome"]
         factor_codes = data["factors"]
 
-        # Get engines
-        meta_engine, converter, baseline_engine, confidence_scorer = _get_engines()
+        # Get engines; baselines and effects come from one bundle snapshot
+        meta_engine, converter, _, confidence_scorer = _get_engines()
+        bundle = get_risk_bundle()
+        baseline_engine = _baseline_engine_for(bundle)
 
         # Get baseline risk
         baseline_risk = baseline_engine.get_baseline_risk(
@@ -104,26 +120,32 @@ def calculate_risk_score():
         if not baseline_risk:
             return jsonify({"error": f"No baseline data for {outcome}/{window}/{age_band}/{surgery}/{urgency}"}), 404
 
-        # For demo purposes, create synthetic pooled effects
-        # In production, these would come from actual meta-analysis
-        pooled_effects = _create_demo_pooled_effects(outcome, window, factor_codes)
+        if bundle is not None:
+            # Precompiled effects, combinations and confidence: no database or pooling per request
+            point_risk, ci_lower, ci_upper, confidence_breakdown = _score_from_bundle(
+                bundle, converter, baseline_risk, outcome, factor_codes
+            )
+        else:
+            # For demo purposes, create synthetic pooled effects
+            # In production, these would come from actual meta-analysis
+            pooled_effects = _create_demo_pooled_effects(outcome, window, factor_codes)
 
-        # Calculate absolute risk with CI
-        point_risk, ci_lower, ci_upper = converter.calculate_absolute_risk_ci(
-            pooled_effects, baseline_risk, factor_codes
-        )
+            # Calculate absolute risk with CI
+            point_risk, ci_lower, ci_upper = converter.calculate_absolute_risk_ci(
+                pooled_effects, baseline_risk, factor_codes
+            )
+
+            # Calculate confidence for the main effect (simplified)
+            if pooled_effects:
+                main_effect = pooled_effects[0]  # Use first effect as representative
+                confidence_breakdown = confidence_scorer.calculate_confidence(main_effect)
+            else:
+                # No effects - baseline only
+                confidence_breakdown = _create_baseline_confidence()
 
         # Calculate risk differences
         risk_differences = converter.calculate_risk_differences(point_risk, baseline_risk)
 
-        # Calculate confidence for the main effect (simplified)
-        if pooled_effects:
-            main_effect = pooled_effects[0]  # Use first effect as representative
-            confidence_breakdown = confidence_scorer.calculate_confidence(main_effect)
-        else:
-            # No effects - baseline only
-            confidence_breakdown = _create_baseline_confidence()
-
         # Create response
         outcome_risk = OutcomeRisk(
             outcome=outcome,
@@ -139,7 +161,8 @@ def calculate_risk_score():
             diagnostics={
                 "method": "REML+HK-SJ",
                 "mc_draws": converter.mc_draws,
-                "baseline_source": baseline_risk.era or "synthetic"
+                "baseline_source": baseline_risk.era or "synthetic",
+                "artifact_hash": bundle.artifact_hash if bundle else None
             },
             citations=[],  # Would include actual study citations
             flags=_generate_risk_flags(baseline_risk, point_risk, confidence_breakdown)
@@ -151,6 +174,20 @@ def calculate_risk_score():
         logger.error(f"Risk calculation error: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
+def _score_from_bundle(bundle, converter, baseline_risk, outcome: str, factor_codes: List[str]):
+    """Absolute risk, CI and confidence from the compiled bundle's combination index"""
+    combined = bundle.combined_effect(outcome, factor_codes)
+    if combined is None:
+        p0 = baseline_risk.p0
+        return p0, p0, p0, _create_baseline_confidence()
+
+    log_effect, variance, matched = combined
+    point_risk, ci_lower, ci_upper = converter.calculate_combined_risk_ci_batch(
+        np.array([log_effect]), np.array([variance]), [baseline_risk]
+    )[0]
+    # First matched factor as the representative effect, as with live pooling
+    return point_risk, ci_lower, ci_upper, bundle.confidence(outcome, matched[0])
+
 def _create_demo_pooled_effects(outcome: str, window: TimeWindow, factor_codes: List[str]):
     """Create demo pooled effects for testing"""
     from risk_engine.schema import PooledEffect, Study, StudyDesign, RiskOfBias
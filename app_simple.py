@@ -16,7 +16,7 @@ import smtplib
 from email.mime.text import MIMEText as MimeText
 from email.mime.multipart import MIMEMultipart as MimeMultipart
 
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, render_template_string, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import signal
 from functools import wraps
@@ -57,7 +57,11 @@ from src.core.error_codes import CodexError, ErrorCode, ErrorLogger, handle_risk
 
 # Import the database-driven risk engine
 sys.path.append(os.path.join(os.path.dirname(__file__)))
-from src.core.risk_engine import RiskEngine
+from src.core.engine_registry import get_engine_registry
+from src.core.batch_pipeline import BatchAnalysisPipeline, iter_ndjson, default_parse_processes, parsed_hpi_to_dict, clamp_batch_options
+from src.core.parse_cache import get_parse_cache
+from src.core.case_store import get_case_store
+from src.core.nlp_backends import get_nlp_backends
 from src.core.hpi_parser import ExtractedFactor, MedicalTextProcessor
 from src.core.baseline_initializer import ensure_baselines_available
 
@@ -268,9 +272,14 @@ def initialize_database():
 initialize_database()
 logger.info(f"Using database: {DB_PATH}")
 
+# CRITICAL FIX: Initialize the risk engine database to use the same path
+from src.core.database import init_database, get_database
+logger.info(f"Initializing risk engine with database: {DB_PATH}")
+init_database(DB_PATH)
+
 def get_db():
-    """Get database connection."""
-    return duckdb.connect(DB_PATH)
+    """Get this thread's database cursor (shared per-process handle; do not close it)."""
+    return get_database().conn
 
 def ensure_critical_baseline_risks():
     """Auto-add critical baseline risks that are needed for core functionality"""
@@ -301,10 +310,8 @@ def ensure_critical_baseline_risks():
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """
 
-            conn.execute(insert_query, baseline_data)
+            get_database().execute_write(insert_query, baseline_data)
             logger.info("✅ Added FAILED_INTUBATION baseline risk: 0.8% (A grade)")
-
-        conn.close()
     except Exception as e:
         logger.error(f"Failed to add critical baseline risks: {e}")
 
@@ -325,7 +332,6 @@ def verify_database_tables():
                 import subprocess
                 subprocess.run(["python", "database_repair.py"], check=True)
                 break
-        db.close()
     except Exception as e:
         logger.error(f"Database verification failed: {e}")
 
@@ -335,18 +341,22 @@ verify_database_tables()
 # Ensure critical baseline risks exist (auto-fix missing FAILED_INTUBATION)
 ensure_critical_baseline_risks()
 
-# CRITICAL FIX: Initialize the risk engine database to use the same path
-from src.core.database import init_database
-logger.info(f"Initializing risk engine with database: {DB_PATH}")
-init_database(DB_PATH)
-
 # Initialize comprehensive baselines to fix baseline warnings
 logger.info("Ensuring comprehensive baseline database coverage...")
 ensure_baselines_available()
 
-# Initialize the NLP-based medical text processor
+# Initialize the NLP-based medical text processor. Optional NLP backends load
+# on first use unless MERIDIAN_PRELOAD_NLP names them (e.g. "spacy" or "all").
 logger.info("Initializing NLP-based medical text processor...")
+nlp_backends = get_nlp_backends()
+nlp_backends.preload_from_env()
 medical_text_processor = MedicalTextProcessor()
+logger.info(f"NLP backends at startup: {json.dumps(nlp_backends.report())}")
+
+# Warm the process-wide risk engine once per worker so requests reuse it
+logger.info("Warming risk engine registry...")
+engine_registry = get_engine_registry()
+engine_registry.warm_start()
 
 # Comprehensive ontology mapping based on clinical risk factors
 ONTOLOGY_MAP = {
@@ -652,6 +662,28 @@ def advanced_hpi_parser(hpi_text):
         # Fallback to simple rule-based parsing if NLP fails
         return simple_hpi_parser(hpi_text)
 
+def advanced_hpi_parser_many(hpi_texts):
+    """advanced_hpi_parser for a chunk of HPIs, with one batched spaCy pass over the chunk."""
+    try:
+        return [parsed_hpi_to_dict(parsed_hpi) for parsed_hpi in medical_text_processor.parse_many(hpi_texts)]
+    except Exception as e:
+        logger.error(f"Error in batched NLP-based HPI parsing: {e}")
+        return [advanced_hpi_parser(hpi_text) for hpi_text in hpi_texts]
+
+def case_analysis(case):
+    """advanced_hpi_parser result for a case, built from its shared parse (no audit row; see analyze())."""
+    try:
+        return parsed_hpi_to_dict(case.view("parsed_hpi"))
+    except Exception as e:
+        logger.error(f"Error in NLP-based HPI parsing: {e}")
+        return simple_hpi_parser(case.hpi_text)
+
+# /api/analyze, meds, Q+A and learning resolve HPIs to shared cases; the
+# parse is shared, each /api/analyze request records its own session
+case_store = get_case_store()
+case_store.register_parser("parsed_hpi", lambda hpi_text: medical_text_processor.parse_hpi(hpi_text, store_audit=False))
+case_store.register_view("analysis", case_analysis)
+
 def calculate_airway_risks(factor_tokens):
     """Calculate specific airway outcome risks."""
     outcomes = []
@@ -3876,7 +3908,8 @@ HTML_TEMPLATE = """
                     body: JSON.stringify({
                         mode: selectedLearningMode,
                         n_items: numQuestions,
-                        case_context: true
+                        case_context: true,
+                        case_id: currentData.case_id
                     })
                 });
             })
@@ -4257,7 +4290,7 @@ HTML_TEMPLATE = """
                     },
                     body: JSON.stringify({
                         question: question,
-                        case_id: 'current',
+                        case_id: (currentData && currentData.case_id) || 'current',
                         allow_web: allowWeb,
                         tools_allowed: [
                             "dose_math", "risk_convert", "guideline_lookup_local",
@@ -4824,7 +4857,6 @@ def health():
     try:
         db = get_db()
         papers_count = db.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
-        db.close()
 
         # Get deployment version
         deployment_version = 1
@@ -4840,16 +4872,99 @@ def health():
             "papers": papers_count,
             "timestamp": datetime.now().isoformat(),
             "database_schema": "auto-repair-enabled",
-            "deployment_version": deployment_version
+            "deployment_version": deployment_version,
+            "risk_engine": engine_registry.health(),
+            "db_connections": get_database().connections.stats(),
+            "audit_sink": get_database().audit_sink.stats(),
+            "parse_cache": get_parse_cache().stats(),
+            "nlp_backends": nlp_backends.report()
         })
     except Exception as e:
         return jsonify({"status": "error", "error": str(e)}), 500
 
+@app.route('/api/ready')
+def ready():
+    """Readiness probe: 200 once the warm risk engine is available."""
+    engine_health = engine_registry.health()
+    return jsonify(engine_health), (200 if engine_health["ready"] else 503)
+
 @app.route('/api/example')
 def example():
     import random
     return jsonify({"hpi": random.choice(SAMPLE_HPIS)})
 
+def analyze_parsed_hpi(parsed, data):
+    """Run risk, medication and recommendation stages on an advanced_hpi_parser result."""
+    # Convert factors to ExtractedFactor objects for the risk engine
+    extracted_factors = []
+    for factor in parsed['extracted_factors']:
+        extracted_factors.append(ExtractedFactor(
+            token=factor['token'],
+            plain_label=factor['plain_label'],
+            confidence=factor['confidence'],
+            evidence_text=factor.get('evidence_text', ''),
+            factor_type='risk_factor',  # Default to risk_factor
+            category=factor.get('category', 'unknown'),
+            severity_weight=factor.get('confidence', 0.5),  # Use confidence as severity weight
+            context='perioperative'  # Default context
+        ))
+
+    # Extract demographics from request data if provided, otherwise use parsed demographics
+    demographics = {
+        'age': data.get('patient_age', parsed['demographics'].get('age')),
+        'sex': data.get('patient_sex', parsed['demographics'].get('sex')),
+        'population': data.get('population', parsed['demographics'].get('population', 'adult'))
+    }
+
+    # Use the warm, process-wide database-driven risk engine
+    risk_engine = engine_registry.get_risk_engine()
+    risk_summary = risk_engine.calculate_risks(
+        factors=extracted_factors,
+        demographics=demographics,
+        mode="model_based",
+        session_id=f"api_{datetime.now().isoformat()}"
+    )
+
+    # Convert RiskSummary to the expected format for compatibility
+    risks = {
+        "risks": [],
+        "summary": risk_summary.summary
+    }
+
+    # Convert RiskAssessment objects to the format expected by the frontend
+    for assessment in risk_summary.risks:
+        risks["risks"].append({
+            "outcome": assessment.outcome,
+            "outcome_label": assessment.outcome_label,
+            "category": assessment.category,
+            "baseline_risk": assessment.baseline_risk,
+            "adjusted_risk": assessment.adjusted_risk,
+            "risk_ratio": assessment.risk_ratio,
+            "evidence_grade": assessment.evidence_grade,
+            "specific_outcomes": [{
+                "name": assessment.outcome_label,
+                "risk": assessment.adjusted_risk,
+                "explanation": f"Risk adjusted based on {len(assessment.contributing_factors)} contributing factors",
+                "management": "Consider evidence-based interventions",
+                "citations": assessment.citations
+            }]
+        })
+
+    # Generate medications
+    medications = generate_simple_medications(parsed['extracted_factors'], risks['risks'])
+
+    # Generate clinical recommendations
+    recommendations = get_clinical_recommendations(risks['risks'], parsed['extracted_factors'], parsed['demographics'])
+    recommendations_html = format_recommendations_html(recommendations)
+
+    return {
+        "parsed": parsed,
+        "risks": risks,
+        "medications": medications,
+        "recommendations": recommendations,
+        "recommendations_html": recommendations_html
+    }
+
 @app.route('/api/analyze', methods=['POST'])
 @timeout(30)  # 30 second timeout to prevent hanging
 def analyze():
@@ -4857,81 +4972,27 @@ def analyze():
         data = request.get_json()
         hpi_text = data.get('hpi_text', '').strip()
 
-        if not hpi_text:
+        # A case_id from an earlier call reuses that case's parse
+        try:
+            case = case_store.resolve(data.get('case_id'), hpi_text)
+        except KeyError as e:
+            return jsonify({"error": e.args[0]}), 404
+        except ValueError:
             return jsonify({"error": "HPI text required"}), 400
+        hpi_text = case.hpi_text
 
-        # Parse HPI using advanced NLP-based parser
-        parsed = advanced_hpi_parser(hpi_text)
+        # Parse HPI using advanced NLP-based parser (once per case); every
+        # request still gets its own case session and audit row
+        parsed = dict(case.analysis)
+        parsed_hpi = case.get("parsed_hpi")
+        if parsed_hpi is not None:
+            parsed["session_id"] = medical_text_processor.record_session(parsed_hpi)
 
-        # Convert factors to ExtractedFactor objects for the risk engine
-        extracted_factors = []
-        for factor in parsed['extracted_factors']:
-            extracted_factors.append(ExtractedFactor(
-                token=factor['token'],
-                plain_label=factor['plain_label'],
-                confidence=factor['confidence'],
-                evidence_text=factor.get('evidence_text', ''),
-                factor_type='risk_factor',  # Default to risk_factor
-                category=factor.get('category', 'unknown'),
-                severity_weight=factor.get('confidence', 0.5),  # Use confidence as severity weight
-                context='perioperative'  # Default context
-            ))
-
-        # Extract demographics from request data if provided, otherwise use parsed demographics
-        demographics = {
-            'age': data.get('patient_age', parsed['demographics'].get('age')),
-            'sex': data.get('patient_sex', parsed['demographics'].get('sex')),
-            'population': data.get('population', parsed['demographics'].get('population', 'adult'))
-        }
-
-        # Use the database-driven risk engine instead of hardcoded calculations
-        risk_engine = RiskEngine()
-        risk_summary = risk_engine.calculate_risks(
-            factors=extracted_factors,
-            demographics=demographics,
-            mode="model_based",
-            session_id=f"api_{datetime.now().isoformat()}"
-        )
-
-        # Convert RiskSummary to the expected format for compatibility
-        risks = {
-            "risks": [],
-            "summary": risk_summary.summary
-        }
-
-        # Convert RiskAssessment objects to the format expected by the frontend
-        for assessment in risk_summary.risks:
-            risks["risks"].append({
-                "outcome": assessment.outcome,
-                "outcome_label": assessment.outcome_label,
-                "category": assessment.category,
-                "baseline_risk": assessment.baseline_risk,
-                "adjusted_risk": assessment.adjusted_risk,
-                "risk_ratio": assessment.risk_ratio,
-                "evidence_grade": assessment.evidence_grade,
-                "specific_outcomes": [{
-                    "name": assessment.outcome_label,
-                    "risk": assessment.adjusted_risk,
-                    "explanation": f"Risk adjusted based on {len(assessment.contributing_factors)} contributing factors",
-                    "management": "Consider evidence-based interventions",
-                    "citations": assessment.citations
-                }]
-            })
-
-        # Generate medications
-        medications = generate_simple_medications(parsed['extracted_factors'], risks['risks'])
-
-        # Generate clinical recommendations
-        recommendations = get_clinical_recommendations(risks['risks'], parsed['extracted_factors'], parsed['demographics'])
-        recommendations_html = format_recommendations_html(recommendations)
-
-        return jsonify({
-            "parsed": parsed,
-            "risks": risks,
-            "medications": medications,
-            "recommendations": recommendations,
-            "recommendations_html": recommendations_html
-        })
+        result = analyze_parsed_hpi(parsed, data)
+        case.put("risk_assessments", result["risks"]["risks"])
+        case.put("medication_plan", result["medications"])
+        result["case_id"] = case.case_id
+        return jsonify(result)
 
     except TimeoutError as e:
         logger.error(f"Request timed out: {e}")
@@ -4947,6 +5008,7 @@ def analyze():
             logger.warning(f"Risk calculation failed but returning parsed data: {str(e)}")
 
             return jsonify({
+                'case_id': case.case_id,
                 'extracted_factors': parsed.get('extracted_factors', []),
                 'demographics': parsed.get('demographics', {}),
                 'risks': [],  # Empty risks due to missing baseline data
@@ -4986,6 +5048,94 @@ def analyze():
                 "trace_id": codex_error.trace_id
             }), 500
 
+# Batches at or above this size parse in a process pool; smaller ones stay in-process
+BATCH_PROCESS_POOL_THRESHOLD = 50
+MAX_BATCH_IN_FLIGHT = 64
+# HPIs per parse chunk (one nlp.pipe pass each)
+BATCH_PARSE_CHUNK = 16
+# Request limits for /api/analyze/batch
+MAX_BATCH_CASES = 1000
+MAX_BATCH_BYTES = 16 * 1024 * 1024
+BATCH_TIMEOUT_SECONDS = 600
+
+def analyze_hpi_batch(cases, parse_processes=None, analyze_threads=4, max_in_flight=MAX_BATCH_IN_FLIGHT):
+    """
+    Analyze many HPIs in-process. Yields one result dict per case as it finishes.
+
+    Each case is {"hpi_text": ..., "id": optional, plus /api/analyze overrides}.
+    Results carry the case id/index and either the /api/analyze payload
+    ("status": "ok") or an error message ("status": "error").
+    """
+    if parse_processes is None:
+        if not isinstance(cases, list):
+            cases = list(cases)
+        parse_processes = default_parse_processes() if len(cases) >= BATCH_PROCESS_POOL_THRESHOLD else 0
+
+    pipeline = BatchAnalysisPipeline(
+        parse_fn=advanced_hpi_parser,
+        analyze_fn=analyze_parsed_hpi,
+        parse_processes=parse_processes,
+        analyze_threads=analyze_threads,
+        max_in_flight=max_in_flight,
+        parse_many_fn=advanced_hpi_parser_many,
+        parse_batch_size=BATCH_PARSE_CHUNK,
+        audit_fn=medical_text_processor.store_audit_record
+    )
+    return pipeline.run(cases)
+
+def _read_batch_cases():
+    """Batch cases from a JSON body ({"cases": [...]} or a list) or an NDJSON body."""
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        return [json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+
+    data = request.get_json()
+    if isinstance(data, dict):
+        data = data.get('cases')
+    if not isinstance(data, list):
+        raise ValueError("Expected a list of cases or {\"cases\": [...]}")
+    return data
+
+@app.route('/api/analyze/batch', methods=['POST'])
+@timeout(30)  # covers reading the request; the stream enforces BATCH_TIMEOUT_SECONDS
+def analyze_batch():
+    """Analyze many HPIs and stream one NDJSON line per case as results finish."""
+    if request.content_length is not None and request.content_length > MAX_BATCH_BYTES:
+        return jsonify({"error": f"Batch request exceeds {MAX_BATCH_BYTES} bytes"}), 413
+    try:
+        cases = _read_batch_cases()
+    except Exception as e:
+        return jsonify({"error": f"Invalid batch request: {e}"}), 400
+
+    if not cases:
+        return jsonify({"error": "At least one case required"}), 400
+    if len(cases) > MAX_BATCH_CASES:
+        return jsonify({"error": f"At most {MAX_BATCH_CASES} cases per batch (got {len(cases)})"}), 413
+
+    # Plain strings are accepted as bare HPI texts
+    cases = [{"hpi_text": case} if isinstance(case, str) else case for case in cases]
+
+    parse_processes = request.args.get('parse_processes', type=int)
+    max_in_flight = request.args.get('max_in_flight', default=MAX_BATCH_IN_FLIGHT, type=int)
+    parse_processes, max_in_flight = clamp_batch_options(parse_processes, max_in_flight, MAX_BATCH_IN_FLIGHT)
+
+    def counted(results):
+        failed = 0
+        started = datetime.now()
+        for result in results:
+            if result["status"] != "ok":
+                failed += 1
+            yield result
+            if (datetime.now() - started).total_seconds() > BATCH_TIMEOUT_SECONDS:
+                # Closing the pipeline generator cancels the remaining cases
+                results.close()
+                yield {"status": "error", "error": f"Batch timed out after {BATCH_TIMEOUT_SECONDS} seconds"}
+                break
+        elapsed = (datetime.now() - started).total_seconds()
+        logger.info(f"Batch analysis finished: {len(cases)} cases, {failed} errors in {elapsed:.1f}s")
+
+    results = analyze_hpi_batch(cases, parse_processes=parse_processes, max_in_flight=max_in_flight)
+    return Response(stream_with_context(iter_ndjson(counted(results))), mimetype='application/x-ndjson')
+
 @app.route('/api/bug-report', methods=['POST'])
 def bug_report():
     """Handle bug report submissions and send email to dgkenn@bu.edu"""
@@ -5112,21 +5262,18 @@ def check_and_repair_database():
             # Test basic table existence instead of specific columns
             db.execute("SELECT COUNT(*) FROM estimates LIMIT 1").fetchone()
             print("[SUCCESS] Database schema is correct")
-            db.close()
             return True
         except Exception as schema_error:
             print(f"[ERROR] Database schema error detected: {schema_error}")
             print("Adding missing harvest_batch_id column...")
             try:
                 # Simple fix: just add the missing column
-                db.execute("ALTER TABLE estimates ADD COLUMN harvest_batch_id VARCHAR DEFAULT 'unknown'")
+                get_database().execute_write("ALTER TABLE estimates ADD COLUMN harvest_batch_id VARCHAR DEFAULT 'unknown'")
                 print("[SUCCESS] Added harvest_batch_id column to estimates table")
-                db.close()
                 return True
             except Exception as alter_error:
                 print(f"[ERROR] Failed to add column: {alter_error}")
                 print("Running full database rebuild...")
-                db.close()
                 rebuild_database_schema()
                 return True
 
@@ -937,7 +937,7 @@ def run_comprehensive_stress_test():
 
     # Import the NLP pipeline
     try:
-        from nlp.pipeline import parse_hpi
+        from nlp.pipeline import parse_hpi_many
         from risk_engine.baseline import BaselineRiskEngine
         from risk_engine.schema import RiskConfig, AgeBand, SurgeryType, Urgency, TimeWindow
 
@@ -969,13 +969,16 @@ def run_comprehensive_stress_test():
     # Run each test case
     start_time = time.time()
 
+    # Parse every HPI up front with batched spaCy processing
+    parsed_cases = parse_hpi_many([case.hpi_text for case in test_cases])
+
     for i, case in enumerate(test_cases):
         if (i + 1) % 10 == 0:
             print(f"  Progress: {i+1}/{len(test_cases)} cases tested")
 
         try:
             # Test NLP parsing
-            parsed_hpi = parse_hpi(case.hpi_text)
+            parsed_hpi = parsed_cases[i]
 
             # Extract results
             extracted_factors = parsed_hpi.get_feature_codes(include_negated=False)
@@ -3,7 +3,7 @@ Meridian Clinical NLP Pipeline
 Hybrid medspaCy + QuickUMLS + ClinicalBERT system for robust HPI parsing
 """
 
-from .pipeline import build_nlp, parse_hpi
+from .pipeline import build_nlp, parse_hpi, parse_hpi_many
 from .schemas import ParsedHPI, ParsedFeature, Modifier
 
-__all__ = ['build_nlp', 'parse_hpi', 'ParsedHPI', 'ParsedFeature', 'Modifier']
\ No newline at end of file
+__all__ = ['build_nlp', 'parse_hpi', 'parse_hpi_many', 'ParsedHPI', 'ParsedFeature', 'Modifier']
\ No newline at end of file
@@ -0,0 +1,261 @@
+"""
+CPU-optimized ClinicalBERT token classification from a locally exported, int8-quantized model.
+HPIs are split into sentences, sentences from many documents share forward passes, and results are cached by sentence hash.
+"""
+
+import os
+import re
+import json
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.core.nlp_backends import get_nlp_backends
+from src.core.parse_cache import get_parse_cache, normalize_text, ruleset_version
+
+logger = logging.getLogger(__name__)
+
+# Directory holding the exported model, tokenizer files and config.json (see scripts/export_bert_onnx.py)
+MODEL_DIR_ENV = "MERIDIAN_BERT_MODEL_DIR"
+# "onnx" or "torch"; picked from the directory contents when unset
+BACKEND_ENV = "MERIDIAN_BERT_BACKEND"
+THREADS_ENV = "MERIDIAN_BERT_THREADS"
+
+ONNX_MODEL_FILES = ("model_quantized.onnx", "model.onnx")
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_MAX_LENGTH = 128
+DEFAULT_STRIDE = 16
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+")
+
+
+def split_sentences(text: str) -> List[Tuple[int, str]]:
+    """(offset, sentence) pieces of text, split after sentence punctuation."""
+    pieces = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        if text[start:match.start()].strip():
+            pieces.append((start, text[start:match.start()]))
+        start = match.end()
+    if text[start:].strip():
+        pieces.append((start, text[start:]))
+    return pieces
+
+
+def _entity_type(label: str) -> Tuple[str, bool]:
+    """(entity type, starts a new entity) for a BIO or plain label; type 'O' is outside."""
+    if label[:2] in ("B-", "I-"):
+        return label[2:], label[:2] == "B-"
+    return label, False
+
+
+def aggregate_entities(text: str, offsets: np.ndarray, probs: np.ndarray,
+                       id2label: Dict[int, str]) -> List[Dict]:
+    """
+    Group per-token predictions into entities, like the transformers pipeline's
+    aggregation_strategy="simple": adjacent tokens of one type form an entity
+    (a B- label starts a new one) and its score is the mean token score.
+    Special and padding tokens have empty offsets and are skipped.
+    """
+    label_ids = probs.argmax(axis=-1)
+    scores = probs.max(axis=-1)
+
+    entities = []
+    current = None
+    for (start, end), label_id, score in zip(offsets.tolist(), label_ids.tolist(), scores.tolist()):
+        if end <= start:
+            continue
+        entity_type, begins = _entity_type(id2label.get(label_id, "O"))
+        if entity_type == "O":
+            current = None
+            continue
+        if current is not None and current["entity_group"] == entity_type and not begins:
+            current["end"] = end
+            current["scores"].append(score)
+        else:
+            current = {"entity_group": entity_type, "start": start, "end": end, "scores": [score]}
+            entities.append(current)
+
+    return [{
+        "entity_group": entity["entity_group"],
+        "score": float(np.mean(entity["scores"])),
+        "word": text[entity["start"]:entity["end"]],
+        "start": entity["start"],
+        "end": entity["end"]
+    } for entity in entities]
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return shifted / shifted.sum(axis=-1, keepdims=True)
+
+
+class BertTagger:
+    """
+    Batched sentence-level token classification.
+
+    Calling it on a text returns the same entity dicts as the transformers
+    pipeline (entity_group, score, word, start, end). tag_many() splits every
+    text into sentences, looks each distinct sentence up in the parse cache and
+    runs the rest through `forward` `batch_size` sentences at a time; sentences
+    longer than `max_length` tokens are split into overlapping windows.
+    """
+
+    def __init__(self, tokenizer, forward: Callable[[Dict[str, np.ndarray]], np.ndarray],
+                 id2label: Dict[int, str], fingerprint: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_length: int = DEFAULT_MAX_LENGTH, stride: int = DEFAULT_STRIDE):
+        self.tokenizer = tokenizer
+        self.forward = forward
+        self.id2label = id2label
+        self.fingerprint = fingerprint
+        self.batch_size = max(1, batch_size)
+        self.max_length = max_length
+        self.stride = stride
+        self.cache = get_parse_cache()
+
+    def __call__(self, text: str) -> List[Dict]:
+        return self.tag_many([text])[0]
+
+    def tag_many(self, texts: Sequence[str]) -> List[List[Dict]]:
+        split = [split_sentences(text) for text in texts]
+
+        tagged: Dict[str, List[Dict]] = {}
+        missing = []
+        for sentence in dict.fromkeys(sentence for pieces in split for _, sentence in pieces):
+            cached = self.cache.get("BertTagger", self.fingerprint, sentence) if self._cacheable(sentence) else None
+            if cached is not None:
+                tagged[sentence] = cached
+            else:
+                missing.append(sentence)
+
+        for i in range(0, len(missing), self.batch_size):
+            batch = missing[i:i + self.batch_size]
+            for sentence, entities in zip(batch, self._tag_batch(batch)):
+                tagged[sentence] = entities
+                if self._cacheable(sentence):
+                    self.cache.put("BertTagger", self.fingerprint, sentence, entities)
+
+        results = []
+        for pieces in split:
+            entities = []
+            for offset, sentence in pieces:
+                for entity in tagged[sentence]:
+                    entities.append({**entity, "start": entity["start"] + offset, "end": entity["end"] + offset})
+            results.append(entities)
+        return results
+
+    @staticmethod
+    def _cacheable(sentence: str) -> bool:
+        # Cache keys are whitespace-normalized; entity offsets are only valid for the normalized form
+        return normalize_text(sentence) == sentence
+
+    def _tag_batch(self, sentences: List[str]) -> List[List[Dict]]:
+        encoding = self.tokenizer(
+            sentences, truncation=True, max_length=self.max_length, stride=self.stride,
+            return_overflowing_tokens=True, return_offsets_mapping=True, padding=True, return_tensors="np"
+        )
+        windows = np.asarray(encoding.pop("overflow_to_sample_mapping"))
+        offsets = np.asarray(encoding.pop("offset_mapping"))
+        probs = _softmax(np.asarray(self.forward(dict(encoding)), dtype=np.float32))
+
+        results = []
+        for index, sentence in enumerate(sentences):
+            rows_offsets, rows_probs = [], []
+            covered = 0
+            for window in np.flatnonzero(windows == index):
+                # Windows overlap by `stride` tokens; keep each token from the first window that has it
+                keep = (offsets[window, :, 1] > offsets[window, :, 0]) & (offsets[window, :, 0] >= covered)
+                if keep.any():
+                    rows_offsets.append(offsets[window][keep])
+                    rows_probs.append(probs[window][keep])
+                    covered = int(offsets[window][keep][:, 1].max())
+            if not rows_offsets:
+                results.append([])
+                continue
+            results.append(aggregate_entities(sentence, np.concatenate(rows_offsets),
+                                              np.concatenate(rows_probs), self.id2label))
+        return results
+
+
+def _model_fingerprint(model_dir: Path, backend: str, max_length: int, stride: int) -> str:
+    files = sorted((p.name, p.stat().st_size, int(p.stat().st_mtime)) for p in model_dir.iterdir() if p.is_file())
+    return ruleset_version(backend, files, max_length, stride)
+
+
+def _onnx_forward(model_path: Path) -> Optional[Callable]:
+    ort = get_nlp_backends().module("onnxruntime")
+    if ort is None:
+        return None
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = int(os.getenv(THREADS_ENV, "0"))
+    session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+    input_names = [i.name for i in session.get_inputs()]
+
+    def forward(encoding: Dict[str, np.ndarray]) -> np.ndarray:
+        return session.run(None, {name: encoding[name].astype(np.int64) for name in input_names})[0]
+    return forward
+
+
+def _torch_forward(model_dir: Path) -> Optional[Callable]:
+    torch = get_nlp_backends().module("torch")
+    transformers = get_nlp_backends().module("transformers")
+    if torch is None or transformers is None:
+        return None
+    model = transformers.AutoModelForTokenClassification.from_pretrained(str(model_dir), local_files_only=True)
+    model.eval()
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    threads = int(os.getenv(THREADS_ENV, "0"))
+    if threads > 0:
+        torch.set_num_threads(threads)
+
+    def forward(encoding: Dict[str, np.ndarray]) -> np.ndarray:
+        with torch.inference_mode():
+            return model(**{name: torch.from_numpy(array) for name, array in encoding.items()}).logits.numpy()
+    return forward
+
+
+def load_bert_tagger(model_dir: str = None, backend: str = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                     max_length: int = DEFAULT_MAX_LENGTH, stride: int = DEFAULT_STRIDE) -> Optional[BertTagger]:
+    """
+    Load a tagger from a local model directory, never from the network. Returns
+    None (with a warning) when the directory, the model or a backend is missing.
+    """
+    model_dir = model_dir or os.getenv(MODEL_DIR_ENV)
+    if not model_dir or not Path(model_dir).is_dir():
+        logger.warning(f"BERT model directory not found: {model_dir!r} (set {MODEL_DIR_ENV})")
+        return None
+    path = Path(model_dir)
+    backends = get_nlp_backends()
+
+    onnx_path = next((path / name for name in ONNX_MODEL_FILES if (path / name).exists()), None)
+    backend = (backend or os.getenv(BACKEND_ENV) or "").lower() or \
+        ("onnx" if onnx_path is not None and backends.available("onnxruntime") else "torch")
+
+    transformers = backends.module("transformers")
+    if transformers is None:
+        logger.warning("transformers is required for the BERT tokenizer")
+        return None
+
+    try:
+        config = json.loads((path / "config.json").read_text())
+        id2label = {int(i): label for i, label in config["id2label"].items()}
+        tokenizer = transformers.AutoTokenizer.from_pretrained(str(path), local_files_only=True, use_fast=True)
+        if backend == "onnx":
+            forward = _onnx_forward(onnx_path) if onnx_path is not None else None
+        elif backend == "torch":
+            forward = _torch_forward(path)
+        else:
+            raise ValueError(f"unknown BERT backend {backend!r}")
+    except Exception as e:
+        logger.warning(f"Could not load BERT model from {path}: {e}")
+        return None
+
+    if forward is None:
+        logger.warning(f"BERT backend {backend} is not available for {path}")
+        return None
+
+    logger.info(f"Loaded {backend} BERT tagger from {path}")
+    return BertTagger(tokenizer, forward, id2label, _model_fingerprint(path, backend, max_length, stride),
+                      batch_size=batch_size, max_length=max_length, stride=stride)
@@ -8,35 +8,29 @@ import re
 import json
 import yaml
 import logging
+import threading
 from typing import List, Dict, Optional, Tuple, Any
 from pathlib import Path
 import math
 
-try:
-    import spacy
-    from spacy.matcher import PhraseMatcher, Matcher
-    SPACY_AVAILABLE = True
-except ImportError:
-    SPACY_AVAILABLE = False
-
-try:
-    import medspacy
-    from medspacy import Sectionizer
-    from medspacy.context import ConTextComponent
-    MEDSPACY_AVAILABLE = True
-except ImportError:
-    MEDSPACY_AVAILABLE = False
-
-try:
-    from transformers import pipeline, AutoTokenizer, AutoModelForTokenClassification
-    TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    TRANSFORMERS_AVAILABLE = False
-
 from .schemas import ParsedHPI, ParsedFeature, Modifier
+from .ruleset import CompiledRuleset
+from .bert_backend import MODEL_DIR_ENV, load_bert_tagger
+from src.core.parse_cache import get_parse_cache, ruleset_version
+from src.core.nlp_backends import get_nlp_backends
+from src.core.spacy_docs import DocBatch, DEFAULT_BATCH_SIZE, make_doc
+
+# Optional backends are only checked for here; they are imported on first use
+_backends = get_nlp_backends()
+SPACY_AVAILABLE = _backends.available("spacy")
+MEDSPACY_AVAILABLE = _backends.available("medspacy")
+TRANSFORMERS_AVAILABLE = _backends.available("transformers")
 
 logger = logging.getLogger(__name__)
 
+# Bump when extraction logic changes in ways rules.yaml and the mapping do not capture
+PIPELINE_VERSION = "2"
+
 class MeridianNLPPipeline:
     """Advanced clinical NLP pipeline for Meridian HPI parsing"""
 
@@ -46,16 +40,42 @@ class MeridianNLPPipeline:
         self.phrase_matcher = None
         self.bert_pipeline = None
         self.rules = {}
+        self.ruleset = None
         self.risk_factor_mapping = {}
 
         # Load configuration
         self._load_rules()
         self._load_risk_factor_mapping()
 
-        # Initialize NLP components
-        self._init_spacy()
-        if self.use_bert:
-            self._init_bert()
+        # NLP components are initialized on the first parse (or now, if preloaded)
+        self._models_ready = False
+        self._models_lock = threading.Lock()
+        self.parse_cache = get_parse_cache()
+        self.cache_version = None
+        if _backends.preload_requested("spacy") or (self.use_bert and _backends.preload_requested("transformers")):
+            self._ensure_models()
+
+    def _ensure_models(self):
+        """Initialize spaCy (and BERT when enabled) once, on first use."""
+        if self._models_ready:
+            return
+        with self._models_lock:
+            if self._models_ready:
+                return
+            self._init_spacy()
+            if self.use_bert:
+                self._init_bert()
+
+            # Parse results are cached by text + rules/model configuration
+            self.cache_version = ruleset_version(
+                PIPELINE_VERSION, self.rules, self.risk_factor_mapping,
+                self.nlp.meta.get("name") if self.nlp else None,
+                self.nlp.pipe_names if self.nlp else None,
+                self.use_bert and self.bert_pipeline is not None,
+                os.getenv("MERIDIAN_NLP_MODEL") if self.use_bert else None,
+                getattr(self.bert_pipeline, "fingerprint", None)
+            )
+            self._models_ready = True
 
     def _load_rules(self):
         """Load rules from YAML configuration"""
@@ -66,6 +86,7 @@ class MeridianNLPPipeline:
         except Exception as e:
             logger.warning(f"Could not load rules.yaml: {e}")
             self.rules = {}
+        self.ruleset = CompiledRuleset.from_rules(self.rules or {})
 
     def _load_risk_factor_mapping(self):
         """Load risk factor mapping from JSON"""
@@ -84,20 +105,28 @@ class MeridianNLPPipeline:
             return
 
         try:
-            # Try to load scientific model first, fallback to general
-            try:
-                self.nlp = spacy.load("en_core_sci_sm")
+            import spacy
+            from spacy.matcher import PhraseMatcher
+
+            # Try to load scientific model first, fallback to general. medspaCy
+            # adds pipes, so it needs a private copy instead of the shared model.
+            load = _backends.load_spacy_model if MEDSPACY_AVAILABLE else _backends.spacy_model
+            self.nlp = load("en_core_sci_sm")
+            if self.nlp is not None:
                 logger.info("Loaded en_core_sci_sm model")
-            except OSError:
-                try:
-                    self.nlp = spacy.load("en_core_web_sm")
+            else:
+                self.nlp = load("en_core_web_sm")
+                if self.nlp is not None:
                     logger.info("Loaded en_core_web_sm model")
-                except OSError:
+                else:
                     logger.warning("No spaCy models available, using minimal setup")
                     self.nlp = spacy.blank("en")
 
             # Add medspaCy components if available
             if MEDSPACY_AVAILABLE:
+                from medspacy import Sectionizer
+                from medspacy.context import ConTextComponent
+
                 # Add sectionizer
                 sectionizer = Sectionizer(self.nlp)
                 if 'sectionizer_patterns' in self.rules:
@@ -163,9 +192,15 @@ class MeridianNLPPipeline:
             logger.warning("Transformers not available, skipping BERT initialization")
             return
 
+        # A locally exported int8 model runs offline with sentence batching (see nlp/bert_backend.py)
+        if os.getenv(MODEL_DIR_ENV):
+            self.bert_pipeline = load_bert_tagger()
+            return
+
         try:
+            transformers = _backends.module("transformers")
             model_name = os.getenv("MERIDIAN_NLP_MODEL", "emilyalsentzer/Bio_ClinicalBERT")
-            self.bert_pipeline = pipeline(
+            self.bert_pipeline = transformers.pipeline(
                 "token-classification",
                 model=model_name,
                 tokenizer=model_name,
@@ -178,6 +213,65 @@ class MeridianNLPPipeline:
 
     def parse_hpi(self, text: str) -> ParsedHPI:
         """Main HPI parsing function"""
+        self._ensure_models()
+        cached = self.parse_cache.get("MeridianNLPPipeline", self.cache_version, text)
+        if cached is not None:
+            return cached
+        return self._parse_uncached(text)
+
+    def parse_many(self, texts: List[str], docs: Optional[DocBatch] = None,
+                   batch_size: int = DEFAULT_BATCH_SIZE, n_process: int = 1) -> List[ParsedHPI]:
+        """
+        Parse many HPIs, running spaCy over every uncached text in one nlp.pipe pass.
+        Pass a DocBatch shared with another parser to reuse its Docs.
+        """
+        self._ensure_models()
+        results = {}
+        for text in texts:
+            if text not in results:
+                cached = self.parse_cache.get("MeridianNLPPipeline", self.cache_version, text)
+                if cached is not None:
+                    results[text] = cached
+
+        missing = [text for text in dict.fromkeys(texts) if text not in results]
+        bert_entities = self._bert_entities_many(missing)
+        if missing and self.nlp is not None:
+            docs = docs or DocBatch(batch_size, n_process)
+            self.request_docs(missing, docs)
+            try:
+                docs.run()
+            except Exception as e:
+                logger.warning(f"Batched spaCy processing failed, parsing documents one at a time: {e}")
+                docs = None
+        for text in missing:
+            results[text] = self._parse_uncached(text, docs, bert_entities.get(text))
+
+        return [results[text] for text in texts]
+
+    def request_docs(self, texts: List[str], docs: DocBatch):
+        """Queue the cleaned texts with the pipes the phrase matcher path reads."""
+        self._ensure_models()
+        if self.nlp is not None:
+            docs.request(self.nlp, [self._clean_text(text) for text in texts], keep=self._spacy_pipes())
+
+    def _bert_entities_many(self, texts: List[str]) -> Dict[str, List[Dict]]:
+        """BERT entities for many texts from batched forward passes, when the tagger supports it."""
+        if not (texts and self.use_bert and hasattr(self.bert_pipeline, "tag_many")):
+            return {}
+        try:
+            tagged = self.bert_pipeline.tag_many([self._clean_text(text) for text in texts])
+        except Exception as e:
+            logger.warning(f"Batched BERT extraction failed, tagging documents one at a time: {e}")
+            return {}
+        return dict(zip(texts, tagged))
+
+    def _spacy_pipes(self) -> Tuple[str, ...]:
+        # medspaCy's ConText sets span.modifiers from the upstream pipes; otherwise the
+        # PhraseMatcher only reads LOWER and no component needs to run
+        return tuple(self.nlp.pipe_names) if MEDSPACY_AVAILABLE else ()
+
+    def _parse_uncached(self, text: str, docs: Optional[DocBatch] = None,
+                        bert_entities: Optional[List[Dict]] = None) -> ParsedHPI:
         try:
             # Clean and normalize text
             cleaned_text = self._clean_text(text)
@@ -205,18 +299,19 @@ class MeridianNLPPipeline:
 
             # 2. spaCy phrase matching
             if self.nlp:
-                spacy_features = self._extract_spacy_features(cleaned_text)
+                doc = docs.get(self.nlp, cleaned_text) if docs is not None else None
+                spacy_features = self._extract_spacy_features(cleaned_text, doc)
                 features.extend(spacy_features)
 
             # 3. BERT extraction (if enabled)
             if self.use_bert and self.bert_pipeline:
-                bert_features = self._extract_bert_features(cleaned_text)
+                bert_features = self._extract_bert_features(cleaned_text, bert_entities)
                 features.extend(bert_features)
 
             # Resolve conflicts and deduplicate
             features = self._resolve_features(features)
 
-            return ParsedHPI(
+            parsed = ParsedHPI(
                 age_years=age_years,
                 sex=sex,
                 urgency=urgency,
@@ -226,6 +321,8 @@ class MeridianNLPPipeline:
                 bmi=bmi,
                 features=features
             )
+            self.parse_cache.put("MeridianNLPPipeline", self.cache_version, text, parsed)
+            return parsed
 
         except Exception as e:
             logger.error(f"Error in parse_hpi: {e}")
@@ -285,25 +382,11 @@ class MeridianNLPPipeline:
 
     def _extract_urgency(self, text: str) -> str:
         """Extract urgency level"""
-        urgency_patterns = self.rules.get('urgency_patterns', {})
-
-        for urgency, patterns in urgency_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, text, re.I):
-                    return urgency
-
-        return "elective"
+        return self.ruleset.first_category(self.ruleset.urgency, text) or "elective"
 
     def _extract_case_type(self, text: str) -> Optional[str]:
         """Extract case type"""
-        case_patterns = self.rules.get('case_type_patterns', {})
-
-        for case_type, patterns in case_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, text, re.I):
-                    return case_type
-
-        return None
+        return self.ruleset.first_category(self.ruleset.case_types, text)
 
     def _extract_weight(self, text: str) -> Optional[float]:
         """Extract weight in kg"""
@@ -345,39 +428,31 @@ class MeridianNLPPipeline:
 
     def _extract_rule_features(self, text: str) -> List[ParsedFeature]:
         """Extract features using rule-based patterns"""
-        features = []
-        patterns = self.rules.get('risk_factor_patterns', {})
-
-        for code, pattern_list in patterns.items():
-            for pattern in pattern_list:
-                matches = list(re.finditer(pattern, text, re.I))
-                for match in matches:
-                    # Check for negation context
-                    modifiers = self._extract_modifiers(text, match.start(), match.end())
+        hits = self.ruleset.match_risk_factors(text)
+        modifiers = self.ruleset.resolve_modifiers(text, [match.span() for _, match in hits])
 
-                    # Get mapping info
-                    mapping = self.risk_factor_mapping.get(code, {})
-
-                    feature = ParsedFeature(
-                        code=code,
-                        label=mapping.get('label', code.replace('_', ' ').title()),
-                        text=match.group(0),
-                        source="rule",
-                        confidence=0.9,
-                        modifiers=modifiers
-                    )
-                    features.append(feature)
-                    break  # Only take first match per pattern
+        features = []
+        for (code, match), modifier in zip(hits, modifiers):
+            mapping = self.risk_factor_mapping.get(code, {})
+            features.append(ParsedFeature(
+                code=code,
+                label=mapping.get('label', code.replace('_', ' ').title()),
+                text=match.group(0),
+                source="rule",
+                confidence=0.9,
+                modifiers=modifier
+            ))
 
         return features
 
-    def _extract_spacy_features(self, text: str) -> List[ParsedFeature]:
-        """Extract features using spaCy phrase matching"""
+    def _extract_spacy_features(self, text: str, doc=None) -> List[ParsedFeature]:
+        """Extract features using spaCy phrase matching (on a prebuilt Doc when one is given)"""
         if not self.nlp or not self.phrase_matcher:
             return []
 
         features = []
-        doc = self.nlp(text)
+        if doc is None:
+            doc = make_doc(self.nlp, text, self._spacy_pipes())
         matches = self.phrase_matcher(doc)
 
         for match_id, start, end in matches:
@@ -409,15 +484,16 @@ class MeridianNLPPipeline:
 
         return features
 
-    def _extract_bert_features(self, text: str) -> List[ParsedFeature]:
-        """Extract features using BERT NER"""
+    def _extract_bert_features(self, text: str, entities: Optional[List[Dict]] = None) -> List[ParsedFeature]:
+        """Extract features using BERT NER; entities already tagged in a batch skip the model"""
         if not self.bert_pipeline:
             return []
 
         features = []
         try:
             # Run BERT pipeline
-            entities = self.bert_pipeline(text)
+            if entities is None:
+                entities = self.bert_pipeline(text)
 
             for entity in entities:
                 # Map BERT labels to Meridian codes (simplified)
@@ -452,51 +528,7 @@ class MeridianNLPPipeline:
 
     def _extract_modifiers(self, text: str, start: int, end: int) -> Modifier:
         """Extract modifiers (negation, temporality) around a span"""
-        modifiers = Modifier()
-
-        # Look for negation ONLY BEFORE the medical condition to avoid false positives
-        # This prevents "No other significant medical history" from negating previous conditions
-        window_start = max(0, start - 50)
-        context_before = text[window_start:start].lower()
-
-        # Check for negation in the preceding context only
-        negation_patterns = self.rules.get('negation_patterns', [])
-        for pattern in negation_patterns:
-            # Look for negation patterns that are close to our medical condition
-            # and not separated by sentence boundaries
-            matches = list(re.finditer(pattern, context_before))
-            if matches:
-                # Check if the negation is in the same sentence/clause
-                last_match = matches[-1]
-                neg_end = window_start + last_match.end()
-
-                # Look for sentence boundaries between negation and medical condition
-                intervening_text = text[neg_end:start]
-
-                # If there's a sentence break (period followed by capital letter),
-                # don't apply the negation
-                if not re.search(r'\.\s+[A-Z]', intervening_text):
-                    # Also check if there are conflicting positive indicators
-                    positive_indicators = ['significant for', 'history of', 'diagnosed with',
-                                         'presents with', 'h/o', 'hx of']
-                    has_positive = any(re.search(indicator, text[neg_end:start], re.I)
-                                     for indicator in positive_indicators)
-
-                    if not has_positive:
-                        modifiers.negated = True
-                        break
-
-        # Check for temporality in broader context
-        window_end = min(len(text), end + 20)
-        context = text[window_start:window_end].lower()
-        temp_patterns = self.rules.get('temporality_patterns', {})
-        for temporality, patterns in temp_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, context):
-                    modifiers.temporality = temporality
-                    break
-
-        return modifiers
+        return self.ruleset.resolve_modifiers(text, [(start, end)])[0]
 
     def _resolve_features(self, features: List[ParsedFeature]) -> List[ParsedFeature]:
         """Resolve conflicts and deduplicate features"""
@@ -542,4 +574,10 @@ def build_nlp(use_bert: bool = False) -> MeridianNLPPipeline:
 def parse_hpi(text: str) -> ParsedHPI:
     """Parse HPI text and return structured results"""
     pipeline = build_nlp()
-    return pipeline.parse_hpi(text)
\ No newline at end of file
+    return pipeline.parse_hpi(text)
+
+def parse_hpi_many(texts: List[str], batch_size: int = DEFAULT_BATCH_SIZE, n_process: int = 1,
+                   docs: Optional[DocBatch] = None) -> List[ParsedHPI]:
+    """Parse many HPI texts with batched spaCy processing; results are in input order"""
+    pipeline = build_nlp()
+    return pipeline.parse_many(texts, docs=docs, batch_size=batch_size, n_process=n_process)
\ No newline at end of file
@@ -0,0 +1,160 @@
+"""
+Compiled form of rules.yaml: regexes are built once per pipeline, not per parse.
+Modifiers for every matched span are resolved ConText-style from a single set of trigger scans.
+"""
+
+import re
+import logging
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Pattern, Sequence, Tuple
+
+from .schemas import Modifier
+
+logger = logging.getLogger(__name__)
+
+# ConText scope: negation triggers look back this far, temporality triggers this far around the span
+NEGATION_WINDOW = 50
+TEMPORALITY_WINDOW_AFTER = 20
+
+# Phrases that end a negation scope when they sit between the trigger and the span
+POSITIVE_INDICATORS = ('significant for', 'history of', 'diagnosed with', 'presents with', 'h/o', 'hx of')
+SENTENCE_BREAK = r'(?-i:\.\s+[A-Z])'
+
+
+def _compile(patterns: Sequence[str], boundaries: bool = False, word_start: bool = False) -> Optional[Pattern]:
+    """
+    One case-insensitive alternation of the valid patterns; None if there are none.
+    boundaries anchors matches to whole words; word_start only to the start of a word.
+    """
+    valid = []
+    for pattern in patterns:
+        try:
+            re.compile(pattern)
+            valid.append(f"(?:{pattern})")
+        except re.error as e:
+            logger.warning(f"Skipping invalid pattern {pattern!r}: {e}")
+    if not valid:
+        return None
+    alternation = "|".join(valid)
+    if boundaries:
+        alternation = rf"(?<!\w)(?:{alternation})(?!\w)"
+    elif word_start:
+        alternation = rf"(?<!\w)(?:{alternation})"
+    return re.compile(alternation, re.I)
+
+
+@dataclass(frozen=True)
+class TriggerSpans:
+    """Non-overlapping trigger matches of one category, in text order."""
+    starts: Tuple[int, ...]
+    ends: Tuple[int, ...]
+
+    @classmethod
+    def scan(cls, pattern: Optional[Pattern], text: str) -> "TriggerSpans":
+        if pattern is None:
+            return cls((), ())
+        spans = [m.span() for m in pattern.finditer(text)]
+        return cls(tuple(s for s, _ in spans), tuple(e for _, e in spans))
+
+    def first_from(self, position: int) -> Optional[Tuple[int, int]]:
+        """The first trigger starting at or after position."""
+        i = bisect_left(self.starts, position)
+        return (self.starts[i], self.ends[i]) if i < len(self.starts) else None
+
+    def last_ending_by(self, position: int) -> Optional[Tuple[int, int]]:
+        """The last trigger ending at or before position."""
+        i = bisect_right(self.ends, position) - 1
+        return (self.starts[i], self.ends[i]) if i >= 0 else None
+
+
+@dataclass(frozen=True)
+class CompiledRuleset:
+    """Immutable, precompiled view of rules.yaml."""
+    # (code, combined alternation, the individual patterns in rules.yaml order)
+    risk_factors: Tuple[Tuple[str, Pattern, Tuple[Pattern, ...]], ...]
+    urgency: Tuple[Tuple[str, Pattern], ...]
+    case_types: Tuple[Tuple[str, Pattern], ...]
+    negation: Optional[Pattern]
+    terminators: Pattern
+    temporality: Tuple[Tuple[str, Pattern], ...]
+
+    @classmethod
+    def from_rules(cls, rules: Dict) -> "CompiledRuleset":
+        risk_factors = []
+        for code, patterns in (rules.get('risk_factor_patterns') or {}).items():
+            combined = _compile(patterns or [])
+            if combined is not None:
+                singles = tuple(p for p in (_compile([pattern]) for pattern in patterns) if p is not None)
+                risk_factors.append((code, combined, singles))
+
+        def categories(key: str, word_start: bool = False) -> Tuple[Tuple[str, Pattern], ...]:
+            compiled = ((name, _compile(patterns or [], word_start=word_start))
+                        for name, patterns in (rules.get(key) or {}).items())
+            return tuple((name, pattern) for name, pattern in compiled if pattern is not None)
+
+        return cls(
+            risk_factors=tuple(risk_factors),
+            urgency=categories('urgency_patterns'),
+            case_types=categories('case_type_patterns'),
+            negation=_compile(rules.get('negation_patterns') or [], boundaries=True),
+            terminators=re.compile("|".join([SENTENCE_BREAK] + [re.escape(p) for p in POSITIVE_INDICATORS]), re.I),
+            # Start-anchored only: "recent"/"previous"/"current" must still cover "recently",
+            # "previously" and "currently", but "active" must not fire inside "reactive"
+            temporality=categories('temporality_patterns', word_start=True),
+        )
+
+    def match_risk_factors(self, text: str) -> List[Tuple[str, re.Match]]:
+        """
+        First match of the first listed pattern that hits, per code. The combined
+        alternation screens out absent codes with a single search.
+        """
+        hits = []
+        for code, combined, singles in self.risk_factors:
+            if combined.search(text) is None:
+                continue
+            for pattern in singles:
+                match = pattern.search(text)
+                if match:
+                    hits.append((code, match))
+                    break
+        return hits
+
+    def first_category(self, categories: Tuple[Tuple[str, Pattern], ...], text: str) -> Optional[str]:
+        for name, pattern in categories:
+            if pattern.search(text):
+                return name
+        return None
+
+    def resolve_modifiers(self, text: str, spans: Sequence[Tuple[int, int]]) -> List[Modifier]:
+        """
+        Negation and temporality for all spans at once. Each trigger category is scanned
+        once over the text; each span then looks up the triggers in its scope.
+
+        A span is negated by the nearest negation trigger ending within NEGATION_WINDOW
+        characters before it, unless a sentence break or positive indicator lies between
+        them. Temporality comes from the last rules.yaml category with a trigger inside
+        [start - NEGATION_WINDOW, end + TEMPORALITY_WINDOW_AFTER].
+        """
+        negations = TriggerSpans.scan(self.negation, text)
+        terminators = TriggerSpans.scan(self.terminators, text)
+        temporality = [(name, TriggerSpans.scan(pattern, text)) for name, pattern in self.temporality]
+
+        modifiers = []
+        for start, end in spans:
+            modifier = Modifier()
+            window_start = max(0, start - NEGATION_WINDOW)
+
+            trigger = negations.last_ending_by(start)
+            if trigger is not None and trigger[0] >= window_start:
+                terminator = terminators.first_from(trigger[1])
+                modifier.negated = terminator is None or terminator[1] > start
+
+            window_end = min(len(text), end + TEMPORALITY_WINDOW_AFTER)
+            for name, triggers in temporality:
+                hit = triggers.first_from(window_start)
+                if hit is not None and hit[1] <= window_end:
+                    modifier.temporality = name
+
+            modifiers.append(modifier)
+        return modifiers
@@ -8,8 +8,10 @@ from .pool import MetaAnalysisEngine
 from .convert import RiskConverter
 from .confidence import ConfidenceScorer
 from .baseline import BaselineRiskEngine
+from .bundle import RiskBundle, compile_risk_bundle
 
 __all__ = [
     'Study', 'PooledEffect', 'OutcomeRisk', 'RiskConfig',
-    'MetaAnalysisEngine', 'RiskConverter', 'ConfidenceScorer', 'BaselineRiskEngine'
+    'MetaAnalysisEngine', 'RiskConverter', 'ConfidenceScorer', 'BaselineRiskEngine',
+    'RiskBundle', 'compile_risk_bundle'
 ]
\ No newline at end of file
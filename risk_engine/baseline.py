@@ -16,10 +16,16 @@ logger = logging.getLogger(__name__)
 class BaselineRiskEngine:
     """Manages baseline risk retrieval with stratification and fallbacks"""
 
-    def __init__(self, config: RiskConfig):
+    def __init__(self, config: RiskConfig, baselines: Optional[List[BaselineRisk]] = None):
         self.config = config
         self.reference_risks = self._load_reference_risks()
-        self.baseline_data = self._load_baseline_data()
+        if baselines is not None:
+            # Precompiled strata (e.g. from a risk bundle) replace the built-in table
+            self.baseline_data = {
+                self._make_key(b.outcome, b.window, b.age_band, b.surgery, b.urgency): b for b in baselines
+            }
+        else:
+            self.baseline_data = self._load_baseline_data()
 
     def _load_baseline_data(self) -> Dict[str, BaselineRisk]:
         """Load baseline risk data from database or static data"""
@@ -0,0 +1,429 @@
+"""
+Compiled risk artifact bundles: the evidence database frozen into versioned, hashed columnar files.
+Each column is a .npy array loaded with mmap, so scoring needs no database and workers share the page cache.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from datetime import datetime
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import stats
+
+from .schema import (RiskEngineManifest, RiskConfig, PooledEffect, BaselineRisk, ConfidenceBreakdown,
+                     ConfidenceLevel, TimeWindow, AgeBand, SurgeryType, Urgency)
+from .pool import MetaAnalysisEngine
+from .confidence import ConfidenceScorer
+from .baseline import BaselineRiskEngine
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_ENV = "MERIDIAN_RISK_BUNDLE"
+MANIFEST_FILE = "manifest.json"
+STRINGS_FILE = "strings.json"
+CURRENT_FILE = "CURRENT"
+
+# Table directories inside a bundle version
+BASELINE_TABLE = "baseline_risks"
+EFFECTS_TABLE = "pooled_effects"
+DIAGNOSTICS_TABLE = "diagnostics"
+COMBINATIONS_TABLE = "combinations"
+
+CONFIDENCE_COLUMNS = ("k_studies_score", "design_mix_score", "bias_score", "temporal_freshness_score",
+                      "window_match_score", "heterogeneity_score", "egger_penalty", "loo_stability_score",
+                      "total_score")
+
+LATEST_EFFECTS_QUERY = """
+    SELECT outcome_token, modifier_token, k, or_mean, or_ci_low, or_ci_high, log_or_var,
+           method, pmids, i_squared, tau_squared, evidence_version
+    FROM effects_pooled
+    WHERE COALESCE(context_label, 'general') = ? {version_filter}
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY outcome_token, modifier_token
+                               ORDER BY updated_at DESC, evidence_version DESC) = 1
+    ORDER BY outcome_token, modifier_token
+"""
+
+
+class _StringTable:
+    """Interns strings to int32 codes; code -1 is None."""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def encode(self, values) -> np.ndarray:
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            if value is None:
+                codes[i] = -1
+                continue
+            code = self._codes.get(value)
+            if code is None:
+                code = self._codes[value] = len(self.values)
+                self.values.append(value)
+            codes[i] = code
+        return codes
+
+
+def _write_table(root: Path, table: str, columns: Dict[str, np.ndarray]):
+    (root / table).mkdir()
+    for name, values in columns.items():
+        np.save(root / table / f"{name}.npy", np.ascontiguousarray(values), allow_pickle=False)
+
+
+def _bundle_hash(root: Path) -> str:
+    """sha256 over every data file (relative path and bytes), in path order."""
+    digest = hashlib.sha256()
+    for path in sorted(p for p in root.rglob("*") if p.is_file() and p.name != MANIFEST_FILE):
+        digest.update(path.relative_to(root).as_posix().encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _config_digest(config: RiskConfig) -> str:
+    return hashlib.sha256(config.model_dump_json().encode()).hexdigest()
+
+
+def _effect_columns(rows, config: RiskConfig) -> Dict[str, np.ndarray]:
+    """Pooled-effect columns from latest effects_pooled rows (OR scale, I² as a fraction)."""
+    k = rows["k"].to_numpy(dtype=np.int32)
+    log_effect = np.log(rows["or_mean"].to_numpy(dtype=float))
+
+    # Variance from the stored log-OR variance, else back out of the 95% CI
+    ci_variance = ((np.log(rows["or_ci_high"].to_numpy(dtype=float))
+                    - np.log(rows["or_ci_low"].to_numpy(dtype=float))) / (2 * 1.96)) ** 2
+    variance = rows["log_or_var"].to_numpy(dtype=float)
+    se = np.sqrt(np.where(np.isfinite(variance) & (variance > 0), variance, ci_variance))
+
+    if config.features.enable_bayesian_shrinkage:
+        shrunk, se_shrunk = MetaAnalysisEngine(config)._bayesian_shrinkage(log_effect, se, k)
+    else:
+        shrunk, se_shrunk = np.full(len(k), np.nan), np.full(len(k), np.nan)
+
+    # Cochran's Q and its p-value recovered from I² = (Q - df) / Q
+    df = np.maximum(k - 1, 1)
+    i_squared = np.nan_to_num(rows["i_squared"].to_numpy(dtype=float))
+    with np.errstate(divide="ignore"):
+        q = np.where(i_squared < 1, df / (1 - np.minimum(i_squared, 1)), np.inf)
+
+    return {
+        "log_effect_raw": log_effect,
+        "se_raw": se,
+        "log_effect_shrunk": np.asarray(shrunk, dtype=float),
+        "se_shrunk": np.asarray(se_shrunk, dtype=float),
+        "k_studies": k,
+        "tau_squared": np.nan_to_num(rows["tau_squared"].to_numpy(dtype=float)),
+        "i_squared": i_squared * 100,
+        "q_statistic": q,
+        "p_heterogeneity": stats.chi2.sf(q, df),
+        "total_weight": 1.0 / se ** 2,
+    }
+
+
+def compile_risk_bundle(db, output_dir, config: Optional[RiskConfig] = None,
+                        evidence_version: Optional[str] = None, context_label: str = "general",
+                        max_combination_size: int = 2) -> RiskEngineManifest:
+    """
+    Compile pooled effects, baselines, diagnostics and a factor-combination index into a new bundle version.
+
+    Reads the latest effects_pooled row per outcome/modifier (optionally one evidence version), writes
+    every table as .npy columns under output_dir/<version>, then points output_dir/CURRENT at it.
+    """
+    config = config or RiskConfig()
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    params = [context_label]
+    version_filter = ""
+    if evidence_version:
+        version_filter = "AND evidence_version = ?"
+        params.append(evidence_version)
+    rows = db.conn.execute(LATEST_EFFECTS_QUERY.format(version_filter=version_filter), params).df()
+
+    strings = _StringTable()
+    effect_columns = _effect_columns(rows, config)
+    outcomes = rows["outcome_token"].tolist()
+    factors = rows["modifier_token"].tolist()
+
+    # Confidence is fixed per effect, so score it once here rather than on every request
+    scorer = ConfidenceScorer(config)
+    confidence = []
+    for i in range(len(rows)):
+        confidence.append(scorer.calculate_confidence(PooledEffect(
+            factor=factors[i], outcome=outcomes[i], window=TimeWindow.INTRAOP, studies=[],
+            **{name: values[i].item() for name, values in effect_columns.items()
+               if name not in ("log_effect_shrunk", "se_shrunk")})))
+    diagnostics = {name: np.array([getattr(c, name) for c in confidence], dtype=float)
+                   for name in CONFIDENCE_COLUMNS}
+    diagnostics["letter_grade"] = strings.encode([c.letter_grade.value for c in confidence])
+
+    # Combined log OR and variance of every factor set up to max_combination_size within an outcome
+    combined_effect = np.where(np.isfinite(effect_columns["log_effect_shrunk"]),
+                               effect_columns["log_effect_shrunk"], effect_columns["log_effect_raw"])
+    combined_variance = np.where(np.isfinite(effect_columns["se_shrunk"]),
+                                 effect_columns["se_shrunk"], effect_columns["se_raw"]) ** 2
+    factor_codes = strings.encode(factors)
+    combo_rows = []
+    for outcome in sorted(set(outcomes)):
+        members = [i for i, o in enumerate(outcomes) if o == outcome]
+        for size in range(1, max_combination_size + 1):
+            combo_rows.extend((outcome, combo) for combo in combinations(members, size))
+    combo_factors = np.full((len(combo_rows), max(max_combination_size, 1)), -1, dtype=np.int32)
+    combo_effect = np.zeros(len(combo_rows))
+    combo_variance = np.zeros(len(combo_rows))
+    for j, (_, combo) in enumerate(combo_rows):
+        members = np.array(combo)
+        combo_factors[j, :len(members)] = np.sort(factor_codes[members])
+        combo_effect[j] = combined_effect[members].sum()
+        combo_variance[j] = combined_variance[members].sum()
+
+    baselines = list(BaselineRiskEngine(config).baseline_data.values())
+
+    def optional(values):
+        return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+    staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=output_dir))
+    try:
+        _write_table(staging, EFFECTS_TABLE, {
+            "outcome": strings.encode(outcomes), "factor": factor_codes,
+            "method": strings.encode(rows["method"].tolist()),
+            "evidence_version": strings.encode(rows["evidence_version"].tolist()),
+            **effect_columns,
+        })
+        _write_table(staging, DIAGNOSTICS_TABLE, diagnostics)
+        _write_table(staging, COMBINATIONS_TABLE, {
+            "outcome": strings.encode([outcome for outcome, _ in combo_rows]),
+            "factors": combo_factors, "log_effect": combo_effect, "variance": combo_variance,
+        })
+        _write_table(staging, BASELINE_TABLE, {
+            "outcome": strings.encode([b.outcome for b in baselines]),
+            "window": strings.encode([b.window.value for b in baselines]),
+            "age_band": strings.encode([b.age_band.value for b in baselines]),
+            "surgery": strings.encode([b.surgery.value for b in baselines]),
+            "urgency": strings.encode([b.urgency.value for b in baselines]),
+            "era": strings.encode([b.era for b in baselines]),
+            "p0": optional(b.p0 for b in baselines),
+            "p0_ci_lower": optional(b.p0_ci_lower for b in baselines),
+            "p0_ci_upper": optional(b.p0_ci_upper for b in baselines),
+            "p_ref": optional(b.p_ref for b in baselines),
+            "delta_pp": optional(b.delta_pp for b in baselines),
+            "fold_ratio": optional(b.fold_ratio for b in baselines),
+            "n_patients": optional(b.n_patients for b in baselines),
+            "n_events": optional(b.n_events for b in baselines),
+            "baseline_high_risk": np.array([b.baseline_high_risk for b in baselines], dtype=bool),
+        })
+        with open(staging / STRINGS_FILE, "w") as f:
+            json.dump(strings.values, f)
+
+        pmids = set()
+        for value in rows["pmids"]:
+            pmids.update(json.loads(value) if value else [])
+        manifest = RiskEngineManifest(
+            artifact_hash=_bundle_hash(staging),
+            created_at=datetime.now(),
+            config_digest=_config_digest(config),
+            baseline_risks_path=BASELINE_TABLE,
+            pooled_effects_path=EFFECTS_TABLE,
+            diagnostics_path=DIAGNOSTICS_TABLE,
+            combinations_index_path=COMBINATIONS_TABLE,
+            total_studies=len(pmids),
+            total_outcomes=len(set(outcomes)),
+            total_factors=len(set(factors)),
+            coverage_stats={
+                "pooled_effects": len(rows),
+                "combinations": len(combo_rows),
+                "baseline_strata": len(baselines),
+                "evidence_versions": sorted(set(rows["evidence_version"])),
+                "context_label": context_label,
+            },
+        )
+        with open(staging / MANIFEST_FILE, "w") as f:
+            f.write(manifest.model_dump_json(indent=2))
+
+        version = f"{evidence_version or 'latest'}-{manifest.artifact_hash[:12]}"
+        target = output_dir / version
+        if target.exists():
+            shutil.rmtree(staging)  # identical content already compiled
+        else:
+            os.rename(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # Swap the CURRENT pointer atomically so readers never see a half-written bundle
+    pointer = output_dir / f".{CURRENT_FILE}.tmp"
+    pointer.write_text(version)
+    os.replace(pointer, output_dir / CURRENT_FILE)
+
+    logger.info(f"Compiled risk bundle {version}: {len(rows)} effects, {len(combo_rows)} combinations")
+    return manifest
+
+
+class RiskBundle:
+    """Read-only view of a compiled bundle; columns are memory-mapped, lookups are small dict indexes."""
+
+    def __init__(self, path, verify: bool = False):
+        path = Path(path)
+        if (path / CURRENT_FILE).exists():
+            path = path / (path / CURRENT_FILE).read_text().strip()
+        self.path = path
+
+        with open(path / MANIFEST_FILE) as f:
+            self.manifest = RiskEngineManifest.model_validate_json(f.read())
+        if verify and _bundle_hash(path) != self.manifest.artifact_hash:
+            raise ValueError(f"Risk bundle {path} does not match its manifest hash")
+        with open(path / STRINGS_FILE) as f:
+            self.strings: List[str] = json.load(f)
+
+        self.baselines = self._load_table(self.manifest.baseline_risks_path)
+        self.effects = self._load_table(self.manifest.pooled_effects_path)
+        self.diagnostics = self._load_table(self.manifest.diagnostics_path)
+        self.combinations = self._load_table(self.manifest.combinations_index_path)
+
+        self._codes = {value: code for code, value in enumerate(self.strings)}
+        self._effect_rows: Dict[Tuple[int, int], int] = {
+            key: row for row, key in enumerate(zip(self.effects["outcome"].tolist(), self.effects["factor"].tolist()))
+        }
+        self._combination_rows: Dict[Tuple[int, Tuple[int, ...]], int] = {}
+        for row, (outcome, factors) in enumerate(zip(self.combinations["outcome"].tolist(),
+                                                      self.combinations["factors"].tolist())):
+            self._combination_rows[(outcome, tuple(code for code in factors if code >= 0))] = row
+
+    def _load_table(self, table: str) -> Dict[str, np.ndarray]:
+        return {path.stem: np.load(path, mmap_mode="r", allow_pickle=False)
+                for path in sorted((self.path / table).glob("*.npy"))}
+
+    def _string(self, code) -> Optional[str]:
+        return self.strings[code] if code >= 0 else None
+
+    @property
+    def artifact_hash(self) -> str:
+        return self.manifest.artifact_hash
+
+    def _rows(self, outcome: str, factor_codes: List[str]) -> List[int]:
+        outcome_code = self._codes.get(outcome)
+        rows = []
+        for factor in dict.fromkeys(factor_codes):
+            row = self._effect_rows.get((outcome_code, self._codes.get(factor)))
+            if row is not None:
+                rows.append(row)
+        return rows
+
+    def combined_effect(self, outcome: str, factor_codes: List[str]) -> Optional[Tuple[float, float, List[str]]]:
+        """(combined log OR, variance, matched factors) for a factor set, or None when nothing matches."""
+        rows = self._rows(outcome, factor_codes)
+        if not rows:
+            return None
+        matched = [self.strings[self.effects["factor"][row]] for row in rows]
+
+        key = (self._codes[outcome], tuple(sorted(int(self.effects["factor"][row]) for row in rows)))
+        combo = self._combination_rows.get(key)
+        if combo is not None:
+            return float(self.combinations["log_effect"][combo]), float(self.combinations["variance"][combo]), matched
+
+        # Larger than the precomputed index: sum the per-factor columns
+        shrunk = self.effects["log_effect_shrunk"][rows]
+        se = np.where(np.isfinite(self.effects["se_shrunk"][rows]),
+                      self.effects["se_shrunk"][rows], self.effects["se_raw"][rows])
+        effect = np.where(np.isfinite(shrunk), shrunk, self.effects["log_effect_raw"][rows])
+        return float(effect.sum()), float(np.sum(se ** 2)), matched
+
+    def pooled_effects(self, outcome: str, window: TimeWindow, factor_codes: List[str]) -> List[PooledEffect]:
+        """PooledEffect models (without study rows) for the factors of an outcome that have evidence."""
+        effects = []
+        for row in self._rows(outcome, factor_codes):
+            values = {name: self.effects[name][row].item() for name in
+                      ("log_effect_raw", "se_raw", "log_effect_shrunk", "se_shrunk", "k_studies", "tau_squared",
+                       "i_squared", "q_statistic", "p_heterogeneity", "total_weight")}
+            for name in ("log_effect_shrunk", "se_shrunk"):
+                if not np.isfinite(values[name]):
+                    values[name] = None
+            effects.append(PooledEffect(factor=self.strings[self.effects["factor"][row]], outcome=outcome,
+                                        window=window, studies=[], **values))
+        return effects
+
+    def confidence(self, outcome: str, factor: str) -> Optional[ConfidenceBreakdown]:
+        """Precomputed confidence breakdown of one outcome/factor effect."""
+        rows = self._rows(outcome, [factor])
+        if not rows:
+            return None
+        row = rows[0]
+        return ConfidenceBreakdown(
+            letter_grade=ConfidenceLevel(self.strings[self.diagnostics["letter_grade"][row]]),
+            **{name: float(self.diagnostics[name][row]) for name in CONFIDENCE_COLUMNS})
+
+    def baseline_risks(self) -> List[BaselineRisk]:
+        """Baseline strata, in compile order."""
+        table = self.baselines
+        baselines = []
+        for row in range(len(table["p0"])):
+            values = {name: table[name][row].item() for name in
+                      ("p0", "p0_ci_lower", "p0_ci_upper", "p_ref", "delta_pp", "fold_ratio",
+                       "n_patients", "n_events")}
+            values = {name: (None if value != value else value) for name, value in values.items()}
+            for name in ("n_patients", "n_events"):
+                if values[name] is not None:
+                    values[name] = int(values[name])
+            baselines.append(BaselineRisk(
+                outcome=self.strings[table["outcome"][row]],
+                window=TimeWindow(self.strings[table["window"][row]]),
+                age_band=AgeBand(self.strings[table["age_band"][row]]),
+                surgery=SurgeryType(self.strings[table["surgery"][row]]),
+                urgency=Urgency(self.strings[table["urgency"][row]]),
+                era=self._string(table["era"][row]),
+                baseline_high_risk=bool(table["baseline_high_risk"][row]),
+                **values))
+        return baselines
+
+
+# Global bundle state: (pointer key, RiskBundle or None when that pointer failed to load)
+_bundle_state = (None, None)
+_bundle_lock = threading.Lock()
+
+
+def _pointer_key(path: str) -> Tuple:
+    """Identity of what `path` points at: the CURRENT file's stat (os.replace gives it a new inode and mtime)."""
+    root = Path(path)
+    target = root / CURRENT_FILE if (root / CURRENT_FILE).exists() else root / MANIFEST_FILE
+    try:
+        stat = os.stat(target)
+        return (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return (path, None, None, None)
+
+
+def get_risk_bundle() -> Optional[RiskBundle]:
+    """
+    Get the process-wide bundle named by MERIDIAN_RISK_BUNDLE (None when unset or unreadable).
+
+    Successes and failures are both cached against the CURRENT pointer, so a failed
+    load is not retried on every request; recompiling (which swaps the pointer)
+    loads the new version.
+    """
+    global _bundle_state
+    path = os.getenv(BUNDLE_ENV)
+    if not path:
+        return None
+    key = _pointer_key(path)
+    cached_key, bundle = _bundle_state
+    if cached_key == key:
+        return bundle
+    with _bundle_lock:
+        cached_key, bundle = _bundle_state
+        if cached_key != key:
+            try:
+                bundle = RiskBundle(path)
+                logger.info(f"Loaded risk bundle {bundle.path.name}")
+            except Exception as e:
+                logger.error(f"Failed to load risk bundle {path}: {e}")
+                bundle = None
+            _bundle_state = (key, bundle)
+    return bundle
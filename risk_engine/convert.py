@@ -11,12 +11,24 @@ from .schema import Study, PooledEffect, BaselineRisk, EffectMeasure
 
 logger = logging.getLogger(__name__)
 
+SAMPLING_MODES = ("random", "sobol")
+
+# Simulated probabilities are clipped to this range
+RISK_CLIP = (0.0001, 0.9999)
+LOGIT_CLIP = tuple(np.log(p / (1 - p)) for p in RISK_CLIP)
+
 class RiskConverter:
     """Converts between effect measures and calculates absolute risks"""
 
-    def __init__(self, mc_draws: int = 5000, seed: Optional[int] = None):
-        self.mc_draws = mc_draws
+    def __init__(self, mc_draws: int = 5000, seed: Optional[int] = None, sampling: str = "random"):
+        if sampling not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode: {sampling}")
+        self.sampling = sampling
+        self.seed = seed
         self.rng = np.random.RandomState(seed)
+        # Sobol points are only balanced in powers of two
+        self.mc_draws = 2 ** int(np.ceil(np.log2(mc_draws))) if sampling == "sobol" else mc_draws
+        self._normals = None
 
     def rr_to_or(self, rr: float, baseline_prob: float) -> float:
         """
@@ -73,112 +85,126 @@ class RiskConverter:
         """
         return sum(log_effects)
 
-    def calculate_absolute_risk_ci(self,
-                                  pooled_effects: List[PooledEffect],
-                                  baseline_risk: BaselineRisk,
-                                  factor_codes: List[str]) -> Tuple[float, float, float]:
+    def standard_normals(self) -> np.ndarray:
         """
-        Calculate absolute risk with 95% CI using Monte Carlo simulation
+        Pre-drawn (2, mc_draws) standard-normal buffer: row 0 drives the
+        combined log effect, row 1 the baseline logit. Drawn once and reused
+        by every call, so repeated scores for the same inputs are identical.
+        """
+        if self._normals is None or self._normals.shape[1] != self.mc_draws:
+            if self.sampling == "sobol":
+                sobol = stats.qmc.Sobol(d=2, scramble=True, seed=self.seed)
+                uniforms = sobol.random_base2(int(np.log2(self.mc_draws))).T
+                self._normals = stats.norm.ppf(np.clip(uniforms, 1e-12, 1 - 1e-12))
+            else:
+                # Same stream order as drawing the effect, then the baseline, with rng.normal
+                self._normals = np.vstack([self.rng.standard_normal(self.mc_draws),
+                                           self.rng.standard_normal(self.mc_draws)])
+        return self._normals
+
+    def simulate_absolute_risk(self, log_effects: np.ndarray, log_variances: np.ndarray, p0: np.ndarray,
+                               p0_ci_lower: np.ndarray = None,
+                               p0_ci_upper: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Absolute risk and 95% CI for many rows (outcomes or patients) at once.
 
-        Returns:
-            (point_estimate, ci_lower, ci_upper)
+        Each input is a length-n array (combined log OR, its variance, and the
+        baseline with an optional CI; NaN where no CI). Draws form an
+        (n, mc_draws) matrix sharing the pre-drawn normals. Returns
+        (point, ci_lower, ci_upper) arrays.
         """
+        log_effects = np.asarray(log_effects, dtype=float)
+        p0 = np.asarray(p0, dtype=float)
+        z_effect, z_baseline = self.standard_normals()
 
-        # Find relevant effects
-        relevant_effects = []
-        effect_variances = []
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            logit_p0 = np.log(p0 / (1 - p0))
+            point = 1 / (1 + np.exp(-(logit_p0 + log_effects)))
 
-        for effect in pooled_effects:
-            if effect.factor in factor_codes:
-                # Use shrunk effect if available, otherwise raw
-                log_effect = effect.log_effect_shrunk or effect.log_effect_raw
-                se = effect.se_shrunk or effect.se_raw
+            effects = log_effects[:, None] + np.sqrt(np.asarray(log_variances, dtype=float))[:, None] * z_effect
 
-                relevant_effects.append(log_effect)
-                effect_variances.append(se ** 2)
+            # Baseline uncertainty: normal on the logit scale fitted to the CI, where one is given
+            baseline_logits = np.broadcast_to(logit_p0[:, None], effects.shape)
+            if p0_ci_lower is not None and p0_ci_upper is not None:
+                lower = np.asarray(p0_ci_lower, dtype=float)
+                upper = np.asarray(p0_ci_upper, dtype=float)
+                logit_se = (np.log(upper / (1 - upper)) - np.log(lower / (1 - lower))) / (2 * 1.96)
+                has_ci = (lower > 0) & (upper > 0) & np.isfinite(logit_se)
+                if has_ci.any():
+                    # Clipping the logit is clipping the sampled probability to RISK_CLIP
+                    sampled = np.clip(logit_p0[:, None] + logit_se[:, None] * z_baseline, *LOGIT_CLIP)
+                    baseline_logits = np.where(has_ci[:, None], sampled, baseline_logits)
 
-        if not relevant_effects:
-            # No effects - return baseline
-            return baseline_risk.p0, baseline_risk.p0, baseline_risk.p0
+            risks = np.clip(1 / (1 + np.exp(-(baseline_logits + effects))), *RISK_CLIP)
 
-        # Point estimate
-        combined_log_effect = self.combine_log_effects(relevant_effects)
-        point_risk = self.log_or_to_prob(combined_log_effect, baseline_risk.p0)
+        ci_lower, ci_upper = np.percentile(risks, [2.5, 97.5], axis=1)
+        return point, ci_lower, ci_upper
 
-        # Monte Carlo for CI
-        # Sample combined effect from multivariate normal
-        # (Simplified: assume independence for now)
-        combined_variance = sum(effect_variances)
+    def calculate_absolute_risk_ci(self,
+                                  pooled_effects: List[PooledEffect],
+                                  baseline_risk: BaselineRisk,
+                                  factor_codes: List[str]) -> Tuple[float, float, float]:
+        """
+        Calculate absolute risk with 95% CI using Monte Carlo simulation
 
-        sampled_effects = self.rng.normal(
-            combined_log_effect,
-            np.sqrt(combined_variance),
-            self.mc_draws
+        Returns:
+            (point_estimate, ci_lower, ci_upper)
+        """
+        point, ci_lower, ci_upper = self.calculate_absolute_risk_ci_batch(
+            pooled_effects, [baseline_risk], [factor_codes]
+        )[0]
+        return point, ci_lower, ci_upper
+
+    def calculate_absolute_risk_ci_batch(self,
+                                         pooled_effects: List[PooledEffect],
+                                         baseline_risks: List[BaselineRisk],
+                                         factor_sets: List[List[str]]) -> List[Tuple[float, float, float]]:
+        """
+        Absolute risk with 95% CI for each (baseline_risk, factor_codes) pair,
+        simulated together. Pairs with no matching effects return the baseline.
+        """
+        log_effects = np.zeros(len(baseline_risks))
+        variances = np.zeros(len(baseline_risks))
+        has_effects = np.zeros(len(baseline_risks), dtype=bool)
+
+        for row, (baseline_risk, factor_codes) in enumerate(zip(baseline_risks, factor_sets)):
+            for effect in pooled_effects:
+                if effect.factor in factor_codes:
+                    # Use shrunk effect if available, otherwise raw; effects combine additively (independence)
+                    log_effects[row] += effect.log_effect_shrunk or effect.log_effect_raw
+                    variances[row] += (effect.se_shrunk or effect.se_raw) ** 2
+                    has_effects[row] = True
+
+        results = [(b.p0, b.p0, b.p0) for b in baseline_risks]
+        rows = np.flatnonzero(has_effects)
+        if not len(rows):
+            return results
+
+        combined = self.calculate_combined_risk_ci_batch(
+            log_effects[rows], variances[rows], [baseline_risks[i] for i in rows]
         )
-
-        # Sample baseline if uncertainty available
-        if baseline_risk.p0_ci_lower and baseline_risk.p0_ci_upper:
-            # Approximate beta distribution from CI
-            baseline_samples = self._sample_baseline_from_ci(
-                baseline_risk.p0,
-                baseline_risk.p0_ci_lower,
-                baseline_risk.p0_ci_upper
-            )
-        else:
-            baseline_samples = np.full(self.mc_draws, baseline_risk.p0)
-
-        # Calculate risk for each draw
-        risk_samples = []
-        for i in range(self.mc_draws):
-            try:
-                risk = self.log_or_to_prob(sampled_effects[i], baseline_samples[i])
-                # Clip to reasonable range
-                risk = np.clip(risk, 0.0001, 0.9999)
-                risk_samples.append(risk)
-            except:
-                # Skip invalid samples
-                continue
-
-        if not risk_samples:
-            return point_risk, point_risk, point_risk
-
-        risk_samples = np.array(risk_samples)
-
-        # Calculate percentiles
-        ci_lower = np.percentile(risk_samples, 2.5)
-        ci_upper = np.percentile(risk_samples, 97.5)
-
-        return point_risk, ci_lower, ci_upper
-
-    def _sample_baseline_from_ci(self, p0: float, ci_lower: float, ci_upper: float) -> np.ndarray:
+        for i, row in zip(rows, combined):
+            results[i] = row
+        return results
+
+    def calculate_combined_risk_ci_batch(self,
+                                         log_effects: np.ndarray,
+                                         log_variances: np.ndarray,
+                                         baseline_risks: List[BaselineRisk]) -> List[Tuple[float, float, float]]:
         """
-        Sample baseline probability from beta distribution fitted to CI
+        Absolute risk with 95% CI from already-combined log ORs and variances
+        (e.g. a precompiled factor-combination index), one row per baseline.
         """
-        try:
-            # Method of moments to fit beta from mean and CI
-            # This is approximate - more sophisticated methods exist
-
-            # Assume normal approximation on logit scale
-            logit_p0 = np.log(p0 / (1 - p0))
-            logit_lower = np.log(ci_lower / (1 - ci_lower))
-            logit_upper = np.log(ci_upper / (1 - ci_upper))
-
-            logit_se = (logit_upper - logit_lower) / (2 * 1.96)
-
-            # Sample on logit scale
-            logit_samples = self.rng.normal(logit_p0, logit_se, self.mc_draws)
-
-            # Transform back to probability
-            prob_samples = 1 / (1 + np.exp(-logit_samples))
-
-            # Clip to valid range
-            prob_samples = np.clip(prob_samples, 0.0001, 0.9999)
-
-            return prob_samples
-
-        except:
-            # Fallback to fixed baseline
-            return np.full(self.mc_draws, p0)
+        def ci_bound(value):
+            return value if value else np.nan
+
+        point, ci_lower, ci_upper = self.simulate_absolute_risk(
+            log_effects, log_variances,
+            np.array([b.p0 for b in baseline_risks]),
+            np.array([ci_bound(b.p0_ci_lower) for b in baseline_risks], dtype=float),
+            np.array([ci_bound(b.p0_ci_upper) for b in baseline_risks], dtype=float)
+        )
+        return [(float(p), float(l), float(u)) for p, l, u in zip(point, ci_lower, ci_upper)]
 
     def calculate_risk_differences(self, adjusted_risk: float, baseline_risk: BaselineRisk) -> Dict[str, float]:
         """
@@ -6,7 +6,6 @@ import numpy as np
 import pandas as pd
 from typing import List, Dict, Tuple, Optional, Any
 from scipy import stats
-from scipy.optimize import minimize_scalar
 import warnings
 import logging
 from dataclasses import dataclass
@@ -30,6 +29,87 @@ class MetaAnalysisResult:
     egger_p: Optional[float] = None
     trim_fill_added: int = 0
 
+# REML tau² search interval and solver settings
+TAU_SQUARED_BOUNDS = (0.0, 2.0)
+REML_MAX_ITERATIONS = 100
+REML_TOLERANCE = 1e-12
+
+# Baseline used to express leave-one-out shifts in percentage points
+LOO_BASELINE_PROB = 0.05
+
+def _segment_sum(values: np.ndarray, segments: np.ndarray, n_segments: int) -> np.ndarray:
+    return np.bincount(segments, weights=values, minlength=n_segments)
+
+def _reml_gradient(tau_sq: np.ndarray, effects: np.ndarray, variances: np.ndarray,
+                   quality: np.ndarray, segments: np.ndarray, n_segments: int) -> np.ndarray:
+    """
+    d/dtau² of the REML criterion 0.5 * (Q + sum log(v + tau²) + log sum w),
+    w = quality / (v + tau²), for every segment at its own tau².
+    """
+    inv = 1.0 / (variances + tau_sq[segments])
+    w = quality * inv
+    sum_w = _segment_sum(w, segments, n_segments)
+    pooled = _segment_sum(w * effects, segments, n_segments) / sum_w
+    residuals = effects - pooled[segments]
+    return 0.5 * (_segment_sum(inv - w * inv * residuals ** 2, segments, n_segments)
+                  - _segment_sum(w * inv, segments, n_segments) / sum_w)
+
+def reml_tau_squared(effects: np.ndarray, variances: np.ndarray, quality: np.ndarray,
+                     segments: np.ndarray, n_segments: int, start: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Minimise the REML criterion over TAU_SQUARED_BOUNDS for many study sets at once.
+
+    Each segment is one study set. The gradient is evaluated from segment
+    sums; segments whose gradient is non-negative at the lower bound stay
+    there, those still descending at the upper bound take it, and the rest
+    are solved by Illinois false position. A warm start (e.g. the full-data
+    tau² for leave-one-out sets) splits the initial bracket.
+    """
+    low = np.full(n_segments, TAU_SQUARED_BOUNDS[0])
+    high = np.full(n_segments, TAU_SQUARED_BOUNDS[1])
+
+    def gradient(tau_sq):
+        return _reml_gradient(tau_sq, effects, variances, quality, segments, n_segments)
+
+    g_low, g_high = gradient(low), gradient(high)
+    boundary = np.where(g_low >= 0, low, high)
+    interior = (g_low < 0) & (g_high > 0)
+    if not interior.any():
+        return boundary
+    active = interior.copy()
+
+    if start is not None:
+        mid = np.clip(start, low, high)
+        inside = active & (mid > low) & (mid < high)
+        g_mid = gradient(mid)
+        go_low = inside & (g_mid > 0)
+        go_high = inside & (g_mid <= 0)
+        high, g_high = np.where(go_low, mid, high), np.where(go_low, g_mid, g_high)
+        low, g_low = np.where(go_high, mid, low), np.where(go_high, g_mid, g_low)
+
+    # Illinois: false position that halves the stale endpoint's value
+    estimate = low.copy()
+    side = np.zeros(n_segments, dtype=int)
+    for _ in range(REML_MAX_ITERATIONS):
+        new = np.where(active, (low * g_high - high * g_low) / (g_high - g_low), estimate)
+        g_new = gradient(new)
+        converged = (np.abs(new - estimate) <= REML_TOLERANCE) | (g_new == 0)
+        estimate = new
+
+        to_high = active & (g_new > 0)
+        to_low = active & (g_new <= 0)
+        g_low = np.where(to_high & (side == 1), g_low / 2, g_low)
+        g_high = np.where(to_low & (side == -1), g_high / 2, g_high)
+        high, g_high = np.where(to_high, new, high), np.where(to_high, g_new, g_high)
+        low, g_low = np.where(to_low, new, low), np.where(to_low, g_new, g_low)
+        side = np.where(to_high, 1, np.where(to_low, -1, side))
+
+        active &= ~converged
+        if not active.any():
+            break
+
+    return np.where(interior, estimate, boundary)
+
 class MetaAnalysisEngine:
     """Core meta-analysis engine with REML pooling and quality adjustments"""
 
@@ -42,28 +122,58 @@ class MetaAnalysisEngine:
         """
         Pool studies for a factor-outcome pair using REML with quality weights
         """
-        if len(studies) < self.config.validation.min_studies_per_factor:
-            logger.warning(f"Insufficient studies for {factor}-{outcome}: {len(studies)}")
-            return None
-
-        try:
-            # Prepare effect data
-            effects_data = self._prepare_effects(studies)
+        return self.pool_studies_batch([(studies, factor, outcome, window)])[0]
 
-            # Apply quality weights
-            weights = self._calculate_weights(studies, effects_data)
-
-            # Run meta-analysis
-            ma_result = self._run_meta_analysis(effects_data, weights)
-
-            # Publication bias tests
-            if len(studies) >= 10:  # Need sufficient studies
-                ma_result.egger_p = self._egger_test(effects_data, weights)
-                if ma_result.egger_p and ma_result.egger_p < 0.05:
-                    ma_result.trim_fill_added = self._trim_and_fill(effects_data, weights)
+    def pool_studies_batch(self, pairs: List[Tuple[List[Study], str, str, TimeWindow]]) -> List[Optional[PooledEffect]]:
+        """
+        Pool many (studies, factor, outcome, window) pairs with full diagnostics.
 
-            # Leave-one-out diagnostics
-            loo_delta = self._loo_diagnostics(effects_data, weights)
+        REML tau² for every pair is solved in one vectorized pass, and so are
+        the leave-one-out refits of all pairs (warm-started from each pair's
+        tau²). Returns one PooledEffect (or None) per pair, in order.
+        """
+        results: List[Optional[PooledEffect]] = [None] * len(pairs)
+        prepared = []
+
+        for index, (studies, factor, outcome, window) in enumerate(pairs):
+            if len(studies) < self.config.validation.min_studies_per_factor:
+                logger.warning(f"Insufficient studies for {factor}-{outcome}: {len(studies)}")
+                continue
+            try:
+                # Prepare effect data and quality weights
+                effects_data = self._prepare_effects(studies)
+                weights = self._calculate_weights(studies, effects_data)
+                prepared.append((index, effects_data, weights))
+            except Exception as e:
+                logger.error(f"Meta-analysis failed for {factor}-{outcome}: {e}")
+
+        if not prepared:
+            return results
+
+        tau_squared = self._estimate_tau_squared_batch([(e, w) for _, e, w in prepared])
+
+        fitted = []
+        for (index, effects_data, weights), tau_sq in zip(prepared, tau_squared):
+            studies, factor, outcome, window = pairs[index]
+            try:
+                ma_result = self._run_meta_analysis(effects_data, weights, tau_squared=tau_sq)
+
+                # Publication bias tests
+                if self.config.features.enable_publication_bias_tests and len(studies) >= 10:
+                    ma_result.egger_p = self._egger_test(effects_data, weights)
+                    if ma_result.egger_p and ma_result.egger_p < 0.05:
+                        ma_result.trim_fill_added = self._trim_and_fill(effects_data, weights)
+                fitted.append((index, effects_data, weights, ma_result))
+            except Exception as e:
+                logger.error(f"Meta-analysis failed for {factor}-{outcome}: {e}")
+
+        # Leave-one-out diagnostics for every pair at once
+        loo_deltas = [None] * len(fitted)
+        if self.config.features.enable_loo_diagnostics:
+            loo_deltas = self._loo_diagnostics_batch([(e, w, r) for _, e, w, r in fitted])
+
+        for (index, effects_data, weights, ma_result), loo_delta in zip(fitted, loo_deltas):
+            studies, factor, outcome, window = pairs[index]
 
             # Bayesian shrinkage (optional)
             log_effect_shrunk = None
@@ -73,7 +183,7 @@ class MetaAnalysisEngine:
                     ma_result.log_effect, ma_result.se, ma_result.k_studies
                 )
 
-            return PooledEffect(
+            results[index] = PooledEffect(
                 factor=factor,
                 outcome=outcome,
                 window=window,
@@ -94,9 +204,7 @@ class MetaAnalysisEngine:
                 studies=studies
             )
 
-        except Exception as e:
-            logger.error(f"Meta-analysis failed for {factor}-{outcome}: {e}")
-            return None
+        return results
 
     def _prepare_effects(self, studies: List[Study]) -> np.ndarray:
         """Convert studies to log effects with standard errors"""
@@ -174,12 +282,13 @@ class MetaAnalysisEngine:
 
         return np.array(weights)
 
-    def _run_meta_analysis(self, effects_data: np.ndarray,
-                          weights: np.ndarray) -> MetaAnalysisResult:
+    def _run_meta_analysis(self, effects_data: np.ndarray, weights: np.ndarray,
+                          tau_squared: Optional[float] = None) -> MetaAnalysisResult:
         """Run REML meta-analysis with optional HK-SJ correction"""
 
-        # Step 1: Estimate tau² using REML
-        tau_squared = self._estimate_tau_squared_reml(effects_data, weights)
+        # Step 1: Estimate tau² using REML (unless already solved for a batch)
+        if tau_squared is None:
+            tau_squared = self._estimate_tau_squared_reml(effects_data, weights)
 
         # Step 2: Update weights with tau²
         updated_weights = 1.0 / (effects_data[:, 1] ** 2 + tau_squared)
@@ -225,31 +334,21 @@ class MetaAnalysisEngine:
     def _estimate_tau_squared_reml(self, effects_data: np.ndarray,
                                   weights: np.ndarray) -> float:
         """Estimate between-study variance using REML"""
+        return float(self._estimate_tau_squared_batch([(effects_data, weights)])[0])
 
-        def reml_objective(tau_sq):
-            # REML log-likelihood (simplified)
-            w_i = 1.0 / (effects_data[:, 1] ** 2 + tau_sq)
-            w_i = weights * w_i  # Apply quality weights
-
-            sum_w = np.sum(w_i)
-            pooled_effect = np.sum(w_i * effects_data[:, 0]) / sum_w
-
-            # Q statistic
-            q = np.sum(w_i * (effects_data[:, 0] - pooled_effect) ** 2)
-
-            # REML criterion (negative log-likelihood)
-            reml = 0.5 * (q + np.sum(np.log(effects_data[:, 1] ** 2 + tau_sq)) +
-                         np.log(sum_w))
+    def _estimate_tau_squared_batch(self, study_sets: List[Tuple[np.ndarray, np.ndarray]]) -> np.ndarray:
+        """REML tau² for several (effects_data, weights) sets, falling back to DL where the solve fails"""
+        segments = np.repeat(np.arange(len(study_sets)), [len(e) for e, _ in study_sets])
+        effects_data = np.concatenate([e for e, _ in study_sets])
+        weights = np.concatenate([w for _, w in study_sets])
 
-            return reml
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tau_squared = reml_tau_squared(effects_data[:, 0], effects_data[:, 1] ** 2, weights,
+                                           segments, len(study_sets))
 
-        # Optimize tau²
-        try:
-            result = minimize_scalar(reml_objective, bounds=(0, 2), method='bounded')
-            return max(0, result.x)
-        except:
-            # Fallback to DerSimonian-Laird
-            return self._estimate_tau_squared_dl(effects_data, weights)
+        for i in np.flatnonzero(~np.isfinite(tau_squared)):
+            tau_squared[i] = self._estimate_tau_squared_dl(*study_sets[i])
+        return tau_squared
 
     def _estimate_tau_squared_dl(self, effects_data: np.ndarray,
                                 weights: np.ndarray) -> float:
@@ -294,23 +393,28 @@ class MetaAnalysisEngine:
     def _egger_test(self, effects_data: np.ndarray, weights: np.ndarray) -> Optional[float]:
         """Egger's test for publication bias"""
         try:
-            # Precision = 1/SE
+            # Weighted regression effect ~ precision (1/SE), solved from weighted sums
             precision = 1.0 / effects_data[:, 1]
+            effects = effects_data[:, 0]
 
-            # Weighted regression: effect ~ precision
-            X = np.column_stack([np.ones(len(precision)), precision])
-            W = np.diag(weights)
+            s_w = np.sum(weights)
+            s_x = np.sum(weights * precision)
+            s_xx = np.sum(weights * precision ** 2)
+            s_y = np.sum(weights * effects)
+            s_xy = np.sum(weights * precision * effects)
 
-            # Weighted least squares
-            XtWX_inv = np.linalg.inv(X.T @ W @ X)
-            beta = XtWX_inv @ X.T @ W @ effects_data[:, 0]
+            det = s_w * s_xx - s_x ** 2
+            if det <= 0:
+                raise np.linalg.LinAlgError("Singular matrix")
+            intercept = (s_xx * s_y - s_x * s_xy) / det
+            slope = (s_w * s_xy - s_x * s_y) / det
 
             # Test intercept = 0 (no bias)
-            residuals = effects_data[:, 0] - X @ beta
+            residuals = effects - intercept - slope * precision
             mse = np.sum(weights * residuals ** 2) / (len(effects_data) - 2)
-            se_intercept = np.sqrt(mse * XtWX_inv[0, 0])
+            se_intercept = np.sqrt(mse * s_xx / det)
 
-            t_stat = beta[0] / se_intercept
+            t_stat = intercept / se_intercept
             p_value = 2 * (1 - stats.t.cdf(abs(t_stat), len(effects_data) - 2))
 
             return p_value
@@ -333,30 +437,64 @@ class MetaAnalysisEngine:
         """Leave-one-out diagnostics for stability"""
         if len(effects_data) <= 2:
             return None
+        return self._loo_diagnostics_batch([(effects_data, weights, self._run_meta_analysis(effects_data, weights))])[0]
 
-        try:
-            # Original pooled effect
-            original_result = self._run_meta_analysis(effects_data, weights)
-            original_risk = self._log_odds_to_prob(original_result.log_effect, 0.05)  # Assume 5% baseline
-
-            max_delta = 0.0
-
-            # Leave each study out
-            for i in range(len(effects_data)):
-                loo_effects = np.delete(effects_data, i, axis=0)
-                loo_weights = np.delete(weights, i)
-
-                loo_result = self._run_meta_analysis(loo_effects, loo_weights)
-                loo_risk = self._log_odds_to_prob(loo_result.log_effect, 0.05)
+    def _loo_diagnostics_batch(self, fits: List[Tuple[np.ndarray, np.ndarray, MetaAnalysisResult]]) -> List[Optional[float]]:
+        """
+        Largest leave-one-out shift (percentage points at a 5% baseline) for each
+        (effects_data, weights, full-data result).
 
-                delta_pp = abs(loo_risk - original_risk) * 100  # Percentage points
-                max_delta = max(max_delta, delta_pp)
+        Every omitted-study subset of every pair with k > 2 becomes one segment
+        of a single layout. Their REML tau² values are solved together,
+        warm-started from the pair's full-data tau². Each refit's pooled effect
+        then comes from that subset's weighted sums, without a per-subset fit.
+        """
+        deltas: List[Optional[float]] = [None] * len(fits)
+        eligible = [i for i, (effects_data, _, _) in enumerate(fits) if len(effects_data) > 2]
+        if not eligible:
+            return deltas
 
-            return max_delta
+        try:
+            effects, variances, quality, segments, starts = [], [], [], [], []
+            n_segments = 0
+            for i in eligible:
+                effects_data, weights, full = fits[i]
+                k = len(effects_data)
+                # Row j of the k x k grid keeps every study except j
+                keep = ~np.eye(k, dtype=bool)
+                columns = np.broadcast_to(np.arange(k), (k, k))[keep]
+                effects.append(effects_data[columns, 0])
+                variances.append(effects_data[columns, 1] ** 2)
+                quality.append(weights[columns])
+                segments.append(n_segments + np.repeat(np.arange(k), k - 1))
+                starts.append(np.full(k, full.tau_squared))
+                n_segments += k
+
+            effects = np.concatenate(effects)
+            variances = np.concatenate(variances)
+            quality = np.concatenate(quality)
+            segments = np.concatenate(segments)
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                tau_squared = reml_tau_squared(effects, variances, quality, segments, n_segments,
+                                               start=np.concatenate(starts))
+            w = quality / (variances + tau_squared[segments])
+            loo_effects = _segment_sum(w * effects, segments, n_segments) / _segment_sum(w, segments, n_segments)
+
+            sizes = [len(fits[i][0]) for i in eligible]
+            full_effects = np.repeat([fits[i][2].log_effect for i in eligible], sizes)
+            loo_risk = self._log_odds_to_prob(loo_effects, LOO_BASELINE_PROB)
+            full_risk = self._log_odds_to_prob(full_effects, LOO_BASELINE_PROB)
+            shift_pp = np.abs(loo_risk - full_risk) * 100  # Percentage points
+
+            max_shift = np.maximum.reduceat(shift_pp, np.cumsum([0] + sizes[:-1]))
+            for i, delta in zip(eligible, max_shift):
+                deltas[i] = float(delta)
 
         except Exception as e:
             logger.warning(f"LOO diagnostics failed: {e}")
-            return None
+
+        return deltas
 
     def _log_odds_to_prob(self, log_odds: float, baseline_prob: float) -> float:
         """Convert log odds to probability given baseline"""
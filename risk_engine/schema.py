@@ -208,6 +208,27 @@ class OutcomeRisk(BaseModel):
     mc_draws: int = 5000
     seed: Optional[int] = None
 
+class MonteCarloConfig(BaseModel):
+    """Absolute-risk CI simulation settings"""
+    n_draws: int = 5000
+    seed: Optional[int] = None
+    sampling: Literal["random", "sobol"] = "random"  # sobol: scrambled quasi-Monte Carlo
+
+class ValidationConfig(BaseModel):
+    """Data sufficiency and plausibility limits"""
+    min_studies_per_factor: int = 2
+    max_heterogeneity_i2: float = 90.0
+    min_baseline_sample_size: int = 50
+    max_baseline_risk: float = 0.8
+
+class FeatureFlags(BaseModel):
+    """Optional pooling stages"""
+    enable_bayesian_shrinkage: bool = True
+    enable_publication_bias_tests: bool = True
+    enable_loo_diagnostics: bool = True
+    enable_interaction_detection: bool = True
+    enable_temporal_weighting: bool = True
+
 class RiskConfig(BaseModel):
     """Configuration for risk scoring engine"""
 
@@ -265,6 +286,13 @@ class RiskConfig(BaseModel):
     # Calibration
     calibration_method: Optional[Literal["isotonic", "platt"]] = None
 
+    # Monte Carlo CI
+    monte_carlo: MonteCarloConfig = MonteCarloConfig()
+
+    # Validation limits and feature flags
+    validation: ValidationConfig = ValidationConfig()
+    features: FeatureFlags = FeatureFlags()
+
     # Confidence scoring weights
     confidence_weights: Dict[str, float] = {
         "k_studies": 0.25,
@@ -277,6 +305,9 @@ class RiskConfig(BaseModel):
         "loo_stability": 0.05
     }
 
+    # Minimum total score (0-100) for each letter grade
+    confidence_thresholds: Dict[str, float] = {"A": 70, "B": 50, "C": 30, "D": 0}
+
 class RiskEngineManifest(BaseModel):
     """Manifest for exported risk engine artifacts"""
     schema_version: str = "1.0"
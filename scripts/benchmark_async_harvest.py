@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark the sequential PubMedHarvester against AsyncPubMedHarvester offline.
+Both harvest the same outcomes from a local fake E-utilities server (fed from database/raw_xml) with simulated latency.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(project_root))
+
+from src.core.database import init_database
+from src.evidence.pubmed_harvester import PubMedHarvester
+from src.evidence.bulk_writer import BulkWriter
+from src.evidence.async_harvester import AsyncPubMedHarvester
+from src.evidence.fake_eutils import ArticleCorpus, FakeEUtilsServer
+
+OUTCOMES = ["LARYNGOSPASM", "BRONCHOSPASM", "HYPOTENSION", "MORTALITY"]
+POPULATIONS = ["pediatric", "adult"]
+
+
+def run_sync(base_url: str, rps: float, max_results: int) -> int:
+    init_database(":memory:")
+    harvester = PubMedHarvester()
+    harvester.base_search_url = f"{base_url}/esearch.fcgi"
+    harvester.base_fetch_url = f"{base_url}/efetch.fcgi"
+    harvester.requests_per_second = rps
+    papers = 0
+    for outcome in OUTCOMES:
+        for population in POPULATIONS:
+            pmids = harvester.search_pubmed(harvester._build_outcome_query(outcome, population), max_results)
+            fetched = harvester.fetch_papers(pmids)
+            # Same work as the async store stage: new papers plus this outcome's effects
+            with BulkWriter(harvester.db) as writer:
+                stored = {row[0] for row in harvester.db.conn.execute("SELECT pmid FROM papers").fetchall()}
+                writer.add_papers([paper for paper in fetched if paper.pmid not in stored])
+                for paper in fetched:
+                    writer.add_effects(harvester.extract_effects(paper, [outcome]))
+            papers += len(fetched)
+    return papers
+
+
+def run_async(base_url: str, rps: float, max_results: int, batch_size: int) -> int:
+    init_database(":memory:")
+
+    async def harvest():
+        async with AsyncPubMedHarvester(base_url=base_url, requests_per_second=rps,
+                                        fetch_batch_size=batch_size) as harvester:
+            pairs = [(outcome, population) for outcome in OUTCOMES for population in POPULATIONS]
+            return await harvester.harvest_outcomes(pairs, max_results)
+
+    return sum(result.papers_fetched for result in asyncio.run(harvest()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential vs asyncio PubMed harvesting against a fake E-utilities server")
+    parser.add_argument("--raw-dir", default="database/raw_xml")
+    parser.add_argument("--files", type=int, default=20, help="Raw batch files to serve")
+    parser.add_argument("--latency", type=float, default=0.3, help="Simulated server latency per request (s)")
+    parser.add_argument("--rps", type=float, default=10, help="Client rate limit (NCBI: 10 with key, 3 without)")
+    parser.add_argument("--max-results", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=200, help="PMIDs per efetch for the async harvester")
+    args = parser.parse_args()
+
+    corpus = ArticleCorpus(str(Path(args.raw_dir).resolve()), args.files)
+    print(f"Serving {len(corpus.articles)} articles with {args.latency}s latency, {args.rps} requests/sec limit")
+
+    with FakeEUtilsServer(corpus, latency=args.latency, rate_limit=args.rps) as server, \
+            tempfile.TemporaryDirectory() as workdir:
+        # Both harvesters archive raw XML under ./database/raw_xml; keep that out of the repo
+        os.chdir(workdir)
+
+        start = time.perf_counter()
+        sync_papers = run_sync(server.base_url, args.rps, args.max_results)
+        sync_seconds = time.perf_counter() - start
+        sync_stats = dict(server.stats)
+
+        start = time.perf_counter()
+        async_papers = run_async(server.base_url, args.rps, args.max_results, args.batch_size)
+        async_seconds = time.perf_counter() - start
+        async_requests = server.stats["requests"] - sync_stats["requests"]
+        rate_limited = server.stats["rate_limited"]
+        os.chdir(project_root)
+
+    print(f"sequential: {sync_papers} papers in {sync_seconds:.2f}s ({sync_stats['requests']} requests)")
+    print(f"asyncio:    {async_papers} papers in {async_seconds:.2f}s ({async_requests} requests)"
+          f"  ({sync_seconds / async_seconds:.1f}x)")
+    print(f"429 responses from the rate limiter: {rate_limited}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
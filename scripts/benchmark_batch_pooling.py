@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-pair MetaAnalysisEngine.pool_effect_modifiers against BatchMetaAnalysisEngine.
+Both re-pool the same synthetic estimates table (seeded random OR/RR/HR rows) in a temporary database.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+
+from src.core.database import init_database
+from src.evidence.bulk_writer import BulkWriter
+from src.evidence.pooling_engine import MetaAnalysisEngine
+from src.evidence.batch_pooling import BatchMetaAnalysisEngine
+from src.evidence.pubmed_harvester import EffectEstimate, PubMedPaper
+
+GRADES = ["A", "B", "C", "D", None]
+MEASURES = ["OR", "RR", "HR"]
+
+
+def seed_estimates(db, outcomes: int, modifiers: int, max_studies: int, seed: int = 7) -> int:
+    """Random pairs with 1..max_studies estimates each, about half with a CI."""
+    rng = np.random.default_rng(seed)
+    papers, effects = [], []
+    for o in range(outcomes):
+        for m in range(modifiers):
+            true_log_or = rng.normal(0.3, 0.4)
+            for s in range(int(rng.integers(1, max_studies + 1))):
+                pmid = f"{o}{m:03d}{s:03d}"
+                papers.append(PubMedPaper(pmid=pmid, title="t", abstract="a", journal="j", year=2020,
+                                          design="cohort", n_total=200, population="adult",
+                                          procedure="general", time_horizon="30d", url="u",
+                                          raw_path="r", ingest_query_id="bench"))
+                se = rng.uniform(0.1, 0.6)
+                log_or = true_log_or + rng.normal(0, 0.3) + rng.normal(0, se)
+                has_ci = rng.random() < 0.5
+                effects.append(EffectEstimate(
+                    id=f"bench_{o}_{m}_{s}", pmid=pmid, outcome_token=f"OUTCOME_{o}",
+                    modifier_token=f"MODIFIER_{m}", measure=MEASURES[s % 3], estimate=float(np.exp(log_or)),
+                    ci_low=float(np.exp(log_or - 1.96 * se)) if has_ci else None,
+                    ci_high=float(np.exp(log_or + 1.96 * se)) if has_ci else None,
+                    adjusted=bool(rng.random() < 0.5), n_group=None, n_events=None, definition_note="",
+                    time_horizon="30d", quality_weight=float(rng.uniform(0.5, 1.5)),
+                    evidence_grade=GRADES[s % len(GRADES)], population_match=1.0,
+                    extraction_confidence=0.9, covariates=[], subgroup=None))
+    with BulkWriter(db) as writer:
+        writer.add_papers(papers)
+        writer.add_effects(effects)
+    return len(effects)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-pair vs batch effect-modifier pooling")
+    parser.add_argument("--outcomes", type=int, default=20)
+    parser.add_argument("--modifiers", type=int, default=50)
+    parser.add_argument("--max-studies", type=int, default=15)
+    args = parser.parse_args()
+    # The per-pair engine logs every pool it stores and every pair it skips
+    logging.getLogger("src.evidence").setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db = init_database(os.path.join(workdir, "bench.duckdb"))
+        rows = seed_estimates(db, args.outcomes, args.modifiers, args.max_studies)
+        pairs = [(f"OUTCOME_{o}", f"MODIFIER_{m}") for o in range(args.outcomes) for m in range(args.modifiers)]
+        print(f"{rows} estimates across {len(pairs)} outcome/modifier pairs")
+
+        start = time.perf_counter()
+        per_pair = MetaAnalysisEngine()
+        legacy = [per_pair.pool_effect_modifiers(outcome, modifier) for outcome, modifier in pairs]
+        legacy = {(e.outcome_token, e.modifier_token): e for e in legacy if e}
+        per_pair_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batch = BatchMetaAnalysisEngine(db).pool_all_effect_modifiers()
+        batch_seconds = time.perf_counter() - start
+
+        worst = 0.0
+        for effect in batch:
+            reference = legacy[(effect.outcome_token, effect.modifier_token)]
+            assert effect.inputs == reference.inputs and effect.method == reference.method
+            for field in ("or_mean", "or_ci_low", "or_ci_high"):
+                worst = max(worst, abs(getattr(effect, field) / getattr(reference, field) - 1))
+        db.close()
+
+    print(f"per-pair: {len(legacy)} pools in {per_pair_seconds:.2f}s")
+    print(f"batch:    {len(batch)} pools in {batch_seconds:.2f}s  ({per_pair_seconds / batch_seconds:.0f}x)")
+    print(f"largest relative OR/CI difference: {worst:.1e}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
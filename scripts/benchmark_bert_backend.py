@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark the quantized BERT tagger on the sample HPIs: single-document latency and batched throughput.
+Needs an exported model (scripts/export_bert_onnx.py) in --model-dir or MERIDIAN_BERT_MODEL_DIR; nothing is downloaded.
+"""
+
+import sys
+import time
+import argparse
+import statistics
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent))
+
+from benchmark_pattern_matcher import load_sample_hpis
+from nlp.bert_backend import load_bert_tagger, split_sentences
+from src.core.parse_cache import ParseCache
+
+
+def uncached(tagger):
+    """Give the tagger an empty private cache so every sentence reaches the model."""
+    tagger.cache = ParseCache()
+    return tagger
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantized BERT tagger latency and throughput")
+    parser.add_argument("--model-dir", default=None)
+    parser.add_argument("--backend", choices=["onnx", "torch"], default=None)
+    parser.add_argument("--batch-sizes", default="1,8,32,64", help="Comma-separated sentences per forward pass")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    tagger = load_bert_tagger(args.model_dir, args.backend)
+    if tagger is None:
+        print("No BERT model could be loaded; export one with scripts/export_bert_onnx.py")
+        return 1
+
+    texts = load_sample_hpis()
+    sentences = sum(len(split_sentences(text)) for text in texts)
+    print(f"HPIs: {len(texts)}   sentences: {sentences}")
+
+    # Single-document latency, one HPI per call
+    uncached(tagger)
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        tagger(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    print(f"per HPI: p50 {statistics.median(latencies):.1f} ms, "
+          f"p95 {latencies[int(0.95 * (len(latencies) - 1))]:.1f} ms")
+
+    for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+        tagger.batch_size = batch_size
+        timings = []
+        for _ in range(args.rounds):
+            uncached(tagger)
+            start = time.perf_counter()
+            tagger.tag_many(texts)
+            timings.append(time.perf_counter() - start)
+        seconds = statistics.median(timings)
+        print(f"batch {batch_size:3d}: {len(texts) / seconds:7.1f} HPIs/s  ({sentences / seconds:7.1f} sentences/s)")
+
+    start = time.perf_counter()
+    tagger.tag_many(texts)
+    seconds = time.perf_counter() - start
+    print(f"cached:    {len(texts) / seconds:7.1f} HPIs/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark bulk DataFrame upserts against per-row INSERT + audit for papers and estimates.
+Uses papers parsed from the on-disk raw XML corpus and the effects extracted from them; checks both paths store identical rows.
+"""
+
+import sys
+import json
+import time
+import argparse
+import tempfile
+from dataclasses import asdict
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.core.database import CodexDatabase
+import src.core.database as database
+from src.evidence.pubmed_harvester import PubMedHarvester, raw_xml_files
+from src.evidence.bulk_writer import BulkWriter
+
+OUTCOMES = ["LARYNGOSPASM", "BRONCHOSPASM", "HYPOTENSION", "MORTALITY", "HYPOXEMIA", "PONV", "DIFFICULT_INTUBATION"]
+
+
+def load_corpus(raw_dir: str, files: int):
+    database._db_instance = CodexDatabase(":memory:")
+    harvester = PubMedHarvester()
+    papers, effects = [], []
+    for path in raw_xml_files(raw_dir)[:files]:
+        for paper in harvester.iter_pubmed_xml(path):
+            paper.ingest_query_id = "benchmark"
+            papers.append(paper)
+            effects.extend(harvester.extract_effects(paper, OUTCOMES))
+    return papers, effects
+
+
+def legacy_store(db, papers, effects):
+    """Previous implementation: one INSERT OR REPLACE and one synchronous audit row per record."""
+    for paper in papers:
+        db.execute_write("""
+            INSERT OR REPLACE INTO papers
+            (pmid, title, abstract, journal, year, design, n_total, population,
+             procedure, time_horizon, url, raw_path, ingest_query_id, doi,
+             authors, keywords, mesh_terms, study_quality_score, evidence_grade)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            paper.pmid, paper.title, paper.abstract, paper.journal, paper.year,
+            paper.design, paper.n_total, paper.population, paper.procedure,
+            paper.time_horizon, paper.url, paper.raw_path, paper.ingest_query_id,
+            paper.doi, json.dumps(paper.authors or []),
+            json.dumps(paper.keywords or []), json.dumps(paper.mesh_terms or []),
+            paper.study_quality_score, paper.evidence_grade
+        ])
+        db.log_action("papers", paper.pmid, "INSERT", asdict(paper))
+
+    for effect in effects:
+        db.execute_write("""
+            INSERT OR REPLACE INTO estimates
+            (id, pmid, outcome_token, modifier_token, measure, estimate,
+             ci_low, ci_high, adjusted, n_group, n_events, definition_note,
+             time_horizon, quality_weight, evidence_grade, population_match,
+             extraction_confidence, covariates, subgroup)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            effect.id, effect.pmid, effect.outcome_token, effect.modifier_token,
+            effect.measure, effect.estimate, effect.ci_low, effect.ci_high,
+            effect.adjusted, effect.n_group, effect.n_events, effect.definition_note,
+            effect.time_horizon, effect.quality_weight, effect.evidence_grade,
+            effect.population_match, effect.extraction_confidence,
+            json.dumps(effect.covariates), effect.subgroup
+        ])
+        db.log_action("estimates", effect.id, "INSERT", asdict(effect))
+
+
+def bulk_store(db, papers, effects):
+    with BulkWriter(db) as writer:
+        writer.add_papers(papers)
+        writer.add_effects(effects)
+    db.audit_sink.flush()
+
+
+def timed(store, papers, effects, workdir: str, name: str):
+    db = CodexDatabase(str(Path(workdir) / f"{name}.duckdb"))
+    start = time.perf_counter()
+    store(db, papers, effects)
+    seconds = time.perf_counter() - start
+    snapshot = (
+        db.conn.execute("SELECT * EXCLUDE (ingested_at) FROM papers ORDER BY pmid").fetchall(),
+        db.conn.execute("SELECT * EXCLUDE (extracted_at) FROM estimates ORDER BY id").fetchall(),
+        db.conn.execute("SELECT COUNT(*) FROM audit_log").fetchone()[0]
+    )
+    db.close()
+    return seconds, snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-row and bulk harvester writes")
+    parser.add_argument("--raw-dir", default="database/raw_xml")
+    parser.add_argument("--files", type=int, default=10, help="Raw batch files to load")
+    args = parser.parse_args()
+
+    papers, effects = load_corpus(args.raw_dir, args.files)
+    # Per-row upserts keep the last row per key; drop earlier duplicates so both paths see the same input
+    papers = list({p.pmid: p for p in papers}.values())
+    effects = list({e.id: e for e in effects}.values())
+    print(f"Corpus: {len(papers)} papers, {len(effects)} estimates from {args.files} raw files")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        legacy_seconds, legacy_rows = timed(legacy_store, papers, effects, workdir, "legacy")
+        bulk_seconds, bulk_rows = timed(bulk_store, papers, effects, workdir, "bulk")
+
+    rows = len(papers) + len(effects)
+    print(f"per-row INSERT + audit: {legacy_seconds:.2f}s ({rows / legacy_seconds:.0f} rows/s, {legacy_rows[2]} audit rows)")
+    print(f"bulk DataFrame upsert:  {bulk_seconds:.2f}s ({rows / bulk_seconds:.0f} rows/s, {bulk_rows[2]} audit rows)"
+          f"  ({legacy_seconds / bulk_seconds:.1f}x)")
+    identical = legacy_rows[:2] == bulk_rows[:2]
+    print(f"identical papers/estimates rows: {identical}")
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark the compiled multi-pattern matcher against the per-pattern extraction loops.
+Checks that condition, medication and procedure extraction output is identical on the sample HPIs.
+"""
+
+import ast
+import sys
+import time
+import statistics
+from dataclasses import asdict
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.core.database import init_database
+from src.core.hpi_parser import MedicalTextProcessor, ExtractedFactor
+
+
+def load_sample_hpis():
+    """SAMPLE_HPIS from app_simple.py plus the 100-case evaluation set (without starting the app)."""
+    source = (Path(__file__).parent.parent / "app_simple.py").read_text()
+    hpis = []
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "SAMPLE_HPIS" for t in node.targets):
+            hpis.extend(ast.literal_eval(node.value))
+
+    from comprehensive_test_100_cases import generate_100_anesthesia_cases
+    hpis.extend(case.hpi_text for case in generate_100_anesthesia_cases())
+    return hpis
+
+
+def legacy_rule_based_factors(processor, text):
+    """Previous implementation: every condition regex over the full text."""
+    factors = []
+    for condition_token, patterns in processor.condition_patterns.items():
+        for pattern in patterns:
+            for match in pattern.finditer(text):
+                term = processor.ontology.get_term(condition_token)
+                if term:
+                    factors.append(ExtractedFactor(
+                        token=condition_token,
+                        plain_label=term.plain_label,
+                        confidence=0.8,
+                        evidence_text=match.group(0),
+                        factor_type=term.type,
+                        category=term.category,
+                        severity_weight=term.severity_weight,
+                        context=text[max(0, match.start()-50):match.end()+50]
+                    ))
+    return factors
+
+
+def legacy_medications(processor, text):
+    """Previous implementation: medication patterns rebuilt and scanned one by one."""
+    medications = []
+    for med_class, patterns in processor._build_medication_patterns().items():
+        for pattern in patterns:
+            for match in pattern.finditer(text):
+                implications = processor._get_medication_implications(med_class, match.group())
+                medications.append(ExtractedFactor(
+                    token=med_class,
+                    plain_label=implications['label'],
+                    confidence=0.85,
+                    evidence_text=match.group(),
+                    factor_type="medication",
+                    category="pharmacological",
+                    severity_weight=1.2 if implications['significance'].startswith('High') else 1.0,
+                    context=implications['recommendations']
+                ))
+    return medications
+
+
+def legacy_procedure(processor, text):
+    for procedure_token, patterns in processor.procedure_patterns.items():
+        for pattern in patterns:
+            if pattern.search(text):
+                return procedure_token
+    return None
+
+
+def legacy_extract(processor, text):
+    return (legacy_rule_based_factors(processor, text), legacy_medications(processor, text),
+            legacy_procedure(processor, text))
+
+
+def compiled_extract(processor, text):
+    return (processor._extract_rule_based_factors(text), processor._extract_medications(text),
+            processor._extract_procedure(text))
+
+
+def time_per_hpi(extract, processor, texts, rounds):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for text in texts:
+            extract(processor, text)
+        timings.append((time.perf_counter() - start) / len(texts))
+    return statistics.median(timings)
+
+
+def main(rounds: int = 20):
+    init_database(":memory:")
+    processor = MedicalTextProcessor()
+    texts = [processor._clean_text(hpi) for hpi in load_sample_hpis()]
+
+    # Output must be identical, factor for factor
+    mismatches = 0
+    for text in texts:
+        legacy = legacy_extract(processor, text)
+        compiled = compiled_extract(processor, text)
+        if ([asdict(f) for f in legacy[0]], [asdict(f) for f in legacy[1]], legacy[2]) != \
+           ([asdict(f) for f in compiled[0]], [asdict(f) for f in compiled[1]], compiled[2]):
+            mismatches += 1
+            print(f"MISMATCH: {text[:80]}...")
+
+    legacy_seconds = time_per_hpi(legacy_extract, processor, texts, rounds)
+    compiled_seconds = time_per_hpi(compiled_extract, processor, texts, rounds)
+
+    print(f"HPIs: {len(texts)}   matcher: {processor.pattern_matcher.stats()}")
+    print(f"legacy loops:     {legacy_seconds * 1000:.3f} ms/HPI")
+    print(f"compiled matcher: {compiled_seconds * 1000:.3f} ms/HPI  ({legacy_seconds / compiled_seconds:.1f}x)")
+    print(f"identical output: {len(texts) - mismatches}/{len(texts)}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
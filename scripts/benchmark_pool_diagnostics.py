@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark risk_engine.pool diagnostics: per-pair bounded REML solves and LOO refits vs the batched engine.
+Pools seeded synthetic factor-outcome pairs both ways and compares pooled effects and LOO shifts.
+"""
+
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+
+import numpy as np
+from scipy import stats
+from scipy.optimize import minimize_scalar
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+
+from risk_engine.pool import MetaAnalysisEngine
+from risk_engine.schema import (RiskConfig, Study, StudyDesign, RiskOfBias, SurgeryType, Urgency,
+                                TimeWindow, EffectMeasure)
+
+
+class LegacyMetaAnalysisEngine(MetaAnalysisEngine):
+    """Diagnostics as they were: one bounded REML solve per fit, one full refit per omitted study."""
+
+    def pool_studies_batch(self, pairs):
+        results = []
+        for studies, factor, outcome, window in pairs:
+            effects_data = self._prepare_effects(studies)
+            weights = self._calculate_weights(studies, effects_data)
+            ma_result = self._run_meta_analysis(effects_data, weights)
+            if len(studies) >= 10:
+                ma_result.egger_p = self._egger_test(effects_data, weights)
+            results.append((ma_result, self._loo_diagnostics(effects_data, weights)))
+        return results
+
+    def _estimate_tau_squared_reml(self, effects_data, weights):
+        def reml_objective(tau_sq):
+            w_i = weights / (effects_data[:, 1] ** 2 + tau_sq)
+            sum_w = np.sum(w_i)
+            pooled_effect = np.sum(w_i * effects_data[:, 0]) / sum_w
+            q = np.sum(w_i * (effects_data[:, 0] - pooled_effect) ** 2)
+            return 0.5 * (q + np.sum(np.log(effects_data[:, 1] ** 2 + tau_sq)) + np.log(sum_w))
+
+        return max(0, minimize_scalar(reml_objective, bounds=(0, 2), method='bounded').x)
+
+    def _egger_test(self, effects_data, weights):
+        precision = 1.0 / effects_data[:, 1]
+        X = np.column_stack([np.ones(len(precision)), precision])
+        W = np.diag(weights)
+        XtWX_inv = np.linalg.inv(X.T @ W @ X)
+        beta = XtWX_inv @ X.T @ W @ effects_data[:, 0]
+        residuals = effects_data[:, 0] - X @ beta
+        mse = np.sum(weights * residuals ** 2) / (len(effects_data) - 2)
+        t_stat = beta[0] / np.sqrt(mse * XtWX_inv[0, 0])
+        return 2 * (1 - stats.t.cdf(abs(t_stat), len(effects_data) - 2))
+
+    def _loo_diagnostics(self, effects_data, weights):
+        if len(effects_data) <= 2:
+            return None
+        original_risk = self._log_odds_to_prob(self._run_meta_analysis(effects_data, weights).log_effect, 0.05)
+        max_delta = 0.0
+        for i in range(len(effects_data)):
+            loo = self._run_meta_analysis(np.delete(effects_data, i, axis=0), np.delete(weights, i))
+            max_delta = max(max_delta, abs(self._log_odds_to_prob(loo.log_effect, 0.05) - original_risk) * 100)
+        return max_delta
+
+
+def synthetic_pairs(n_pairs: int, max_studies: int, seed: int = 11):
+    rng = np.random.default_rng(seed)
+    designs, biases = list(StudyDesign), list(RiskOfBias)
+    pairs = []
+    for p in range(n_pairs):
+        true_log_or = rng.normal(0.4, 0.3)
+        heterogeneity = rng.uniform(0, 0.3)
+        studies = []
+        for s in range(int(rng.integers(2, max_studies + 1))):
+            se = rng.uniform(0.1, 0.5)
+            value = float(np.exp(true_log_or + rng.normal(0, heterogeneity) + rng.normal(0, se)))
+            studies.append(Study(
+                pmid=f"{p}_{s}", title="t", first_author="a", pub_year=int(rng.integers(2000, 2025)),
+                design=designs[s % 3], risk_of_bias=biases[s % 3], age_pop="mixed",
+                surgery_domain=SurgeryType.GENERAL, urgency=Urgency.ELECTIVE, outcome=f"OUTCOME_{p}",
+                window=TimeWindow.INTRAOP, factor=f"FACTOR_{p}", measure=EffectMeasure.OR, value=value,
+                se=float(se), n_total=int(rng.integers(50, 2000))))
+        pairs.append((studies, f"FACTOR_{p}", f"OUTCOME_{p}", TimeWindow.INTRAOP))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-pair vs batched REML + leave-one-out diagnostics")
+    parser.add_argument("--pairs", type=int, default=300)
+    parser.add_argument("--max-studies", type=int, default=20)
+    args = parser.parse_args()
+    logging.getLogger("risk_engine").setLevel(logging.ERROR)
+
+    pairs = synthetic_pairs(args.pairs, args.max_studies)
+    config = RiskConfig()
+    studies = sum(len(p[0]) for p in pairs)
+    print(f"{len(pairs)} pairs, {studies} studies")
+
+    start = time.perf_counter()
+    legacy = LegacyMetaAnalysisEngine(config).pool_studies_batch(pairs)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = MetaAnalysisEngine(config).pool_studies_batch(pairs)
+    batched_seconds = time.perf_counter() - start
+
+    effect_diff = max(abs(new.log_effect_raw - old.log_effect) for new, (old, _) in zip(batched, legacy))
+    loo_diff = max(abs((new.loo_max_delta_pp or 0) - (loo or 0)) for new, (_, loo) in zip(batched, legacy))
+    print(f"per pair: {legacy_seconds:.2f}s  ({legacy_seconds / len(pairs) * 1000:.1f} ms/pair)")
+    print(f"batched:  {batched_seconds:.2f}s  ({batched_seconds / len(pairs) * 1000:.2f} ms/pair, "
+          f"{legacy_seconds / batched_seconds:.0f}x)")
+    print(f"largest difference: pooled log effect {effect_diff:.1e}, LOO shift {loo_diff:.1e} pp")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
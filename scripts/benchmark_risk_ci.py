@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark RiskConverter.calculate_absolute_risk_ci: the previous per-draw loop vs the array engine.
+Reports per-call latency, batched throughput, and how much CI bounds move between seeds (random vs Sobol).
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+
+from risk_engine.convert import RiskConverter
+from risk_engine.schema import PooledEffect, BaselineRisk, TimeWindow, AgeBand, SurgeryType, Urgency
+
+
+class LegacyRiskConverter(RiskConverter):
+    """calculate_absolute_risk_ci as it was: NumPy draws, then a Python loop per draw."""
+
+    def calculate_absolute_risk_ci(self, pooled_effects, baseline_risk, factor_codes):
+        relevant_effects = []
+        effect_variances = []
+        for effect in pooled_effects:
+            if effect.factor in factor_codes:
+                relevant_effects.append(effect.log_effect_shrunk or effect.log_effect_raw)
+                effect_variances.append((effect.se_shrunk or effect.se_raw) ** 2)
+
+        if not relevant_effects:
+            return baseline_risk.p0, baseline_risk.p0, baseline_risk.p0
+
+        combined_log_effect = self.combine_log_effects(relevant_effects)
+        point_risk = self.log_or_to_prob(combined_log_effect, baseline_risk.p0)
+        sampled_effects = self.rng.normal(combined_log_effect, np.sqrt(sum(effect_variances)), self.mc_draws)
+
+        if baseline_risk.p0_ci_lower and baseline_risk.p0_ci_upper:
+            logit_p0 = np.log(baseline_risk.p0 / (1 - baseline_risk.p0))
+            logit_se = (np.log(baseline_risk.p0_ci_upper / (1 - baseline_risk.p0_ci_upper))
+                        - np.log(baseline_risk.p0_ci_lower / (1 - baseline_risk.p0_ci_lower))) / (2 * 1.96)
+            baseline_samples = np.clip(1 / (1 + np.exp(-self.rng.normal(logit_p0, logit_se, self.mc_draws))),
+                                       0.0001, 0.9999)
+        else:
+            baseline_samples = np.full(self.mc_draws, baseline_risk.p0)
+
+        risk_samples = []
+        for i in range(self.mc_draws):
+            try:
+                risk = self.log_or_to_prob(sampled_effects[i], baseline_samples[i])
+                risk = np.clip(risk, 0.0001, 0.9999)
+                risk_samples.append(risk)
+            except:
+                continue
+
+        risk_samples = np.array(risk_samples)
+        return point_risk, np.percentile(risk_samples, 2.5), np.percentile(risk_samples, 97.5)
+
+
+def demo_inputs():
+    effects = [
+        PooledEffect(factor=factor, outcome="LARYNGOSPASM", window=TimeWindow.INTRAOP, log_effect_raw=log_effect,
+                     se_raw=se, k_studies=5, tau_squared=0.02, i_squared=20.0, q_statistic=4.0,
+                     p_heterogeneity=0.4, total_weight=1.0, studies=[])
+        for factor, log_effect, se in [("ASTHMA", 0.693, 0.2), ("RECENT_URI_2W", 1.099, 0.25), ("OSA", 0.588, 0.3)]
+    ]
+    baseline = BaselineRisk(outcome="LARYNGOSPASM", window=TimeWindow.INTRAOP, age_band=AgeBand.ONE_TO_3,
+                            surgery=SurgeryType.ENT, urgency=Urgency.ELECTIVE, p0=0.02, p0_ci_lower=0.012,
+                            p0_ci_upper=0.033, p_ref=0.01, delta_pp=1.0, fold_ratio=2.0)
+    return effects, baseline, ["ASTHMA", "RECENT_URI_2W"]
+
+
+def per_call_ms(converter, effects, baseline, factors, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        converter.calculate_absolute_risk_ci(effects, baseline, factors)
+    return (time.perf_counter() - start) / calls * 1000
+
+
+def seed_spread(sampling, draws, seeds, effects, baseline, factors):
+    """Standard deviation of the CI bounds across converter seeds (Monte Carlo error of the CI itself)."""
+    bounds = np.array([RiskConverter(draws, seed=seed, sampling=sampling)
+                       .calculate_absolute_risk_ci(effects, baseline, factors)[1:] for seed in range(seeds)])
+    return bounds.std(axis=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo absolute-risk CI latency and precision")
+    parser.add_argument("--draws", type=int, default=5000)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=1000, help="Outcome/patient rows for the batched call")
+    parser.add_argument("--seeds", type=int, default=50)
+    args = parser.parse_args()
+
+    effects, baseline, factors = demo_inputs()
+
+    legacy = per_call_ms(LegacyRiskConverter(args.draws, seed=42), effects, baseline, factors, max(1, args.calls // 10))
+    vectorized = per_call_ms(RiskConverter(args.draws, seed=42), effects, baseline, factors, args.calls)
+    sobol = per_call_ms(RiskConverter(1024, seed=42, sampling="sobol"), effects, baseline, factors, args.calls)
+    print(f"per call, {args.draws} draws: loop {legacy:.2f} ms, arrays {vectorized:.3f} ms ({legacy / vectorized:.0f}x)")
+    print(f"per call, Sobol 1024 draws: {sobol:.3f} ms")
+
+    converter = RiskConverter(args.draws, seed=42)
+    start = time.perf_counter()
+    converter.calculate_absolute_risk_ci_batch(effects, [baseline] * args.rows, [factors] * args.rows)
+    batch = (time.perf_counter() - start) * 1000
+    print(f"batched {args.rows} rows: {batch:.1f} ms ({batch / args.rows:.3f} ms/row)")
+
+    print(f"CI bound spread across {args.seeds} seeds (lower, upper):")
+    for sampling, draws in [("random", args.draws), ("random", 1024), ("sobol", 1024), ("sobol", 256)]:
+        spread = seed_spread(sampling, draws, args.seeds, effects, baseline, factors)
+        print(f"  {sampling:6s} {draws:5d} draws: {spread[0]:.2e}, {spread[1]:.2e}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
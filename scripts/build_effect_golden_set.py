@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Build the golden-output regression sets for effect extraction.
+The keyword set snapshots existing `estimates` rows: each case is a stored paper and, per outcome it was harvested for,
+the estimate rows that harvest produced. The ontology set re-extracts those papers with per-pattern finditer() matching
+and ontology outcome attribution, the reference output for the single-scan matcher in the production default mode.
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+DEFAULT_OUT = "tests/fixtures/effects/golden_estimates.json"
+DEFAULT_ONTOLOGY_OUT = "tests/fixtures/effects/golden_estimates_ontology.json"
+
+# Outcomes requested together when building the ontology set (as one harvest query would)
+ONTOLOGY_OUTCOMES = ["LARYNGOSPASM", "BRONCHOSPASM", "HYPOTENSION", "MORTALITY"]
+
+# Estimate columns the extractor determines (ids embed outcome, measure and estimate)
+ROW_COLUMNS = ["id", "measure", "estimate", "ci_low", "ci_high", "adjusted", "n_group", "n_events",
+               "definition_note", "extraction_confidence", "covariates"]
+
+
+def build_cases(conn, papers: int) -> list:
+    pmids = [row[0] for row in conn.execute("""
+        SELECT DISTINCT e.pmid FROM estimates e JOIN papers p ON e.pmid = p.pmid ORDER BY e.pmid LIMIT ?
+    """, [papers]).fetchall()]
+
+    cases = []
+    for pmid in pmids:
+        title, abstract, time_horizon, quality, grade = conn.execute("""
+            SELECT title, abstract, time_horizon, study_quality_score, evidence_grade FROM papers WHERE pmid = ?
+        """, [pmid]).fetchone()
+        expected = {}
+        for row in conn.execute(f"""
+            SELECT outcome_token, {', '.join(ROW_COLUMNS)} FROM estimates WHERE pmid = ? ORDER BY outcome_token, id
+        """, [pmid]).fetchall():
+            values = dict(zip(ROW_COLUMNS, row[1:]))
+            values["covariates"] = json.loads(values["covariates"] or "[]")
+            expected.setdefault(row[0], []).append(values)
+        cases.append({
+            "pmid": pmid,
+            "title": title,
+            "abstract": abstract,
+            "time_horizon": time_horizon,
+            "study_quality_score": quality,
+            "evidence_grade": grade,
+            "expected": expected
+        })
+    return cases
+
+
+def build_ontology_cases(keyword_cases: list) -> list:
+    from src.evidence.effect_extractor import EffectExtractor
+
+    class PerPatternExtractor(EffectExtractor):
+        """Reference matcher: every pattern runs finditer() over the whole text."""
+
+        def matches(self, text, lowered=None):
+            for index, pattern in enumerate(self.patterns):
+                for match in pattern.finditer(text):
+                    yield index, match
+
+    extractor = PerPatternExtractor("ontology")
+    cases = []
+    for case in keyword_cases:
+        paper = argparse.Namespace(**{k: v for k, v in case.items() if k != "expected"})
+        # Stored rows are upserts by id: the last extraction for an id wins
+        rows = {effect.id: effect for effect in extractor.extract(paper, ONTOLOGY_OUTCOMES)}
+        expected = {}
+        for effect_id in sorted(rows):
+            effect = rows[effect_id]
+            values = {column: getattr(effect, column) for column in ROW_COLUMNS}
+            expected.setdefault(effect.outcome_token, []).append(values)
+        cases.append({**case, "expected": expected})
+    return cases
+
+
+def write_cases(out: Path, source: str, cases: list, **header):
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as f:
+        # One case per line keeps the fixture compact and its diffs readable
+        fields = "".join(', "%s": %s' % (key, json.dumps(value)) for key, value in header.items())
+        f.write('{"source": %s%s, "cases": [\n' % (json.dumps(source), fields))
+        f.write(",\n".join(json.dumps(case, ensure_ascii=False) for case in cases))
+        f.write("\n]}\n")
+    rows = sum(len(r) for case in cases for r in case["expected"].values())
+    print(f"Wrote {len(cases)} papers ({rows} estimate rows) to {out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot estimates rows as an effect-extraction golden set")
+    parser.add_argument("--db", default="database/production.duckdb", help="Database with papers and estimates")
+    parser.add_argument("--papers", type=int, default=25, help="Papers to include (lowest PMIDs with estimates)")
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--ontology", action="store_true",
+                        help=f"Build the ontology-mode set from the papers in {DEFAULT_OUT} (no database needed)")
+    args = parser.parse_args()
+
+    if args.ontology:
+        with open(DEFAULT_OUT) as f:
+            keyword_cases = json.load(f)["cases"]
+        write_cases(Path(args.out or DEFAULT_ONTOLOGY_OUT), Path(DEFAULT_OUT).name,
+                    build_ontology_cases(keyword_cases), outcome_tokens=ONTOLOGY_OUTCOMES)
+        return
+
+    import duckdb
+    conn = duckdb.connect(args.db, read_only=True)
+    cases = build_cases(conn, args.papers)
+    conn.close()
+    write_cases(Path(args.out or DEFAULT_OUT), Path(args.db).name, cases)
+
+if __name__ == "__main__":
+    main()
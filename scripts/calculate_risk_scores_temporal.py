@@ -19,6 +19,7 @@ Usage:
     python scripts/calculate_risk_scores_temporal.py
     python scripts/calculate_risk_scores_temporal.py --tau 10  # Custom temporal decay
     python scripts/calculate_risk_scores_temporal.py --modern-cutoff 2010  # Custom modern cutoff
+    python scripts/calculate_risk_scores_temporal.py --sweep-tau 5 7 10 --sweep-cutoff 2010 2015  # Sensitivity
 """
 
 import sys
@@ -28,15 +29,18 @@ import json
 import math
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional
 import argparse
 
+import pandas as pd
+
 # Add project root to path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from src.core.database import init_database
 from src.core.error_codes import CodexError, ErrorCode, ErrorLogger
+from src.evidence.temporal_pooling import TemporalPoolingEngine, DEFAULT_TAU, DEFAULT_MODERN_CUTOFF
 
 # Configure logging
 logging.basicConfig(
@@ -53,284 +57,57 @@ error_logger = ErrorLogger()
 class TemporalRiskCalculator:
     """Risk calculator with temporal weighting implementation"""
 
-    def __init__(self, db_path: str = "database/codex.duckdb", tau: float = 7.0, modern_cutoff: int = 2015):
+    def __init__(self, db_path: str = "database/codex.duckdb", tau: float = DEFAULT_TAU,
+                 modern_cutoff: int = DEFAULT_MODERN_CUTOFF):
         self.db_path = db_path
-        self.tau = tau  # Temporal decay half-life in years
+        self.tau = tau  # Temporal decay constant in years
         self.modern_cutoff = modern_cutoff  # Modern practice cutoff year
-        self.current_year = datetime.now().year
 
         # Initialize database
         self.db = init_database(db_path)
+        self.engine = TemporalPoolingEngine(self.db)
+        self.current_year = self.engine.current_year
 
         # Temporal weighting parameters
-        self.guideline_weight_multiplier = 1.5  # Extra weight for recent guidelines
-        self.modern_practice_multiplier = 1.3   # Extra weight for modern cohorts
+        self.guideline_weight_multiplier = self.engine.guideline_weight_multiplier
+        self.modern_practice_multiplier = self.engine.modern_practice_multiplier
+
+        self._pooled: Optional[pd.DataFrame] = None
 
         logger.info(f"Initialized TemporalRiskCalculator with tau={tau} years, modern cutoff={modern_cutoff}")
 
-    def calculate_temporal_weight(self, publication_year: int, study_type: str = "study") -> float:
-        """
-        Calculate temporal weight for a study based on publication year
-
-        Uses exponential decay: weight = exp(-(current_year - pub_year)/τ)
-        Additional multipliers for guidelines and modern practices
-        """
-        if publication_year is None or publication_year < 1950 or publication_year > self.current_year:
-            return 0.1  # Minimal weight for invalid years
-
-        # Base temporal weight with exponential decay
-        years_ago = self.current_year - publication_year
-        temporal_weight = math.exp(-years_ago / self.tau)
-
-        # Additional weight for recent guidelines
-        if study_type.lower() in ["guideline", "consensus", "recommendation"] and publication_year >= self.modern_cutoff:
-            temporal_weight *= self.guideline_weight_multiplier
-
-        # Additional weight for modern practice era
-        if publication_year >= self.modern_cutoff:
-            temporal_weight *= self.modern_practice_multiplier
-
-        return temporal_weight
-
-    def get_evidence_for_outcome(self, outcome_token: str, population: str = "mixed") -> List[Dict]:
-        """Get all evidence estimates for a specific outcome"""
-        query = """
-            SELECT
-                e.estimate,
-                e.standard_error,
-                e.confidence_interval_lower,
-                e.confidence_interval_upper,
-                e.evidence_grade,
-                e.sample_size,
-                e.modifier_token,
-                p.publication_year,
-                p.study_type,
-                p.title,
-                p.journal
-            FROM estimates e
-            LEFT JOIN papers p ON e.paper_id = p.paper_id
-            WHERE e.outcome_token = ?
-            AND (e.population = ? OR e.population IS NULL OR e.population = 'mixed')
-            AND e.estimate IS NOT NULL
-            ORDER BY p.publication_year DESC
-        """
-
-        results = self.db.conn.execute(query, [outcome_token, population]).fetchall()
-
-        evidence_list = []
-        for row in results:
-            evidence_list.append({
-                'estimate': row[0],
-                'standard_error': row[1],
-                'ci_lower': row[2],
-                'ci_upper': row[3],
-                'evidence_grade': row[4],
-                'sample_size': row[5],
-                'modifier_token': row[6],
-                'publication_year': row[7],
-                'study_type': row[8] or 'study',
-                'title': row[9],
-                'journal': row[10]
-            })
-
-        return evidence_list
-
-    def calculate_inverse_variance_weight(self, evidence: Dict) -> float:
-        """Calculate inverse variance weight for meta-analysis"""
-        if evidence['standard_error'] is None or evidence['standard_error'] <= 0:
-            # Fallback based on sample size if available
-            if evidence['sample_size'] and evidence['sample_size'] > 0:
-                # Approximate SE from sample size: SE ≈ 1/√n
-                approx_se = 1.0 / math.sqrt(evidence['sample_size'])
-                return 1.0 / (approx_se ** 2)
+    def pooled(self) -> pd.DataFrame:
+        """All baseline and modifier groups pooled once for this calculator's parameters"""
+        if self._pooled is None:
+            self._pooled = self.engine.pool([self.tau], [self.modern_cutoff])
+        return self._pooled
+
+    def _calculations(self, calculation_type: str) -> Dict:
+        rows = self.pooled()
+        rows = rows[rows["calculation_type"] == calculation_type]
+        results = {}
+        for record in rows.to_dict("records"):
+            record = {k: (None if isinstance(v, float) and math.isnan(v) else v) for k, v in record.items()}
+            record['type'] = record.pop('calculation_type')
+            for column in ('tau', 'modern_cutoff'):
+                record.pop(column)
+            if calculation_type == 'baseline_risk':
+                record.pop('modifier_token')
+                key = f"{record['outcome_token']}_{record['population']}"
             else:
-                return 1.0  # Minimal weight
-
-        return 1.0 / (evidence['standard_error'] ** 2)
-
-    def calculate_evidence_grade_weight(self, grade: str) -> float:
-        """Convert evidence grade to numeric weight"""
-        grade_weights = {
-            'A': 4.0,  # High quality RCTs, meta-analyses
-            'B': 3.0,  # Good quality cohort studies
-            'C': 2.0,  # Case-control, lower quality studies
-            'D': 1.0   # Expert opinion, case reports
-        }
-        return grade_weights.get(grade, 1.0)
-
-    def pool_evidence_temporal(self, evidence_list: List[Dict]) -> Dict:
-        """
-        Pool evidence using temporal weighting and inverse variance meta-analysis
-
-        Returns both raw pooled estimate and temporally adjusted estimate
-        """
-        if not evidence_list:
-            return None
-
-        # Calculate weights for each study
-        raw_weights = []
-        temporal_weights = []
-        estimates = []
-
-        for evidence in evidence_list:
-            # Base inverse variance weight
-            iv_weight = self.calculate_inverse_variance_weight(evidence)
-
-            # Evidence grade weight
-            grade_weight = self.calculate_evidence_grade_weight(evidence['evidence_grade'])
-
-            # Temporal weight
-            temporal_weight = self.calculate_temporal_weight(
-                evidence['publication_year'],
-                evidence['study_type']
-            )
-
-            # Combined weights
-            raw_weight = iv_weight * grade_weight
-            temporal_adjusted_weight = raw_weight * temporal_weight
-
-            raw_weights.append(raw_weight)
-            temporal_weights.append(temporal_adjusted_weight)
-            estimates.append(evidence['estimate'])
-
-        # Calculate raw pooled estimate
-        if sum(raw_weights) > 0:
-            raw_pooled = sum(est * weight for est, weight in zip(estimates, raw_weights)) / sum(raw_weights)
-            raw_se = 1.0 / math.sqrt(sum(raw_weights))
-        else:
-            raw_pooled = estimates[0] if estimates else 0.0
-            raw_se = 1.0
-
-        # Calculate temporally adjusted pooled estimate
-        if sum(temporal_weights) > 0:
-            temporal_pooled = sum(est * weight for est, weight in zip(estimates, temporal_weights)) / sum(temporal_weights)
-            temporal_se = 1.0 / math.sqrt(sum(temporal_weights))
-        else:
-            temporal_pooled = raw_pooled
-            temporal_se = raw_se
-
-        # Calculate confidence intervals
-        raw_ci_lower = raw_pooled - 1.96 * raw_se
-        raw_ci_upper = raw_pooled + 1.96 * raw_se
-        temporal_ci_lower = temporal_pooled - 1.96 * temporal_se
-        temporal_ci_upper = temporal_pooled + 1.96 * temporal_se
-
-        # Check if temporal adjustment made significant difference
-        temporal_adjustment_applied = abs(temporal_pooled - raw_pooled) > 0.01
-
-        # Calculate average publication year for data age assessment
-        years = [e['publication_year'] for e in evidence_list if e['publication_year']]
-        avg_year = sum(years) / len(years) if years else None
-        data_age_warning = avg_year and (self.current_year - avg_year) > 15
-
-        return {
-            'raw_estimate': raw_pooled,
-            'raw_standard_error': raw_se,
-            'raw_ci_lower': raw_ci_lower,
-            'raw_ci_upper': raw_ci_upper,
-            'temporal_estimate': temporal_pooled,
-            'temporal_standard_error': temporal_se,
-            'temporal_ci_lower': temporal_ci_lower,
-            'temporal_ci_upper': temporal_ci_upper,
-            'studies_count': len(evidence_list),
-            'temporal_adjustment_applied': temporal_adjustment_applied,
-            'average_publication_year': avg_year,
-            'data_age_warning': data_age_warning,
-            'oldest_study': min(years) if years else None,
-            'newest_study': max(years) if years else None
-        }
+                key = f"{record['outcome_token']}_{record['modifier_token']}_{record['population']}"
+            results[key] = record
+        return results
 
     def calculate_baseline_risks(self) -> Dict:
         """Calculate baseline risks for all outcomes with temporal weighting"""
-        logger.info("Calculating baseline risks with temporal weighting")
-
-        # Get all unique outcomes
-        query = """
-            SELECT DISTINCT outcome_token,
-                   COALESCE(population, 'mixed') as pop
-            FROM estimates
-            WHERE estimate IS NOT NULL
-            AND modifier_token IS NULL  -- Only baseline risks
-        """
-
-        outcome_populations = self.db.conn.execute(query).fetchall()
-
-        baseline_risks = {}
-
-        for outcome_token, population in outcome_populations:
-            try:
-                evidence_list = self.get_evidence_for_outcome(outcome_token, population)
-
-                # Filter for baseline evidence (no modifiers)
-                baseline_evidence = [e for e in evidence_list if not e['modifier_token']]
-
-                if baseline_evidence:
-                    pooled_result = self.pool_evidence_temporal(baseline_evidence)
-
-                    if pooled_result:
-                        baseline_risks[f"{outcome_token}_{population}"] = {
-                            'outcome_token': outcome_token,
-                            'population': population,
-                            'type': 'baseline_risk',
-                            **pooled_result
-                        }
-
-                        logger.info(f"Calculated baseline risk for {outcome_token} ({population}): "
-                                  f"raw={pooled_result['raw_estimate']:.4f}, "
-                                  f"temporal={pooled_result['temporal_estimate']:.4f}")
-
-            except Exception as e:
-                logger.error(f"Failed to calculate baseline risk for {outcome_token} ({population}): {e}")
-                continue
-
+        baseline_risks = self._calculations('baseline_risk')
         logger.info(f"Calculated {len(baseline_risks)} baseline risks")
         return baseline_risks
 
     def calculate_modifier_effects(self) -> Dict:
         """Calculate modifier effects for all risk factors with temporal weighting"""
-        logger.info("Calculating modifier effects with temporal weighting")
-
-        # Get all unique outcome-modifier combinations
-        query = """
-            SELECT DISTINCT outcome_token, modifier_token,
-                   COALESCE(population, 'mixed') as pop
-            FROM estimates
-            WHERE estimate IS NOT NULL
-            AND modifier_token IS NOT NULL
-        """
-
-        combinations = self.db.conn.execute(query).fetchall()
-
-        modifier_effects = {}
-
-        for outcome_token, modifier_token, population in combinations:
-            try:
-                evidence_list = self.get_evidence_for_outcome(outcome_token, population)
-
-                # Filter for this specific modifier
-                modifier_evidence = [e for e in evidence_list if e['modifier_token'] == modifier_token]
-
-                if modifier_evidence:
-                    pooled_result = self.pool_evidence_temporal(modifier_evidence)
-
-                    if pooled_result:
-                        key = f"{outcome_token}_{modifier_token}_{population}"
-                        modifier_effects[key] = {
-                            'outcome_token': outcome_token,
-                            'modifier_token': modifier_token,
-                            'population': population,
-                            'type': 'modifier_effect',
-                            **pooled_result
-                        }
-
-                        logger.info(f"Calculated modifier effect for {outcome_token}+{modifier_token} ({population}): "
-                                  f"raw={pooled_result['raw_estimate']:.4f}, "
-                                  f"temporal={pooled_result['temporal_estimate']:.4f}")
-
-            except Exception as e:
-                logger.error(f"Failed to calculate modifier effect for {outcome_token}+{modifier_token} ({population}): {e}")
-                continue
-
+        modifier_effects = self._calculations('modifier_effect')
         logger.info(f"Calculated {len(modifier_effects)} modifier effects")
         return modifier_effects
 
@@ -339,105 +116,7 @@ class TemporalRiskCalculator:
         logger.info("Storing risk calculations in database")
 
         try:
-            # Create risk_calculations table if not exists
-            self.db.conn.execute("""
-                CREATE TABLE IF NOT EXISTS risk_calculations (
-                    calculation_id TEXT PRIMARY KEY,
-                    outcome_token TEXT NOT NULL,
-                    modifier_token TEXT,
-                    population TEXT NOT NULL,
-                    calculation_type TEXT NOT NULL,
-                    raw_estimate REAL,
-                    raw_standard_error REAL,
-                    raw_ci_lower REAL,
-                    raw_ci_upper REAL,
-                    temporal_estimate REAL,
-                    temporal_standard_error REAL,
-                    temporal_ci_lower REAL,
-                    temporal_ci_upper REAL,
-                    studies_count INTEGER,
-                    temporal_adjustment_applied BOOLEAN,
-                    average_publication_year REAL,
-                    data_age_warning BOOLEAN,
-                    oldest_study INTEGER,
-                    newest_study INTEGER,
-                    calculation_timestamp TEXT,
-                    temporal_parameters TEXT
-                )
-            """)
-
-            # Store metadata about calculation parameters
-            temporal_params = {
-                'tau': self.tau,
-                'modern_cutoff': self.modern_cutoff,
-                'guideline_weight_multiplier': self.guideline_weight_multiplier,
-                'modern_practice_multiplier': self.modern_practice_multiplier,
-                'calculation_date': datetime.now().isoformat()
-            }
-
-            # Store baseline risks
-            for key, risk_data in baseline_risks.items():
-                calculation_id = f"baseline_{key}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-
-                self.db.conn.execute("""
-                    INSERT OR REPLACE INTO risk_calculations
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, [
-                    calculation_id,
-                    risk_data['outcome_token'],
-                    None,  # No modifier for baseline
-                    risk_data['population'],
-                    'baseline_risk',
-                    risk_data['raw_estimate'],
-                    risk_data['raw_standard_error'],
-                    risk_data['raw_ci_lower'],
-                    risk_data['raw_ci_upper'],
-                    risk_data['temporal_estimate'],
-                    risk_data['temporal_standard_error'],
-                    risk_data['temporal_ci_lower'],
-                    risk_data['temporal_ci_upper'],
-                    risk_data['studies_count'],
-                    risk_data['temporal_adjustment_applied'],
-                    risk_data['average_publication_year'],
-                    risk_data['data_age_warning'],
-                    risk_data['oldest_study'],
-                    risk_data['newest_study'],
-                    datetime.now().isoformat(),
-                    json.dumps(temporal_params)
-                ])
-
-            # Store modifier effects
-            for key, effect_data in modifier_effects.items():
-                calculation_id = f"modifier_{key}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-
-                self.db.conn.execute("""
-                    INSERT OR REPLACE INTO risk_calculations
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, [
-                    calculation_id,
-                    effect_data['outcome_token'],
-                    effect_data['modifier_token'],
-                    effect_data['population'],
-                    'modifier_effect',
-                    effect_data['raw_estimate'],
-                    effect_data['raw_standard_error'],
-                    effect_data['raw_ci_lower'],
-                    effect_data['raw_ci_upper'],
-                    effect_data['temporal_estimate'],
-                    effect_data['temporal_standard_error'],
-                    effect_data['temporal_ci_lower'],
-                    effect_data['temporal_ci_upper'],
-                    effect_data['studies_count'],
-                    effect_data['temporal_adjustment_applied'],
-                    effect_data['average_publication_year'],
-                    effect_data['data_age_warning'],
-                    effect_data['oldest_study'],
-                    effect_data['newest_study'],
-                    datetime.now().isoformat(),
-                    json.dumps(temporal_params)
-                ])
-
-            self.db.conn.commit()
+            self.engine.store(self.pooled(), self.tau, self.modern_cutoff)
             logger.info(f"Stored {len(baseline_risks)} baseline risks and {len(modifier_effects)} modifier effects")
 
         except Exception as e:
@@ -450,6 +129,11 @@ class TemporalRiskCalculator:
             error_logger.log_error(error)
             raise error
 
+    def sensitivity_analysis(self, taus: List[float], modern_cutoffs: List[int]) -> pd.DataFrame:
+        """Pool every group for every (tau, cutoff) pair in one pass and summarise the spread"""
+        pooled = self.engine.pool(taus, modern_cutoffs)
+        return self.engine.sensitivity(pooled)
+
     def generate_calculation_report(self, baseline_risks: Dict, modifier_effects: Dict) -> str:
         """Generate comprehensive calculation report"""
 
@@ -509,8 +193,10 @@ class TemporalRiskCalculator:
 def main():
     parser = argparse.ArgumentParser(description='Calculate Risk Scores with Temporal Weighting')
     parser.add_argument('--db-path', default='database/codex.duckdb', help='Database path')
-    parser.add_argument('--tau', type=float, default=7.0, help='Temporal decay parameter (years)')
-    parser.add_argument('--modern-cutoff', type=int, default=2015, help='Modern practice cutoff year')
+    parser.add_argument('--tau', type=float, default=DEFAULT_TAU, help='Temporal decay parameter (years)')
+    parser.add_argument('--modern-cutoff', type=int, default=DEFAULT_MODERN_CUTOFF, help='Modern practice cutoff year')
+    parser.add_argument('--sweep-tau', type=float, nargs='+', help='Tau values for a sensitivity sweep')
+    parser.add_argument('--sweep-cutoff', type=int, nargs='+', help='Modern cutoffs for a sensitivity sweep')
 
     args = parser.parse_args()
 
@@ -522,6 +208,15 @@ def main():
             modern_cutoff=args.modern_cutoff
         )
 
+        if args.sweep_tau or args.sweep_cutoff:
+            summary = calculator.sensitivity_analysis(args.sweep_tau or [args.tau],
+                                                      args.sweep_cutoff or [args.modern_cutoff])
+            summary_path = f"risk_calculation_temporal_sensitivity_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            summary.to_csv(summary_path, index=False)
+            print(summary.sort_values("range", ascending=False).head(20).to_string(index=False))
+            print(f"\nSensitivity summary saved: {summary_path}")
+            return 0
+
         logger.info("Starting temporal risk score calculation")
 
         # Calculate baseline risks
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Compile the evidence database into a versioned, hashed risk bundle for the scoring API.
+Point MERIDIAN_RISK_BUNDLE at the output directory; workers mmap the version named in its CURRENT file.
+"""
+
+import sys
+import logging
+import argparse
+from pathlib import Path
+
+import yaml
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.core.database import init_database
+from risk_engine.schema import RiskConfig
+from risk_engine.bundle import compile_risk_bundle, RiskBundle
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile pooled evidence into a memory-mappable risk bundle")
+    parser.add_argument("--db", default="database/production.duckdb", help="DuckDB evidence database to read")
+    parser.add_argument("--output", default="data/risk_bundle", help="Bundle root (versions + CURRENT pointer)")
+    parser.add_argument("--config", default=str(project_root / "config" / "risk_config.yaml"))
+    parser.add_argument("--evidence-version", default=None, help="Only compile pools from this evidence version")
+    parser.add_argument("--max-combination-size", type=int, default=2,
+                        help="Largest factor set precomputed in the combinations index")
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = RiskConfig(**yaml.safe_load(f))
+
+    db = init_database(args.db)
+    try:
+        manifest = compile_risk_bundle(db, args.output, config, evidence_version=args.evidence_version,
+                                       max_combination_size=args.max_combination_size)
+    finally:
+        db.close()
+
+    # Re-open the way a worker does, verifying the hash
+    bundle = RiskBundle(args.output, verify=True)
+    logger.info(f"Bundle {bundle.path} ({manifest.artifact_hash[:12]}): {manifest.coverage_stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
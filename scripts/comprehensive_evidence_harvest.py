@@ -25,7 +25,9 @@ sys.path.append(str(project_root))
 
 from src.core.database import get_database
 from src.evidence.pubmed_harvester import PubMedHarvester, PubMedPaper, EffectEstimate
+from src.evidence.bulk_writer import BulkWriter
 from src.evidence.pooling_engine import MetaAnalysisEngine
+from src.evidence.incremental_pooling import IncrementalRepooler
 from src.ontology.core_ontology import AnesthesiaOntology
 
 # Configure logging
@@ -74,6 +76,7 @@ class ComprehensiveEvidenceHarvester:
     def __init__(self, api_key: str = None):
         self.harvester = PubMedHarvester(api_key=api_key)
         self.pooling_engine = MetaAnalysisEngine()
+        self.repooler = IncrementalRepooler()
         self.ontology = AnesthesiaOntology()
         self.db = get_database()
 
@@ -304,21 +307,21 @@ class ComprehensiveEvidenceHarvester:
 
             # Extract effects
             all_effects = []
-            for paper in quality_papers:
-                effects = self.harvester.extract_effects(paper, [plan.outcome_token])
-                # Enhanced effect extraction with risk factor mapping
-                enhanced_effects = self._enhance_effect_extraction(paper, effects, plan)
+            with BulkWriter(self.harvester.db) as writer:
+                for paper in quality_papers:
+                    effects = self.harvester.extract_effects(paper, [plan.outcome_token])
+                    # Enhanced effect extraction with risk factor mapping
+                    enhanced_effects = self._enhance_effect_extraction(paper, effects, plan)
 
-                # Link effects to harvest batch
-                for effect in enhanced_effects:
-                    effect.harvest_batch_id = batch_id
+                    # Link effects to harvest batch
+                    for effect in enhanced_effects:
+                        effect.harvest_batch_id = batch_id
 
-                all_effects.extend(enhanced_effects)
+                    all_effects.extend(enhanced_effects)
 
-                # Store paper and effects
-                self.harvester._store_paper(paper)
-                for effect in enhanced_effects:
-                    self.harvester.store_effect(effect)
+                    # Queue paper and effects; written in bulk when the batch closes
+                    writer.add_papers([paper])
+                    writer.add_effects(enhanced_effects)
 
             # Calculate quality distribution
             grade_dist = {}
@@ -561,54 +564,19 @@ class ComprehensiveEvidenceHarvester:
                     outcome_groups[outcome_token] = []
                 outcome_groups[outcome_token].append(result)
 
-        # Update models for each outcome
-        for outcome_token, outcome_results in outcome_groups.items():
-            try:
-                self._update_outcome_pooled_model(outcome_token)
-                logger.info(f"Updated pooled model for {outcome_token}")
-            except Exception as e:
-                logger.error(f"Error updating pooled model for {outcome_token}: {e}")
-
-    def _update_outcome_pooled_model(self, outcome_token: str):
-        """Update pooled model for a specific outcome."""
-
-        # Get all estimates for this outcome (excluding harvest_batch_id for compatibility)
-        estimates = self.db.conn.execute("""
-            SELECT outcome_token, context_label, baseline_risk, baseline_source,
-                   modifier_token, measure, effect_size, ci_low, ci_high,
-                   denominator, numerator, events, sample_size, pmid,
-                   evidence_grade, quality_weight, covariates, subgroup, extracted_at
-            FROM estimates
-            WHERE outcome_token = ?
-            AND quality_weight >= ?
-            ORDER BY evidence_grade, quality_weight DESC
-        """, [outcome_token, self.min_quality_score]).fetchall()
-
-        if len(estimates) < 2:
-            logger.warning(f"Insufficient estimates for pooling {outcome_token}: {len(estimates)}")
+        if not outcome_groups:
             return
 
-        # Group by modifier (risk factor)
-        modifier_groups = {}
-        for est in estimates:
-            modifier = est[3]  # modifier_token column
-            if modifier not in modifier_groups:
-                modifier_groups[modifier] = []
-            modifier_groups[modifier].append(est)
-
-        # Pool estimates for each risk factor
-        for modifier_token, modifier_estimates in modifier_groups.items():
-            if len(modifier_estimates) >= 2:
-                try:
-                    pooled_result = self.pooling_engine.pool_estimates(
-                        outcome_token, modifier_token, modifier_estimates
-                    )
-
-                    # Store pooled result
-                    self._store_pooled_result(pooled_result)
-
-                except Exception as e:
-                    logger.error(f"Error pooling {outcome_token} + {modifier_token}: {e}")
+        # Re-pool only the groups whose estimates this harvest touched, as one new evidence version
+        try:
+            repool = self.repooler.repool_dirty(
+                description=f"Harvest update: {', '.join(sorted(outcome_groups))}"
+            )
+            if repool:
+                logger.info(f"Evidence {repool.version}: {len(repool.effects)} pooled effects and "
+                            f"{len(repool.baselines)} baselines updated")
+        except Exception as e:
+            logger.error(f"Error updating pooled models: {e}")
 
     def _create_harvest_batch(self, batch_id: str, plan: HarvestPlan, population: str):
         """Create harvest batch record."""
@@ -671,40 +639,6 @@ class ComprehensiveEvidenceHarvester:
                 except Exception as e:
                     logger.error(f"Error creating risk factor mapping for {effect.modifier_token}: {e}")
 
-    def _store_pooled_result(self, pooled_result):
-        """Store pooled analysis result in database."""
-
-        try:
-            # Generate pooled estimate ID
-            pooled_id = f"{pooled_result['outcome_token']}_{pooled_result.get('modifier_token', 'baseline')}"
-
-            self.db.conn.execute("""
-                INSERT OR REPLACE INTO pooled_estimates
-                (id, outcome_token, modifier_token, pooled_estimate, pooled_ci_low,
-                 pooled_ci_high, heterogeneity_i2, n_studies, total_n,
-                 evidence_grade, contributing_pmids, contributing_estimates, last_updated)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, [
-                pooled_id,
-                pooled_result["outcome_token"],
-                pooled_result.get("modifier_token"),
-                pooled_result["pooled_estimate"],
-                pooled_result["ci_low"],
-                pooled_result["ci_high"],
-                pooled_result.get("i2"),
-                pooled_result["n_studies"],
-                pooled_result.get("total_n"),
-                pooled_result["evidence_grade"],
-                json.dumps(pooled_result.get("contributing_pmids", [])),
-                json.dumps(pooled_result.get("contributing_estimates", [])),
-                datetime.now().isoformat()
-            ])
-
-            self.db.log_action("pooled_estimates", pooled_id, "UPDATE", pooled_result)
-
-        except Exception as e:
-            logger.error(f"Error storing pooled result: {e}")
-
     def _generate_harvest_report(self, results: List[HarvestResults]):
         """Generate comprehensive harvest report."""
 
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Export a ClinicalBERT token-classification model to ONNX and quantize it to int8 for CPU inference.
+Run once where the model is available; point MERIDIAN_BERT_MODEL_DIR at the output directory to serve it offline.
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+# Add project root to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from nlp.bert_backend import ONNX_MODEL_FILES
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and int8-quantize a token-classification model")
+    parser.add_argument("--model", default="emilyalsentzer/Bio_ClinicalBERT",
+                        help="Hub name or local path of the source model")
+    parser.add_argument("--output", required=True, help="Directory for model_quantized.onnx, tokenizer and config")
+    parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+
+    import torch
+    from transformers import AutoModelForTokenClassification, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output = Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+    quantized_path, float_path = (output / name for name in ONNX_MODEL_FILES)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model, use_fast=True)
+    model = AutoModelForTokenClassification.from_pretrained(args.model)
+    model.eval()
+    tokenizer.save_pretrained(output)
+    model.config.save_pretrained(output)
+
+    sample = tokenizer(["Patient with asthma on albuterol."], return_tensors="pt")
+    input_names = list(sample.keys())
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch", 1: "sequence"}
+    with torch.inference_mode():
+        torch.onnx.export(model, tuple(sample[name] for name in input_names), str(float_path),
+                          input_names=input_names, output_names=["logits"],
+                          dynamic_axes=dynamic_axes, opset_version=args.opset)
+
+    quantize_dynamic(str(float_path), str(quantized_path), weight_type=QuantType.QInt8)
+    float_path.unlink()
+
+    size_mb = quantized_path.stat().st_size / 1e6
+    print(f"Wrote {quantized_path} ({size_mb:.1f} MB, labels: {list(model.config.id2label.values())})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
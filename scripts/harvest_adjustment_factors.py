@@ -13,6 +13,7 @@ Usage:
 
 import sys
 import os
+import asyncio
 import logging
 import json
 from pathlib import Path
@@ -25,7 +26,7 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from src.core.database import init_database
-from src.evidence.pubmed_harvester import PubMedHarvester
+from src.evidence.async_harvester import AsyncPubMedHarvester
 from src.evidence.nlp_extractor import NLPExtractor
 from src.core.error_codes import CodexError, ErrorCode, ErrorLogger
 
@@ -43,7 +44,7 @@ class AdjustmentFactorHarvester:
     def __init__(self, db_path: str = "database/codex.duckdb", api_key: str = None):
         self.db_path = db_path
         self.db = init_database(db_path)
-        self.harvester = PubMedHarvester(api_key=api_key)
+        self.harvester = AsyncPubMedHarvester(api_key=api_key)
         self.extractor = NLPExtractor()
         logger.info(f"Initialized AdjustmentFactorHarvester with database: {db_path}")
 
@@ -291,14 +292,12 @@ class AdjustmentFactorHarvester:
         logger.info("Starting comprehensive adjustment factor harvest")
 
         try:
-            # Harvest age adjustments
-            await self.harvest_age_adjustments()
-
-            # Harvest surgery type adjustments
-            await self.harvest_surgery_adjustments()
-
-            # Harvest urgency adjustments
-            await self.harvest_urgency_adjustments()
+            # Age, surgery type and urgency harvests share the harvester's rate limit and run concurrently
+            await asyncio.gather(
+                self.harvest_age_adjustments(),
+                self.harvest_surgery_adjustments(),
+                self.harvest_urgency_adjustments()
+            )
 
             # Generate summary report
             self.generate_harvest_report()
@@ -17,7 +17,7 @@ import time
 # Add project root to path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from nlp.pipeline import parse_hpi
+from nlp.pipeline import parse_hpi_many
 from nlp.schemas import ParsedHPI
 from src.core.risk_engine import RiskEngine
 
@@ -376,12 +376,15 @@ class NLPValidator:
 
         print(f"\\nValidating NLP pipeline on {len(test_cases)} synthetic cases...")
 
+        # Parse every case up front with batched spaCy processing
+        parsed_cases = parse_hpi_many([case.text for case in test_cases])
+
         for i, case in enumerate(test_cases):
             print(f"\\rProcessing case {i+1}/{len(test_cases)}: {case.case_description}", end="")
 
             try:
                 # Parse HPI
-                parsed = parse_hpi(case.text)
+                parsed = parsed_cases[i]
 
                 # Extract actual features (non-negated)
                 actual_features = set(parsed.get_feature_codes(include_negated=False))
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Offline re-ingest of the stored PubMed XML archive into `papers`.
+Streams every raw efetch batch with iterparse across a process pool and reports articles/sec and peak RSS.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import resource
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.core.database import init_database
+from src.evidence.pubmed_harvester import (
+    PubMedHarvester, raw_xml_files, init_reingest_worker, parse_raw_file
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_mb(who: int) -> float:
+    """Peak RSS in MB (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def parsed_files(files, processes: int):
+    """(path, papers) per raw file; parsed in worker processes when processes > 1."""
+    if processes <= 1:
+        harvester = PubMedHarvester()
+        for path in files:
+            yield path, list(harvester.iter_pubmed_xml(path))
+        return
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                             initializer=init_reingest_worker) as pool:
+        # One file per task; results arrive in file order while later files parse
+        yield from pool.map(parse_raw_file, files)
+
+
+def reingest(raw_dir: str, db_path: str, processes: int, dry_run: bool = False) -> dict:
+    files = raw_xml_files(raw_dir)
+    if not files:
+        logger.warning(f"No raw batches found in {raw_dir}")
+        return {"files": 0, "articles": 0}
+
+    if dry_run:
+        # Parse only: never create or migrate db_path; the in-process parser gets a private in-memory database
+        init_database(":memory:")
+        db = harvester = None
+    else:
+        db = init_database(db_path)
+        harvester = PubMedHarvester()
+    ingest_query_id = f"reingest_{datetime.now().isoformat()}"
+
+    logger.info(f"Re-ingesting {len(files)} raw batches from {raw_dir} with {processes} process(es)")
+    start = time.perf_counter()
+    articles = 0
+    stored = 0
+
+    for done, (path, papers) in enumerate(parsed_files(files, processes), 1):
+        for paper in papers:
+            paper.ingest_query_id = ingest_query_id
+        articles += len(papers)
+        if not dry_run:
+            stored += harvester.store_papers(papers)
+
+        elapsed = time.perf_counter() - start
+        if done % 10 == 0 or done == len(files):
+            logger.info(f"{done}/{len(files)} files, {articles} articles, {articles / elapsed:.0f} articles/sec")
+
+    elapsed = time.perf_counter() - start
+    if db is not None:
+        db.audit_sink.flush()
+    report = {
+        "files": len(files),
+        "articles": articles,
+        "stored": stored,
+        "seconds": round(elapsed, 2),
+        "articles_per_second": round(articles / elapsed, 1) if elapsed else None,
+        "peak_rss_mb": round(peak_rss_mb(resource.RUSAGE_SELF), 1),
+        "peak_worker_rss_mb": round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1) if processes > 1 else None
+    }
+    logger.info(f"Re-ingest complete: {report}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild papers from the stored raw PubMed XML batches")
+    parser.add_argument("--raw-dir", default="database/raw_xml", help="Directory of pubmed_batch_*.xml files")
+    parser.add_argument("--db", default="database/production.duckdb", help="DuckDB database to write papers into")
+    parser.add_argument("--processes", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Parser processes (1 parses in this process)")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and report only; do not write papers")
+    args = parser.parse_args()
+
+    report = reingest(args.raw_dir, args.db, args.processes, args.dry_run)
+    print(f"Articles: {report['articles']} from {report['files']} files")
+    if report["files"]:
+        print(f"Throughput: {report['articles_per_second']} articles/sec in {report['seconds']}s")
+        print(f"Peak RSS: {report['peak_rss_mb']} MB (main)"
+              + (f", {report['peak_worker_rss_mb']} MB (largest worker)" if report['peak_worker_rss_mb'] else ""))
+
+
+if __name__ == "__main__":
+    main()
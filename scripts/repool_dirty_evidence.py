@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Re-pool only the evidence groups whose estimates changed since the last run and publish a new evidence version.
+Meant for the daily harvest job; use BatchMetaAnalysisEngine.pool_all_effect_modifiers for a full rebuild.
+"""
+
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.core.database import init_database
+from src.evidence.incremental_pooling import IncrementalRepooler
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally re-pool dirty outcome/modifier/population groups")
+    parser.add_argument("--db", default="database/production.duckdb", help="DuckDB evidence database")
+    parser.add_argument("--description", default=None, help="Description for the new evidence version")
+    parser.add_argument("--dry-run", action="store_true", help="List the dirty keys only")
+    args = parser.parse_args()
+
+    db = init_database(args.db)
+    try:
+        repooler = IncrementalRepooler(db)
+        if args.dry_run:
+            db.sync_estimates_dirty()
+            print(repooler.pending_keys().to_string(index=False))
+            return 0
+
+        start = time.perf_counter()
+        result = repooler.repool_dirty(args.description)
+        if result is None:
+            logger.info("Nothing to re-pool")
+            return 0
+        logger.info(f"{result.version}: {len(result.effects)} effects, {len(result.baselines)} baselines, "
+                    f"{len(result.unpoolable)} groups without enough studies (pooled rows removed), "
+                    f"{time.perf_counter() - start:.2f}s")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
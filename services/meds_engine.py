@@ -4,8 +4,6 @@ Medication Recommendation Engine for Meridian
 Generates evidence-based medication recommendations based on parsed HPI and risk assessment
 """
 
-import json
-import yaml
 import math
 from typing import Dict, List, Optional, Tuple, Any
 from pathlib import Path
@@ -13,8 +11,17 @@ from dataclasses import dataclass
 from enum import Enum
 import logging
 
+from services.meds_tables import MedTables, MedTablesLoader, RELOAD_CHECK_SECONDS
+
 logger = logging.getLogger(__name__)
 
+# Allergy -> agents that contain the allergen
+ALLERGEN_AGENTS = {
+    "EGG_SOY_ALLERGY": frozenset(["Propofol"]),
+    "SULFA_ALLERGY": frozenset(["Furosemide"]),
+    "PENICILLIN_ALLERGY": frozenset(["Penicillin", "Ampicillin"])
+}
+
 class MedicationTiming(Enum):
     PRE_INDUCTION = "pre_induction"
     INDUCTION = "induction"
@@ -108,38 +115,45 @@ class PatientParameters:
 class MeridianMedsEngine:
     """Core medication recommendation engine"""
 
-    def __init__(self, config_dir: Path = None):
+    def __init__(self, config_dir: Path = None, reload_check_seconds: float = RELOAD_CHECK_SECONDS):
         if config_dir is None:
             config_dir = Path(__file__).parent.parent / "config"
 
         self.config_dir = config_dir
-        self._load_configurations()
+        self._load_configurations(reload_check_seconds)
 
-    def _load_configurations(self):
-        """Load all configuration files"""
+    def _load_configurations(self, reload_check_seconds: float = RELOAD_CHECK_SECONDS):
+        """Load all configuration files and compile them into lookup tables"""
         try:
-            # Load medication rules
-            with open(self.config_dir / "med_rules.yaml", 'r') as f:
-                self.med_rules = yaml.safe_load(f)
-
-            # Load formulary
-            with open(self.config_dir / "formulary.json", 'r') as f:
-                self.formulary = json.load(f)
-
-            # Load dosing rules
-            with open(self.config_dir / "dosing.json", 'r') as f:
-                self.dosing_rules = json.load(f)
-
-            # Load guideline mapping
-            with open(self.config_dir / "guideline_map.json", 'r') as f:
-                self.guideline_map = json.load(f)
-
+            self._tables_loader = MedTablesLoader(self.config_dir, reload_check_seconds)
             logger.info("Medication engine configurations loaded successfully")
 
         except Exception as e:
             logger.error(f"Failed to load medication configurations: {e}")
             raise
 
+    @property
+    def tables(self) -> MedTables:
+        """Current compiled tables; reloaded when a config file changes"""
+        return self._tables_loader.current()
+
+    # Raw configuration documents, as loaded
+    @property
+    def med_rules(self) -> Dict[str, Any]:
+        return self.tables.med_rules
+
+    @property
+    def formulary(self) -> Dict[str, Any]:
+        return self.tables.formulary
+
+    @property
+    def dosing_rules(self) -> Dict[str, Any]:
+        return self.tables.dosing_rules
+
+    @property
+    def guideline_map(self) -> Dict[str, Any]:
+        return self.tables.guideline_map
+
     def generate_recommendations(
         self,
         parsed_hpi: Any,
@@ -158,23 +172,26 @@ class MeridianMedsEngine:
             Complete medication recommendation response
         """
         try:
+            # One snapshot for the whole plan, so a config reload mid-request cannot mix table versions
+            tables = self.tables
+
             # Extract clinical features
             features = self._extract_features(parsed_hpi)
 
             # Analyze risk patterns
-            elevated_risks = self._analyze_risks(risk_summary)
+            elevated_risks = self._analyze_risks(risk_summary, tables)
 
             # Generate medication candidates
-            candidates = self._generate_candidates(features, elevated_risks, patient_params)
+            candidates = self._generate_candidates(features, elevated_risks, patient_params, tables)
 
             # Apply contraindication screening
-            screened_candidates = self._screen_contraindications(candidates, features, patient_params)
+            screened_candidates = self._screen_contraindications(candidates, features, patient_params, tables)
 
             # Categorize into buckets
             bucketed_meds = self._categorize_medications(screened_candidates, patient_params)
 
             # Calculate doses and preparations
-            final_recommendations = self._calculate_doses_and_prep(bucketed_meds, patient_params)
+            final_recommendations = self._calculate_doses_and_prep(bucketed_meds, patient_params, tables)
 
             # Generate summary
             summary = self._generate_summary(final_recommendations, elevated_risks)
@@ -199,22 +216,23 @@ class MeridianMedsEngine:
             return parsed_hpi.get_feature_codes(include_negated=False)
         return []
 
-    def _analyze_risks(self, risk_summary: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _analyze_risks(self, risk_summary: Dict[str, Any], tables: Optional[MedTables] = None) -> List[Dict[str, Any]]:
         """Analyze elevated risks and their significance"""
         elevated_risks = []
 
         if not risk_summary or 'risks' not in risk_summary:
             return elevated_risks
 
+        risk_rules = (tables or self.tables).risk_rules
         for outcome, risk_data in risk_summary.get('risks', {}).items():
             absolute_risk = risk_data.get('absolute_risk', 0)
             delta_risk = risk_data.get('delta_vs_baseline', 0)
             confidence = risk_data.get('confidence', 'C')
 
             # Check if risk meets medication threshold
-            outcome_rules = self.med_rules.get('risk_medication_mapping', {}).get(outcome, {})
-            threshold = outcome_rules.get('threshold', 0.1)
-            delta_threshold = outcome_rules.get('delta_threshold', 0.05)
+            rule = risk_rules.get(outcome)
+            threshold = rule.threshold if rule else 0.1
+            delta_threshold = rule.delta_threshold if rule else 0.05
 
             if absolute_risk >= threshold or delta_risk >= delta_threshold:
                 elevated_risks.append({
@@ -242,34 +260,33 @@ class MeridianMedsEngine:
         self,
         features: List[str],
         elevated_risks: List[Dict[str, Any]],
-        patient_params: PatientParameters
+        patient_params: PatientParameters,
+        tables: Optional[MedTables] = None
     ) -> List[Dict[str, Any]]:
         """Generate medication candidates based on features and risks"""
         candidates = []
+        tables = tables or self.tables
 
         # Risk-based candidates
         for risk in elevated_risks:
-            outcome = risk['outcome']
-            med_classes = self.med_rules.get('risk_medication_mapping', {}).get(outcome, {}).get('medication_classes', [])
-
-            for med_class in med_classes:
-                candidate = self._create_candidate_from_risk(med_class, risk, patient_params)
+            rule = tables.risk_rules.get(risk['outcome'])
+            for med_class in (rule.medication_classes if rule else ()):
+                candidate = self._create_candidate_from_risk(med_class, risk, patient_params, tables)
                 if candidate:
                     candidates.append(candidate)
 
         # Feature-based candidates
         for feature in features:
-            feature_meds = self.med_rules.get('feature_medication_mapping', {}).get(feature, {}).get('medications', [])
-            for med_class in feature_meds:
-                candidate = self._create_candidate_from_feature(med_class, feature, patient_params)
+            rule = tables.feature_rules.get(feature)
+            for med_class in (rule.medication_classes if rule else ()):
+                candidate = self._create_candidate_from_feature(med_class, feature, patient_params, tables)
                 if candidate:
                     candidates.append(candidate)
 
         # Surgery-specific candidates
         if patient_params.surgery_domain:
-            surgery_meds = self.med_rules.get('surgery_specific', {}).get(patient_params.surgery_domain, {}).get('baseline_medications', [])
-            for med_info in surgery_meds:
-                candidate = self._create_candidate_from_surgery(med_info, patient_params)
+            for med_info in tables.surgery_medications.get(patient_params.surgery_domain, ()):
+                candidate = self._create_candidate_from_surgery(med_info, patient_params, tables)
                 if candidate:
                     candidates.append(candidate)
 
@@ -298,7 +315,8 @@ class MeridianMedsEngine:
 
         return candidates
 
-    def _create_candidate_from_risk(self, med_class_info: Dict, risk: Dict, patient_params: PatientParameters) -> Optional[Dict]:
+    def _create_candidate_from_risk(self, med_class_info: Dict, risk: Dict, patient_params: PatientParameters,
+                                    tables: Optional[MedTables] = None) -> Optional[Dict]:
         """Create medication candidate from risk-based rule"""
         med_class = med_class_info.get('class')
         if not med_class:
@@ -313,8 +331,7 @@ class MeridianMedsEngine:
                 return None
 
         # Get preferred agent for this class
-        agent_info = self.formulary.get('medication_classes', {}).get(med_class, {})
-        preferred_agent = agent_info.get('preferred_agent')
+        preferred_agent = (tables or self.tables).preferred_agent(med_class)
 
         if not preferred_agent:
             return None
@@ -332,16 +349,17 @@ class MeridianMedsEngine:
             'contraindications': med_class_info.get('contraindications', [])
         }
 
-    def _create_candidate_from_feature(self, med_class: str, feature: str, patient_params: PatientParameters) -> Optional[Dict]:
+    def _create_candidate_from_feature(self, med_class: str, feature: str, patient_params: PatientParameters,
+                                       tables: Optional[MedTables] = None) -> Optional[Dict]:
         """Create medication candidate from feature-based rule"""
         # Get preferred agent for this class
-        agent_info = self.formulary.get('medication_classes', {}).get(med_class, {})
-        preferred_agent = agent_info.get('preferred_agent')
+        tables = tables or self.tables
+        preferred_agent = tables.preferred_agent(med_class)
 
         if not preferred_agent:
             return None
 
-        feature_info = self.med_rules.get('feature_medication_mapping', {}).get(feature, {})
+        feature_rule = tables.feature_rules.get(feature)
 
         return {
             'agent': preferred_agent,
@@ -352,18 +370,18 @@ class MeridianMedsEngine:
             'indication': f"Clinical feature: {feature}",
             'evidence': [],
             'source': 'feature_based',
-            'severity_modifier': feature_info.get('severity_modifier', 1.0)
+            'severity_modifier': feature_rule.severity_modifier if feature_rule else 1.0
         }
 
-    def _create_candidate_from_surgery(self, med_info: Dict, patient_params: PatientParameters) -> Optional[Dict]:
+    def _create_candidate_from_surgery(self, med_info: Dict, patient_params: PatientParameters,
+                                       tables: Optional[MedTables] = None) -> Optional[Dict]:
         """Create medication candidate from surgery-specific rule"""
         med_class = med_info.get('class')
         if not med_class:
             return None
 
         # Get preferred agent for this class
-        agent_info = self.formulary.get('medication_classes', {}).get(med_class, {})
-        preferred_agent = agent_info.get('preferred_agent')
+        preferred_agent = (tables or self.tables).preferred_agent(med_class)
 
         if not preferred_agent:
             return None
@@ -383,24 +401,27 @@ class MeridianMedsEngine:
         self,
         candidates: List[Dict[str, Any]],
         features: List[str],
-        patient_params: PatientParameters
+        patient_params: PatientParameters,
+        tables: Optional[MedTables] = None
     ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
         """Screen candidates for contraindications"""
         safe_candidates = []
         contraindicated = []
+        tables = tables or self.tables
 
         for candidate in candidates:
             agent = candidate['agent']
             med_class = candidate['class']
 
             # Check absolute contraindications
-            is_contraindicated, reason = self._check_contraindications(agent, med_class, features, patient_params)
+            is_contraindicated, reason = self._check_contraindications(agent, med_class, features, patient_params,
+                                                                       tables)
 
             if is_contraindicated:
                 contraindicated.append({
                     'agent': agent,
                     'reason': reason,
-                    'alternatives': self._get_alternatives(med_class, features, patient_params)
+                    'alternatives': self._get_alternatives(med_class, features, patient_params, tables)
                 })
             else:
                 safe_candidates.append(candidate)
@@ -412,18 +433,17 @@ class MeridianMedsEngine:
         agent: str,
         med_class: str,
         features: List[str],
-        patient_params: PatientParameters
+        patient_params: PatientParameters,
+        tables: Optional[MedTables] = None
     ) -> Tuple[bool, Optional[str]]:
         """Check if medication is contraindicated"""
-        contraindications = self.med_rules.get('contraindications', {})
+        tables = tables or self.tables
 
         # Check absolute contraindications
-        absolute_contras = contraindications.get('absolute', {})
         for feature in features:
-            if feature in absolute_contras:
-                contraindicated_agents = absolute_contras[feature]
-                if agent in contraindicated_agents or med_class in contraindicated_agents:
-                    return True, f"Absolute contraindication due to {feature}"
+            contraindicated = tables.absolute_contraindications.get(feature)
+            if contraindicated and (agent in contraindicated or med_class in contraindicated):
+                return True, f"Absolute contraindication due to {feature}"
 
         # Check allergy contraindications
         for allergy in patient_params.allergies:
@@ -431,38 +451,30 @@ class MeridianMedsEngine:
                 return True, f"Allergy to {allergy}"
 
         # Check relative contraindications
-        relative_contras = contraindications.get('relative', {})
         for feature in features:
-            if feature in relative_contras:
-                contra_info = relative_contras[feature]
-                if isinstance(contra_info, list):
-                    if agent in contra_info or med_class in contra_info:
-                        return True, f"Relative contraindication due to {feature}"
-                elif isinstance(contra_info, dict):
-                    if contra_info.get('class') == med_class:
-                        return True, contra_info.get('reason', f"Contraindicated due to {feature}")
+            relative = tables.relative_contraindications.get(feature)
+            if relative is None:
+                continue
+            if agent in relative.names or med_class in relative.names:
+                return True, f"Relative contraindication due to {feature}"
+            if med_class in relative.class_reasons:
+                return True, relative.class_reasons[med_class]
 
         return False, None
 
     def _agent_contains_allergen(self, agent: str, allergy: str) -> bool:
         """Check if agent contains known allergen"""
-        allergen_mapping = {
-            "EGG_SOY_ALLERGY": ["Propofol"],
-            "SULFA_ALLERGY": ["Furosemide"],
-            "PENICILLIN_ALLERGY": ["Penicillin", "Ampicillin"]
-        }
+        return agent in ALLERGEN_AGENTS.get(allergy, ())
 
-        allergen_agents = allergen_mapping.get(allergy, [])
-        return agent in allergen_agents
-
-    def _get_alternatives(self, med_class: str, features: List[str], patient_params: PatientParameters) -> List[str]:
+    def _get_alternatives(self, med_class: str, features: List[str], patient_params: PatientParameters,
+                          tables: Optional[MedTables] = None) -> List[str]:
         """Get alternative agents for contraindicated medication class"""
-        class_info = self.formulary.get('medication_classes', {}).get(med_class, {})
-        agents = class_info.get('agents', {})
+        tables = tables or self.tables
+        class_record = tables.classes.get(med_class)
 
         alternatives = []
-        for agent_name in agents.keys():
-            is_contra, _ = self._check_contraindications(agent_name, med_class, features, patient_params)
+        for agent_name in (class_record.agents if class_record else ()):
+            is_contra, _ = self._check_contraindications(agent_name, med_class, features, patient_params, tables)
             if not is_contra:
                 alternatives.append(agent_name)
 
@@ -528,7 +540,8 @@ class MeridianMedsEngine:
     def _calculate_doses_and_prep(
         self,
         bucketed_meds: Dict[str, List[Dict[str, Any]]],
-        patient_params: PatientParameters
+        patient_params: PatientParameters,
+        tables: Optional[MedTables] = None
     ) -> Dict[str, List[MedicationRecommendation]]:
         """Calculate doses and preparation instructions"""
         final_recommendations = {}
@@ -541,7 +554,7 @@ class MeridianMedsEngine:
             recommendations = []
             for candidate in candidates:
                 try:
-                    recommendation = self._create_full_recommendation(candidate, patient_params)
+                    recommendation = self._create_full_recommendation(candidate, patient_params, tables)
                     if recommendation:
                         recommendations.append(recommendation)
                 except Exception as e:
@@ -561,20 +574,22 @@ class MeridianMedsEngine:
     def _create_full_recommendation(
         self,
         candidate: Dict[str, Any],
-        patient_params: PatientParameters
+        patient_params: PatientParameters,
+        tables: Optional[MedTables] = None
     ) -> Optional[MedicationRecommendation]:
         """Create complete medication recommendation with dose calculations"""
         agent = candidate['agent']
         med_class = candidate['class']
+        tables = tables or self.tables
 
         # Get dosing information
-        dose_info = self.dosing_rules.get('dosing_rules', {}).get(agent, {})
+        dose_info = tables.dosing.get(agent, {})
         if not dose_info:
             logger.warning(f"No dosing information found for {agent}")
             return None
 
         # Calculate dose
-        dose_calculation = self._calculate_dose(agent, dose_info, patient_params)
+        dose_calculation = self._calculate_dose(agent, dose_info, patient_params, tables)
         if not dose_calculation:
             return None
 
@@ -582,7 +597,7 @@ class MeridianMedsEngine:
         prep_instructions = self._get_preparation_instructions(agent, dose_calculation, patient_params)
 
         # Get evidence and citations
-        citations = self._get_citations(med_class, candidate.get('evidence', []))
+        citations = self._get_citations(med_class, candidate.get('evidence', []), tables)
 
         # Format dose string
         dose_string = self._format_dose_string(dose_calculation, dose_info, patient_params)
@@ -604,9 +619,11 @@ class MeridianMedsEngine:
         self,
         agent: str,
         dose_info: Dict[str, Any],
-        patient_params: PatientParameters
+        patient_params: PatientParameters,
+        tables: Optional[MedTables] = None
     ) -> Optional[DoseCalculation]:
         """Calculate medication dose and volume"""
+        tables = tables or self.tables
         try:
             # Determine age category
             age_category = "pediatric" if patient_params.is_pediatric else "adult"
@@ -649,16 +666,16 @@ class MeridianMedsEngine:
                 return None
 
             # Get concentration and calculate volume
-            volume_ml, concentration = self._calculate_volume(agent, dose_mg)
+            volume_ml, concentration = self._calculate_volume(agent, dose_mg, tables)
 
             # Apply renal/hepatic adjustments
             dose_mg, volume_ml = self._apply_organ_adjustments(
-                agent, dose_mg, volume_ml, patient_params
+                agent, dose_mg, volume_ml, patient_params, tables
             )
 
             # Round to practical values
-            dose_mg = self._round_dose(dose_mg)
-            volume_ml = self._round_volume(volume_ml)
+            dose_mg = self._round_dose(dose_mg, tables)
+            volume_ml = self._round_volume(volume_ml, tables)
 
             return DoseCalculation(
                 mg=dose_mg,
@@ -671,62 +688,41 @@ class MeridianMedsEngine:
             logger.error(f"Error calculating dose for {agent}: {e}")
             return None
 
-    def _calculate_volume(self, agent: str, dose_mg: float) -> Tuple[float, str]:
-        """Calculate volume needed based on available concentrations"""
-        agent_info = None
+    def _calculate_volume(self, agent: str, dose_mg: float, tables: Optional[MedTables] = None) -> Tuple[float, str]:
+        """Calculate volume needed based on the agent's first IV concentration (parsed at load)"""
+        record = (tables or self.tables).agents.get(agent)
 
-        # Find agent in formulary
-        for med_class_info in self.formulary.get('medication_classes', {}).values():
-            if agent in med_class_info.get('agents', {}):
-                agent_info = med_class_info['agents'][agent]
-                break
-
-        if not agent_info:
+        if not record:
             logger.warning(f"Agent {agent} not found in formulary")
             return 1.0, "unknown concentration"
 
-        # Use first IV concentration
-        concentrations = agent_info.get('concentrations', [])
-        iv_conc = None
-        for conc in concentrations:
-            if conc.get('route') in ['IV', 'IV_bolus']:
-                iv_conc = conc
-                break
-
-        if not iv_conc:
+        if record.iv_strength is None:
             logger.warning(f"No IV concentration found for {agent}")
             return 1.0, "unknown concentration"
 
-        # Parse concentration (e.g., "10 mg/mL")
-        strength = iv_conc.get('strength', '')
-        try:
-            if 'mg/mL' in strength:
-                mg_per_ml = float(strength.split(' mg/mL')[0])
-                volume_ml = dose_mg / mg_per_ml
-                return volume_ml, strength
-            elif 'mcg/mL' in strength:
-                mcg_per_ml = float(strength.split(' mcg/mL')[0])
-                volume_ml = (dose_mg * 1000) / mcg_per_ml
-                return volume_ml, strength
-            else:
-                logger.warning(f"Cannot parse concentration: {strength}")
-                return 1.0, strength
-        except (ValueError, IndexError):
-            logger.warning(f"Error parsing concentration: {strength}")
+        strength = record.iv_strength
+        if record.iv_unit is None:
+            logger.warning(f"Cannot parse concentration: {strength}")
             return 1.0, strength
 
+        if record.iv_unit == "mg":
+            return dose_mg / record.iv_per_ml, strength
+        return (dose_mg * 1000) / record.iv_per_ml, strength
+
     def _apply_organ_adjustments(
         self,
         agent: str,
         dose_mg: float,
         volume_ml: float,
-        patient_params: PatientParameters
+        patient_params: PatientParameters,
+        tables: Optional[MedTables] = None
     ) -> Tuple[float, float]:
         """Apply renal and hepatic dose adjustments"""
         adjustment_factor = 1.0
+        tables = tables or self.tables
 
         # Get adjustment rules for this agent
-        dose_info = self.dosing_rules.get('dosing_rules', {}).get(agent, {})
+        dose_info = tables.dosing.get(agent, {})
 
         # Renal adjustment
         if patient_params.renal_function in ['moderate', 'severe']:
@@ -746,18 +742,15 @@ class MeridianMedsEngine:
 
         # Age adjustment for elderly
         if patient_params.age_years and patient_params.age_years >= 65:
-            age_rules = self.med_rules.get('age_specific', {}).get('GERIATRIC', {})
-            age_factor = age_rules.get('dose_reduction_factor', 1.0)
-            adjustment_factor *= age_factor
+            adjustment_factor *= tables.geriatric_dose_factor
 
         adjusted_dose = dose_mg * adjustment_factor
         adjusted_volume = volume_ml * adjustment_factor
 
         return adjusted_dose, adjusted_volume
 
-    def _round_dose(self, dose_mg: float) -> float:
+    def _round_dose(self, dose_mg: float, tables: Optional[MedTables] = None) -> float:
         """Round dose to practical increment"""
-        rounding_rules = self.dosing_rules.get('dose_calculation_rules', {}).get('safety_bounds', {}).get('rounding_rules', {})
 
         # Use smaller increments for small doses
         if dose_mg < 0.1:
@@ -765,14 +758,13 @@ class MeridianMedsEngine:
         elif dose_mg < 1.0:
             dose_increment = 0.05  # 0.05 mg increments for small doses
         else:
-            dose_increment = rounding_rules.get('dose_mg', 0.1)  # Default to 0.1 mg increments
+            dose_increment = (tables or self.tables).dose_rounding_mg  # Default to 0.1 mg increments
 
         return round(dose_mg / dose_increment) * dose_increment
 
-    def _round_volume(self, volume_ml: float) -> float:
+    def _round_volume(self, volume_ml: float, tables: Optional[MedTables] = None) -> float:
         """Round volume to practical increment"""
-        rounding_rules = self.dosing_rules.get('dose_calculation_rules', {}).get('safety_bounds', {}).get('rounding_rules', {})
-        volume_increment = rounding_rules.get('volume_ml', 0.1)
+        volume_increment = (tables or self.tables).volume_rounding_ml
 
         return round(volume_ml / volume_increment) * volume_increment
 
@@ -854,20 +846,12 @@ class MeridianMedsEngine:
 
         return '; '.join(notes) if notes else None
 
-    def _get_citations(self, med_class: str, evidence: List[str]) -> List[str]:
+    def _get_citations(self, med_class: str, evidence: List[str], tables: Optional[MedTables] = None) -> List[str]:
         """Get citations for medication recommendation"""
         citations = evidence.copy()
 
         # Add guideline citations
-        for outcome, guideline_info in self.guideline_map.get('guideline_mapping', {}).items():
-            guidelines = guideline_info.get('primary_guidelines', [])
-            for guideline in guidelines:
-                recommendations = guideline.get('recommendations', {})
-                if med_class in recommendations:
-                    citation = f"{guideline['organization']} {guideline['title']} {guideline['year']}"
-                    if 'pmid' in guideline:
-                        citation += f" (PMID:{guideline['pmid']})"
-                    citations.append(citation)
+        citations.extend((tables or self.tables).class_citations.get(med_class, ()))
 
         return list(set(citations))  # Remove duplicates
 
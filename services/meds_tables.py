@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Indexed lookup tables compiled from the medication configs (formulary, dosing, med_rules, guideline_map).
+Per-request medication planning reads these dicts instead of walking the nested JSON/YAML.
+"""
+
+import os
+import json
+import yaml
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Tuple, Any
+
+logger = logging.getLogger(__name__)
+
+CONFIG_FILES = ("med_rules.yaml", "formulary.json", "dosing.json", "guideline_map.json")
+
+# How often (seconds) the config files are stat'ed for changes
+RELOAD_CHECK_SECONDS = 2.0
+
+IV_ROUTES = ("IV", "IV_bolus")
+
+
+class ClassRecord:
+    """One formulary medication class"""
+    __slots__ = ("name", "preferred_agent", "agents")
+
+    def __init__(self, name: str, preferred_agent: Optional[str], agents: Tuple[str, ...]):
+        self.name = name
+        self.preferred_agent = preferred_agent
+        self.agents = agents
+
+
+class AgentRecord:
+    """One formulary agent with its first IV concentration pre-parsed"""
+    __slots__ = ("name", "med_class", "concentrations", "iv_strength", "iv_unit", "iv_per_ml")
+
+    def __init__(self, name: str, med_class: str, concentrations: Tuple[Dict[str, Any], ...]):
+        self.name = name
+        self.med_class = med_class
+        self.concentrations = concentrations
+        self.iv_strength = None  # e.g. "10 mg/mL"; None when there is no IV concentration
+        self.iv_unit = None      # "mg" or "mcg" per mL; None when the strength cannot be parsed
+        self.iv_per_ml = None
+
+        iv = next((c for c in concentrations if c.get('route') in IV_ROUTES), None)
+        if iv is None:
+            return
+        self.iv_strength = iv.get('strength', '')
+        for unit in ("mg", "mcg"):
+            if f"{unit}/mL" in self.iv_strength:
+                try:
+                    self.iv_per_ml = float(self.iv_strength.split(f" {unit}/mL")[0])
+                    self.iv_unit = unit
+                except (ValueError, IndexError):
+                    pass
+                break
+
+
+class RiskRule:
+    """Medication thresholds and classes for one risk outcome"""
+    __slots__ = ("outcome", "threshold", "delta_threshold", "medication_classes")
+
+    def __init__(self, outcome: str, threshold: float, delta_threshold: float,
+                 medication_classes: Tuple[Dict[str, Any], ...]):
+        self.outcome = outcome
+        self.threshold = threshold
+        self.delta_threshold = delta_threshold
+        self.medication_classes = medication_classes
+
+
+class FeatureRule:
+    """Medication classes suggested by one clinical feature"""
+    __slots__ = ("feature", "medication_classes", "severity_modifier")
+
+    def __init__(self, feature: str, medication_classes: Tuple[str, ...], severity_modifier: float):
+        self.feature = feature
+        self.medication_classes = medication_classes
+        self.severity_modifier = severity_modifier
+
+
+class RelativeContraindication:
+    """Relative contraindications of one feature: listed names, or class -> reason"""
+    __slots__ = ("names", "class_reasons")
+
+    def __init__(self, names: FrozenSet[str], class_reasons: Dict[str, Optional[str]]):
+        self.names = names
+        self.class_reasons = class_reasons
+
+
+class MedTables:
+    """
+    Immutable indexes over the four medication config files.
+
+    agents maps every formulary agent to its class (the first class listing it)
+    and concentrations; classes, risk_rules, feature_rules and surgery_medications
+    replace the chained .get() walks; class_citations holds the guideline
+    citations for each class, and outcome_classes the classes guidelines
+    recommend per outcome.
+    """
+    __slots__ = ("med_rules", "formulary", "dosing_rules", "guideline_map", "signature",
+                 "classes", "agents", "dosing", "risk_rules", "feature_rules", "surgery_medications",
+                 "absolute_contraindications", "relative_contraindications",
+                 "class_citations", "outcome_classes", "geriatric_dose_factor",
+                 "dose_rounding_mg", "volume_rounding_ml")
+
+    def __init__(self, med_rules: Dict, formulary: Dict, dosing_rules: Dict, guideline_map: Dict,
+                 signature: Tuple = ()):
+        self.med_rules = med_rules
+        self.formulary = formulary
+        self.dosing_rules = dosing_rules
+        self.guideline_map = guideline_map
+        self.signature = signature
+
+        self.classes: Dict[str, ClassRecord] = {}
+        self.agents: Dict[str, AgentRecord] = {}
+        for class_name, class_info in (formulary.get('medication_classes') or {}).items():
+            agents = class_info.get('agents') or {}
+            self.classes[class_name] = ClassRecord(class_name, class_info.get('preferred_agent'), tuple(agents))
+            for agent_name, agent_info in agents.items():
+                if agent_name not in self.agents:
+                    self.agents[agent_name] = AgentRecord(
+                        agent_name, class_name, tuple(agent_info.get('concentrations') or ()))
+
+        self.dosing: Dict[str, Dict[str, Any]] = dosing_rules.get('dosing_rules') or {}
+
+        self.risk_rules: Dict[str, RiskRule] = {
+            outcome: RiskRule(outcome, rule.get('threshold', 0.1), rule.get('delta_threshold', 0.05),
+                              tuple(rule.get('medication_classes') or ()))
+            for outcome, rule in (med_rules.get('risk_medication_mapping') or {}).items()
+        }
+        self.feature_rules: Dict[str, FeatureRule] = {
+            feature: FeatureRule(feature, tuple(rule.get('medications') or ()), rule.get('severity_modifier', 1.0))
+            for feature, rule in (med_rules.get('feature_medication_mapping') or {}).items()
+        }
+        self.surgery_medications: Dict[str, Tuple[Dict[str, Any], ...]] = {
+            domain: tuple(rule.get('baseline_medications') or ())
+            for domain, rule in (med_rules.get('surgery_specific') or {}).items()
+        }
+
+        contraindications = med_rules.get('contraindications') or {}
+        self.absolute_contraindications: Dict[str, FrozenSet[str]] = {
+            feature: frozenset(names or ()) for feature, names in (contraindications.get('absolute') or {}).items()
+        }
+        self.relative_contraindications: Dict[str, RelativeContraindication] = {}
+        for feature, info in (contraindications.get('relative') or {}).items():
+            if isinstance(info, list):
+                names = frozenset(name for name in info if isinstance(name, str))
+                self.relative_contraindications[feature] = RelativeContraindication(names, {})
+            elif isinstance(info, dict) and info.get('class') is not None:
+                self.relative_contraindications[feature] = RelativeContraindication(
+                    frozenset(), {info['class']: info.get('reason', f"Contraindicated due to {feature}")})
+
+        class_citations: Dict[str, List[str]] = {}
+        outcome_classes: Dict[str, List[str]] = {}
+        for outcome, guideline_info in (guideline_map.get('guideline_mapping') or {}).items():
+            for guideline in guideline_info.get('primary_guidelines') or ():
+                citation = f"{guideline['organization']} {guideline['title']} {guideline['year']}"
+                if 'pmid' in guideline:
+                    citation += f" (PMID:{guideline['pmid']})"
+                for med_class in guideline.get('recommendations') or {}:
+                    class_citations.setdefault(med_class, []).append(citation)
+                    classes = outcome_classes.setdefault(outcome, [])
+                    if med_class not in classes:
+                        classes.append(med_class)
+        self.class_citations = {name: tuple(citations) for name, citations in class_citations.items()}
+        self.outcome_classes = {outcome: tuple(classes) for outcome, classes in outcome_classes.items()}
+
+        geriatric = (med_rules.get('age_specific') or {}).get('GERIATRIC') or {}
+        self.geriatric_dose_factor = geriatric.get('dose_reduction_factor', 1.0)
+        rounding = ((dosing_rules.get('dose_calculation_rules') or {}).get('safety_bounds') or {}).get('rounding_rules') or {}
+        self.dose_rounding_mg = rounding.get('dose_mg', 0.1)
+        self.volume_rounding_ml = rounding.get('volume_ml', 0.1)
+
+    @classmethod
+    def load(cls, config_dir: Path) -> "MedTables":
+        signature = config_signature(config_dir)
+        with open(config_dir / "med_rules.yaml", 'r') as f:
+            med_rules = yaml.safe_load(f) or {}
+        with open(config_dir / "formulary.json", 'r') as f:
+            formulary = json.load(f)
+        with open(config_dir / "dosing.json", 'r') as f:
+            dosing_rules = json.load(f)
+        with open(config_dir / "guideline_map.json", 'r') as f:
+            guideline_map = json.load(f)
+        return cls(med_rules, formulary, dosing_rules, guideline_map, signature)
+
+    def agent_class(self, agent: str) -> Optional[str]:
+        record = self.agents.get(agent)
+        return record.med_class if record else None
+
+    def preferred_agent(self, med_class: str) -> Optional[str]:
+        record = self.classes.get(med_class)
+        return record.preferred_agent if record else None
+
+
+def config_signature(config_dir: Path) -> Tuple:
+    """(name, mtime_ns, size) of each config file; a change means the tables are stale."""
+    signature = []
+    for name in CONFIG_FILES:
+        try:
+            stat = os.stat(config_dir / name)
+            signature.append((name, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((name, None, None))
+    return tuple(signature)
+
+
+class MedTablesLoader:
+    """
+    Current MedTables for a config directory, rebuilt when a file changes.
+
+    Files are stat'ed at most every `check_seconds`; a changed signature
+    recompiles all four files and swaps the tables in one assignment, so a
+    request sees either the old or the new tables. If the new files fail to
+    load, the previous tables stay in use.
+    """
+
+    def __init__(self, config_dir: Path, check_seconds: float = RELOAD_CHECK_SECONDS):
+        self.config_dir = Path(config_dir)
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._tables = MedTables.load(self.config_dir)
+        self._checked_at = time.monotonic()
+        self.reloads = 0
+
+    def current(self) -> MedTables:
+        if time.monotonic() - self._checked_at >= self.check_seconds:
+            self.reload_if_changed()
+        return self._tables
+
+    def reload_if_changed(self) -> bool:
+        """Recompile if any config file changed; True when new tables were installed."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            if config_signature(self.config_dir) == self._tables.signature:
+                return False
+            try:
+                tables = MedTables.load(self.config_dir)
+            except Exception as e:
+                logger.error(f"Medication config reload failed, keeping previous tables: {e}")
+                return False
+            self._tables = tables
+            self.reloads += 1
+        logger.info(f"Reloaded medication configurations from {self.config_dir}")
+        return True
@@ -57,9 +57,9 @@ class EvidenceReferencingEngine:
     and provides audit trails for all clinical guidance.
     """
 
-    def __init__(self):
+    def __init__(self, ontology: AnesthesiaOntology = None):
         self.db = get_database()
-        self.ontology = AnesthesiaOntology()
+        self.ontology = ontology or AnesthesiaOntology()
 
     def get_outcome_evidence_summary(self, outcome_token: str,
                                    modifier_token: str = None,
@@ -472,7 +472,7 @@ class EvidenceReferencingEngine:
         citation_id = f"{pmid}_{outcome_token}_{modifier_token}_{citation_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
         try:
-            self.db.conn.execute("""
+            self.db.execute_write("""
                 INSERT INTO evidence_citations
                 (citation_id, pmid, outcome_token, modifier_token, citation_type,
                  citation_text, evidence_strength, clinical_relevance, created_at)
@@ -674,14 +674,11 @@ class MedicationEngine:
             }
 
             # Update case session
-            self.db.conn.execute("""
-                UPDATE case_sessions
-                SET medication_recommendations = ?
-                WHERE session_id = ?
-            """, [json.dumps(plan_data), plan.session_id])
+            self.db.audit_sink.update_case_session(plan.session_id, "medication_recommendations",
+                                                   json.dumps(plan_data))
 
             # Log the action
-            self.db.log_action("medication_plans", plan.session_id, "GENERATE", {
+            self.db.audit_sink.log_action("medication_plans", plan.session_id, "GENERATE", {
                 "total_medications": sum(plan.total_medications.values()),
                 "contraindications": plan.total_medications.get("contraindicated", 0),
                 "interactions": len(plan.drug_interactions)
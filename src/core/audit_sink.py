@@ -0,0 +1,352 @@
+"""
+Background audit sink for case_sessions and audit_log.
+Queues audit records off the request path and writes them in batched multi-row statements.
+"""
+
+import json
+import queue
+import atexit
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+# case_sessions columns that may be filled in after the session row is created
+CASE_SESSION_UPDATE_COLUMNS = ("risk_scores", "medication_recommendations")
+
+CASE_SESSION_COLUMNS = ("session_id", "hpi_text", "parsed_factors", "risk_scores",
+                        "medication_recommendations", "evidence_version", "anonymized_hpi", "created_at")
+AUDIT_LOG_COLUMNS = ("id", "entity", "entity_id", "action", "details_json",
+                     "evidence_version", "session_id", "created_at")
+
+# Rows per multi-row INSERT statement (keeps parameter lists well within DuckDB limits)
+MAX_ROWS_PER_STATEMENT = 200
+
+# Wait between enqueue attempts while the queue is full
+PUT_RETRY_SECONDS = 0.005
+
+# Control markers passed through the queue to the writer thread
+_STOP = object()
+_FLUSH = object()
+
+
+class AuditSink:
+    """
+    Asynchronous, batched writer for audit records.
+
+    Producers enqueue records and return immediately. A single writer thread
+    drains the queue and flushes, through the database's writer connection,
+    when `batch_size` records are waiting or `flush_interval` seconds have passed
+    since the oldest one was queued, writing each table with multi-row
+    INSERTs in one transaction. Updates to a session created in the same
+    batch are folded into its INSERT row.
+
+    The queue is bounded: when full, producers block for up to
+    `put_timeout` seconds (backpressure) and then write the record
+    synchronously themselves, so audit records are never dropped. close()
+    (also registered with atexit) drains and flushes everything queued.
+    """
+
+    def __init__(self, db, batch_size: int = 500, flush_interval: float = 1.0,
+                 max_queue: int = 10000, put_timeout: float = 0.5):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+        # Metrics
+        self._enqueued = 0
+        self._flushed = 0
+        self._batches = 0
+        self._failed = 0
+        self._sync_writes = 0
+        self._pending_since: Optional[float] = None
+        self._last_flush_at: Optional[float] = None
+        self._last_flush_seconds: Optional[float] = None
+        self._max_flush_lag: float = 0.0
+
+    # ---- Producer API ----
+
+    def insert_case_session(self, session_id: str, hpi_text: str, parsed_factors: Optional[str],
+                            evidence_version: Optional[str], anonymized_hpi: Optional[str],
+                            risk_scores: Optional[str] = "{}", medication_recommendations: Optional[str] = "{}"):
+        """Queue a new case_sessions row."""
+        self._put(("case_session", {
+            "session_id": session_id,
+            "hpi_text": hpi_text,
+            "parsed_factors": parsed_factors,
+            "risk_scores": risk_scores,
+            "medication_recommendations": medication_recommendations,
+            "evidence_version": evidence_version,
+            "anonymized_hpi": anonymized_hpi,
+            "created_at": datetime.now()
+        }))
+
+    def update_case_session(self, session_id: str, column: str, value: Optional[str]):
+        """Queue an update of one JSON column of an existing case_sessions row."""
+        if column not in CASE_SESSION_UPDATE_COLUMNS:
+            raise ValueError(f"Unsupported case_sessions column: {column}")
+        self._put(("case_session_update", (session_id, column, value)))
+
+    def log_action(self, entity: str, entity_id: str, action: str,
+                   details: Dict[str, Any], evidence_version: str = None,
+                   session_id: str = None):
+        """Queue an audit_log row (same fields as CodexDatabase.log_action)."""
+        created_at = datetime.now()
+        self._put(("audit", {
+            "id": f"{entity}_{entity_id}_{action}_{created_at.isoformat()}",
+            "entity": entity,
+            "entity_id": entity_id,
+            "action": action,
+            "details_json": json.dumps(details),
+            "evidence_version": evidence_version,
+            "session_id": session_id,
+            "created_at": created_at
+        }))
+
+    def _put(self, record):
+        enqueued_at = time.monotonic()
+        self._ensure_started()
+        deadline = enqueued_at + self.put_timeout
+        while True:
+            # The closed check and the enqueue happen under the lock close() takes,
+            # so nothing can be queued after the writer thread was told to stop
+            with self._lock:
+                if self._closed:
+                    break
+                try:
+                    self._queue.put_nowait((record, enqueued_at))
+                    self._enqueued += 1
+                    return
+                except queue.Full:
+                    pass
+            if time.monotonic() >= deadline:
+                # Backpressure exhausted: the caller pays for its own write rather than losing it
+                logger.warning("Audit queue full; writing record synchronously")
+                break
+            time.sleep(PUT_RETRY_SECONDS)
+
+        self._write_sync([(record, enqueued_at)])
+
+    def _write_sync(self, items):
+        with self._lock:
+            self._sync_writes += len(items)
+        with self.db.writer() as conn:
+            self._write(conn, items)
+
+    # ---- Lifecycle ----
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="audit-sink", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until everything queued so far has been written."""
+        if self._thread is None or not self._thread.is_alive():
+            return self._queue.empty()
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 30.0):
+        """Flush all queued records and stop the writer thread."""
+        # Closed before the stop marker is queued; later records are written synchronously
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+
+        if thread is not None and thread.is_alive():
+            self._queue.put((_STOP, None))
+            thread.join(timeout)
+            if thread.is_alive():
+                logger.error("Audit sink did not drain before shutdown timeout")
+
+    # ---- Writer thread ----
+
+    def _run(self):
+        pending = []
+        waiters = []
+        stop = False
+        try:
+            while not stop:
+                timeout = self.flush_interval
+                if pending:
+                    timeout = max(0.0, pending[0][1] + self.flush_interval - time.monotonic())
+                try:
+                    entries = [self._queue.get(timeout=timeout)]
+                except queue.Empty:
+                    entries = []
+
+                # Drain whatever else is already waiting, up to one batch
+                while len(pending) + len(entries) < self.batch_size:
+                    try:
+                        entries.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                for record, extra in entries:
+                    if record is _STOP:
+                        stop = True
+                    elif record is _FLUSH:
+                        waiters.append(extra)
+                    else:
+                        pending.append((record, extra))
+                if pending and self._pending_since is None:
+                    self._pending_since = pending[0][1]
+
+                due = (len(pending) >= self.batch_size or waiters or stop or
+                       (pending and time.monotonic() - pending[0][1] >= self.flush_interval))
+                if due:
+                    if pending:
+                        self._flush(pending)
+                        pending = []
+                    for waiter in waiters:
+                        waiter.set()
+                    waiters = []
+        finally:
+            # Records that raced with close() still get written
+            while True:
+                try:
+                    record, extra = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is _FLUSH:
+                    waiters.append(extra)
+                elif record is not _STOP:
+                    pending.append((record, extra))
+            if pending:
+                self._flush(pending)
+            for waiter in waiters:
+                waiter.set()
+
+    def _flush(self, items):
+        start = time.perf_counter()
+        try:
+            with self.db.writer() as conn:
+                self._write(conn, items)
+        except Exception as e:
+            # Lock or connection errors lose this batch, not the writer thread
+            with self._lock:
+                self._failed += len(items)
+                self._pending_since = None
+            logger.error(f"Error flushing {len(items)} audit records: {e}")
+            return
+        lag = time.monotonic() - items[0][1]
+
+        with self._lock:
+            self._flushed += len(items)
+            self._batches += 1
+            self._last_flush_at = time.time()
+            self._last_flush_seconds = time.perf_counter() - start
+            self._max_flush_lag = max(self._max_flush_lag, lag)
+            self._pending_since = None
+
+    def _write(self, conn, items):
+        """Write one batch: new sessions, then session updates, then audit rows."""
+        sessions: Dict[str, Dict[str, Any]] = {}
+        updates: List[tuple] = []
+        audits: List[Dict[str, Any]] = []
+
+        for (kind, payload), _ in items:
+            if kind == "case_session":
+                sessions[payload["session_id"]] = dict(payload)
+            elif kind == "case_session_update":
+                session_id, column, value = payload
+                if session_id in sessions:
+                    sessions[session_id][column] = value
+                else:
+                    updates.append(payload)
+            elif kind == "audit":
+                audits.append(payload)
+
+        session_rows = [[row[c] for c in CASE_SESSION_COLUMNS] for row in sessions.values()]
+        audit_rows = [[row[c] for c in AUDIT_LOG_COLUMNS] for row in audits]
+        update_rows = [(column, [value, session_id]) for session_id, column, value in updates]
+
+        try:
+            conn.execute("BEGIN TRANSACTION")
+            _insert_rows(conn, "case_sessions", CASE_SESSION_COLUMNS, session_rows)
+            for column, params in update_rows:
+                conn.execute(f"UPDATE case_sessions SET {column} = ? WHERE session_id = ?", params)
+            _insert_rows(conn, "audit_log", AUDIT_LOG_COLUMNS, audit_rows)
+            conn.execute("COMMIT")
+            return
+        except Exception as e:
+            try:
+                conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            logger.warning(f"Batched audit write failed ({e}); retrying row by row")
+
+        # One bad row (e.g. a duplicate key) must not lose the rest of the batch
+        for row in session_rows:
+            self._write_one("case_sessions", lambda: _insert_rows(conn, "case_sessions", CASE_SESSION_COLUMNS, [row]))
+        for column, params in update_rows:
+            self._write_one("case_sessions", lambda: conn.execute(
+                f"UPDATE case_sessions SET {column} = ? WHERE session_id = ?", params))
+        for row in audit_rows:
+            self._write_one("audit_log", lambda: _insert_rows(conn, "audit_log", AUDIT_LOG_COLUMNS, [row]))
+
+    def _write_one(self, table: str, write: Callable[[], Any]):
+        try:
+            write()
+        except Exception as e:
+            with self._lock:
+                self._failed += 1
+            logger.error(f"Error writing {table} audit record: {e}")
+
+    # ---- Metrics ----
+
+    def flush_lag_seconds(self) -> float:
+        """Age of the oldest record not yet written (0 when fully flushed)."""
+        oldest = self._pending_since
+        with self._queue.mutex:
+            for record, extra in self._queue.queue:
+                if record is not _STOP and record is not _FLUSH:
+                    oldest = extra if oldest is None else min(oldest, extra)
+                    break
+        return 0.0 if oldest is None else max(0.0, time.monotonic() - oldest)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "flush_lag_seconds": round(self.flush_lag_seconds(), 3),
+                "max_flush_lag_seconds": round(self._max_flush_lag, 3),
+                "enqueued": self._enqueued,
+                "flushed": self._flushed,
+                "batches": self._batches,
+                "failed": self._failed,
+                "sync_writes": self._sync_writes,
+                "last_flush_at": datetime.fromtimestamp(self._last_flush_at).isoformat() if self._last_flush_at else None,
+                "last_flush_seconds": self._last_flush_seconds,
+                "running": self._thread is not None and self._thread.is_alive()
+            }
+
+
+def _insert_rows(conn, table: str, columns, rows: List[list]):
+    """Multi-row INSERT, chunked to MAX_ROWS_PER_STATEMENT rows per statement."""
+    if not rows:
+        return
+    placeholders = "(" + ", ".join("?" for _ in columns) + ")"
+    column_list = ", ".join(columns)
+    for start in range(0, len(rows), MAX_ROWS_PER_STATEMENT):
+        chunk = rows[start:start + MAX_ROWS_PER_STATEMENT]
+        params = [value for row in chunk for value in row]
+        conn.execute(f"INSERT INTO {table} ({column_list}) VALUES " +
+                     ", ".join([placeholders] * len(chunk)), params)
@@ -0,0 +1,320 @@
+"""
+Batch HPI analysis pipeline.
+Runs parse -> risk -> meds -> recommendations over many HPIs with bounded concurrency and streams results as they finish.
+"""
+
+import os
+import json
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future, BrokenExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, List, Optional, Callable, Iterable, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Per-process parser used by the CPU-bound parse stage
+_worker_processor = None
+
+# Key of the audit payload in worker parse results; popped and written by the parent
+AUDIT_KEY = "_audit"
+
+
+def _init_parse_worker():
+    """Process-pool initializer: build one MedicalTextProcessor per worker process."""
+    global _worker_processor
+    from src.core.database import init_database
+    from src.core.hpi_parser import MedicalTextProcessor
+
+    # DuckDB allows only one writing process, so workers get a private
+    # in-memory store and only parse: their case_sessions/audit rows travel
+    # back with each result and the parent writes them (see AUDIT_KEY).
+    init_database(":memory:")
+    _worker_processor = MedicalTextProcessor(store_audit=False)
+
+
+def parse_hpi_in_worker(hpi_text: str) -> Dict[str, Any]:
+    """Parse an HPI in a worker process into the same dict shape as app_simple.advanced_hpi_parser."""
+    return _worker_result(_worker_processor.parse_hpi(hpi_text))
+
+
+def parse_many_in_worker(hpi_texts: List[str]) -> List[Dict[str, Any]]:
+    """Parse a chunk of HPIs in a worker process with one batched spaCy pass."""
+    return [_worker_result(parsed_hpi) for parsed_hpi in _worker_processor.parse_many(hpi_texts)]
+
+
+def _worker_result(parsed_hpi) -> Dict[str, Any]:
+    from src.core.hpi_parser import audit_record
+    result = parsed_hpi_to_dict(parsed_hpi)
+    result[AUDIT_KEY] = audit_record(parsed_hpi)
+    return result
+
+
+def parsed_hpi_to_dict(parsed_hpi) -> Dict[str, Any]:
+    """MedicalTextProcessor result in the dict shape analyze stages expect."""
+    return {
+        "extracted_factors": [{
+            "token": factor.token,
+            "plain_label": factor.plain_label,
+            "confidence": factor.confidence,
+            "evidence_text": factor.evidence_text,
+            "category": factor.category,
+            "severity_weight": factor.severity_weight
+        } for factor in parsed_hpi.extracted_factors],
+        "demographics": parsed_hpi.demographics,
+        "session_id": parsed_hpi.session_id,
+        "confidence_score": parsed_hpi.confidence_score
+    }
+
+
+class BatchAnalysisPipeline:
+    """
+    Bounded-concurrency parse -> analyze pipeline.
+
+    Parsing runs in a process pool (spawned workers, each with its own
+    MedicalTextProcessor) when `parse_processes` > 0, otherwise on the thread
+    pool with `parse_fn`. With `parse_batch_size` > 1, cases are parsed in
+    chunks (`parse_many_fn` in-process, MedicalTextProcessor.parse_many in
+    workers) so spaCy tokenizes each chunk in one nlp.pipe pass. Each parsed
+    case is handed to `analyze_fn` (risk engine, medications,
+    recommendations) on a thread pool. At most `max_in_flight` cases are
+    queued at once, so arbitrarily large inputs run in constant memory, and
+    results are yielded in completion order.
+
+    Worker processes do not touch the database; the audit record each worker
+    result carries is passed to `audit_fn` (normally
+    MedicalTextProcessor.store_audit_record) in this process.
+    """
+
+    def __init__(self, parse_fn: Callable[[str], Dict[str, Any]],
+                 analyze_fn: Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]],
+                 parse_processes: int = 0, analyze_threads: int = 4,
+                 max_in_flight: int = 64,
+                 parse_many_fn: Optional[Callable[[List[str]], List[Dict[str, Any]]]] = None,
+                 parse_batch_size: int = 1,
+                 audit_fn: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.parse_fn = parse_fn
+        self.analyze_fn = analyze_fn
+        self.parse_processes = parse_processes
+        self.analyze_threads = max(1, analyze_threads)
+        self.max_in_flight = max(1, max_in_flight)
+        self.parse_many_fn = parse_many_fn
+        self.parse_batch_size = max(1, parse_batch_size)
+        self.audit_fn = audit_fn
+        self._process_pool_broken = False
+
+    def run(self, cases: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Analyze cases and yield one result dict per case as it finishes.
+
+        Each case is a dict with `hpi_text` and optional `id` plus the same
+        optional overrides /api/analyze accepts (patient_age, patient_sex,
+        population).
+        """
+        process_pool = None
+        self._process_pool_broken = False
+        if self.parse_processes > 0:
+            process_pool = ProcessPoolExecutor(
+                max_workers=self.parse_processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_parse_worker
+            )
+        thread_pool = ThreadPoolExecutor(max_workers=self.analyze_threads,
+                                         thread_name_prefix="batch-analyze")
+
+        pending: Dict[Future, tuple] = {}
+        case_iter = enumerate(cases)
+        exhausted = False
+        batched = self.parse_batch_size > 1 and (self.parse_many_fn is not None or process_pool is not None)
+        chunk_size = self.parse_batch_size
+        if process_pool is not None:
+            # Small enough that the in-flight window still feeds every worker
+            chunk_size = min(chunk_size, max(1, self.max_in_flight // self.parse_processes))
+        in_flight = 0
+
+        try:
+            while True:
+                # Keep the pipeline topped up to the in-flight bound
+                while not exhausted and in_flight < self.max_in_flight:
+                    limit = min(chunk_size, self.max_in_flight - in_flight) if batched else 1
+                    chunk = []
+                    while len(chunk) < limit:
+                        try:
+                            chunk.append(next(case_iter))
+                        except StopIteration:
+                            exhausted = True
+                            break
+                    if not chunk:
+                        break
+                    in_flight += len(chunk)
+                    if batched:
+                        self._submit_parse_batch(chunk, process_pool, thread_pool, pending)
+                    else:
+                        self._submit_parse(*chunk[0], process_pool, thread_pool, pending)
+
+                if not pending:
+                    break
+
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    entry = pending.pop(future)
+                    if entry[0] == "parse_batch":
+                        self._advance_batch(entry[1], entry[2], future, thread_pool, pending)
+                        continue
+                    stage, index, case, started = entry
+                    result = self._advance(stage, index, case, started, future, thread_pool, pending)
+                    if result is not None:
+                        in_flight -= 1
+                        yield result
+        finally:
+            for future in pending:
+                future.cancel()
+            thread_pool.shutdown(wait=False, cancel_futures=True)
+            if process_pool is not None:
+                process_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _submit_parse(self, index: int, case: Dict[str, Any], process_pool, thread_pool, pending):
+        started = time.perf_counter()
+        hpi_text = (case.get("hpi_text") or "").strip()
+        if not hpi_text:
+            future = Future()
+            future.set_exception(ValueError("HPI text required"))
+        elif process_pool is not None and not self._process_pool_broken:
+            try:
+                future = process_pool.submit(parse_hpi_in_worker, hpi_text)
+            except BrokenExecutor as e:
+                # A crashed worker breaks the whole pool; finish the batch in-process
+                logger.warning(f"Parse process pool unavailable, parsing in-process: {e}")
+                self._process_pool_broken = True
+                future = thread_pool.submit(self.parse_fn, hpi_text)
+        else:
+            future = thread_pool.submit(self.parse_fn, hpi_text)
+        pending[future] = ("parse", index, case, started)
+
+    def _submit_parse_batch(self, chunk, process_pool, thread_pool, pending):
+        started = time.perf_counter()
+        batch = []
+        for index, case in chunk:
+            if (case.get("hpi_text") or "").strip():
+                batch.append((index, case))
+            else:
+                self._submit_parse(index, case, process_pool, thread_pool, pending)
+        if not batch:
+            return
+
+        texts = [case["hpi_text"].strip() for _, case in batch]
+        future = None
+        if process_pool is not None and not self._process_pool_broken:
+            try:
+                future = process_pool.submit(parse_many_in_worker, texts)
+            except BrokenExecutor as e:
+                logger.warning(f"Parse process pool unavailable, parsing in-process: {e}")
+                self._process_pool_broken = True
+        if future is None:
+            if self.parse_many_fn is not None:
+                future = thread_pool.submit(self.parse_many_fn, texts)
+            else:
+                future = thread_pool.submit(lambda: [self.parse_fn(text) for text in texts])
+        pending[future] = ("parse_batch", batch, started)
+
+    def _advance_batch(self, batch, started: float, future: Future, thread_pool, pending):
+        """Hand each case of a parsed chunk to the analyze stage."""
+        try:
+            parsed_cases = future.result()
+            if len(parsed_cases) != len(batch):
+                raise ValueError(f"expected {len(batch)} parse results, got {len(parsed_cases)}")
+        except Exception as e:
+            # Parse the chunk's cases one at a time instead
+            logger.warning(f"Batch parse of {len(batch)} cases failed: {e}")
+            parsed_cases = [None] * len(batch)
+
+        for (index, case), parsed in zip(batch, parsed_cases):
+            self._record_audit(parsed)
+            if parsed is None:
+                next_future = thread_pool.submit(self._parse_and_analyze, case)
+            else:
+                next_future = thread_pool.submit(self.analyze_fn, parsed, case)
+            pending[next_future] = ("analyze", index, case, started)
+
+    def _advance(self, stage: str, index: int, case: Dict[str, Any], started: float,
+                 future: Future, thread_pool, pending) -> Optional[Dict[str, Any]]:
+        """Move a finished stage forward; returns a result when the case is complete."""
+        if stage == "parse":
+            try:
+                parsed = future.result()
+            except ValueError as e:
+                return self._error_result(index, case, started, e)
+            except Exception as e:
+                if not (case.get("hpi_text") or "").strip():
+                    return self._error_result(index, case, started, e)
+                # Worker-side failure: fall back to the in-process parser
+                logger.warning(f"Batch parse worker failed for case {index}: {e}")
+                parsed = None
+
+            self._record_audit(parsed)
+            if parsed is None:
+                next_future = thread_pool.submit(self._parse_and_analyze, case)
+            else:
+                next_future = thread_pool.submit(self.analyze_fn, parsed, case)
+            pending[next_future] = ("analyze", index, case, started)
+            return None
+
+        try:
+            analysis = future.result()
+        except Exception as e:
+            return self._error_result(index, case, started, e)
+
+        return {
+            "index": index,
+            "id": case.get("id", index),
+            "status": "ok",
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "result": analysis
+        }
+
+    def _record_audit(self, parsed: Optional[Dict[str, Any]]):
+        """Write the audit record a worker sent back with its parse result."""
+        record = parsed.pop(AUDIT_KEY, None) if parsed is not None else None
+        if record is None:
+            return
+        if self.audit_fn is None:
+            logger.warning(f"No audit_fn set; dropping audit record for {record.get('session_id')}")
+            return
+        try:
+            self.audit_fn(record)
+        except Exception as e:
+            logger.error(f"Error writing audit record for {record.get('session_id')}: {e}")
+
+    def _parse_and_analyze(self, case: Dict[str, Any]) -> Dict[str, Any]:
+        parsed = self.parse_fn(case["hpi_text"].strip())
+        return self.analyze_fn(parsed, case)
+
+    def _error_result(self, index: int, case: Dict[str, Any], started: float, error: Exception) -> Dict[str, Any]:
+        logger.error(f"Batch analysis failed for case {case.get('id', index)}: {error}")
+        return {
+            "index": index,
+            "id": case.get("id", index),
+            "status": "error",
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "error": str(error)
+        }
+
+
+def iter_ndjson(results: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Serialize pipeline results as newline-delimited JSON."""
+    for result in results:
+        yield json.dumps(result, default=str) + "\n"
+
+
+def default_parse_processes() -> int:
+    """Parse workers to use for large batches (one per spare CPU, at least one)."""
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def clamp_batch_options(parse_processes: Optional[int], max_in_flight: int,
+                        max_in_flight_cap: int) -> Tuple[Optional[int], int]:
+    """Bound client-supplied pipeline knobs; None keeps the automatic process count."""
+    if parse_processes is not None:
+        parse_processes = min(max(parse_processes, 0), default_parse_processes())
+    max_in_flight = min(max(max_in_flight, 1), max_in_flight_cap)
+    return parse_processes, max_in_flight
@@ -0,0 +1,213 @@
+"""
+Canonical parsed cases keyed by an HMAC of the normalized HPI text.
+Each parser runs at most once per case; blueprints look cases up by case_id instead of re-parsing the text.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from .parse_cache import normalize_text
+from .text_keys import keyed_digest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CASES = 2048
+DEFAULT_TTL_SECONDS = 6 * 3600
+CASE_ID_PREFIX = "case_"
+
+
+def case_id_for(hpi_text: str) -> str:
+    """Keyed hash of the whitespace-normalized text; the same HPI gives the same id in every worker sharing the secret."""
+    return f"{CASE_ID_PREFIX}{keyed_digest(normalize_text(hpi_text))[:24]}"
+
+
+def _parse_nlp(hpi_text: str):
+    from nlp.pipeline import parse_hpi
+    return parse_hpi(hpi_text)
+
+
+def _case_context(hpi_text: str) -> Dict[str, Any]:
+    from src.learning.patient_context import PatientContextExtractor
+    return PatientContextExtractor().text_context(hpi_text)
+
+
+class ParsedCase:
+    """
+    One HPI and everything derived from it.
+
+    Views are built on first access by the parser registered under that name
+    ("analysis": the /api/analyze parse, "nlp": the rules/spaCy ParsedHPI,
+    "context": surgery domain, procedure keywords and urgency) and then shared
+    by every caller. Derived views are built from the case itself, so they
+    can reuse other views. Results produced downstream (risk assessments,
+    medication plans) are attached with put() so later requests can reuse them.
+    """
+
+    def __init__(self, case_id: str, hpi_text: str, parsers: Dict[str, Callable[[str], Any]],
+                 derived: Optional[Dict[str, Callable[["ParsedCase"], Any]]] = None):
+        self.case_id = case_id
+        self.hpi_text = hpi_text
+        self.created_at = time.time()
+        self._parsers = parsers
+        self._derived = derived if derived is not None else {}
+        self._views: Dict[str, Any] = {}
+        # Re-entrant: a derived view builds the views it depends on while holding it
+        self._lock = threading.RLock()
+
+    def view(self, name: str) -> Any:
+        """The named view, parsing it once on first use."""
+        if name in self._views:
+            return self._views[name]
+        with self._lock:
+            if name not in self._views:
+                if name in self._derived:
+                    self._views[name] = self._derived[name](self)
+                elif name in self._parsers:
+                    self._views[name] = self._parsers[name](self.hpi_text)
+                else:
+                    raise KeyError(f"No parser registered for case view {name!r}")
+            return self._views[name]
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """A view or attached result if it exists; never parses."""
+        return self._views.get(name, default)
+
+    def put(self, name: str, value: Any):
+        with self._lock:
+            self._views[name] = value
+
+    @property
+    def analysis(self) -> Dict[str, Any]:
+        return self.view("analysis")
+
+    @property
+    def nlp(self):
+        return self.view("nlp")
+
+    @property
+    def context(self) -> Dict[str, Any]:
+        return self.view("context")
+
+    def summary(self) -> Dict[str, Any]:
+        return {"case_id": self.case_id, "created_at": self.created_at, "views": sorted(self._views)}
+
+
+class CaseStore:
+    """
+    Thread-safe LRU + TTL store of ParsedCase objects.
+
+    Cases live in this process only: a case_id that has expired or was issued by
+    another worker is unknown here, and clients re-send the text (which maps to
+    the same case_id).
+    """
+
+    def __init__(self, max_cases: int = DEFAULT_MAX_CASES, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.max_cases = max_cases
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._cases: "OrderedDict[str, ParsedCase]" = OrderedDict()
+        self._parsers: Dict[str, Callable[[str], Any]] = {"nlp": _parse_nlp, "context": _case_context}
+        self._derived: Dict[str, Callable[[ParsedCase], Any]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def register_parser(self, name: str, parser: Callable[[str], Any]):
+        """Builder for a view; cases created afterwards and existing cases without the view use it."""
+        with self._lock:
+            self._derived.pop(name, None)
+            self._parsers[name] = parser
+
+    def register_view(self, name: str, builder: Callable[[ParsedCase], Any]):
+        """Builder for a view derived from the case (e.g. from another view); replaces a parser of that name."""
+        with self._lock:
+            self._parsers.pop(name, None)
+            self._derived[name] = builder
+
+    def open(self, hpi_text: str) -> ParsedCase:
+        """The case for this text, created (unparsed) if it is new."""
+        if not hpi_text or not hpi_text.strip():
+            raise ValueError("hpi_text is empty")
+        case_id = case_id_for(hpi_text)
+        with self._lock:
+            case = self._lookup(case_id)
+            if case is None:
+                case = ParsedCase(case_id, hpi_text.strip(), self._parsers, self._derived)
+                self._cases[case_id] = case
+                while len(self._cases) > self.max_cases:
+                    self._cases.popitem(last=False)
+                    self.evictions += 1
+            return case
+
+    def get(self, case_id: str) -> Optional[ParsedCase]:
+        with self._lock:
+            return self._lookup(case_id)
+
+    def resolve(self, case_id: Optional[str] = None, hpi_text: Optional[str] = None) -> ParsedCase:
+        """
+        Case for a request: by case_id if given, else by text. When both are given
+        and the text hashes to a different case, the text wins. Raises KeyError for
+        an unknown case_id without text and ValueError when neither is given.
+        """
+        if case_id and hpi_text and hpi_text.strip() and case_id_for(hpi_text) != case_id:
+            logger.info(f"case_id {case_id} does not match the request's hpi_text; using the text")
+            case_id = None
+        if case_id:
+            case = self.get(case_id)
+            if case is not None:
+                return case
+            if not hpi_text:
+                raise KeyError(f"Unknown case_id {case_id!r}; send hpi_text to re-create it")
+        if not hpi_text:
+            raise ValueError("hpi_text or case_id is required")
+        return self.open(hpi_text)
+
+    def clear(self):
+        with self._lock:
+            self._cases.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cases": len(self._cases),
+                "max_cases": self.max_cases,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "parsers": sorted([*self._parsers, *self._derived])
+            }
+
+    def _lookup(self, case_id: str) -> Optional[ParsedCase]:
+        """Caller holds the lock."""
+        case = self._cases.get(case_id)
+        if case is not None and time.time() - case.created_at > self.ttl_seconds:
+            del self._cases[case_id]
+            case = None
+        if case is None:
+            self.misses += 1
+            return None
+        self._cases.move_to_end(case_id)
+        self.hits += 1
+        return case
+
+
+# Global case store instance
+_case_store_instance = None
+_case_store_lock = threading.Lock()
+
+
+def get_case_store() -> CaseStore:
+    """Get the process-wide case store."""
+    global _case_store_instance
+    if _case_store_instance is None:
+        with _case_store_lock:
+            if _case_store_instance is None:
+                _case_store_instance = CaseStore()
+    return _case_store_instance
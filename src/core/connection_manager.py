@@ -0,0 +1,159 @@
+"""
+Per-process DuckDB connection manager.
+One database handle per process, a cursor per thread for reads and a single serialized writer connection.
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionManager:
+    """
+    Shares one DuckDB database instance between all threads of a process.
+
+    DuckDB connections must not be used from several threads at once, and
+    opening a new connection per request re-attaches the database file. The
+    manager opens the file once and gives every thread its own cursor (a
+    connection on the same instance, created on first use and reused after
+    that), so reads run concurrently without connection churn. All writes go
+    through the one writer connection, serialized by a lock, so concurrent
+    requests never race on write-write conflicts.
+
+    The handle is tied to the process that opened it: a forked worker (e.g.
+    gunicorn with preload) transparently opens its own on first use instead
+    of sharing the parent's.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = str(db_path)
+
+        self._lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._cursors: Dict[int, duckdb.DuckDBPyConnection] = {}
+        self._writer: Optional[duckdb.DuckDBPyConnection] = None
+        self._pid: Optional[int] = None
+        self._closed = False
+
+        # Metrics
+        self._opens = 0
+        self._cursors_created = 0
+        self._cursors_pruned = 0
+        self._writes = 0
+        self._write_wait_seconds = 0.0
+        self._max_write_wait = 0.0
+
+        self._open()
+
+    def _open(self):
+        self._writer = duckdb.connect(self.db_path)
+        self._pid = os.getpid()
+        self._cursors = {}
+        self._opens += 1
+
+    def _ensure_process(self):
+        """Reopen after a fork; the parent's handle must not be used from this process."""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    logger.info(f"Opening DuckDB handle for worker process {os.getpid()}")
+                    self._write_lock = threading.RLock()
+                    self._open()
+
+    # ---- Reads ----
+
+    def cursor(self) -> duckdb.DuckDBPyConnection:
+        """This thread's cursor (created on first use, owned by the manager; do not close it)."""
+        if self._closed:
+            raise RuntimeError(f"Connection manager for {self.db_path} is closed")
+        self._ensure_process()
+
+        ident = threading.get_ident()
+        cursor = self._cursors.get(ident)
+        if cursor is not None:
+            return cursor
+
+        with self._lock:
+            cursor = self._writer.cursor()
+            self._prune_dead_threads()
+            self._cursors[ident] = cursor
+            self._cursors_created += 1
+        return cursor
+
+    def _prune_dead_threads(self):
+        """Close cursors of threads that have exited. Caller holds the lock."""
+        alive = {thread.ident for thread in threading.enumerate()}
+        for ident in [i for i in self._cursors if i not in alive]:
+            try:
+                self._cursors.pop(ident).close()
+            except Exception:
+                pass
+            self._cursors_pruned += 1
+
+    # ---- Writes ----
+
+    @contextmanager
+    def writer(self):
+        """Exclusive use of the writer connection for a write (or a write transaction)."""
+        if self._closed:
+            raise RuntimeError(f"Connection manager for {self.db_path} is closed")
+        self._ensure_process()
+
+        start = time.perf_counter()
+        with self._write_lock:
+            waited = time.perf_counter() - start
+            with self._lock:
+                self._writes += 1
+                self._write_wait_seconds += waited
+                self._max_write_wait = max(self._max_write_wait, waited)
+            yield self._writer
+
+    def execute_write(self, query: str, parameters=None):
+        """Run a single write statement on the writer connection."""
+        with self.writer() as conn:
+            if parameters is None:
+                return conn.execute(query)
+            return conn.execute(query, parameters)
+
+    # ---- Lifecycle and metrics ----
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            cursors = list(self._cursors.values())
+            self._cursors.clear()
+
+        if self._pid != os.getpid():
+            # Inherited handle: leave it to the process that opened it
+            return
+        for cursor in cursors:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        with self._write_lock:
+            self._writer.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "db_path": self.db_path,
+                "pid": self._pid,
+                "opens": self._opens,
+                "thread_cursors": len(self._cursors),
+                "cursors_created": self._cursors_created,
+                "cursors_pruned": self._cursors_pruned,
+                "writes": self._writes,
+                "write_wait_seconds": round(self._write_wait_seconds, 6),
+                "max_write_wait_seconds": round(self._max_write_wait, 6),
+                "closed": self._closed
+            }
@@ -5,25 +5,51 @@ Audit-ready design with complete provenance tracking.
 
 import duckdb
 import json
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 import logging
 
+from .audit_sink import AuditSink
+from .connection_manager import ConnectionManager
+
 logger = logging.getLogger(__name__)
 
+# How long cached_evidence_version() may serve a version without re-reading it
+EVIDENCE_VERSION_CACHE_SECONDS = 5.0
+
 class CodexDatabase:
     def __init__(self, db_path: str = "database/codex.duckdb"):
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self.conn = duckdb.connect(str(self.db_path))
+        self.connections = ConnectionManager(str(self.db_path))
+        self.audit_sink = AuditSink(self)
+        self._evidence_version_cache = None  # (version, read at monotonic seconds)
         self.init_schema()
 
+    @property
+    def conn(self) -> duckdb.DuckDBPyConnection:
+        """Cursor for the calling thread (shared database handle, never crosses threads)."""
+        return self.connections.cursor()
+
+    def writer(self):
+        """Context manager holding the single writer connection."""
+        return self.connections.writer()
+
+    def execute_write(self, query: str, parameters=None):
+        """Run one write statement through the single writer connection."""
+        return self.connections.execute_write(query, parameters)
+
     def init_schema(self):
         """Initialize complete database schema for evidence engine."""
+        with self.writer() as conn:
+            self._create_schema(conn)
+
+    def _create_schema(self, conn):
 
         # Core papers table - stores normalized PubMed records
-        self.conn.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS papers (
                 pmid VARCHAR PRIMARY KEY,
                 title TEXT NOT NULL,
@@ -49,7 +75,7 @@ class CodexDatabase:
         """)
 
         # Estimates table - extracted effect sizes and incidences
-        self.conn.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS estimates (
                 id VARCHAR PRIMARY KEY,
                 pmid VARCHAR NOT NULL,
@@ -76,8 +102,33 @@ class CodexDatabase:
             )
         """)
 
+        # Dirty set - pooling keys whose estimates changed since the last re-pool
+        conn.execute("CREATE SEQUENCE IF NOT EXISTS estimates_dirty_seq")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS estimates_dirty (
+                outcome_token VARCHAR NOT NULL,
+                modifier_token VARCHAR NOT NULL,  -- '' for baseline incidence
+                population VARCHAR NOT NULL,  -- paper procedure (context label) or 'general'
+                mark_seq BIGINT NOT NULL,  -- from estimates_dirty_seq; bumped on every re-mark
+                marked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (outcome_token, modifier_token, population)
+            )
+        """)
+
+        # Fingerprint of each pooling key's estimates as of its last re-pool (see sync_estimates_dirty)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS estimates_key_state (
+                outcome_token VARCHAR NOT NULL,
+                modifier_token VARCHAR NOT NULL,
+                population VARCHAR NOT NULL,
+                fingerprint UBIGINT NOT NULL,  -- bit_xor of the estimate + paper row hashes
+                n_estimates INTEGER NOT NULL,
+                PRIMARY KEY (outcome_token, modifier_token, population)
+            )
+        """)
+
         # Pooled effects - outcome-modifier combinations
-        self.conn.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS effects_pooled (
                 id VARCHAR PRIMARY KEY,
                 outcome_token VARCHAR NOT NULL,
@@ -100,7 +151,7 @@ class CodexDatabase:
         """)
 
         # Pooled baselines - outcome baseline risks by context
-        self.conn.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS baselines_pooled (
                 id VARCHAR PRIMARY KEY,
                 outcome_token VARCHAR NOT NULL,
@@ -121,7 +172,7 @@ class CodexDatabase:
         """)
 
         # Guidelines from professional societies
-        self.conn.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS guidelines (
                 id VARCHAR PRIMARY KEY,
                 society VARCHAR NOT NULL,  -- ASA, ASRA, SPA, etc.
@@ -142,7 +193,7 @@ class CodexDatabase:
         """)
 
         # Ontology - canonical tokens and mappings
-        self.conn.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS ontology (
                 token VARCHAR PRIMARY KEY,
                 type VARCHAR NOT NULL,  -- risk_factor, outcome, med, drug_class, context
@@ -160,7 +211,7 @@ class CodexDatabase:
         """)
 
         # PubMed search queries
-        self.conn.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS queries (
                 id VARCHAR PRIMARY KEY,
                 name VARCHAR NOT NULL,
@@ -176,7 +227,7 @@ class CodexDatabase:
         """)
 
         # Comprehensive audit log
-        self.conn.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS audit_log (
                 id VARCHAR PRIMARY KEY,
                 entity VARCHAR NOT NULL,  -- table name
@@ -193,7 +244,7 @@ class CodexDatabase:
         """)
 
         # Medications knowledge base
-        self.conn.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS medications (
                 token VARCHAR PRIMARY KEY,
                 generic_name VARCHAR NOT NULL,
@@ -220,7 +271,7 @@ class CodexDatabase:
         """)
 
         # Evidence versions and change tracking
-        self.conn.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS evidence_versions (
                 version VARCHAR PRIMARY KEY,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -235,7 +286,7 @@ class CodexDatabase:
         """)
 
         # Patient case sessions (for debugging/audit)
-        self.conn.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS case_sessions (
                 session_id VARCHAR PRIMARY KEY,
                 hpi_text TEXT NOT NULL,
@@ -250,7 +301,7 @@ class CodexDatabase:
         """)
 
         # Evidence harvest batches - track systematic evidence collection
-        self.conn.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS harvest_batches (
                 batch_id VARCHAR PRIMARY KEY,
                 outcome_token VARCHAR NOT NULL,
@@ -269,8 +320,18 @@ class CodexDatabase:
             )
         """)
 
+        # PMIDs each harvest batch has fetched and stored (its resume checkpoint)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS harvest_batch_pmids (
+                batch_id VARCHAR NOT NULL,
+                pmid VARCHAR NOT NULL,
+                processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (batch_id, pmid)
+            )
+        """)
+
         # Pooled estimates - enhanced with comprehensive referencing
-        self.conn.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS pooled_estimates (
                 id VARCHAR PRIMARY KEY,
                 outcome_token VARCHAR NOT NULL,
@@ -294,7 +355,7 @@ class CodexDatabase:
         """)
 
         # Evidence citations - comprehensive referencing system
-        self.conn.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS evidence_citations (
                 citation_id VARCHAR PRIMARY KEY,
                 pmid VARCHAR NOT NULL,
@@ -312,7 +373,7 @@ class CodexDatabase:
         """)
 
         # Risk factor mappings - link parsed risk factors to evidence
-        self.conn.execute("""
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS risk_factor_evidence_mapping (
                 mapping_id VARCHAR PRIMARY KEY,
                 parsed_risk_factor VARCHAR NOT NULL,  -- What was extracted from HPI
@@ -328,11 +389,11 @@ class CodexDatabase:
         """)
 
         # Create indexes for performance
-        self._create_indexes()
+        self._create_indexes(conn)
 
         logger.info("Database schema initialized successfully")
 
-    def _create_indexes(self):
+    def _create_indexes(self, conn):
         """Create performance indexes."""
         indexes = [
             "CREATE INDEX IF NOT EXISTS idx_estimates_outcome ON estimates(outcome_token)",
@@ -356,7 +417,7 @@ class CodexDatabase:
         ]
 
         for idx in indexes:
-            self.conn.execute(idx)
+            conn.execute(idx)
 
     def log_action(self, entity: str, entity_id: str, action: str,
                    details: Dict[str, Any], evidence_version: str = None,
@@ -364,13 +425,73 @@ class CodexDatabase:
         """Log audit trail entry."""
         audit_id = f"{entity}_{entity_id}_{action}_{datetime.now().isoformat()}"
 
-        self.conn.execute("""
+        self.execute_write("""
             INSERT INTO audit_log (id, entity, entity_id, action, details_json,
                                  evidence_version, session_id)
             VALUES (?, ?, ?, ?, ?, ?, ?)
         """, [audit_id, entity, entity_id, action, json.dumps(details),
               evidence_version, session_id])
 
+    def mark_estimates_dirty(self, estimate_ids: List[str], conn=None):
+        """
+        Record the (outcome, modifier, population) keys of these estimates in estimates_dirty.
+        Call before a change (old keys) and after it (new keys); pass conn to join a transaction.
+        """
+        if not estimate_ids:
+            return
+        query = """
+            INSERT OR REPLACE INTO estimates_dirty (outcome_token, modifier_token, population, mark_seq, marked_at)
+            SELECT outcome_token, modifier_token, population, nextval('estimates_dirty_seq'), CURRENT_TIMESTAMP
+            FROM (
+                SELECT DISTINCT e.outcome_token, COALESCE(e.modifier_token, '') AS modifier_token,
+                       COALESCE(NULLIF(p.procedure, ''), 'general') AS population
+                FROM estimates e
+                LEFT JOIN papers p ON p.pmid = e.pmid
+                WHERE e.id IN (SELECT UNNEST(?::VARCHAR[]))
+            )
+        """
+        if conn is not None:
+            conn.execute(query, [list(estimate_ids)])
+        else:
+            self.execute_write(query, [list(estimate_ids)])
+
+    def sync_estimates_dirty(self):
+        """
+        Mark dirty every key whose estimates changed since it was last re-pooled,
+        whichever path wrote them (raw SQL inserts, updates, deletes, scripts):
+        per-key fingerprints of the estimate and paper rows are compared with
+        estimates_key_state, and keys that changed, appeared or lost all their
+        estimates are added to estimates_dirty. Against an empty state (a new or
+        pre-existing database) every key is marked once.
+
+        Returns the fingerprints as a DataFrame; the re-pooler stores them for
+        the keys it consumes.
+        """
+        with self.writer() as conn:
+            fingerprints = conn.execute("""
+                SELECT e.outcome_token, COALESCE(e.modifier_token, '') AS modifier_token,
+                       COALESCE(NULLIF(p.procedure, ''), 'general') AS population,
+                       bit_xor(hash(e, p)) AS fingerprint, COUNT(*) AS n_estimates
+                FROM estimates e
+                LEFT JOIN papers p ON p.pmid = e.pmid
+                GROUP BY 1, 2, 3
+            """).df()
+            conn.register("_estimate_key_fingerprints", fingerprints)
+            try:
+                conn.execute("""
+                    INSERT OR REPLACE INTO estimates_dirty (outcome_token, modifier_token, population, mark_seq, marked_at)
+                    SELECT COALESCE(f.outcome_token, s.outcome_token), COALESCE(f.modifier_token, s.modifier_token),
+                           COALESCE(f.population, s.population), nextval('estimates_dirty_seq'), CURRENT_TIMESTAMP
+                    FROM _estimate_key_fingerprints f
+                    FULL OUTER JOIN estimates_key_state s
+                      ON s.outcome_token = f.outcome_token AND s.modifier_token = f.modifier_token
+                     AND s.population = f.population
+                    WHERE f.fingerprint IS DISTINCT FROM s.fingerprint
+                """)
+            finally:
+                conn.unregister("_estimate_key_fingerprints")
+        return fingerprints
+
     def get_current_evidence_version(self) -> Optional[str]:
         """Get the current evidence version."""
         result = self.conn.execute("""
@@ -381,25 +502,45 @@ class CodexDatabase:
 
         return result[0] if result else None
 
+    def cached_evidence_version(self) -> Optional[str]:
+        """
+        Current evidence version for audit writes on the request path: re-read
+        at most every EVIDENCE_VERSION_CACHE_SECONDS, and immediately after
+        this process creates a version.
+        """
+        cached = self._evidence_version_cache
+        now = time.monotonic()
+        if cached is not None and now - cached[1] < EVIDENCE_VERSION_CACHE_SECONDS:
+            return cached[0]
+        version = self.get_current_evidence_version()
+        self._evidence_version_cache = (version, now)
+        return version
+
+    def invalidate_evidence_version(self):
+        """Drop the cached evidence version (call after writing evidence_versions)."""
+        self._evidence_version_cache = None
+
     def create_evidence_version(self, description: str) -> str:
         """Create new evidence version."""
         version = f"v{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
-        # Mark all previous versions as not current
-        self.conn.execute("UPDATE evidence_versions SET is_current = FALSE")
+        with self.writer() as conn:
+            # Mark all previous versions as not current
+            conn.execute("UPDATE evidence_versions SET is_current = FALSE")
 
-        # Create new version
-        self.conn.execute("""
-            INSERT INTO evidence_versions (version, description, is_current)
-            VALUES (?, ?, TRUE)
-        """, [version, description])
+            # Create new version
+            conn.execute("""
+                INSERT INTO evidence_versions (version, description, is_current)
+                VALUES (?, ?, TRUE)
+            """, [version, description])
 
+        self.invalidate_evidence_version()
         return version
 
     def close(self):
-        """Close database connection."""
-        if self.conn:
-            self.conn.close()
+        """Flush queued audit records and close database connection."""
+        self.audit_sink.close()
+        self.connections.close()
 
     def __enter__(self):
         return self
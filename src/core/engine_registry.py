@@ -0,0 +1,187 @@
+"""
+Process-wide registry of warm risk engines.
+Builds the RiskEngine stack once per worker and swaps it atomically when the evidence version changes.
+"""
+
+import threading
+import time
+import logging
+from typing import Dict, Any, Optional, Callable
+from datetime import datetime
+
+from .database import get_database
+from .risk_engine import RiskEngine
+from .evidence_index import EvidenceIndex
+from ..evidence.pooling_engine import MetaAnalysisEngine
+from ..ontology.core_ontology import AnesthesiaOntology
+from ..api.evidence_referencing import EvidenceReferencingEngine
+
+logger = logging.getLogger(__name__)
+
+# Registry lifecycle states reported by health()
+STATE_COLD = "cold"
+STATE_WARMING = "warming"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+
+
+def build_risk_engine() -> RiskEngine:
+    """Build a RiskEngine with a shared ontology and a preloaded evidence index."""
+    ontology = AnesthesiaOntology()
+    return RiskEngine(
+        ontology=ontology,
+        pooling_engine=MetaAnalysisEngine(),
+        evidence_engine=EvidenceReferencingEngine(ontology=ontology),
+        evidence_index=EvidenceIndex.load(get_database())
+    )
+
+
+class EngineRegistry:
+    """
+    Thread-safe holder for the long-lived RiskEngine of this worker.
+
+    The engine is built once (normally at worker start via warm_start) and
+    reused by every request. The current evidence version is re-checked at
+    most every `version_check_interval` seconds; when it changes a new engine
+    is built off to the side and published with a single reference swap, so
+    in-flight requests keep the engine they started with.
+    """
+
+    def __init__(self, factory: Callable[[], RiskEngine] = build_risk_engine,
+                 version_check_interval: float = 30.0):
+        self.factory = factory
+        self.version_check_interval = version_check_interval
+
+        self._lock = threading.RLock()
+        self._engine: Optional[RiskEngine] = None
+        self._evidence_version: Optional[str] = None
+        self._state = STATE_COLD
+        self._last_error: Optional[str] = None
+        self._built_at: Optional[datetime] = None
+        self._build_seconds: Optional[float] = None
+        self._build_count = 0
+        self._last_version_check = 0.0
+
+    def warm_start(self) -> bool:
+        """Build the engine eagerly. Returns True when the registry is ready."""
+        with self._lock:
+            if self._engine is None:
+                self._rebuild(self._read_evidence_version())
+            return self._state == STATE_READY
+
+    def get_risk_engine(self) -> RiskEngine:
+        """Return the warm engine, building or refreshing it if needed."""
+        engine = self._engine
+        if engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._rebuild(self._read_evidence_version())
+                if self._engine is None:
+                    raise RuntimeError(f"Risk engine unavailable: {self._last_error}")
+                return self._engine
+
+        self._maybe_refresh()
+        return self._engine
+
+    def refresh(self, force: bool = False) -> bool:
+        """Rebuild the engine if the evidence version changed (or always when forced)."""
+        with self._lock:
+            version = self._read_evidence_version()
+            self._last_version_check = time.monotonic()
+            if force or self._engine is None or version != self._evidence_version:
+                return self._rebuild(version)
+            return False
+
+    def _maybe_refresh(self):
+        """Throttled evidence-version check on the request path."""
+        now = time.monotonic()
+        if now - self._last_version_check < self.version_check_interval:
+            return
+
+        # Only one thread performs the check; others keep using the current engine
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if now - self._last_version_check < self.version_check_interval:
+                return
+            self._last_version_check = now
+            version = self._read_evidence_version()
+            if version != self._evidence_version:
+                logger.info(f"Evidence version changed {self._evidence_version} -> {version}; rebuilding risk engine")
+                self._rebuild(version)
+        finally:
+            self._lock.release()
+
+    def _rebuild(self, evidence_version: Optional[str]) -> bool:
+        """Build a new engine and publish it. Caller must hold the lock."""
+        previous_state = self._state
+        if self._engine is None:
+            self._state = STATE_WARMING
+
+        start = time.perf_counter()
+        try:
+            engine = self.factory()
+        except Exception as e:
+            logger.error(f"Failed to build risk engine: {e}")
+            self._last_error = str(e)
+            # Keep serving the previous engine if we had one
+            self._state = previous_state if self._engine is not None else STATE_FAILED
+            return False
+
+        self._build_seconds = time.perf_counter() - start
+        self._engine = engine
+        self._evidence_version = evidence_version
+        self._built_at = datetime.now()
+        self._build_count += 1
+        self._last_error = None
+        self._state = STATE_READY
+        self._last_version_check = time.monotonic()
+
+        logger.info(f"Risk engine ready (evidence {evidence_version}, built in {self._build_seconds:.2f}s)")
+        return True
+
+    def _read_evidence_version(self) -> Optional[str]:
+        try:
+            return get_database().get_current_evidence_version()
+        except Exception as e:
+            logger.debug(f"Could not read evidence version: {e}")
+            return self._evidence_version
+
+    @property
+    def is_ready(self) -> bool:
+        return self._state == STATE_READY
+
+    def health(self) -> Dict[str, Any]:
+        """Readiness/health snapshot for the /api/health endpoint."""
+        engine = self._engine
+        index = getattr(engine, "evidence_index", None)
+        result_cache = getattr(engine, "result_cache", None)
+        return {
+            "state": self._state,
+            "ready": self.is_ready,
+            "evidence_version": self._evidence_version,
+            "built_at": self._built_at.isoformat() if self._built_at else None,
+            "build_seconds": self._build_seconds,
+            "build_count": self._build_count,
+            "last_error": self._last_error,
+            "evidence_index": index.stats() if index is not None else None,
+            "result_cache": result_cache.stats() if result_cache is not None else None
+        }
+
+
+# Global registry instance
+_registry_instance = None
+_registry_lock = threading.Lock()
+
+def get_engine_registry() -> EngineRegistry:
+    """Get the process-wide engine registry."""
+    global _registry_instance
+    if _registry_instance is None:
+        with _registry_lock:
+            if _registry_instance is None:
+                _registry_instance = EngineRegistry()
+    return _registry_instance
+
+def get_risk_engine() -> RiskEngine:
+    """Convenience accessor for the warm RiskEngine of this worker."""
+    return get_engine_registry().get_risk_engine()
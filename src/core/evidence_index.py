@@ -0,0 +1,250 @@
+"""
+In-memory evidence index for the risk engine.
+Preloads baseline and modifier evidence in a few bulk scans so risk lookups need no SQL per request.
+"""
+
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple, Any
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Grade ranking used by the risk engine's ORDER BY clauses (A best, anything else last)
+GRADE_RANK = {"A": 1, "B": 2, "C": 3}
+
+# Mirrors the per-request LIMIT clauses in RiskEngine
+MAX_INCIDENCE_ESTIMATES = 10
+MAX_EFFECT_ESTIMATES = 10
+
+
+class EvidenceTableUnavailable(Exception):
+    """Raised when a lookup hits a table that could not be loaded (mirrors a failing SQL query)."""
+
+
+def _grade_rank(grade: Optional[str]) -> int:
+    return GRADE_RANK.get(grade, 4)
+
+
+def _desc_nulls_last(value) -> Tuple[int, float]:
+    """Sort key for `col DESC` with DuckDB's default NULLS LAST."""
+    return (1, 0.0) if value is None else (0, -value)
+
+
+def _asc_nulls_last(value) -> Tuple[int, Any]:
+    """Sort key for `col ASC` with DuckDB's default NULLS LAST."""
+    return (1, "") if value is None else (0, value)
+
+
+class EvidenceIndex:
+    """
+    Versioned, read-only snapshot of the evidence tables used by RiskEngine.
+
+    Rows are kept as the same tuples the engine's SQL queries return, already
+    filtered and ordered the way those queries order them, so the engine's
+    post-processing runs unchanged against either source:
+
+      - evidence_based_adjusted_risks: first row per outcome (baseline) and
+        per (outcome, modifier), in table scan order
+      - baseline_risks: best row per (outcome, population) with the
+        population-match / grade / studies_count DESC ordering
+      - risk_modifiers: best row per (outcome, modifier) by grade, studies_count DESC
+      - estimates: top incidence rows per outcome and top OR/RR/HR rows per
+        (outcome, modifier)
+    """
+
+    def __init__(self, evidence_version: Optional[str] = None):
+        self.evidence_version = evidence_version
+        self.loaded_at: Optional[datetime] = None
+
+        self._eb_baseline: Dict[str, tuple] = {}
+        self._eb_modifier: Dict[Tuple[str, str], tuple] = {}
+        self._baseline_rows: Optional[Dict[str, List[tuple]]] = None
+        self._modifier_rows: Optional[Dict[Tuple[str, str], tuple]] = None
+        self._incidence_rows: Optional[Dict[str, List[tuple]]] = None
+        self._effect_rows: Optional[Dict[Tuple[str, str], List[tuple]]] = None
+
+        self._best_baseline: Dict[Tuple[str, str], Optional[tuple]] = {}
+        self.row_counts: Dict[str, int] = {}
+        self.load_errors: Dict[str, str] = {}
+
+    @classmethod
+    def load(cls, db) -> "EvidenceIndex":
+        """Build an index from a CodexDatabase with one scan per table."""
+        index = cls(evidence_version=db.get_current_evidence_version())
+        conn = db.conn
+
+        index._load_evidence_based(conn)
+        index._load_baseline_risks(conn)
+        index._load_risk_modifiers(conn)
+        index._load_estimates(conn)
+        index.loaded_at = datetime.now()
+
+        logger.info(f"Evidence index loaded (version {index.evidence_version}): {index.row_counts}")
+        if index.load_errors:
+            logger.warning(f"Evidence index tables unavailable: {sorted(index.load_errors)}")
+        return index
+
+    def _load_evidence_based(self, conn):
+        try:
+            rows = conn.execute("""
+                SELECT outcome_token, modifier_token, adjusted_risk, effect_estimate,
+                       confidence_interval_lower, confidence_interval_upper,
+                       studies_count, evidence_grade, adjustment_category
+                FROM evidence_based_adjusted_risks
+            """).fetchall()
+        except Exception as e:
+            # Engine treats a missing table as "no row" for this source
+            self.load_errors["evidence_based_adjusted_risks"] = str(e)
+            return
+
+        for (outcome, modifier, adjusted_risk, effect_estimate,
+             ci_low, ci_high, studies_count, grade, category) in rows:
+            if category == 'baseline' and outcome not in self._eb_baseline:
+                self._eb_baseline[outcome] = (adjusted_risk, ci_low, ci_high,
+                                              studies_count, grade, category)
+            if modifier is not None and (outcome, modifier) not in self._eb_modifier:
+                self._eb_modifier[(outcome, modifier)] = (effect_estimate, ci_low, ci_high,
+                                                          studies_count, grade)
+        self.row_counts["evidence_based_adjusted_risks"] = len(rows)
+
+    def _load_baseline_risks(self, conn):
+        try:
+            rows = conn.execute("""
+                SELECT outcome_token, baseline_risk, confidence_interval_lower,
+                       confidence_interval_upper, studies_count, evidence_grade, population
+                FROM baseline_risks
+            """).fetchall()
+        except Exception as e:
+            self.load_errors["baseline_risks"] = str(e)
+            return
+
+        by_outcome = defaultdict(list)
+        for outcome, *row in rows:
+            by_outcome[outcome].append(tuple(row))
+
+        # Pre-sort by the population-independent part of the ORDER BY
+        for outcome_rows in by_outcome.values():
+            outcome_rows.sort(key=lambda r: (_grade_rank(r[4]), _desc_nulls_last(r[3])))
+
+        self._baseline_rows = dict(by_outcome)
+        self.row_counts["baseline_risks"] = len(rows)
+
+    def _load_risk_modifiers(self, conn):
+        try:
+            rows = conn.execute("""
+                SELECT outcome_token, modifier_token, effect_estimate,
+                       confidence_interval_lower, confidence_interval_upper,
+                       studies_count, evidence_grade
+                FROM risk_modifiers
+            """).fetchall()
+        except Exception as e:
+            self.load_errors["risk_modifiers"] = str(e)
+            return
+
+        grouped = defaultdict(list)
+        for outcome, modifier, *row in rows:
+            grouped[(outcome, modifier)].append(tuple(row))
+
+        self._modifier_rows = {
+            key: min(group, key=lambda r: (_grade_rank(r[4]), _desc_nulls_last(r[3])))
+            for key, group in grouped.items()
+        }
+        self.row_counts["risk_modifiers"] = len(rows)
+
+    def _load_estimates(self, conn):
+        try:
+            incidence = conn.execute("""
+                SELECT outcome_token, estimate, pmid, n_group, n_events, quality_weight, evidence_grade
+                FROM estimates
+                WHERE modifier_token IS NULL
+                AND measure = 'INCIDENCE'
+                AND extraction_confidence >= 0.7
+            """).fetchall()
+            effects = conn.execute("""
+                SELECT outcome_token, modifier_token, estimate, ci_low, ci_high, pmid,
+                       quality_weight, evidence_grade, adjusted, n_group, extraction_confidence
+                FROM estimates
+                WHERE modifier_token IS NOT NULL
+                AND measure IN ('OR', 'RR', 'HR')
+                AND extraction_confidence >= 0.6
+            """).fetchall()
+        except Exception as e:
+            self.load_errors["estimates"] = str(e)
+            return
+
+        incidence_groups = defaultdict(list)
+        for outcome, *row in incidence:
+            incidence_groups[outcome].append(tuple(row))
+        # ORDER BY quality_weight DESC, evidence_grade LIMIT 10
+        self._incidence_rows = {
+            outcome: sorted(group, key=lambda r: (_desc_nulls_last(r[4]), _asc_nulls_last(r[5])))[:MAX_INCIDENCE_ESTIMATES]
+            for outcome, group in incidence_groups.items()
+        }
+
+        effect_groups = defaultdict(list)
+        for outcome, modifier, *row in effects:
+            effect_groups[(outcome, modifier)].append(tuple(row))
+        # ORDER BY quality_weight DESC, evidence_grade, extraction_confidence DESC LIMIT 10
+        self._effect_rows = {
+            key: sorted(group, key=lambda r: (_desc_nulls_last(r[4]), _asc_nulls_last(r[5]),
+                                              _desc_nulls_last(r[8])))[:MAX_EFFECT_ESTIMATES]
+            for key, group in effect_groups.items()
+        }
+        self.row_counts["estimates"] = len(incidence) + len(effects)
+
+    def _require(self, table: str, rows):
+        if rows is None:
+            raise EvidenceTableUnavailable(f"{table} not loaded: {self.load_errors.get(table)}")
+        return rows
+
+    # ---- Lookups (each mirrors one query in RiskEngine) ----
+
+    def evidence_based_baseline(self, outcome_token: str) -> Optional[tuple]:
+        return self._eb_baseline.get(outcome_token)
+
+    def evidence_based_modifier(self, outcome_token: str, modifier_token: str) -> Optional[tuple]:
+        return self._eb_modifier.get((outcome_token, modifier_token))
+
+    def baseline_risk(self, outcome_token: str, population: str) -> Optional[tuple]:
+        """Best baseline_risks row for the population, preferring exact match over 'mixed'."""
+        key = (outcome_token, population)
+        if key in self._best_baseline:
+            return self._best_baseline[key]
+
+        rows = self._require("baseline_risks", self._baseline_rows).get(outcome_token, [])
+        best = None
+        # Rows are grade/studies ordered, so the first exact match wins, else the first 'mixed'
+        for row in rows:
+            if row[5] == population:
+                best = row
+                break
+            if best is None and row[5] == 'mixed':
+                best = row
+
+        self._best_baseline[key] = best
+        return best
+
+    def risk_modifier(self, outcome_token: str, modifier_token: str) -> Optional[tuple]:
+        return self._require("risk_modifiers", self._modifier_rows).get((outcome_token, modifier_token))
+
+    def incidence_estimates(self, outcome_token: str) -> List[tuple]:
+        return self._require("estimates", self._incidence_rows).get(outcome_token, [])
+
+    def effect_estimates(self, outcome_token: str, modifier_token: str) -> List[tuple]:
+        return self._require("estimates", self._effect_rows).get((outcome_token, modifier_token), [])
+
+    def modifier_tokens(self) -> List[str]:
+        """All modifier tokens with any evidence in the index, sorted."""
+        tokens = {modifier for _, modifier in self._eb_modifier}
+        tokens.update(modifier for _, modifier in (self._modifier_rows or {}))
+        tokens.update(modifier for _, modifier in (self._effect_rows or {}))
+        return sorted(tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "evidence_version": self.evidence_version,
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "row_counts": dict(self.row_counts),
+            "unavailable_tables": sorted(self.load_errors)
+        }
@@ -6,28 +6,23 @@ Uses rule-based NLP with medical ontology mapping and PHI detection.
 import re
 import json
 import logging
+import threading
 from typing import Dict, List, Set, Tuple, Optional, Any
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, replace
 from datetime import datetime, timedelta
-try:
-    import spacy
-    from spacy.matcher import Matcher
-    SPACY_AVAILABLE = True
-except ImportError:
-    SPACY_AVAILABLE = False
-
-try:
-    import nltk
-    from nltk.corpus import stopwords
-    NLTK_AVAILABLE = True
-except ImportError:
-    NLTK_AVAILABLE = False
 
 from src.ontology.core_ontology import AnesthesiaOntology
 from src.core.database import get_database
+from src.core.pattern_matcher import MultiPatternMatcher
+from src.core.parse_cache import get_parse_cache, ruleset_version
+from src.core.nlp_backends import get_nlp_backends
+from src.core.spacy_docs import DocBatch, DEFAULT_BATCH_SIZE, make_doc
 
 logger = logging.getLogger(__name__)
 
+# Bump when extraction logic changes in ways the pattern tables do not capture
+PARSER_VERSION = "1"
+
 @dataclass
 class ExtractedFactor:
     token: str
@@ -51,34 +46,37 @@ class ParsedHPI:
     phi_locations: List[Tuple[int, int, str]]  # start, end, type
     confidence_score: float
 
+def audit_record(parsed_hpi: ParsedHPI) -> Dict[str, Any]:
+    """Picklable case_sessions/audit_log payload for a parse (evidence version is added when it is written)."""
+    return {
+        "session_id": parsed_hpi.session_id,
+        "hpi_text": parsed_hpi.raw_text,
+        "parsed_factors": json.dumps([asdict(f) for f in parsed_hpi.extracted_factors]),
+        "anonymized_hpi": parsed_hpi.anonymized_text,
+        "factors_extracted": len(parsed_hpi.extracted_factors),
+        "phi_detected": parsed_hpi.phi_detected
+    }
+
 class MedicalTextProcessor:
     """
     Advanced medical text processor with PHI detection and clinical entity extraction.
     """
 
-    def __init__(self):
-        # Load spaCy model (download with: python -m spacy download en_core_web_sm)
-        if SPACY_AVAILABLE:
-            try:
-                self.nlp = spacy.load("en_core_web_sm")
-            except OSError:
-                logger.warning("spaCy model not found. Using rule-based processing only.")
-                self.nlp = None
-        else:
-            logger.warning("spaCy not available. Using rule-based processing only.")
-            self.nlp = None
+    def __init__(self, spacy_model: str = "en_core_web_sm", store_audit: bool = True):
+        # spaCy model (download with: python -m spacy download en_core_web_sm) is
+        # loaded on first use, see the nlp property
+        self.spacy_model = spacy_model
+        # False in batch parse workers: the parent process writes their audit records
+        self.store_audit = store_audit
+        self._nlp = None
+        self._nlp_loaded = False
+        self._nlp_lock = threading.Lock()
+        self.matcher = None
 
         # Load ontology
         self.ontology = AnesthesiaOntology()
         self.db = get_database()
 
-        # Initialize matchers
-        if self.nlp and SPACY_AVAILABLE:
-            self.matcher = Matcher(self.nlp.vocab)
-            self._build_medical_patterns()
-        else:
-            self.matcher = None
-
         # PHI detection patterns
         self.phi_patterns = self._build_phi_patterns()
 
@@ -104,9 +102,64 @@ class MedicalTextProcessor:
         # Surgical procedure patterns
         self.procedure_patterns = self._build_procedure_patterns()
 
+        # Medication patterns
+        self.medication_patterns = self._build_medication_patterns()
+
+        # One prefilter scan per HPI gates all condition/procedure/medication regexes
+        self.pattern_matcher = MultiPatternMatcher({
+            "condition": self.condition_patterns,
+            "procedure": self.procedure_patterns,
+            "medication": self.medication_patterns
+        })
+
+        # Parse results are cached by text + ruleset, so any pattern change invalidates them
+        self.parse_cache = get_parse_cache()
+        self._cache_version = None
+        self._rules_version = ruleset_version(
+            PARSER_VERSION,
+            *[[(token, [(p.pattern, p.flags) for p in patterns]) for token, patterns in table.items()]
+              for table in (self.condition_patterns, self.procedure_patterns, self.medication_patterns)],
+            [(p.pattern, p.flags, label) for p, label in self.phi_patterns],
+            [(p.pattern, p.flags) for p in self.age_patterns + self.weight_patterns]
+        )
+        self.parse_cache.register_disk_codec("MedicalTextProcessor", self._extraction_to_disk,
+                                             self._extraction_from_disk)
+
+    @property
+    def nlp(self):
+        """spaCy pipeline, loaded on first use (None when spaCy or the model is unavailable)."""
+        if not self._nlp_loaded:
+            with self._nlp_lock:
+                if not self._nlp_loaded:
+                    self._load_nlp()
+        return self._nlp
+
+    def _load_nlp(self):
+        """Load the shared spaCy model and build the entity matcher. Caller holds the lock."""
+        backends = get_nlp_backends()
+        if not backends.available("spacy"):
+            logger.warning("spaCy not available. Using rule-based processing only.")
+        else:
+            nlp = backends.spacy_model(self.spacy_model)
+            if nlp is None:
+                logger.warning("spaCy model not found. Using rule-based processing only.")
+            else:
+                from spacy.matcher import Matcher
+                self._nlp = nlp
+                self.matcher = Matcher(nlp.vocab)
+                self._build_medical_patterns()
+        self._nlp_loaded = True
+
+    @property
+    def cache_version(self) -> str:
+        """Parse cache version: the ruleset plus whether spaCy extraction is active."""
+        if self._cache_version is None:
+            self._cache_version = ruleset_version(self._rules_version, self.nlp is not None)
+        return self._cache_version
+
     def _build_medical_patterns(self):
         """Build spaCy matcher patterns for medical entities."""
-        if not self.nlp:
+        if not self.matcher:
             return
 
         # Risk factor patterns
@@ -861,25 +914,21 @@ class MedicalTextProcessor:
     def _extract_medications(self, text: str) -> List[ExtractedFactor]:
         """Extract medications and assess anesthetic implications."""
         medications = []
-        medication_patterns = self._build_medication_patterns()
-
-        for med_class, patterns in medication_patterns.items():
-            for pattern in patterns:
-                matches = pattern.finditer(text)
-                for match in matches:
-                    # Determine anesthetic implications
-                    implications = self._get_medication_implications(med_class, match.group())
-
-                    medications.append(ExtractedFactor(
-                        token=med_class,
-                        plain_label=implications['label'],
-                        confidence=0.85,
-                        evidence_text=match.group(),
-                        factor_type="medication",
-                        category="pharmacological",
-                        severity_weight=1.2 if implications['significance'].startswith('High') else 1.0,
-                        context=implications['recommendations']
-                    ))
+
+        for med_class, _, match in self.pattern_matcher.finditer("medication", text):
+            # Determine anesthetic implications
+            implications = self._get_medication_implications(med_class, match.group())
+
+            medications.append(ExtractedFactor(
+                token=med_class,
+                plain_label=implications['label'],
+                confidence=0.85,
+                evidence_text=match.group(),
+                factor_type="medication",
+                category="pharmacological",
+                severity_weight=1.2 if implications['significance'].startswith('High') else 1.0,
+                context=implications['recommendations']
+            ))
 
         return medications
 
@@ -944,27 +993,55 @@ class MedicalTextProcessor:
             "recommendations": "Review for potential anesthetic interactions"
         })
 
-    def parse_hpi(self, hpi_text: str, session_id: str = None) -> ParsedHPI:
+    def parse_hpi(self, hpi_text: str, session_id: str = None, store_audit: Optional[bool] = None) -> ParsedHPI:
         """
         Main HPI parsing function with comprehensive extraction.
+        store_audit overrides the processor's setting for this call.
+        """
+        extraction = self.parse_cache.get_or_parse(
+            "MedicalTextProcessor", self.cache_version, hpi_text, self._extract_all)
+        return self._build_parsed_hpi(hpi_text, session_id, extraction, store_audit)
+
+    def parse_many(self, hpi_texts: List[str], docs: Optional[DocBatch] = None,
+                   batch_size: int = DEFAULT_BATCH_SIZE, n_process: int = 1) -> List[ParsedHPI]:
         """
+        Parse many HPIs, tokenizing every uncached text in one nlp.pipe pass.
+        Pass a DocBatch shared with another parser to reuse its Docs.
+        """
+        extractions = {}
+        for text in hpi_texts:
+            if text not in extractions:
+                cached = self.parse_cache.get("MedicalTextProcessor", self.cache_version, text)
+                if cached is not None:
+                    extractions[text] = cached
+
+        missing = [text for text in dict.fromkeys(hpi_texts) if text not in extractions]
+        if missing and self.nlp is not None:
+            docs = docs or DocBatch(batch_size, n_process)
+            self.request_docs(missing, docs)
+            try:
+                docs.run()
+            except Exception as e:
+                logger.warning(f"Batched spaCy processing failed, parsing documents one at a time: {e}")
+                docs = None
+        for text in missing:
+            extractions[text] = self._extract_all(text, docs)
+            self.parse_cache.put("MedicalTextProcessor", self.cache_version, text, extractions[text])
+
+        return [self._build_parsed_hpi(text, None, extractions[text]) for text in hpi_texts]
+
+    def request_docs(self, hpi_texts: List[str], docs: DocBatch):
+        """Queue the cleaned texts for the Matcher, which only reads token attributes."""
+        if self.nlp is not None:
+            docs.request(self.nlp, [self._clean_text(text) for text in hpi_texts])
+
+    def _build_parsed_hpi(self, hpi_text: str, session_id: Optional[str], extraction,
+                          store_audit: Optional[bool] = None) -> ParsedHPI:
         if not session_id:
             session_id = f"hpi_{datetime.now().isoformat()}"
 
-        # Clean and normalize text
-        cleaned_text = self._clean_text(hpi_text)
-
-        # Detect and anonymize PHI
-        phi_detected, phi_locations, anonymized_text = self._detect_and_anonymize_phi(cleaned_text)
-
-        # Extract demographics
-        demographics = self._extract_demographics(cleaned_text)
-
-        # Extract risk factors
-        extracted_factors = self._extract_risk_factors(cleaned_text)
-
-        # Calculate overall confidence
-        confidence_score = self._calculate_confidence(extracted_factors, demographics)
+        (phi_detected, phi_locations, anonymized_text, demographics,
+         extracted_factors, confidence_score) = extraction
 
         parsed_hpi = ParsedHPI(
             session_id=session_id,
@@ -979,10 +1056,65 @@ class MedicalTextProcessor:
         )
 
         # Store in database for audit
-        self._store_parsed_hpi(parsed_hpi)
+        if store_audit is None:
+            store_audit = self.store_audit
+        if store_audit:
+            self._store_parsed_hpi(parsed_hpi)
 
         return parsed_hpi
 
+    # ExtractedFactor fields that hold excerpts of the HPI
+    TEXT_SPAN_FIELDS = ("evidence_text", "context")
+
+    def _extraction_to_disk(self, hpi_text: str, extraction) -> Tuple:
+        """
+        PHI-free form of an _extract_all result for the parse cache's disk tier:
+        factor excerpts of the HPI become offsets into the cleaned text and the
+        anonymized text is dropped; both are rebuilt from the request's text on load.
+        """
+        _, _, _, demographics, extracted_factors, confidence_score = extraction
+        cleaned_text = self._clean_text(hpi_text)
+        factors = []
+        for factor in extracted_factors:
+            spans = {}
+            for field in self.TEXT_SPAN_FIELDS:
+                excerpt = getattr(factor, field)
+                start = cleaned_text.find(excerpt) if excerpt else -1
+                if start >= 0:
+                    spans[field] = (start, start + len(excerpt))
+            factors.append((replace(factor, **{field: "" for field in spans}), spans))
+        return demographics, factors, confidence_score
+
+    def _extraction_from_disk(self, hpi_text: str, payload: Tuple):
+        demographics, factors, confidence_score = payload
+        cleaned_text = self._clean_text(hpi_text)
+        phi_detected, phi_locations, anonymized_text = self._detect_and_anonymize_phi(cleaned_text)
+        extracted_factors = [
+            replace(factor, **{field: cleaned_text[start:end] for field, (start, end) in spans.items()})
+            for factor, spans in factors
+        ]
+        return phi_detected, phi_locations, anonymized_text, demographics, extracted_factors, confidence_score
+
+    def _extract_all(self, hpi_text: str, docs: Optional[DocBatch] = None) -> Tuple[bool, List[Tuple[int, int, str]], str, Dict[str, Any], List[ExtractedFactor], float]:
+        """Text-dependent part of parse_hpi (cacheable: no session or audit state)."""
+        # Clean and normalize text
+        cleaned_text = self._clean_text(hpi_text)
+
+        # Detect and anonymize PHI
+        phi_detected, phi_locations, anonymized_text = self._detect_and_anonymize_phi(cleaned_text)
+
+        # Extract demographics
+        demographics = self._extract_demographics(cleaned_text)
+
+        # Extract risk factors
+        doc = docs.get(self.nlp, cleaned_text) if docs is not None else None
+        extracted_factors = self._extract_risk_factors(cleaned_text, doc)
+
+        # Calculate overall confidence
+        confidence_score = self._calculate_confidence(extracted_factors, demographics)
+
+        return phi_detected, phi_locations, anonymized_text, demographics, extracted_factors, confidence_score
+
     def _clean_text(self, text: str) -> str:
         """Clean and normalize HPI text."""
         # Remove extra whitespace
@@ -1137,12 +1269,7 @@ class MedicalTextProcessor:
 
     def _extract_procedure(self, text: str) -> Optional[str]:
         """Extract surgical procedure."""
-        for procedure_token, patterns in self.procedure_patterns.items():
-            for pattern in patterns:
-                if pattern.search(text):
-                    return procedure_token
-
-        return None
+        return self.pattern_matcher.first_token("procedure", text)
 
     def _extract_urgency(self, text: str) -> str:
         """Extract urgency level."""
@@ -1153,7 +1280,7 @@ class MedicalTextProcessor:
         else:
             return "ELECTIVE"
 
-    def _extract_risk_factors(self, text: str) -> List[ExtractedFactor]:
+    def _extract_risk_factors(self, text: str, doc=None) -> List[ExtractedFactor]:
         """Extract risk factors using multiple approaches."""
         factors = []
 
@@ -1163,7 +1290,7 @@ class MedicalTextProcessor:
 
         # spaCy NLP extraction (if available)
         if self.nlp:
-            nlp_factors = self._extract_nlp_factors(text)
+            nlp_factors = self._extract_nlp_factors(text, doc)
             factors.extend(nlp_factors)
 
         # Medication extraction with anesthetic implications
@@ -1178,37 +1305,39 @@ class MedicalTextProcessor:
     def _extract_rule_based_factors(self, text: str) -> List[ExtractedFactor]:
         """Extract factors using rule-based patterns."""
         factors = []
-
-        for condition_token, patterns in self.condition_patterns.items():
-            for pattern in patterns:
-                matches = pattern.finditer(text)
-                for match in matches:
-                    # Get ontology term
-                    term = self.ontology.get_term(condition_token)
-                    if term:
-                        factor = ExtractedFactor(
-                            token=condition_token,
-                            plain_label=term.plain_label,
-                            confidence=0.8,  # Rule-based confidence
-                            evidence_text=match.group(0),
-                            factor_type=term.type,
-                            category=term.category,
-                            severity_weight=term.severity_weight,
-                            context=text[max(0, match.start()-50):match.end()+50]
-                        )
-                        factors.append(factor)
+        terms = {}
+
+        for condition_token, _, match in self.pattern_matcher.finditer("condition", text):
+            # Get ontology term (once per token)
+            if condition_token not in terms:
+                terms[condition_token] = self.ontology.get_term(condition_token)
+            term = terms[condition_token]
+            if term:
+                factor = ExtractedFactor(
+                    token=condition_token,
+                    plain_label=term.plain_label,
+                    confidence=0.8,  # Rule-based confidence
+                    evidence_text=match.group(0),
+                    factor_type=term.type,
+                    category=term.category,
+                    severity_weight=term.severity_weight,
+                    context=text[max(0, match.start()-50):match.end()+50]
+                )
+                factors.append(factor)
 
         return factors
 
-    def _extract_nlp_factors(self, text: str) -> List[ExtractedFactor]:
-        """Extract factors using spaCy NLP."""
+    def _extract_nlp_factors(self, text: str, doc=None) -> List[ExtractedFactor]:
+        """Extract factors using spaCy NLP (on a prebuilt Doc when one is given)."""
         factors = []
 
         if not self.nlp:
             return factors
 
         try:
-            doc = self.nlp(text)
+            if doc is None:
+                # Matcher patterns only use token attributes, so no pipe needs to run
+                doc = make_doc(self.nlp, text)
             matches = self.matcher(doc)
 
             for match_id, start, end in matches:
@@ -1269,30 +1398,33 @@ class MedicalTextProcessor:
         return min(base_confidence, 1.0)
 
     def _store_parsed_hpi(self, parsed_hpi: ParsedHPI):
-        """Store parsed HPI in database for audit."""
+        """Queue parsed HPI for the audit sink (written in the background)."""
+        self.store_audit_record(audit_record(parsed_hpi))
+
+    def record_session(self, parsed_hpi: ParsedHPI) -> str:
+        """Write a new case session (and audit row) for an already parsed HPI; returns its session_id."""
+        session_id = f"hpi_{datetime.now().isoformat()}"
+        self.store_audit_record({**audit_record(parsed_hpi), "session_id": session_id})
+        return session_id
+
+    def store_audit_record(self, record: Dict[str, Any]):
+        """Queue an audit_record() (possibly built in another process) for the audit sink."""
         try:
-            self.db.conn.execute("""
-                INSERT INTO case_sessions
-                (session_id, hpi_text, parsed_factors, risk_scores,
-                 medication_recommendations, evidence_version, anonymized_hpi)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, [
-                parsed_hpi.session_id,
-                parsed_hpi.raw_text,
-                json.dumps([asdict(f) for f in parsed_hpi.extracted_factors]),
-                json.dumps({}),  # Will be filled by risk scoring
-                json.dumps({}),  # Will be filled by medication system
-                self.db.get_current_evidence_version(),
-                parsed_hpi.anonymized_text
-            ])
+            self.db.audit_sink.insert_case_session(
+                session_id=record["session_id"],
+                hpi_text=record["hpi_text"],
+                parsed_factors=record["parsed_factors"],
+                evidence_version=self.db.cached_evidence_version(),
+                anonymized_hpi=record["anonymized_hpi"]
+            )
 
             # Log the action
-            self.db.log_action("case_sessions", parsed_hpi.session_id, "INSERT",
-                             {"factors_extracted": len(parsed_hpi.extracted_factors),
-                              "phi_detected": parsed_hpi.phi_detected})
+            self.db.audit_sink.log_action("case_sessions", record["session_id"], "INSERT",
+                                          {"factors_extracted": record["factors_extracted"],
+                                           "phi_detected": record["phi_detected"]})
 
         except Exception as e:
-            logger.error(f"Error storing parsed HPI {parsed_hpi.session_id}: {e}")
+            logger.error(f"Error storing parsed HPI {record.get('session_id')}: {e}")
 
     def generate_risk_summary(self, factors: List[ExtractedFactor]) -> List[str]:
         """Generate plain-language risk summary."""
@@ -0,0 +1,170 @@
+"""
+Lazy loading of the optional NLP backends (spaCy, medspaCy, NLTK, transformers).
+Nothing heavy is imported until first use; MERIDIAN_PRELOAD_NLP loads backends eagerly for workers that need them.
+"""
+
+import os
+import time
+import logging
+import importlib
+import importlib.util
+import threading
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Backend name -> top-level module
+BACKEND_MODULES = {
+    "spacy": "spacy",
+    "medspacy": "medspacy",
+    "nltk": "nltk",
+    "transformers": "transformers",
+    "torch": "torch",
+    "onnxruntime": "onnxruntime"
+}
+
+# Comma-separated backend names (or "all") to load at worker start
+PRELOAD_ENV = "MERIDIAN_PRELOAD_NLP"
+
+
+def _rss_mb() -> Optional[float]:
+    """Current resident set size of this process in MB (Linux), else peak RSS."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    except Exception:
+        return None
+
+
+class NLPBackends:
+    """
+    Process-wide, thread-safe loader for optional NLP backends and models.
+
+    available() only checks that a package is installed (no import). module()
+    imports a backend on first use and records how long it took, and
+    spacy_model() loads a spaCy model once and shares it between every
+    processor in the process. report() summarizes what was actually loaded,
+    with load times and RSS, for startup logs and /api/health.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._available: Dict[str, bool] = {}
+        self._modules: Dict[str, Any] = {}
+        self._models: Dict[str, Any] = {}
+        self._timings: Dict[str, float] = {}
+        self._errors: Dict[str, str] = {}
+
+    def available(self, name: str) -> bool:
+        """Whether a backend (or model package) is installed, without importing it."""
+        if name not in self._available:
+            module_name = BACKEND_MODULES.get(name, name)
+            try:
+                self._available[name] = importlib.util.find_spec(module_name) is not None
+            except (ImportError, ValueError):
+                self._available[name] = False
+        return self._available[name]
+
+    def module(self, name: str):
+        """Import a backend on first use. Returns None when it is missing or fails to import."""
+        if name in self._modules:
+            return self._modules[name]
+        with self._lock:
+            if name not in self._modules:
+                self._modules[name] = self._timed(name, lambda: importlib.import_module(BACKEND_MODULES.get(name, name)))
+            return self._modules[name]
+
+    def spacy_model(self, model_name: str):
+        """Shared spaCy pipeline, loaded on first request. Callers must not add pipes to it."""
+        key = f"spacy:{model_name}"
+        if key in self._models:
+            return self._models[key]
+        with self._lock:
+            if key not in self._models:
+                self._models[key] = self.load_spacy_model(model_name)
+            return self._models[key]
+
+    def load_spacy_model(self, model_name: str):
+        """Private (unshared) copy of a spaCy pipeline, or None if spaCy or the model is missing."""
+        spacy = self.module("spacy")
+        if spacy is None:
+            return None
+        return self._timed(f"spacy:{model_name}", lambda: spacy.load(model_name), errors=(OSError, ImportError))
+
+    def _timed(self, key: str, load, errors=(ImportError,)):
+        start = time.perf_counter()
+        try:
+            value = load()
+        except errors as e:
+            self._errors[key] = str(e)
+            logger.info(f"NLP backend {key} unavailable: {e}")
+            return None
+        self._timings[key] = time.perf_counter() - start
+        logger.info(f"Loaded NLP backend {key} in {self._timings[key]:.2f}s")
+        return value
+
+    def preload(self, names: List[str]):
+        """Eagerly import the given backends (e.g. for workers that serve NLP-heavy routes)."""
+        for name in names:
+            if name == "spacy":
+                self.spacy_model("en_core_web_sm")
+            else:
+                self.module(name)
+
+    def preload_from_env(self) -> List[str]:
+        """Preload the backends listed in MERIDIAN_PRELOAD_NLP; returns the names requested."""
+        value = os.getenv(PRELOAD_ENV, "").strip().lower()
+        if not value or value == "none":
+            return []
+        names = list(BACKEND_MODULES) if value == "all" else [n.strip() for n in value.split(",") if n.strip()]
+        self.preload(names)
+        return names
+
+    def preload_requested(self, name: str) -> bool:
+        value = os.getenv(PRELOAD_ENV, "").strip().lower()
+        return value == "all" or name in [n.strip() for n in value.split(",")]
+
+    def report(self) -> Dict[str, Any]:
+        """What is installed, what has been loaded, and what it cost."""
+        backends = {}
+        for name in BACKEND_MODULES:
+            backends[name] = {
+                "available": self.available(name),
+                "loaded": self._modules.get(name) is not None,
+                "load_seconds": round(self._timings[name], 3) if name in self._timings else None,
+                "error": self._errors.get(name)
+            }
+        models = {
+            key: {
+                "loaded": model is not None,
+                "load_seconds": round(self._timings[key], 3) if key in self._timings else None,
+                "error": self._errors.get(key)
+            }
+            for key, model in self._models.items()
+        }
+        return {
+            "preload": os.getenv(PRELOAD_ENV) or None,
+            "backends": backends,
+            "models": models,
+            "rss_mb": _rss_mb()
+        }
+
+
+# Global backend loader instance
+_backends_instance = None
+_backends_lock = threading.Lock()
+
+def get_nlp_backends() -> NLPBackends:
+    """Get the process-wide NLP backend loader."""
+    global _backends_instance
+    if _backends_instance is None:
+        with _backends_lock:
+            if _backends_instance is None:
+                _backends_instance = NLPBackends()
+    return _backends_instance
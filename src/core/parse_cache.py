@@ -0,0 +1,295 @@
+"""
+Content-addressed cache for HPI parse results shared by all parsers.
+Keys are an HMAC of the normalized text plus parser name and ruleset version; LRU + TTL with a memory budget.
+
+The optional disk tier (MERIDIAN_PARSE_CACHE_DIR) never stores HPI text: only
+parsers that register a disk codec are persisted, as the PHI-free payload the
+codec produces. The directory is created owner-only (0700) and the SQLite file
+is chmod 0600; entries older than the TTL are purged at startup and
+periodically while running, and clear() empties the file.
+"""
+
+import os
+import re
+import time
+import pickle
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple, Callable
+
+from .text_keys import keyed_digest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 6 * 3600
+# How often (seconds) expired rows are deleted from the disk tier
+DISK_PURGE_SECONDS = 300
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Whitespace-normalized text, the first step every parser applies."""
+    return _WHITESPACE.sub(" ", text.strip())
+
+
+def ruleset_version(*parts: Any) -> str:
+    """Short stable hash of a parser's rules (pattern sources, mappings, flags)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(repr(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def cache_key(parser: str, version: str, text: str) -> str:
+    # Keyed like case ids: disk rows must not be looked up by hashing a guessed HPI. Without a
+    # configured secret the key changes per process, so earlier disk rows are simply not hit.
+    return keyed_digest(f"{parser}\0{version}\0{normalize_text(text)}")
+
+
+class ParseCache:
+    """
+    Thread-safe LRU + TTL cache of parse results.
+
+    Values are stored pickled, which gives each caller its own copy (cached
+    results can never be mutated through a returned object) and an exact
+    byte size for the memory budget. With `disk_path` set, results of parsers
+    with a registered disk codec are also written to a SQLite file so a
+    restarted (or sibling) worker starts warm; the codec's dump(text, value)
+    gives the payload that is written and load(text, payload) rebuilds the
+    result from it and the caller's text. Disk hits are promoted back into
+    memory. Other parsers stay memory-only.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self.disk_path = disk_path
+        self._disk_local = threading.local()
+        self._disk_codecs: Dict[str, Tuple[Callable[[str, Any], Any], Callable[[str, Any], Any]]] = {}
+        self._disk_purged_at = 0.0
+        if disk_path:
+            self._init_disk()
+
+    # ---- Public API ----
+
+    def register_disk_codec(self, parser: str, dump: Callable[[str, Any], Any], load: Callable[[str, Any], Any]):
+        """Persist `parser`'s results on disk as dump(text, value), which must not contain PHI."""
+        self._disk_codecs[parser] = (dump, load)
+
+    def get(self, parser: str, version: str, text: str):
+        """Cached result (a fresh copy) or None."""
+        key = cache_key(parser, version, text)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, blob = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return pickle.loads(blob)
+                self._remove(key)
+                self.expirations += 1
+
+        codec = self._disk_codecs.get(parser) if self.disk_path else None
+        if codec is not None:
+            disk_entry = self._disk_get(key, now)
+            if disk_entry is not None:
+                stored_at, payload = disk_entry
+                try:
+                    value = codec[1](text, pickle.loads(payload))
+                    blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+                except Exception as e:
+                    logger.debug(f"Parse cache disk entry for {parser} unreadable: {e}")
+                else:
+                    with self._lock:
+                        self.hits += 1
+                        self.disk_hits += 1
+                        self._store(key, stored_at, blob)
+                    return pickle.loads(blob)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, parser: str, version: str, text: str, value: Any):
+        """Store a parse result."""
+        key = cache_key(parser, version, text)
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.debug(f"Parse result for {parser} not cacheable: {e}")
+            return
+
+        stored_at = time.time()
+        with self._lock:
+            self._store(key, stored_at, blob)
+
+        codec = self._disk_codecs.get(parser) if self.disk_path else None
+        if codec is not None:
+            try:
+                payload = pickle.dumps(codec[0](text, value), protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception as e:
+                logger.debug(f"Parse result for {parser} not persistable: {e}")
+                return
+            self._disk_put(key, stored_at, payload)
+
+    def get_or_parse(self, parser: str, version: str, text: str, parse: Callable[[str], Any]):
+        """Return the cached result for text, parsing (and caching) it on a miss."""
+        cached = self.get(parser, version, text)
+        if cached is not None:
+            return cached
+        value = parse(text)
+        self.put(parser, version, text, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.disk_path:
+            try:
+                conn = self._disk_conn()
+                conn.execute("DELETE FROM parse_payloads")
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not clear parse cache file: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "disk_path": self.disk_path
+            }
+
+    # ---- Memory tier (caller holds the lock) ----
+
+    def _store(self, key: str, stored_at: float, blob: bytes):
+        if len(blob) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (stored_at, blob)
+        self._bytes += len(blob)
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, blob = self._entries.pop(key)
+        self._bytes -= len(blob)
+
+    # ---- Disk tier ----
+
+    def _init_disk(self):
+        directory = Path(self.disk_path).parent
+        if not directory.exists():
+            directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        conn = self._disk_conn()
+        try:
+            os.chmod(self.disk_path, 0o600)
+        except OSError as e:
+            logger.warning(f"Could not restrict permissions of {self.disk_path}: {e}")
+        # Earlier versions pickled full parse results (including HPI text) here
+        conn.execute("DROP TABLE IF EXISTS parse_cache")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS parse_payloads (
+                key TEXT PRIMARY KEY,
+                stored_at REAL NOT NULL,
+                payload BLOB NOT NULL
+            )
+        """)
+        conn.commit()
+        # Drop anything that expired while the worker was down
+        self._disk_purge(conn, time.time())
+
+    def _disk_conn(self) -> sqlite3.Connection:
+        conn = getattr(self._disk_local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.disk_path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._disk_local.conn = conn
+        return conn
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, bytes]]:
+        try:
+            row = self._disk_conn().execute(
+                "SELECT stored_at, payload FROM parse_payloads WHERE key = ?", [key]
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.debug(f"Parse cache disk read failed: {e}")
+            return None
+        if row is None or now - row[0] > self.ttl_seconds:
+            return None
+        return row[0], row[1]
+
+    def _disk_put(self, key: str, stored_at: float, payload: bytes):
+        try:
+            conn = self._disk_conn()
+            conn.execute("INSERT OR REPLACE INTO parse_payloads (key, stored_at, payload) VALUES (?, ?, ?)",
+                         [key, stored_at, payload])
+            conn.commit()
+            if stored_at - self._disk_purged_at >= DISK_PURGE_SECONDS:
+                self._disk_purge(conn, stored_at)
+        except sqlite3.Error as e:
+            logger.debug(f"Parse cache disk write failed: {e}")
+
+    def _disk_purge(self, conn: sqlite3.Connection, now: float):
+        self._disk_purged_at = now
+        conn.execute("DELETE FROM parse_payloads WHERE stored_at < ?", [now - self.ttl_seconds])
+        conn.commit()
+
+
+# Global parse cache instance
+_parse_cache_instance = None
+_parse_cache_lock = threading.Lock()
+
+def get_parse_cache() -> ParseCache:
+    """
+    Get the process-wide parse cache. MERIDIAN_PARSE_CACHE_DIR enables the disk
+    tier (PHI-free payloads only; owner-only permissions; TTL retention).
+    """
+    global _parse_cache_instance
+    if _parse_cache_instance is None:
+        with _parse_cache_lock:
+            if _parse_cache_instance is None:
+                cache_dir = os.getenv("MERIDIAN_PARSE_CACHE_DIR")
+                _parse_cache_instance = ParseCache(
+                    disk_path=os.path.join(cache_dir, "parse_cache.sqlite") if cache_dir else None
+                )
+    return _parse_cache_instance
@@ -0,0 +1,213 @@
+"""
+Compiled multi-pattern matcher for rule-based HPI extraction.
+One prefilter scan over literal anchors decides which regexes can possibly match, so only those run.
+"""
+
+import re
+import logging
+from typing import Dict, List, Tuple, Optional, FrozenSet, Iterator, Any
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+logger = logging.getLogger(__name__)
+
+# Shorter anchors (single letters) would pass nearly every text
+MIN_ANCHOR_LENGTH = 2
+
+_ZERO_WIDTH = {sre_constants.AT}
+_LITERAL = sre_constants.LITERAL
+_SUBPATTERN = sre_constants.SUBPATTERN
+_BRANCH = sre_constants.BRANCH
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+_POSSESSIVE = getattr(sre_constants, "POSSESSIVE_REPEAT", None)
+if _POSSESSIVE is not None:
+    _REPEATS.add(_POSSESSIVE)
+
+
+def _best(requirements: List[FrozenSet[str]]) -> Optional[FrozenSet[str]]:
+    """Most selective requirement: the one whose weakest anchor is longest."""
+    candidates = [r for r in requirements if r]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda r: (min(len(a) for a in r), -len(r)))
+
+
+def _sequence_requirement(items) -> Optional[FrozenSet[str]]:
+    """
+    Anchors of which at least one must occur in any match of a parsed sequence.
+
+    Returns a set of lower-cased literal strings, or None when no reliable
+    anchor can be derived (the pattern then always runs).
+    """
+    requirements: List[FrozenSet[str]] = []
+    run: List[str] = []
+
+    def close_run():
+        if len(run) >= MIN_ANCHOR_LENGTH:
+            requirements.append(frozenset(["".join(run)]))
+        run.clear()
+
+    for op, arg in items:
+        if op == _LITERAL:
+            run.append(chr(arg).lower())
+        elif op in _ZERO_WIDTH:
+            continue
+        elif op == _SUBPATTERN:
+            close_run()
+            requirements.append(_sequence_requirement(arg[-1]))
+        elif op == _BRANCH:
+            close_run()
+            alternatives = [_sequence_requirement(branch) for branch in arg[1]]
+            if all(alternatives):
+                requirements.append(frozenset().union(*alternatives))
+        elif op in _REPEATS:
+            close_run()
+            min_count, _, item = arg
+            if min_count >= 1:
+                requirements.append(_sequence_requirement(item))
+        else:
+            close_run()
+    close_run()
+
+    return _best(requirements)
+
+
+def pattern_anchors(pattern: re.Pattern) -> Optional[FrozenSet[str]]:
+    """Literal anchors for a compiled regex (at least one occurs, case-insensitively, in every match)."""
+    try:
+        return _sequence_requirement(sre_parse.parse(pattern.pattern, pattern.flags))
+    except Exception as e:
+        logger.debug(f"Could not derive anchors for {pattern.pattern!r}: {e}")
+        return None
+
+
+def trie_regex(words: List[str]) -> str:
+    """Regex source for a trie over words; greedy optionals make it match the longest word."""
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def render(node) -> str:
+        terminal = "" in node
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if terminal:
+            return "(?:" + body + ")?"
+        return body
+
+    return render(trie)
+
+
+class AnchorScanner:
+    """
+    Finds every anchor that occurs in a text with a single regex pass.
+
+    The anchors are compiled into one trie-shaped pattern wrapped in a
+    lookahead, so the scan visits each text position once and reports the
+    longest anchor starting there; shorter anchors that are prefixes of it
+    are added from a precomputed table. Together this is the set an
+    Aho-Corasick automaton would report.
+    """
+
+    def __init__(self, anchors: List[str]):
+        self.anchors = sorted(set(anchors))
+        self._prefixes: Dict[str, Tuple[str, ...]] = {
+            anchor: tuple(a for a in self.anchors if anchor.startswith(a))
+            for anchor in self.anchors
+        }
+        self._regex = re.compile("(?=(" + trie_regex(self.anchors) + "))") if self.anchors else None
+
+    def scan(self, lowered_text: str) -> set:
+        found = set()
+        if self._regex is None:
+            return found
+        for match in self._regex.finditer(lowered_text):
+            longest = match.group(1)
+            if longest:
+                found.update(self._prefixes[longest])
+        return found
+
+
+class MultiPatternMatcher:
+    """
+    Named pattern tables (table -> token -> [compiled regex]) compiled for one-pass matching.
+
+    All tables share one anchor scan per text, so conditions, procedures and
+    medications cost a single prefilter pass over the HPI. finditer() then
+    yields (token, pattern_index, match) for every regex match in exactly the
+    order the nested "for token, patterns ...: for pattern ...:
+    pattern.finditer(text)" loops produce them, but only regexes whose
+    anchors were seen are executed. Patterns without a derivable anchor
+    always run. Non-ASCII texts skip the prefilter, since str.lower() and the
+    regex engine's case folding may disagree there.
+    """
+
+    def __init__(self, tables: Dict[str, Dict[str, List[re.Pattern]]]):
+        self.entries: Dict[str, List[Tuple[str, int, re.Pattern, Optional[FrozenSet[str]]]]] = {}
+        anchors = set()
+        for table, groups in tables.items():
+            entries = []
+            for token, patterns in groups.items():
+                for index, pattern in enumerate(patterns):
+                    required = pattern_anchors(pattern)
+                    entries.append((token, index, pattern, required))
+                    if required:
+                        anchors.update(required)
+            self.entries[table] = entries
+
+        self.scanner = AnchorScanner(sorted(anchors))
+        # (text, anchors present) for the most recent text; extraction steps share one scan
+        self._last_scan: Tuple[Optional[str], Optional[set]] = (None, None)
+
+    def _present(self, text: str) -> Optional[set]:
+        last_text, present = self._last_scan
+        if last_text is text or last_text == text:
+            return present
+        present = self.scanner.scan(text.lower()) if text.isascii() else None
+        self._last_scan = (text, present)
+        return present
+
+    def candidates(self, table: str, text: str) -> Iterator[Tuple[str, int, re.Pattern]]:
+        """Patterns of a table (in table order) that can possibly match text."""
+        present = self._present(text)
+        for token, index, pattern, required in self.entries[table]:
+            if present is None or not required or not present.isdisjoint(required):
+                yield token, index, pattern
+
+    def finditer(self, table: str, text: str) -> Iterator[Tuple[str, int, re.Match]]:
+        for token, index, pattern in self.candidates(table, text):
+            for match in pattern.finditer(text):
+                yield token, index, match
+
+    def hits(self, table: str, text: str) -> List[Tuple[str, Tuple[int, int]]]:
+        """(token, span) for every match in a table."""
+        return [(token, match.span()) for token, _, match in self.finditer(table, text)]
+
+    def first_token(self, table: str, text: str) -> Optional[str]:
+        """Token of the first pattern (in table order) that searches successfully."""
+        for token, _, pattern in self.candidates(table, text):
+            if pattern.search(text):
+                return token
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "anchors": len(self.scanner.anchors),
+            "tables": {
+                table: {
+                    "patterns": len(entries),
+                    "ungated_patterns": sum(1 for entry in entries if not entry[3])
+                }
+                for table, entries in self.entries.items()
+            }
+        }
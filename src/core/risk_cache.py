@@ -0,0 +1,118 @@
+"""
+Memoized risk results keyed by canonical factor profile.
+A RiskSummary depends only on the factor tokens, context, population, mode and evidence version, not on the HPI text.
+"""
+
+import copy
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PROFILES = 2048
+
+# (sorted factor tokens, context label, explicit population, mode, evidence version)
+RiskCacheKey = Tuple[Tuple[str, ...], str, Optional[str], str, Optional[str]]
+
+
+def canonical_tokens(factor_tokens: List[str]) -> Tuple[str, ...]:
+    """Factor profile as a sorted token tuple (duplicates kept: each one applies its OR)."""
+    return tuple(sorted(factor_tokens))
+
+
+def order_contributing_factors(risk_summary, factor_tokens: List[str]):
+    """
+    Put each assessment's contributing factors in the caller's factor order.
+
+    A cached summary carries the order of the request that filled the entry;
+    entries are matched to tokens first-come, so duplicates keep their count.
+    Works in place on the caller's private copy.
+    """
+    for risk in risk_summary.risks:
+        remaining = list(risk.contributing_factors)
+        ordered = []
+        for token in factor_tokens:
+            for i, contribution in enumerate(remaining):
+                if contribution['factor'] == token:
+                    ordered.append(remaining.pop(i))
+                    break
+        risk.contributing_factors = ordered + remaining
+    return risk_summary
+
+
+class RiskResultCache:
+    """
+    Bounded LRU of computed risk results for one RiskEngine.
+
+    Entries hold the RiskSummary only; the audit payload is serialized per
+    request, since it carries that request's timestamp and factor order. put() and
+    get() deep-copy the summary so no caller shares its RiskAssessment
+    objects with the cache or with another request. Keys ignore factor order;
+    RiskEngine re-orders a hit with order_contributing_factors(). The cache
+    tracks the evidence version of its entries and drops all of them as soon
+    as a lookup arrives with a different version, so results computed
+    against superseded evidence are never served.
+    """
+
+    def __init__(self, max_profiles: int = DEFAULT_MAX_PROFILES):
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[RiskCacheKey, Any]" = OrderedDict()
+        self._evidence_version: Optional[str] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(factor_tokens: List[str], context_label: str, explicit_population: Optional[str],
+                 mode: str, evidence_version: Optional[str]) -> RiskCacheKey:
+        return (canonical_tokens(factor_tokens), context_label, explicit_population, mode, evidence_version)
+
+    def get(self, key: RiskCacheKey) -> Optional[Any]:
+        with self._lock:
+            self._check_version(key[-1])
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(entry)
+
+    def put(self, key: RiskCacheKey, risk_summary):
+        risk_summary = copy.deepcopy(risk_summary)
+        with self._lock:
+            self._check_version(key[-1])
+            self._entries[key] = risk_summary
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_profiles:
+                self._entries.popitem(last=False)
+
+    def _check_version(self, evidence_version: Optional[str]):
+        if evidence_version != self._evidence_version:
+            if self._entries:
+                logger.info(f"Evidence version {self._evidence_version} -> {evidence_version}; "
+                            f"dropping {len(self._entries)} cached risk profiles")
+                self.invalidations += 1
+            self._entries.clear()
+            self._evidence_version = evidence_version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "profiles": len(self._entries),
+                "max_profiles": self.max_profiles,
+                "evidence_version": self._evidence_version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations
+            }
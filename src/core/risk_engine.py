@@ -7,18 +7,26 @@ import numpy as np
 import json
 import logging
 from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, replace
 from datetime import datetime
 import math
+import threading
+from collections import OrderedDict
 
 from ..core.database import get_database
 from ..evidence.pooling_engine import MetaAnalysisEngine
 from ..ontology.core_ontology import AnesthesiaOntology
 from ..api.evidence_referencing import EvidenceReferencingEngine
 from .hpi_parser import ExtractedFactor, ParsedHPI
+from .evidence_index import EvidenceIndex
+from .risk_matrix import RiskMatrix
+from .risk_cache import RiskResultCache, order_contributing_factors
 
 logger = logging.getLogger(__name__)
 
+# Dense matrices kept per engine; population comes from clients, so bound it
+MAX_RISK_MATRICES = 8
+
 @dataclass
 class RiskAssessment:
     outcome: str
@@ -52,11 +60,28 @@ class RiskEngine:
     with effect modifiers using evidence-based calculations.
     """
 
-    def __init__(self):
+    def __init__(self, ontology: AnesthesiaOntology = None,
+                 pooling_engine: MetaAnalysisEngine = None,
+                 evidence_engine: EvidenceReferencingEngine = None,
+                 evidence_index: EvidenceIndex = None, vectorized: bool = True,
+                 cache_results: bool = True):
+        # Dependencies may be injected so long-lived engines (see
+        # engine_registry) can share one warm ontology/evidence stack.
         self.db = get_database()
-        self.pooling_engine = MetaAnalysisEngine()
-        self.ontology = AnesthesiaOntology()
-        self.evidence_engine = EvidenceReferencingEngine()
+        self.pooling_engine = pooling_engine or MetaAnalysisEngine()
+        self.ontology = ontology or AnesthesiaOntology()
+        self.evidence_engine = evidence_engine or EvidenceReferencingEngine()
+
+        # Optional preloaded evidence; when set, lookups below issue no SQL
+        self.evidence_index = evidence_index
+
+        # Batched NumPy scoring of all outcomes (requires the evidence index)
+        self.vectorized = vectorized
+        self._risk_matrices: "OrderedDict[str, RiskMatrix]" = OrderedDict()
+        self._risk_matrices_lock = threading.Lock()
+
+        # Model-based results memoized per canonical factor profile
+        self.result_cache = RiskResultCache() if cache_results else None
 
         # Risk calculation parameters
         self.min_baseline_risk = 0.0001  # 0.01%
@@ -103,17 +128,42 @@ class RiskEngine:
         # Extract explicit population from demographics
         explicit_population = demographics.get('population', None)
 
-        # Get all assessable outcomes
-        outcome_tokens = self._get_assessable_outcomes()
-
-        # Calculate risks for each outcome
-        risk_assessments = []
-        for outcome_token in outcome_tokens:
-            assessment = self._calculate_outcome_risk(
-                outcome_token, factors, demographics, context_label, mode, explicit_population
+        # Model-based results depend only on the factor profile, context,
+        # population and evidence version, so repeated profiles are served
+        # from the result cache with this request's session_id
+        evidence_version = self._current_evidence_version()
+        cache_key = None
+        if self.result_cache is not None and mode == "model_based":
+            cache_key = self.result_cache.make_key(
+                [factor.token for factor in factors], context_label, explicit_population, mode, evidence_version
+            )
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                # The cache hands out a private copy, so callers may mutate it
+                risk_summary = replace(cached, session_id=session_id, calculated_at=datetime.now())
+                order_contributing_factors(risk_summary, [factor.token for factor in factors])
+                # Serialized after re-stamping, so the session's audit row matches this response
+                self._log_risk_calculation(risk_summary, len(factors), context_label,
+                                           self._risk_payload(risk_summary))
+                return risk_summary
+
+        if self._can_vectorize(mode):
+            # Score every outcome in one pass over the dense evidence matrices
+            risk_assessments = self._calculate_outcome_risks_vectorized(
+                factors, context_label, explicit_population
             )
-            if assessment:
-                risk_assessments.append(assessment)
+        else:
+            # Get all assessable outcomes
+            outcome_tokens = self._get_assessable_outcomes()
+
+            # Calculate risks for each outcome
+            risk_assessments = []
+            for outcome_token in outcome_tokens:
+                assessment = self._calculate_outcome_risk(
+                    outcome_token, factors, demographics, context_label, mode, explicit_population
+                )
+                if assessment:
+                    risk_assessments.append(assessment)
 
         # Apply clinical filtering: Only show high-severity outcomes when risk is elevated
         risk_assessments = self._apply_clinical_filtering(risk_assessments)
@@ -127,25 +177,145 @@ class RiskEngine:
         # Create final summary object
         risk_summary = RiskSummary(
             session_id=session_id,
-            evidence_version=self.db.get_current_evidence_version() or "v1.0.0",
+            evidence_version=evidence_version or "v1.0.0",
             mode=mode,
             risks=risk_assessments,
             summary=summary,
             calculated_at=datetime.now()
         )
 
-        # Store for audit
-        self._store_risk_assessment(risk_summary)
+        risk_payload = self._risk_payload(risk_summary)
+        if cache_key is not None and risk_payload is not None:
+            self.result_cache.put(cache_key, risk_summary)
+
+        self._log_risk_calculation(risk_summary, len(factors), context_label, risk_payload)
 
-        # Log calculation
-        self.db.log_action("risk_calculations", session_id, "CALCULATE", {
-            "num_factors": len(factors),
-            "num_outcomes": len(risk_assessments),
-            "mode": mode,
+        return risk_summary
+
+    def _log_risk_calculation(self, risk_summary: RiskSummary, num_factors: int, context_label: str,
+                              risk_payload: Optional[str]):
+        """Store the assessment and log the calculation for audit."""
+        self._store_risk_assessment(risk_summary, risk_payload)
+
+        self.db.audit_sink.log_action("risk_calculations", risk_summary.session_id, "CALCULATE", {
+            "num_factors": num_factors,
+            "num_outcomes": len(risk_summary.risks),
+            "mode": risk_summary.mode,
             "context": context_label
         })
 
-        return risk_summary
+    def _current_evidence_version(self) -> Optional[str]:
+        """Evidence version of the preloaded index, or the database's current version."""
+        if self.evidence_index is not None:
+            return self.evidence_index.evidence_version
+        return self.db.get_current_evidence_version()
+
+    def _resolve_population(self, context_label: str, explicit_population: str = None) -> str:
+        """Population used for evidence lookups (same rules as the per-outcome queries)."""
+        if explicit_population:
+            return explicit_population
+        if "pediatric" in context_label.lower():
+            return "pediatric"
+        elif "adult" in context_label.lower():
+            return "adult"
+        elif "obstetric" in context_label.lower():
+            return "obstetric"
+        return "mixed"
+
+    def _can_vectorize(self, mode: str) -> bool:
+        """Batched scoring needs model-based mode and a fully loaded evidence index."""
+        if not self.vectorized or mode != "model_based" or self.evidence_index is None:
+            return False
+        required = {"baseline_risks", "risk_modifiers", "estimates"}
+        return not (required & set(self.evidence_index.load_errors))
+
+    def get_risk_matrix(self, population: str) -> RiskMatrix:
+        """Dense evidence matrices for a population, kept in a small per-engine LRU."""
+        with self._risk_matrices_lock:
+            matrix = self._risk_matrices.get(population)
+            if matrix is not None:
+                self._risk_matrices.move_to_end(population)
+                return matrix
+
+        matrix = RiskMatrix(self, population, self.evidence_index.modifier_tokens())
+        with self._risk_matrices_lock:
+            self._risk_matrices[population] = matrix
+            self._risk_matrices.move_to_end(population)
+            while len(self._risk_matrices) > MAX_RISK_MATRICES:
+                self._risk_matrices.popitem(last=False)
+        return matrix
+
+    def score_cohort(self, cohort_factor_tokens: List[List[str]], population: str = "mixed") -> Dict[str, Any]:
+        """
+        Score many factor sets against every outcome in one batched pass.
+
+        Returns the outcome tokens plus [n_patients, n_outcomes] arrays of
+        adjusted risk, CI bounds and risk ratio; `available` is False where the
+        per-patient path would not report the outcome (no baseline). Clinical
+        filtering is not applied.
+        """
+        matrix = self.get_risk_matrix(population)
+        result = matrix.compute_cohort(cohort_factor_tokens)
+        result["outcomes"] = list(matrix.outcomes)
+        return result
+
+    def _calculate_outcome_risks_vectorized(self, factors: List[ExtractedFactor], context_label: str,
+                                            explicit_population: str = None) -> List[RiskAssessment]:
+        """Vectorized equivalent of calling _calculate_outcome_risk for every outcome."""
+        population = self._resolve_population(context_label, explicit_population)
+        matrix = self.get_risk_matrix(population)
+        factor_tokens = [factor.token for factor in factors]
+        scores = matrix.compute(factor_tokens)
+
+        risk_assessments = []
+        for i in np.flatnonzero(scores['available']):
+            outcome_token = matrix.outcomes[i]
+            baseline_result = matrix.baseline_results[i]
+            baseline_risk, baseline_context, baseline_citations = baseline_result
+            outcome_term = self.ontology.get_term(outcome_token)
+
+            if not scores['has_modifiers'][i]:
+                risk_assessments.append(RiskAssessment(
+                    outcome=outcome_token,
+                    outcome_label=outcome_term.plain_label if outcome_term else outcome_token,
+                    category=outcome_term.category if outcome_term else "unknown",
+                    baseline_risk=baseline_risk,
+                    baseline_context=baseline_context,
+                    adjusted_risk=baseline_risk,
+                    confidence_interval=(baseline_risk * 0.8, baseline_risk * 1.2),
+                    risk_ratio=1.0,
+                    risk_difference=0.0,
+                    evidence_grade="C",
+                    k_studies=1,
+                    contributing_factors=[],
+                    citations=baseline_citations,
+                    last_updated=datetime.now(),
+                    no_evidence=True
+                ))
+                continue
+
+            contributing_factors, all_citations, modifier_results = matrix.contributing(i, factor_tokens)
+            all_citations.extend(baseline_citations)
+            adjusted_risk = float(scores['adjusted_risk'][i])
+
+            risk_assessments.append(RiskAssessment(
+                outcome=outcome_token,
+                outcome_label=outcome_term.plain_label if outcome_term else outcome_token,
+                category=outcome_term.category if outcome_term else "unknown",
+                baseline_risk=baseline_risk,
+                baseline_context=baseline_context,
+                adjusted_risk=adjusted_risk,
+                confidence_interval=(float(scores['ci_low'][i]), float(scores['ci_high'][i])),
+                risk_ratio=adjusted_risk / baseline_risk if baseline_risk > 0 else 1.0,
+                risk_difference=adjusted_risk - baseline_risk,
+                evidence_grade=self._determine_evidence_grade([baseline_result] + modifier_results),
+                k_studies=1 + sum(len(mod.get('studies', [])) for mod in modifier_results),
+                contributing_factors=contributing_factors,
+                citations=list(set(all_citations)),
+                last_updated=datetime.now()
+            ))
+
+        return risk_assessments
 
     def _determine_context(self, demographics: Dict[str, Any], factors: List[ExtractedFactor]) -> str:
         """Determine clinical context for baseline risk selection."""
@@ -291,11 +461,14 @@ class RiskEngine:
         """
 
         evidence_result = None
-        try:
-            evidence_result = self.db.conn.execute(evidence_based_query, [outcome_token]).fetchone()
-        except Exception as e:
-            # Table may not exist yet, fall back to baseline_risks table
-            logger.debug(f"evidence_based_adjusted_risks table not available for {outcome_token}: {e}")
+        if self.evidence_index is not None:
+            evidence_result = self.evidence_index.evidence_based_baseline(outcome_token)
+        else:
+            try:
+                evidence_result = self.db.conn.execute(evidence_based_query, [outcome_token]).fetchone()
+            except Exception as e:
+                # Table may not exist yet, fall back to baseline_risks table
+                logger.debug(f"evidence_based_adjusted_risks table not available for {outcome_token}: {e}")
 
         if evidence_result:
             baseline_risk = evidence_result[0]
@@ -322,9 +495,12 @@ class RiskEngine:
             LIMIT 1
         """
 
-        baseline_result = self.db.conn.execute(baseline_query, [
-            outcome_token, population, population
-        ]).fetchone()
+        if self.evidence_index is not None:
+            baseline_result = self.evidence_index.baseline_risk(outcome_token, population)
+        else:
+            baseline_result = self.db.conn.execute(baseline_query, [
+                outcome_token, population, population
+            ]).fetchone()
 
         if baseline_result:
             baseline_risk = baseline_result[0]
@@ -336,9 +512,12 @@ class RiskEngine:
 
         # Fallback: try less specific population
         if population != "mixed":
-            fallback_result = self.db.conn.execute(baseline_query, [
-                outcome_token, "mixed", "mixed"
-            ]).fetchone()
+            if self.evidence_index is not None:
+                fallback_result = self.evidence_index.baseline_risk(outcome_token, "mixed")
+            else:
+                fallback_result = self.db.conn.execute(baseline_query, [
+                    outcome_token, "mixed", "mixed"
+                ]).fetchone()
 
             if fallback_result:
                 baseline_risk = fallback_result[0]
@@ -370,7 +549,10 @@ class RiskEngine:
             LIMIT 10
         """
 
-        estimates = self.db.conn.execute(estimates_query, [outcome_token]).fetchall()
+        if self.evidence_index is not None:
+            estimates = self.evidence_index.incidence_estimates(outcome_token)
+        else:
+            estimates = self.db.conn.execute(estimates_query, [outcome_token]).fetchall()
 
         if not estimates:
             return None
@@ -467,11 +649,14 @@ class RiskEngine:
         """
 
         evidence_result = None
-        try:
-            evidence_result = self.db.conn.execute(evidence_based_query, [outcome_token, modifier_token]).fetchone()
-        except Exception as e:
-            # Table may not exist yet, fall back to risk_modifiers table
-            logger.debug(f"evidence_based_adjusted_risks table not available for {outcome_token}, {modifier_token}: {e}")
+        if self.evidence_index is not None:
+            evidence_result = self.evidence_index.evidence_based_modifier(outcome_token, modifier_token)
+        else:
+            try:
+                evidence_result = self.db.conn.execute(evidence_based_query, [outcome_token, modifier_token]).fetchone()
+            except Exception as e:
+                # Table may not exist yet, fall back to risk_modifiers table
+                logger.debug(f"evidence_based_adjusted_risks table not available for {outcome_token}, {modifier_token}: {e}")
 
         if evidence_result:
             or_value = evidence_result[0]
@@ -511,7 +696,10 @@ class RiskEngine:
             LIMIT 1
         """
 
-        effect_result = self.db.conn.execute(effect_query, [outcome_token, modifier_token]).fetchone()
+        if self.evidence_index is not None:
+            effect_result = self.evidence_index.risk_modifier(outcome_token, modifier_token)
+        else:
+            effect_result = self.db.conn.execute(effect_query, [outcome_token, modifier_token]).fetchone()
 
         if effect_result:
             or_value = effect_result[0]
@@ -561,7 +749,10 @@ class RiskEngine:
             LIMIT 10
         """
 
-        estimates = self.db.conn.execute(estimates_query, [outcome_token, modifier_token]).fetchall()
+        if self.evidence_index is not None:
+            estimates = self.evidence_index.effect_estimates(outcome_token, modifier_token)
+        else:
+            estimates = self.db.conn.execute(estimates_query, [outcome_token, modifier_token]).fetchall()
 
         if not estimates:
             return None
@@ -889,8 +1080,8 @@ class RiskEngine:
             "total_risk_factors": len(factors)
         }
 
-    def _store_risk_assessment(self, risk_summary: RiskSummary):
-        """Store risk assessment for audit trail."""
+    def _risk_payload(self, risk_summary: RiskSummary) -> Optional[str]:
+        """Serialized risk scores for the case session audit record."""
         try:
             # Convert risks to dict format with datetime serialization
             risks_data = []
@@ -901,20 +1092,28 @@ class RiskEngine:
                     risk_dict['last_updated'] = risk_dict['last_updated'].isoformat()
                 risks_data.append(risk_dict)
 
-            # Update case session with risk scores
-            risk_data = {
+            return json.dumps({
                 "risks": risks_data,
                 "summary": risk_summary.summary,
                 "mode": risk_summary.mode,
                 "evidence_version": risk_summary.evidence_version,
                 "calculated_at": risk_summary.calculated_at.isoformat()
-            }
+            })
+
+        except Exception as e:
+            logger.error(f"Error serializing risk assessment {risk_summary.session_id}: {e}")
+            return None
 
-            self.db.conn.execute("""
-                UPDATE case_sessions
-                SET risk_scores = ?
-                WHERE session_id = ?
-            """, [json.dumps(risk_data), risk_summary.session_id])
+    def _store_risk_assessment(self, risk_summary: RiskSummary, risk_payload: Optional[str] = None):
+        """Store risk assessment for audit trail."""
+        try:
+            if risk_payload is None:
+                risk_payload = self._risk_payload(risk_summary)
+            if risk_payload is None:
+                return
+
+            # Update case session with risk scores
+            self.db.audit_sink.update_case_session(risk_summary.session_id, "risk_scores", risk_payload)
 
         except Exception as e:
             logger.error(f"Error storing risk assessment {risk_summary.session_id}: {e}")
@@ -0,0 +1,245 @@
+"""
+Dense outcome x modifier evidence matrices for batched risk computation.
+Scores every outcome (or a whole cohort) in NumPy passes instead of per-outcome Python loops.
+"""
+
+import math
+import logging
+from typing import Dict, List, Optional, Tuple, Any
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# z-value used by RiskEngine._apply_modifiers for CI <-> SE conversion
+Z_95 = 1.96
+
+
+class RiskMatrix:
+    """
+    Evidence for one population laid out as dense matrices.
+
+    Rows are the assessable outcomes, columns the modifier tokens that have
+    any evidence. Each cell holds the modifier result RiskEngine would
+    resolve for that (outcome, modifier, population), reduced to:
+
+      - present: a modifier result exists (so the outcome is not baseline-only)
+      - valid:   its OR passes the engine's min/max OR check
+      - odds_ratio / se_sq: the OR and squared log-OR SE derived from its CI
+        (SE precomputed once here with math.log, exactly as the scalar path does)
+
+    Per-patient work is then a handful of vectorized multiplies over outcomes.
+    ORs are combined factor by factor in the patient's factor order, so the
+    products are bit-for-bit those of the scalar loop.
+    """
+
+    def __init__(self, engine, population: str, modifier_tokens: List[str]):
+        self.population = population
+        self.min_baseline_risk = engine.min_baseline_risk
+        self.max_baseline_risk = engine.max_baseline_risk
+        self.min_or = engine.min_or
+        self.max_or = engine.max_or
+
+        self.outcomes = engine._get_assessable_outcomes()
+        self.modifiers = list(modifier_tokens)
+        self.modifier_index = {token: j for j, token in enumerate(self.modifiers)}
+
+        n_out, n_mod = len(self.outcomes), len(self.modifiers)
+
+        # Baselines (NaN where the engine would skip the outcome)
+        self.baseline = np.full(n_out, np.nan)
+        self.baseline_results: List[Optional[Tuple[float, str, List[str]]]] = [None] * n_out
+
+        self.present = np.zeros((n_out, n_mod), dtype=bool)
+        self.valid = np.zeros((n_out, n_mod), dtype=bool)
+        self.error = np.zeros((n_out, n_mod), dtype=bool)
+        self.odds_ratio = np.ones((n_out, n_mod))
+        self.se_sq = np.zeros((n_out, n_mod))
+
+        # Sparse per-cell metadata: raw results for every present cell,
+        # contributing-factor records for the valid ones
+        self.results: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        self.cells: Dict[Tuple[int, int], Dict[str, Any]] = {}
+
+        self._build(engine)
+
+    def _build(self, engine):
+        for i, outcome in enumerate(self.outcomes):
+            try:
+                result = engine._get_baseline_risk(outcome, self.population, self.population)
+            except Exception as e:
+                logger.debug(f"Baseline lookup failed for {outcome}: {e}")
+                result = None
+            if result:
+                self.baseline_results[i] = result
+                self.baseline[i] = result[0]
+
+            for j, modifier in enumerate(self.modifiers):
+                try:
+                    modifier_result = engine._get_pooled_effect_estimate(outcome, modifier, self.population)
+                except Exception as e:
+                    logger.debug(f"Modifier lookup failed for {outcome}/{modifier}: {e}")
+                    self.error[i, j] = True
+                    continue
+                if modifier_result:
+                    self._set_cell(i, j, modifier_result)
+
+    def _set_cell(self, i: int, j: int, modifier: Dict[str, Any]):
+        """Reduce one modifier result exactly as RiskEngine._apply_modifiers reads it."""
+        self.present[i, j] = True
+        self.results[(i, j)] = modifier
+
+        or_value = modifier.get('or') or modifier.get('or_value')
+        or_ci = modifier.get('ci') or (modifier.get('ci_low'), modifier.get('ci_high'))
+        try:
+            or_value = float(or_value)
+        except (ValueError, TypeError):
+            return
+        if not (self.min_or <= or_value <= self.max_or):
+            return
+
+        self.valid[i, j] = True
+        self.odds_ratio[i, j] = or_value
+
+        if or_ci and len(or_ci) == 2 and or_ci[0] is not None and or_ci[1] is not None:
+            try:
+                ci_low = float(or_ci[0])
+                ci_high = float(or_ci[1])
+                if ci_low > 0 and ci_high > 0:
+                    se_log_or = (math.log(ci_high) - math.log(ci_low)) / (2 * Z_95)
+                    self.se_sq[i, j] = se_log_or ** 2
+            except (ValueError, TypeError, ZeroDivisionError):
+                pass
+
+        self.cells[(i, j)] = {
+            'factor': modifier['factor'],
+            'factor_label': modifier.get('factor_label', modifier['factor']),
+            'or': or_value,
+            'ci': or_ci,
+            'evidence_grade': modifier.get('evidence_grade', 'C'),
+            'pmids': modifier['pmids'] if 'pmids' in modifier else None
+        }
+
+    def columns(self, factor_tokens: List[str]) -> List[int]:
+        """Column indices for a patient's factors, in factor order (unknown tokens dropped)."""
+        return [self.modifier_index[t] for t in factor_tokens if t in self.modifier_index]
+
+    def compute(self, factor_tokens: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Adjusted risk, CI and flags for every outcome for one factor set.
+
+        CI bounds of the few outcomes with propagated variance are re-evaluated
+        with math.log/math.exp so results are bit-identical to the scalar path
+        (NumPy's transcendental kernels may differ in the last ulp).
+        """
+        result = self.compute_cohort([factor_tokens], exact=True)
+        return {key: value[0] for key, value in result.items()}
+
+    def compute_cohort(self, cohort_factor_tokens: List[List[str]], exact: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Score many patients at once. Returns [n_patients, n_outcomes] arrays:
+        adjusted_risk, ci_low, ci_high, risk_ratio, has_modifiers, available.
+        """
+        n_pat, n_out = len(cohort_factor_tokens), len(self.outcomes)
+        columns = [self.columns(tokens) for tokens in cohort_factor_tokens]
+        width = max((len(c) for c in columns), default=0)
+
+        # Column positions padded with -1 for patients with fewer factors
+        col_matrix = np.full((n_pat, width), -1, dtype=np.int64)
+        for p, cols in enumerate(columns):
+            col_matrix[p, :len(cols)] = cols
+
+        combined_or = np.ones((n_pat, n_out))
+        log_or_variance = np.zeros((n_pat, n_out))
+        has_modifiers = np.zeros((n_pat, n_out), dtype=bool)
+        failed = np.zeros((n_pat, n_out), dtype=bool)
+
+        # One vectorized step per factor position keeps the multiplication order of the scalar loop
+        for k in range(width):
+            cols = col_matrix[:, k]
+            active = (cols >= 0)[:, None]
+            safe_cols = np.where(cols >= 0, cols, 0)
+
+            valid = self.valid.T[safe_cols] & active
+            combined_or = np.where(valid, combined_or * self.odds_ratio.T[safe_cols], combined_or)
+            log_or_variance = np.where(valid, log_or_variance + self.se_sq.T[safe_cols], log_or_variance)
+            has_modifiers |= self.present.T[safe_cols] & active
+            failed |= self.error.T[safe_cols] & active
+
+        baseline = np.broadcast_to(self.baseline, (n_pat, n_out))
+        available = ~np.isnan(baseline) & ~failed
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            baseline_odds = baseline / (1 - baseline)
+
+            adjusted_odds = baseline_odds * combined_or
+            adjusted = adjusted_odds / (1 + adjusted_odds)
+            adjusted = np.maximum(self.min_baseline_risk, np.minimum(adjusted, self.max_baseline_risk))
+
+            # Propagated CI where any modifier contributed variance
+            log_combined_or = np.log(combined_or)
+            se_combined = np.sqrt(log_or_variance)
+            ci_odds_low = baseline_odds * np.exp(log_combined_or - Z_95 * se_combined)
+            ci_odds_high = baseline_odds * np.exp(log_combined_or + Z_95 * se_combined)
+            propagated_low = np.maximum(self.min_baseline_risk, ci_odds_low / (1 + ci_odds_low))
+            propagated_high = np.minimum(self.max_baseline_risk, ci_odds_high / (1 + ci_odds_high))
+
+            has_variance = log_or_variance > 0
+            ci_low = np.where(has_variance, propagated_low, np.maximum(self.min_baseline_risk, adjusted * 0.7))
+            ci_high = np.where(has_variance, propagated_high, np.minimum(self.max_baseline_risk, adjusted * 1.3))
+
+            # Baseline-only outcomes
+            adjusted = np.where(has_modifiers, adjusted, baseline)
+            ci_low = np.where(has_modifiers, ci_low, baseline * 0.8)
+            ci_high = np.where(has_modifiers, ci_high, baseline * 1.2)
+
+            risk_ratio = np.where(has_modifiers & (baseline > 0), adjusted / baseline, 1.0)
+
+        if exact:
+            for p, i in np.argwhere(has_modifiers & has_variance & available):
+                ci_low[p, i], ci_high[p, i] = self._propagated_ci(
+                    baseline_odds[p, i], combined_or[p, i], log_or_variance[p, i]
+                )
+
+        return {
+            'adjusted_risk': adjusted,
+            'ci_low': ci_low,
+            'ci_high': ci_high,
+            'risk_ratio': risk_ratio,
+            'has_modifiers': has_modifiers,
+            'available': available
+        }
+
+    def _propagated_ci(self, baseline_odds: float, combined_or: float, log_or_variance: float) -> Tuple[float, float]:
+        """Scalar CI propagation, term for term as in RiskEngine._apply_modifiers."""
+        log_combined_or = math.log(combined_or)
+        se_combined = math.sqrt(log_or_variance)
+        ci_odds_low = baseline_odds * math.exp(log_combined_or - Z_95 * se_combined)
+        ci_odds_high = baseline_odds * math.exp(log_combined_or + Z_95 * se_combined)
+        return (
+            max(self.min_baseline_risk, ci_odds_low / (1 + ci_odds_low)),
+            min(self.max_baseline_risk, ci_odds_high / (1 + ci_odds_high))
+        )
+
+    def contributing(self, outcome_index: int, factor_tokens: List[str]) -> Tuple[List[Dict[str, Any]], List[str], List[Dict[str, Any]]]:
+        """Contributing factors, citations and raw modifier results for one outcome, in factor order."""
+        contributing_factors = []
+        citations = []
+        modifier_results = []
+        for j in self.columns(factor_tokens):
+            if not self.present[outcome_index, j]:
+                continue
+            modifier_results.append(self.results[(outcome_index, j)])
+            cell = self.cells.get((outcome_index, j))
+            if cell is None:
+                continue
+            contributing_factors.append({
+                'factor': cell['factor'],
+                'factor_label': cell['factor_label'],
+                'or': cell['or'],
+                'ci': cell['ci'],
+                'evidence_grade': cell['evidence_grade']
+            })
+            if cell['pmids'] is not None:
+                citations.extend(cell['pmids'])
+        return contributing_factors, citations, modifier_results
@@ -0,0 +1,81 @@
+"""
+Batched spaCy processing for multi-document parsing.
+Each distinct text goes through nlp.pipe once with the components no matcher reads disabled; parsers on the same model share the Doc.
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 64
+
+
+def make_doc(nlp, text: str, keep: Sequence[str] = ()):
+    """A single Doc with only the `keep` pipes run (just the tokenizer when keep is empty)."""
+    if not keep:
+        return nlp.make_doc(text)
+    return nlp(text, disable=[name for name in nlp.pipe_names if name not in keep])
+
+
+class DocBatch:
+    """
+    Docs for many texts, built with nlp.pipe.
+
+    Parsers register the (cleaned) texts they will look up with request(),
+    naming the pipes their matchers need; run() pipes every pending text once
+    per model, so two parsers that use the same model and see the same text
+    share one Doc. get() returns None for texts that were never requested,
+    and the parser falls back to make_doc().
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, n_process: int = 1):
+        self.batch_size = max(1, batch_size)
+        self.n_process = max(1, n_process)
+        self._models: Dict[int, Tuple[Any, Set[str]]] = {}
+        self._pending: Dict[int, Dict[str, None]] = {}  # insertion-ordered set per model
+        self._docs: Dict[Tuple[int, str], Any] = {}
+
+    def request(self, nlp, texts: Iterable[str], keep: Sequence[str] = ()):
+        """Queue texts for nlp; the pipes kept for a model are the union over all requests."""
+        if nlp is None:
+            return
+        key = id(nlp)
+        _, pipes = self._models.setdefault(key, (nlp, set()))
+        pipes.update(keep)
+        pending = self._pending.setdefault(key, {})
+        for text in texts:
+            if (key, text) not in self._docs:
+                pending[text] = None
+
+    def run(self):
+        """Pipe every pending text; already-built Docs are not rebuilt."""
+        for key, pending in self._pending.items():
+            if not pending:
+                continue
+            nlp, keep = self._models[key]
+            texts = list(pending)
+            disable = [name for name in nlp.pipe_names if name not in keep]
+            docs = nlp.pipe(texts, batch_size=self.batch_size, n_process=self.n_process, disable=disable)
+            for text, doc in zip(texts, docs):
+                self._docs[(key, text)] = doc
+            pending.clear()
+            logger.debug(f"Piped {len(texts)} documents (disabled: {disable or 'none'})")
+
+    def get(self, nlp, text: str):
+        """The Doc built for text with nlp, or None."""
+        if nlp is None:
+            return None
+        return self._docs.get((id(nlp), text))
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+
+def request_all(parsers: Iterable[Any], texts: List[str], docs: Optional[DocBatch] = None) -> DocBatch:
+    """Queue texts for every parser with a request_docs(texts, docs) method and pipe them together."""
+    docs = docs or DocBatch()
+    for parser in parsers:
+        parser.request_docs(texts, docs)
+    docs.run()
+    return docs
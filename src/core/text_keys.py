@@ -0,0 +1,50 @@
+"""
+Keyed hashes for identifiers derived from HPI text.
+Case ids and parse-cache keys must not be plain hashes of PHI that anyone could recompute from a guessed HPI.
+"""
+
+import os
+import hmac
+import hashlib
+import secrets
+import logging
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Shared secret for the HMAC key; every worker (and every restart) must see the same value
+# for ids to resolve across them. SECRET_KEY is used when the dedicated variable is unset.
+TEXT_KEY_SECRET_ENV = "MERIDIAN_TEXT_KEY_SECRET"
+FALLBACK_SECRET_ENV = "SECRET_KEY"
+
+_key: Optional[bytes] = None
+_key_lock = threading.Lock()
+
+
+def text_key() -> bytes:
+    """HMAC key from the configured secret, or a random per-process key (with a warning) if none is set."""
+    global _key
+    if _key is None:
+        with _key_lock:
+            if _key is None:
+                secret = os.environ.get(TEXT_KEY_SECRET_ENV) or os.environ.get(FALLBACK_SECRET_ENV)
+                if secret:
+                    _key = hashlib.sha256(f"meridian-text-key\0{secret}".encode("utf-8")).digest()
+                else:
+                    logger.warning(f"{TEXT_KEY_SECRET_ENV} is not set; case ids and parse-cache keys "
+                                   f"are only valid in this process")
+                    _key = secrets.token_bytes(32)
+    return _key
+
+
+def reset_text_key():
+    """Re-read the secret on next use (tests and config reloads)."""
+    global _key
+    with _key_lock:
+        _key = None
+
+
+def keyed_digest(text: str) -> str:
+    """Hex HMAC-SHA256 of text under text_key()."""
+    return hmac.new(text_key(), text.encode("utf-8"), hashlib.sha256).hexdigest()
@@ -0,0 +1,395 @@
+"""
+Concurrent PubMed harvesting on asyncio with a shared NCBI rate limit.
+Searches, efetch batches, parsing and bulk stores for many outcomes overlap; each outcome is checkpointed in harvest_batches.
+"""
+
+import io
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .pubmed_harvester import PubMedHarvester, PubMedPaper
+from .bulk_writer import BulkWriter
+
+logger = logging.getLogger(__name__)
+
+EUTILS_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+
+# Statuses worth retrying: rate limited, or a transient server-side failure
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+async def _cancel_all(tasks):
+    """Cancel tasks and wait until every one has finished."""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` requests per second with bursts of up to `capacity`.
+
+    One bucket is shared by every request a harvester makes, so the NCBI
+    limit holds however many searches and fetches are in flight.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class HarvestBatchResult:
+    """Outcome of one checkpointed harvest (one harvest_batches row)."""
+    batch_id: str
+    outcome_token: str
+    population: str
+    status: str
+    papers_found: int = 0
+    papers_fetched: int = 0
+    papers_processed: int = 0
+    effects_extracted: int = 0
+    resumed: bool = False
+    skipped: bool = False
+    error_message: Optional[str] = None
+
+
+class AsyncPubMedHarvester:
+    """
+    asyncio PubMed harvester with a token-bucket rate limit (10 rps with an
+    API key, 3 without) and one pooled HTTP session.
+
+    HTTP calls run on a pooled requests.Session in a thread pool, so there
+    are up to `max_connections` requests in flight. Parsing and storing reuse
+    PubMedHarvester (iterparse, effect extraction, BulkWriter). 429 and 5xx
+    responses are retried with exponential backoff, and Retry-After is honored.
+
+    harvest_outcome() checkpoints its progress in harvest_batches under a
+    deterministic batch_id, records every PMID it has stored in
+    harvest_batch_pmids, and stores new papers with that batch_id as their
+    ingest_query_id. Rerunning a completed batch does nothing. Rerunning a
+    failed or interrupted batch only fetches the PMIDs it has not processed
+    yet. A paper that is already stored keeps its original row; only its
+    effects for this outcome are added. When one efetch batch fails, the
+    others are cancelled (stores already running finish) before the
+    checkpoint is marked failed.
+    """
+
+    def __init__(self, api_key: str = None, email: str = "codex@anesthesia.ai",
+                 base_url: str = EUTILS_URL, requests_per_second: float = None,
+                 max_connections: int = 10, max_retries: int = 4, backoff: float = 0.5,
+                 fetch_batch_size: int = 200, save_raw: bool = True,
+                 harvester: PubMedHarvester = None):
+        self.harvester = harvester or PubMedHarvester(api_key=api_key, email=email)
+        self.api_key = self.harvester.api_key
+        self.email = email
+        self.db = self.harvester.db
+
+        self.search_url = f"{base_url.rstrip('/')}/esearch.fcgi"
+        self.fetch_url = f"{base_url.rstrip('/')}/efetch.fcgi"
+        self.requests_per_second = requests_per_second or self.harvester.requests_per_second
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.fetch_batch_size = fetch_batch_size
+        self.save_raw = save_raw
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="pubmed-http")
+        self._bucket: Optional[TokenBucket] = None
+        self._bucket_loop = None
+        # Store stages run on pool threads; the existence check and the upsert must not interleave
+        self._store_lock = threading.Lock()
+
+        self.stats = {"requests": 0, "retries": 0, "papers_parsed": 0}
+
+    @property
+    def bucket(self) -> TokenBucket:
+        # Created per event loop (asyncio.Lock binds to the loop that first waits on it)
+        loop = asyncio.get_running_loop()
+        if self._bucket is None or self._bucket_loop is not loop:
+            self._bucket = TokenBucket(self.requests_per_second)
+            self._bucket_loop = loop
+        return self._bucket
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _get(self, url: str, params: Dict, timeout: float) -> requests.Response:
+        """Rate-limited GET, retried on 429/5xx and connection errors."""
+        params = dict(params, email=self.email)
+        if self.api_key:
+            params["api_key"] = self.api_key
+
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            self.stats["requests"] += 1
+            delay = self.backoff * (2 ** attempt)
+            try:
+                response = await self._run(lambda: self.session.get(url, params=params, timeout=timeout))
+            except requests.RequestException as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(f"PubMed request error ({e}); retry {attempt + 1} in {delay:.1f}s")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                    response.raise_for_status()
+                    return response
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                logger.warning(f"PubMed returned {response.status_code}; retry {attempt + 1} in {delay:.1f}s")
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay)
+
+    async def _esearch(self, query: str, max_results: int) -> List[str]:
+        response = await self._get(self.search_url, {
+            "db": "pubmed",
+            "retmode": "json",
+            "term": query,
+            "retmax": max_results,
+            "sort": "relevance"
+        }, timeout=30)
+        return response.json().get("esearchresult", {}).get("idlist", [])
+
+    async def _efetch(self, pmids: List[str]) -> List[PubMedPaper]:
+        response = await self._get(self.fetch_url, {
+            "db": "pubmed",
+            "retmode": "xml",
+            "id": ",".join(pmids)
+        }, timeout=60)
+        papers = await self._run(self._parse, response.content)
+        self.stats["papers_parsed"] += len(papers)
+        return papers
+
+    def _parse(self, content: bytes) -> List[PubMedPaper]:
+        raw_path = self.harvester._save_raw_xml([], content.decode("utf-8")) if self.save_raw else None
+        return list(self.harvester.iter_pubmed_xml(io.BytesIO(content), raw_path))
+
+    def _batches(self, pmids: List[str]) -> List[List[str]]:
+        return [pmids[i:i + self.fetch_batch_size] for i in range(0, len(pmids), self.fetch_batch_size)]
+
+    async def search_pubmed(self, query: str, max_results: int = 100) -> List[str]:
+        """Search PubMed and return PMIDs (empty on failure, like PubMedHarvester.search_pubmed)."""
+        pmids: List[str] = []
+        try:
+            pmids = await self._esearch(query, max_results)
+        except requests.RequestException as e:
+            logger.error(f"PubMed search error: {e}")
+            return []
+        logger.info(f"Found {len(pmids)} PMIDs for query: {query[:100]}...")
+        return pmids
+
+    async def fetch_papers(self, pmids: List[str]) -> List[PubMedPaper]:
+        """Fetch and parse papers; efetch batches run concurrently. Failed batches are logged and skipped."""
+        results = await asyncio.gather(*(self._efetch(batch) for batch in self._batches(pmids)),
+                                       return_exceptions=True)
+        papers = []
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.error(f"PubMed fetch error: {result}")
+            else:
+                papers.extend(result)
+        return papers
+
+    def batch_id_for(self, outcome_token: str, population: str, query: str, max_results: int) -> str:
+        digest = hashlib.sha1(f"{query}|{max_results}".encode()).hexdigest()[:12]
+        return f"async_{outcome_token}_{population}_{digest}"
+
+    async def harvest_outcome(self, outcome_token: str, population: str = "both", max_results: int = 200,
+                              priority: int = 3, harvest_type: str = "comprehensive") -> HarvestBatchResult:
+        """Search, fetch, parse and store one outcome under a resumable harvest_batches checkpoint."""
+        query = self.harvester._build_outcome_query(outcome_token, population)
+        batch_id = self.batch_id_for(outcome_token, population, query, max_results)
+        result = HarvestBatchResult(batch_id, outcome_token, population, status="running")
+
+        status = await self._run(self._checkpoint_status, batch_id)
+        if status == "completed":
+            logger.info(f"Harvest batch {batch_id} already completed; skipping")
+            result.status, result.skipped = "completed", True
+            return result
+        result.resumed = status is not None
+        await self._run(self._start_checkpoint, batch_id, outcome_token, population, query,
+                        priority, harvest_type, result.resumed)
+
+        pmids: List[str] = []
+        try:
+            pmids = await self._esearch(query, max_results)
+            result.papers_found = len(pmids)
+
+            stored = await self._run(self._processed_pmids, batch_id, outcome_token)
+            pending = [pmid for pmid in pmids if pmid not in stored]
+            if result.resumed:
+                logger.info(f"Resuming {batch_id}: {len(stored)} papers stored, {len(pending)} to fetch")
+
+            # Each efetch batch is stored as soon as it is parsed, while other batches are still in flight
+            await self._run_all([self._fetch_and_store(batch_id, outcome_token, batch, result)
+                                 for batch in self._batches(pending)])
+        except Exception as e:
+            result.status, result.error_message = "failed", str(e)
+            logger.error(f"Harvest batch {batch_id} failed: {e}")
+            await self._run(self._finish_checkpoint, batch_id, result, pmids)
+            return result
+
+        result.status = "completed"
+        await self._run(self._finish_checkpoint, batch_id, result, pmids)
+        logger.info(f"Harvested {result.papers_processed} papers, {result.effects_extracted} effects "
+                    f"for {outcome_token}/{population}")
+        return result
+
+    async def harvest_outcomes(self, outcomes: List[Tuple[str, str]], max_results: int = 200) -> List[HarvestBatchResult]:
+        """Harvest (outcome_token, population) pairs concurrently under the shared rate limit."""
+        return await asyncio.gather(*(self.harvest_outcome(token, population, max_results)
+                                      for token, population in outcomes))
+
+    async def _run_all(self, coros) -> List:
+        """Run coroutines concurrently; on the first failure cancel and await the rest, then raise it."""
+        tasks = [asyncio.ensure_future(coro) for coro in coros]
+        if not tasks:
+            return []
+        try:
+            # Returns early only when a task raised
+            _, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        except asyncio.CancelledError:
+            await _cancel_all(tasks)
+            raise
+        await _cancel_all(pending)
+        for task in tasks:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+        return [task.result() for task in tasks]
+
+    async def _fetch_and_store(self, batch_id: str, outcome_token: str, pmids: List[str],
+                               result: HarvestBatchResult):
+        papers = await self._efetch(pmids)
+        result.papers_fetched += len(papers)
+        store = asyncio.ensure_future(self._run(self._store, batch_id, outcome_token, papers))
+        try:
+            await asyncio.shield(store)
+        except asyncio.CancelledError:
+            # The write is already running on a pool thread; let it finish before the batch is finalized
+            await asyncio.wait([store])
+            raise
+
+    def _store(self, batch_id: str, outcome_token: str, papers: List[PubMedPaper]):
+        effects = [effect for paper in papers for effect in self.harvester.extract_effects(paper, [outcome_token])]
+        with self._store_lock:
+            # Replacing a paper that already has estimates violates their foreign key, so only new papers are written
+            existing = self._existing_pmids([paper.pmid for paper in papers])
+            new_papers = [paper for paper in papers if paper.pmid not in existing]
+            for paper in new_papers:
+                paper.ingest_query_id = batch_id
+            with BulkWriter(self.db) as writer:
+                writer.add_papers(new_papers)
+                writer.add_effects(effects)
+        # Resume state is the harvest_batch_pmids rows; the harvest_batches row is written once,
+        # by _finish_checkpoint, since repeated updates of one key conflict across writer transactions
+        self.db.execute_write("""
+            INSERT OR IGNORE INTO harvest_batch_pmids (batch_id, pmid)
+            SELECT ?, UNNEST(?::VARCHAR[])
+        """, [batch_id, [paper.pmid for paper in papers]])
+
+    def _checkpoint_status(self, batch_id: str) -> Optional[str]:
+        # fetchall, not fetchone: an unexhausted result keeps this thread cursor's read transaction open,
+        # which makes later deletes and updates on the writer fail constraint and conflict checks
+        rows = self.db.conn.execute("SELECT status FROM harvest_batches WHERE batch_id = ?", [batch_id]).fetchall()
+        return rows[0][0] if rows else None
+
+    def _existing_pmids(self, pmids: List[str]) -> set:
+        rows = self.db.conn.execute("SELECT pmid FROM papers WHERE pmid IN (SELECT UNNEST(?::VARCHAR[]))",
+                                    [pmids]).fetchall()
+        return {row[0] for row in rows}
+
+    def _processed_pmids(self, batch_id: str, outcome_token: str) -> set:
+        """
+        PMIDs in this batch's checkpoint (pre-existing papers included) whose
+        paper is still stored, plus, for batches checkpointed before
+        harvest_batch_pmids existed, papers it stored or that have effects for its outcome.
+        """
+        rows = self.db.conn.execute("""
+            SELECT checkpoint.pmid FROM harvest_batch_pmids checkpoint
+            JOIN papers ON papers.pmid = checkpoint.pmid
+            WHERE checkpoint.batch_id = ?
+            UNION SELECT pmid FROM papers WHERE ingest_query_id = ?
+            UNION SELECT pmid FROM estimates WHERE outcome_token = ?
+        """, [batch_id, batch_id, outcome_token]).fetchall()
+        return {row[0] for row in rows}
+
+    def _start_checkpoint(self, batch_id: str, outcome_token: str, population: str, query: str,
+                          priority: int, harvest_type: str, resumed: bool):
+        if resumed:
+            self.db.execute_write("""
+                UPDATE harvest_batches SET status = 'running', error_message = NULL, completed_at = NULL
+                WHERE batch_id = ?
+            """, [batch_id])
+        else:
+            self.db.execute_write("""
+                INSERT INTO harvest_batches
+                (batch_id, outcome_token, population, query_used, priority, harvest_type)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [batch_id, outcome_token, population, query, priority, harvest_type])
+
+    def _update_checkpoint(self, batch_id: str, values: Dict):
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        self.db.execute_write(f"UPDATE harvest_batches SET {assignments} WHERE batch_id = ?",
+                              [*values.values(), batch_id])
+
+    def _finish_checkpoint(self, batch_id: str, result: HarvestBatchResult, pmids: List[str]):
+        """Record final counts from what is actually stored, so resumed runs report the whole batch."""
+        conn = self.db.conn
+        grades = dict(conn.execute("""
+            SELECT COALESCE(evidence_grade, 'unknown'), COUNT(*) FROM papers
+            WHERE pmid IN (SELECT UNNEST(?::VARCHAR[])) GROUP BY 1
+        """, [pmids]).fetchall())
+        result.papers_processed = sum(grades.values())
+        result.effects_extracted = conn.execute("""
+            SELECT COUNT(*) FROM estimates
+            WHERE pmid IN (SELECT UNNEST(?::VARCHAR[])) AND outcome_token = ?
+        """, [pmids, result.outcome_token]).fetchall()[0][0]
+
+        self._update_checkpoint(batch_id, {
+            "papers_found": result.papers_found,
+            "papers_processed": result.papers_processed,
+            "effects_extracted": result.effects_extracted,
+            "quality_grade_distribution": json.dumps(grades),
+            "completed_at": datetime.now().isoformat(),
+            "status": result.status,
+            "error_message": result.error_message
+        })
+
+    def close(self):
+        self.session.close()
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,325 @@
+"""
+Batch random-effects pooling of every outcome x modifier x context group at once.
+Same study filtering and FE/PM/HK rules as MetaAnalysisEngine.pool_effect_modifiers, computed with segmented NumPy reductions.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from ..core.database import get_database
+from .bulk_writer import BulkWriter
+from .pooling_engine import PooledEffect
+
+logger = logging.getLogger(__name__)
+
+GENERAL_CONTEXT = "general"
+
+# Default variance inputs when a study reports no usable CI (see MetaAnalysisEngine._estimate_variance_from_quality)
+QUALITY_VARIANCE_MULTIPLIERS = {'A': 0.5, 'B': 0.7, 'C': 1.0, 'D': 1.5}
+
+# Paule-Mandel search interval, matching the bounded scalar solve of the per-pair engine
+TAU_SQUARED_MAX = 10.0
+PM_MAX_ITERATIONS = 100
+PM_TOLERANCE = 1e-12
+
+
+@dataclass
+class PooledGroups:
+    """Column-wise results for all pooled groups (index i is one outcome/modifier/context group)."""
+    outcome_token: np.ndarray
+    modifier_token: np.ndarray
+    context_label: np.ndarray
+    k: np.ndarray
+    fixed_effect: np.ndarray
+    fixed_variance: np.ndarray
+    q_statistic: np.ndarray
+    p_heterogeneity: np.ndarray
+    i_squared: np.ndarray
+    tau_squared_dl: np.ndarray
+    tau_squared_pm: np.ndarray
+    pooled_effect: np.ndarray
+    pooled_variance: np.ndarray
+    random_effects: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.k)
+
+
+def _segment_sum(values: np.ndarray, groups: np.ndarray, n_groups: int) -> np.ndarray:
+    return np.bincount(groups, weights=values, minlength=n_groups)
+
+
+def paule_mandel_tau_squared(effects: np.ndarray, variances: np.ndarray, groups: np.ndarray,
+                             n_groups: int, start: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Solve Q(tau²) = k - 1 for every group simultaneously.
+
+    Q is decreasing in tau², so each group keeps a bracket inside
+    [0, TAU_SQUARED_MAX] and takes Newton steps (dQ/dtau² = -sum(w² r²)),
+    falling back to bisection when a step leaves the bracket. Groups whose
+    Q(0) is already below k - 1 get 0; groups still above it at the upper
+    bound get the bound, as the bounded scalar solve would.
+    """
+    k = np.bincount(groups, minlength=n_groups)
+    df = k - 1.0
+
+    def q_and_slope(tau_sq):
+        weights = 1.0 / (variances + tau_sq[groups])
+        mean = _segment_sum(weights * effects, groups, n_groups) / _segment_sum(weights, groups, n_groups)
+        residuals = effects - mean[groups]
+        q = _segment_sum(weights * residuals ** 2, groups, n_groups)
+        slope = -_segment_sum(weights ** 2 * residuals ** 2, groups, n_groups)
+        return q - df, slope
+
+    low = np.zeros(n_groups)
+    high = np.full(n_groups, TAU_SQUARED_MAX)
+    f_low, _ = q_and_slope(low)
+    f_high, _ = q_and_slope(high)
+
+    tau_sq = np.zeros(n_groups) if start is None else np.clip(start, 0.0, TAU_SQUARED_MAX)
+    active = (f_low > 0) & (f_high < 0)
+    tau_sq = np.where(active, tau_sq, np.where(f_high >= 0, TAU_SQUARED_MAX, 0.0))
+
+    for _ in range(PM_MAX_ITERATIONS):
+        if not active.any():
+            break
+        f, slope = q_and_slope(tau_sq)
+        low = np.where(active & (f > 0), tau_sq, low)
+        high = np.where(active & (f < 0), tau_sq, high)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = tau_sq - f / slope
+        bisect = ~np.isfinite(step) | (step <= low) | (step >= high)
+        step = np.where(bisect, (low + high) / 2, step)
+
+        converged = (np.abs(step - tau_sq) <= PM_TOLERANCE * np.maximum(1.0, tau_sq)) | (f == 0)
+        tau_sq = np.where(active, step, tau_sq)
+        active &= ~converged
+
+    return tau_sq
+
+
+def pool_groups(effects: np.ndarray, variances: np.ndarray, quality_weights: np.ndarray,
+                groups: np.ndarray, n_groups: int, hk_max_studies: int = 10) -> Dict[str, np.ndarray]:
+    """
+    Fixed-effect, DerSimonian-Laird, Paule-Mandel and Hartung-Knapp results
+    for log effects segmented by `groups` (integers 0..n_groups-1, each with k >= 2).
+    """
+    k = np.bincount(groups, minlength=n_groups)
+    df = k - 1.0
+
+    # Quality-weighted fixed effect; heterogeneity uses plain inverse-variance weights
+    iv = 1.0 / variances
+    sum_iv = _segment_sum(iv, groups, n_groups)
+    quality_iv = quality_weights * iv
+    fixed = _segment_sum(quality_iv * effects, groups, n_groups) / _segment_sum(quality_iv, groups, n_groups)
+    fixed_var = 1.0 / sum_iv
+
+    q = _segment_sum(iv * (effects - fixed[groups]) ** 2, groups, n_groups)
+    p_het = 1 - stats.chi2.cdf(q, df)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        i_squared = np.where(q > 0, np.maximum(0.0, (q - df) / q), 0.0)
+
+    # DerSimonian-Laird (around the unweighted inverse-variance mean) seeds the PM iteration
+    iv_mean = _segment_sum(iv * effects, groups, n_groups) / sum_iv
+    q_iv = _segment_sum(iv * (effects - iv_mean[groups]) ** 2, groups, n_groups)
+    tau_dl = np.maximum(0.0, (q_iv - df) / (sum_iv - _segment_sum(iv ** 2, groups, n_groups) / sum_iv))
+    tau_pm = paule_mandel_tau_squared(effects, variances, groups, n_groups, start=tau_dl)
+
+    random_effects = ((p_het < 0.10) | (k >= 3)) & (df > 0)
+    tau_sq = np.where(random_effects, tau_pm, 0.0)
+
+    re_weights = 1.0 / (variances + tau_sq[groups])
+    sum_re = _segment_sum(re_weights, groups, n_groups)
+    re_effect = _segment_sum(re_weights * effects, groups, n_groups) / sum_re
+    re_var = 1.0 / sum_re
+
+    # Hartung-Knapp: the variance becomes the weighted residual variance of the RE fit
+    hk_var = _segment_sum(re_weights * (effects - re_effect[groups]) ** 2, groups, n_groups) / (df * sum_re)
+    re_var = np.where(k <= hk_max_studies, hk_var, re_var)
+
+    return {
+        "k": k,
+        "fixed_effect": fixed,
+        "fixed_variance": fixed_var,
+        "q_statistic": q,
+        "p_heterogeneity": p_het,
+        "i_squared": i_squared,
+        "tau_squared_dl": tau_dl,
+        "tau_squared_pm": tau_sq,
+        "pooled_effect": np.where(random_effects, re_effect, fixed),
+        "pooled_variance": np.where(random_effects, re_var, fixed_var),
+        "random_effects": random_effects
+    }
+
+
+class BatchMetaAnalysisEngine:
+    """
+    Re-pools every effect modifier in one pass.
+
+    All OR/RR/HR estimates are loaded with a single query (one row per
+    estimate and matching context), filtered and converted to log effects
+    with the per-pair engine's rules, then pooled per group with bincount
+    reductions and a vectorized Paule-Mandel solve. The resulting
+    PooledEffect rows are written with one BulkWriter flush.
+    """
+
+    def __init__(self, db=None):
+        self.db = db or get_database()
+        self.min_studies_effect = 2
+        self.hk_max_studies = 10
+
+    def load_effect_estimates(self, outcome_tokens: List[str] = None, context_labels: List[str] = None,
+                              modifier_tokens: List[str] = None) -> pd.DataFrame:
+        """Effect estimates joined to every requested context they belong to ('general' always)."""
+        contexts = [GENERAL_CONTEXT] + [c for c in (context_labels or []) if c and c != GENERAL_CONTEXT]
+        context_values = ", ".join("(?)" for _ in contexts)
+        params = list(contexts)
+
+        query = f"""
+            SELECT e.id, e.pmid, e.outcome_token, e.modifier_token, c.context_label,
+                   e.measure, e.estimate, e.ci_low, e.ci_high, e.adjusted,
+                   e.quality_weight, e.evidence_grade
+            FROM estimates e
+            LEFT JOIN papers p ON p.pmid = e.pmid
+            JOIN (VALUES {context_values}) AS c(context_label)
+              ON c.context_label = '{GENERAL_CONTEXT}'
+              OR e.definition_note LIKE '%' || c.context_label || '%'
+              OR p.procedure = c.context_label
+            WHERE e.modifier_token IS NOT NULL AND e.measure IN ('OR', 'RR', 'HR') AND e.estimate > 0
+        """
+        if outcome_tokens:
+            query += f" AND e.outcome_token IN ({', '.join('?' for _ in outcome_tokens)})"
+            params.extend(outcome_tokens)
+        if modifier_tokens:
+            query += f" AND e.modifier_token IN ({', '.join('?' for _ in modifier_tokens)})"
+            params.extend(modifier_tokens)
+
+        query += """
+            ORDER BY e.outcome_token, e.modifier_token, c.context_label,
+                     e.quality_weight DESC, e.adjusted DESC, e.id
+        """
+        return self.db.conn.execute(query, params).df()
+
+    def pool(self, estimates: pd.DataFrame) -> Optional[tuple]:
+        """Filter studies and pool each group; returns (PooledGroups, study frame with group ids) or None."""
+        if estimates.empty:
+            return None
+
+        frame = estimates.copy()
+        log_effect = np.log(frame["estimate"].to_numpy(dtype=float))
+
+        # Variance from the CI when it is usable, otherwise from grade and adjustment
+        ci_low = frame["ci_low"].to_numpy(dtype=float, na_value=np.nan)
+        ci_high = frame["ci_high"].to_numpy(dtype=float, na_value=np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ci_variance = ((np.log(ci_high) - np.log(ci_low)) / (2 * 1.96)) ** 2
+        has_ci = (np.nan_to_num(ci_low) > 0) & (np.nan_to_num(ci_high) != 0)
+
+        adjusted = frame["adjusted"].fillna(False).astype(bool).to_numpy()
+        grade_multiplier = frame["evidence_grade"].map(QUALITY_VARIANCE_MULTIPLIERS).fillna(1.5).to_numpy(dtype=float)
+        quality_variance = (np.minimum(1.0, 0.1 + 0.1 * np.abs(log_effect)) * grade_multiplier
+                            * np.where(adjusted, 0.8, 1.2))
+        variance = np.where(has_ci, ci_variance, quality_variance)
+
+        frame["log_effect"] = log_effect
+        frame["variance"] = variance
+        frame["adjusted"] = adjusted
+        quality = frame["quality_weight"].to_numpy(dtype=float, na_value=np.nan)
+        frame["quality_weight"] = np.where(np.isnan(quality) | (quality == 0), 1.0, quality)
+        frame["evidence_grade"] = frame["evidence_grade"].where(frame["evidence_grade"].notna() & (frame["evidence_grade"] != ""), "D")
+        frame = frame[(variance > 0) & (variance <= 10)]
+
+        keys = ["outcome_token", "modifier_token", "context_label"]
+        group = frame.groupby(keys, sort=True).ngroup().to_numpy()
+        k = np.bincount(group) if len(group) else np.array([], dtype=int)
+        keep = k[group] >= self.min_studies_effect if len(group) else np.array([], dtype=bool)
+        frame = frame[keep]
+        if frame.empty:
+            return None
+
+        # Renumber the surviving groups 0..n-1 and make each one a contiguous run of rows
+        frame = frame.assign(group=frame.groupby(keys, sort=True).ngroup().to_numpy())
+        frame = frame.sort_values("group", kind="stable")
+        group = frame["group"].to_numpy()
+        n_groups = int(group[-1]) + 1
+
+        results = pool_groups(frame["log_effect"].to_numpy(), frame["variance"].to_numpy(),
+                              frame["quality_weight"].to_numpy(), group, n_groups, self.hk_max_studies)
+
+        first = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        labels = {key: frame[key].to_numpy()[first] for key in keys}
+        return PooledGroups(**labels, **results), frame
+
+    def pool_all_effect_modifiers(self, outcome_tokens: List[str] = None, context_labels: List[str] = None,
+                                  evidence_version: str = None, store: bool = True) -> List[PooledEffect]:
+        """Re-pool every outcome/modifier/context group with enough studies and bulk-store the results."""
+        estimates = self.load_effect_estimates(outcome_tokens, context_labels)
+        pooled = self.pool(estimates)
+        if pooled is None:
+            logger.info("No effect modifier groups with enough studies to pool")
+            return []
+        groups, studies = pooled
+
+        version = evidence_version or self.db.get_current_evidence_version() or "v1.0.0"
+        effects = self._to_pooled_effects(groups, studies, version, datetime.now().isoformat())
+
+        if store:
+            with BulkWriter(self.db) as writer:
+                writer.add_pooled_effects(effects)
+        logger.info(f"Pooled {len(effects)} effect modifier groups from {len(studies)} studies")
+        return effects
+
+    def _to_pooled_effects(self, groups: PooledGroups, studies: pd.DataFrame, version: str,
+                           stamp: str) -> List[PooledEffect]:
+        or_mean = np.exp(groups.pooled_effect)
+        se = np.sqrt(groups.pooled_variance)
+        ci_low = np.exp(groups.pooled_effect - 1.96 * se)
+        ci_high = np.exp(groups.pooled_effect + 1.96 * se)
+        methods = np.where(groups.random_effects, "random_effects_pm", "fixed_effects")
+
+        bounds = np.flatnonzero(np.r_[True, np.diff(studies["group"].to_numpy()) != 0, True])
+        ids = studies["id"].tolist()
+        pmids = studies["pmid"].tolist()
+        grades = studies["evidence_grade"].tolist()
+        quality = studies["quality_weight"].to_numpy()
+        adjusted = studies["adjusted"].to_numpy()
+
+        effects = []
+        for i in range(len(groups)):
+            start, end = bounds[i], bounds[i + 1]
+            grade_counts: Dict[str, int] = {}
+            for grade in grades[start:end]:
+                grade_counts[grade] = grade_counts.get(grade, 0) + 1
+
+            outcome, modifier, context = groups.outcome_token[i], groups.modifier_token[i], groups.context_label[i]
+            effects.append(PooledEffect(
+                id=f"effect_{outcome}_{modifier}_{context}_{stamp}",
+                outcome_token=outcome,
+                modifier_token=modifier,
+                context_label=context,
+                k=int(groups.k[i]),
+                or_mean=float(or_mean[i]),
+                or_ci_low=float(ci_low[i]),
+                or_ci_high=float(ci_high[i]),
+                log_or_var=float(groups.pooled_variance[i]),
+                method=str(methods[i]),
+                inputs=ids[start:end],
+                pmids=pmids[start:end],
+                i_squared=float(groups.i_squared[i]),
+                tau_squared=float(groups.tau_squared_pm[i]),
+                evidence_version=version,
+                quality_summary={
+                    'grade_distribution': grade_counts,
+                    'mean_quality_weight': float(np.mean(quality[start:end])),
+                    'adjusted_studies': int(np.count_nonzero(adjusted[start:end])),
+                    'total_studies': int(end - start)
+                }
+            ))
+        return effects
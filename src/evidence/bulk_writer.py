@@ -0,0 +1,291 @@
+"""
+Bulk persistence for harvested papers, effect estimates and pooled effects.
+Rows are accumulated column-wise and upserted with one DataFrame-backed statement and one audit row per batch.
+"""
+
+import json
+import uuid
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Tuple, Any, Callable
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 2000
+
+# pandas dtypes that keep NULLs as NULLs (not NaN) when DuckDB scans the frame
+_DTYPES = {
+    "str": object,
+    "int": "Int64",
+    "float": "Float64",
+    "bool": "boolean"
+}
+
+
+@dataclass(frozen=True)
+class BulkTable:
+    """Target table: key column and (column, kind, value getter) for each inserted column."""
+    name: str
+    key: str
+    columns: Tuple[Tuple[str, str, Callable[[Any], Any]], ...]
+    track_dirty: bool = False  # record old and new pooling keys in estimates_dirty
+    # DELETE + INSERT instead of INSERT OR REPLACE: DuckDB's OR REPLACE keeps the old
+    # values of indexed columns, so a re-labelled estimate would silently stay as it was
+    delete_existing: bool = False
+
+    def row(self, record) -> list:
+        return [getter(record) for _, _, getter in self.columns]
+
+
+def _json_list(values) -> str:
+    return json.dumps(values or [])
+
+
+PAPERS_TABLE = BulkTable("papers", "pmid", (
+    ("pmid", "str", lambda p: p.pmid),
+    ("title", "str", lambda p: p.title),
+    ("abstract", "str", lambda p: p.abstract),
+    ("journal", "str", lambda p: p.journal),
+    ("year", "int", lambda p: p.year),
+    ("design", "str", lambda p: p.design),
+    ("n_total", "int", lambda p: p.n_total),
+    ("population", "str", lambda p: p.population),
+    ("procedure", "str", lambda p: p.procedure),
+    ("time_horizon", "str", lambda p: p.time_horizon),
+    ("url", "str", lambda p: p.url),
+    ("raw_path", "str", lambda p: p.raw_path),
+    ("ingest_query_id", "str", lambda p: p.ingest_query_id),
+    ("doi", "str", lambda p: p.doi),
+    ("authors", "str", lambda p: _json_list(p.authors)),
+    ("keywords", "str", lambda p: _json_list(p.keywords)),
+    ("mesh_terms", "str", lambda p: _json_list(p.mesh_terms)),
+    ("study_quality_score", "float", lambda p: p.study_quality_score),
+    ("evidence_grade", "str", lambda p: p.evidence_grade)
+))
+
+ESTIMATES_TABLE = BulkTable("estimates", "id", (
+    ("id", "str", lambda e: e.id),
+    ("pmid", "str", lambda e: e.pmid),
+    ("outcome_token", "str", lambda e: e.outcome_token),
+    ("modifier_token", "str", lambda e: e.modifier_token),
+    ("measure", "str", lambda e: e.measure),
+    ("estimate", "float", lambda e: e.estimate),
+    ("ci_low", "float", lambda e: e.ci_low),
+    ("ci_high", "float", lambda e: e.ci_high),
+    ("adjusted", "bool", lambda e: e.adjusted),
+    ("n_group", "int", lambda e: e.n_group),
+    ("n_events", "int", lambda e: e.n_events),
+    ("definition_note", "str", lambda e: e.definition_note),
+    ("time_horizon", "str", lambda e: e.time_horizon),
+    ("quality_weight", "float", lambda e: e.quality_weight),
+    ("evidence_grade", "str", lambda e: e.evidence_grade),
+    ("population_match", "float", lambda e: e.population_match),
+    ("extraction_confidence", "float", lambda e: e.extraction_confidence),
+    ("covariates", "str", lambda e: json.dumps(e.covariates)),
+    ("subgroup", "str", lambda e: e.subgroup)
+), track_dirty=True, delete_existing=True)
+
+EFFECTS_POOLED_TABLE = BulkTable("effects_pooled", "id", (
+    ("id", "str", lambda e: e.id),
+    ("outcome_token", "str", lambda e: e.outcome_token),
+    ("modifier_token", "str", lambda e: e.modifier_token),
+    ("context_label", "str", lambda e: e.context_label),
+    ("k", "int", lambda e: e.k),
+    ("or_mean", "float", lambda e: e.or_mean),
+    ("or_ci_low", "float", lambda e: e.or_ci_low),
+    ("or_ci_high", "float", lambda e: e.or_ci_high),
+    ("log_or_var", "float", lambda e: e.log_or_var),
+    ("method", "str", lambda e: e.method),
+    ("inputs", "str", lambda e: _json_list(e.inputs)),
+    ("pmids", "str", lambda e: _json_list(e.pmids)),
+    ("i_squared", "float", lambda e: e.i_squared),
+    ("tau_squared", "float", lambda e: e.tau_squared),
+    ("evidence_version", "str", lambda e: e.evidence_version),
+    ("quality_summary", "str", lambda e: json.dumps(e.quality_summary))
+))
+
+# Written by IncrementalRepooler inside its publish transaction, not buffered by BulkWriter
+BASELINES_POOLED_TABLE = BulkTable("baselines_pooled", "id", (
+    ("id", "str", lambda b: b.id),
+    ("outcome_token", "str", lambda b: b.outcome_token),
+    ("context_label", "str", lambda b: b.context_label),
+    ("k", "int", lambda b: b.k),
+    ("p0_mean", "float", lambda b: b.p0_mean),
+    ("p0_ci_low", "float", lambda b: b.p0_ci_low),
+    ("p0_ci_high", "float", lambda b: b.p0_ci_high),
+    ("N_total", "int", lambda b: b.N_total),
+    ("time_horizon", "str", lambda b: b.time_horizon),
+    ("pmids", "str", lambda b: _json_list(b.pmids)),
+    ("method", "str", lambda b: b.method),
+    ("i_squared", "float", lambda b: b.i_squared),
+    ("evidence_version", "str", lambda b: b.evidence_version),
+    ("quality_summary", "str", lambda b: json.dumps(b.quality_summary))
+))
+
+
+def table_frame(table: BulkTable, rows: List[list]) -> pd.DataFrame:
+    """Typed DataFrame of table rows (raises TypeError/ValueError on values that do not fit)."""
+    return pd.DataFrame({
+        name: pd.array([row[i] for row in rows], dtype=_DTYPES[kind])
+        for i, (name, kind, _) in enumerate(table.columns)
+    })
+
+
+class BulkWriter:
+    """
+    Buffers papers, estimates and pooled effects and upserts them in batches.
+
+    Each table's pending rows are kept keyed by primary key (a later row for
+    the same key replaces the earlier one, as consecutive INSERT OR REPLACE
+    statements would). flush() turns each buffer into a typed DataFrame,
+    registers it with DuckDB and runs a single INSERT OR REPLACE ... SELECT
+    on the writer connection, papers before estimates so foreign keys
+    resolve, then pooled effects. Every flushed batch gets one summarized audit_log row instead
+    of one per record. Buffers flush automatically at `batch_size` rows.
+    """
+
+    def __init__(self, db, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+        self._tables = (PAPERS_TABLE, ESTIMATES_TABLE, EFFECTS_POOLED_TABLE)
+        self._pending: Dict[str, Dict[str, list]] = {table.name: {} for table in self._tables}
+
+        self.rows_written = {table.name: 0 for table in self._tables}
+        self.batches = 0
+
+    def add_papers(self, papers) -> int:
+        """Queue papers; returns the number of rows written by any automatic flush."""
+        return self._add(PAPERS_TABLE, papers)
+
+    def add_effects(self, effects) -> int:
+        """Queue effect estimates; returns the number of rows written by any automatic flush."""
+        return self._add(ESTIMATES_TABLE, effects)
+
+    def add_pooled_effects(self, pooled) -> int:
+        """Queue PooledEffect rows; returns the number of rows written by any automatic flush."""
+        return self._add(EFFECTS_POOLED_TABLE, pooled)
+
+    def _add(self, table: BulkTable, records) -> int:
+        pending = self._pending[table.name]
+        key_index = [name for name, _, _ in table.columns].index(table.key)
+        for record in records:
+            row = table.row(record)
+            pending.pop(row[key_index], None)
+            pending[row[key_index]] = row
+        if len(pending) >= self.batch_size:
+            return self.flush()
+        return 0
+
+    def flush(self) -> int:
+        """Write all buffered rows (papers, estimates, then pooled effects). Returns rows written."""
+        written = 0
+        for table in self._tables:
+            rows = list(self._pending[table.name].values())
+            if rows:
+                written += self._write_batch(table, rows)
+                self._pending[table.name] = {}
+        return written
+
+    def _write_batch(self, table: BulkTable, rows: List[list]) -> int:
+        columns = [name for name, _, _ in table.columns]
+        try:
+            frame = table_frame(table, rows)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Could not build {table.name} batch frame ({e}); writing row by row")
+            with self.db.writer() as conn:
+                rows = self._write_rows(conn, table, rows)
+            return self._record_batch(table, rows)
+
+        view = f"_bulk_{table.name}_{uuid.uuid4().hex[:8]}"
+        column_list = ", ".join(columns)
+        keys = [row[columns.index(table.key)] for row in rows]
+
+        with self.db.writer() as conn:
+            conn.register(view, frame)
+            try:
+                conn.execute("BEGIN TRANSACTION")
+                if table.track_dirty:
+                    self.db.mark_estimates_dirty(keys, conn)
+                if table.delete_existing:
+                    conn.execute(f"DELETE FROM {table.name} WHERE {table.key} IN (SELECT {table.key} FROM {view})")
+                    conn.execute(f"INSERT INTO {table.name} ({column_list}) SELECT {column_list} FROM {view}")
+                else:
+                    conn.execute(f"INSERT OR REPLACE INTO {table.name} ({column_list}) SELECT {column_list} FROM {view}")
+                if table.track_dirty:
+                    self.db.mark_estimates_dirty(keys, conn)
+                conn.execute("COMMIT")
+            except Exception as e:
+                try:
+                    conn.execute("ROLLBACK")
+                except Exception as rollback_error:
+                    # Still inside the failed transaction: a row-by-row retry would silently drop every row
+                    logger.error(f"Rollback of {table.name} bulk write failed: {rollback_error}")
+                    raise e
+                logger.warning(f"Bulk write of {len(rows)} {table.name} rows failed ({e}); retrying row by row")
+                rows = self._write_rows(conn, table, rows)
+            finally:
+                conn.unregister(view)
+
+        return self._record_batch(table, rows)
+
+    def _record_batch(self, table: BulkTable, rows: List[list]) -> int:
+        """Count a written batch and log its single audit row."""
+        if not rows:
+            return 0
+        columns = [name for name, _, _ in table.columns]
+        self.rows_written[table.name] += len(rows)
+        self.batches += 1
+
+        keys = [row[columns.index(table.key)] for row in rows]
+        batch_id = f"bulk_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        details = {"rows": len(rows), "keys": keys}
+        if "ingest_query_id" in columns:
+            details["ingest_query_ids"] = sorted({row[columns.index("ingest_query_id")] or "" for row in rows})
+        self.db.audit_sink.log_action(table.name, batch_id, "BULK_UPSERT", details)
+        return len(rows)
+
+    def _write_rows(self, conn, table: BulkTable, rows: List[list]) -> List[list]:
+        """Fallback: one statement per row so a single bad row does not lose the batch."""
+        columns = [name for name, _, _ in table.columns]
+        verb = "INSERT" if table.delete_existing else "INSERT OR REPLACE"
+        statement = f"{verb} INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        keys = [row[columns.index(table.key)] for row in rows]
+        if table.track_dirty:
+            self.db.mark_estimates_dirty(keys, conn)
+        written = []
+        for key, row in zip(keys, rows):
+            try:
+                if table.delete_existing:
+                    # One transaction per row so a failed insert does not lose the deleted original
+                    conn.execute("BEGIN TRANSACTION")
+                    try:
+                        conn.execute(f"DELETE FROM {table.name} WHERE {table.key} = ?", [key])
+                        conn.execute(statement, row)
+                        conn.execute("COMMIT")
+                    except Exception:
+                        conn.execute("ROLLBACK")
+                        raise
+                else:
+                    conn.execute(statement, row)
+                written.append(row)
+            except Exception as e:
+                logger.error(f"Error storing {table.name} row {key}: {e}")
+        if table.track_dirty:
+            self.db.mark_estimates_dirty([row[columns.index(table.key)] for row in written], conn)
+        return written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+            return
+        # Don't commit a partial batch behind the error that interrupted it
+        dropped = {name: len(rows) for name, rows in self._pending.items() if rows}
+        self._pending = {table.name: {} for table in self._tables}
+        if dropped:
+            logger.warning(f"Discarding unflushed rows after {exc_type.__name__}: {dropped}")
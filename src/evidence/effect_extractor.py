@@ -0,0 +1,483 @@
+"""
+Compiled effect-estimate extraction for paper titles and abstracts.
+One scan per abstract finds every ratio/CI/incidence/n-of-N candidate; outcomes resolve through a precompiled ontology synonym automaton.
+"""
+
+import re
+import bisect
+import logging
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Iterable, Iterator, FrozenSet
+
+from ..core.pattern_matcher import trie_regex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 250
+
+# Characters of text on either side of a match that form its context
+CONTEXT_WINDOW = 100
+
+# Outcome resolution: "ontology" matches outcome synonyms near the estimate;
+# "keywords" reproduces the original fixed keyword list (any requested token wins)
+OUTCOME_MODES = ("ontology", "keywords")
+LEGACY_OUTCOME_KEYWORDS = ["bronchospasm", "laryngospasm", "hypotension", "mortality",
+                           "bleeding", "infection", "pneumonia"]
+
+COVARIATE_TERMS = ["age", "sex", "bmi", "asa", "emergency", "duration",
+                   "comorbidities", "smoking", "diabetes", "hypertension"]
+
+
+@dataclass
+class EffectEstimate:
+    id: str
+    pmid: str
+    outcome_token: str
+    modifier_token: Optional[str]
+    measure: str  # OR, RR, HR, INCIDENCE
+    estimate: float
+    ci_low: Optional[float]
+    ci_high: Optional[float]
+    adjusted: bool
+    n_group: Optional[int]
+    n_events: Optional[int]
+    definition_note: str
+    time_horizon: str
+    quality_weight: float
+    evidence_grade: str
+    population_match: float
+    extraction_confidence: float
+    covariates: List[str]
+    subgroup: str
+
+
+# Effect patterns, in the order their matches are reported
+EFFECT_PATTERNS = [
+    # Odds ratios
+    re.compile(r"\b(?:OR|odds\s+ratio)\s*[:=]?\s*([0-9]+(?:\.[0-9]+)?)\s*(?:\(([0-9.]+)\s*[-–]\s*([0-9.]+)\))?", re.I),
+    re.compile(r"\bodds\s+ratio\s*[:=]?\s*([0-9]+(?:\.[0-9]+)?)", re.I),
+
+    # Relative risks
+    re.compile(r"\b(?:RR|relative\s+risk)\s*[:=]?\s*([0-9]+(?:\.[0-9]+)?)\s*(?:\(([0-9.]+)\s*[-–]\s*([0-9.]+)\))?", re.I),
+    re.compile(r"\brisk\s+ratio\s*[:=]?\s*([0-9]+(?:\.[0-9]+)?)", re.I),
+
+    # Hazard ratios
+    re.compile(r"\b(?:HR|hazard\s+ratio)\s*[:=]?\s*([0-9]+(?:\.[0-9]+)?)\s*(?:\(([0-9.]+)\s*[-–]\s*([0-9.]+)\))?", re.I),
+
+    # Incidence rates
+    re.compile(r"\bincidence\s*[:=]?\s*([0-9]+(?:\.[0-9]+)?)\s*%", re.I),
+    re.compile(r"([0-9]+(?:\.[0-9]+)?)\s*%\s*(?:of|in)", re.I),
+    re.compile(r"([0-9]+)\s*\/\s*([0-9]+)", re.I),  # n/N format
+
+    # Multiplier expressions
+    re.compile(r"\b([0-9]+(?:\.[0-9]+)?)\s*(?:times|fold)\s+(?:higher|increased|greater|more\s+likely)", re.I),
+    re.compile(r"\b([0-9]+(?:\.[0-9]+)?)\s*×\s*(?:higher|increased)", re.I),
+
+    # P-values and significance
+    re.compile(r"\bp\s*[<>=]\s*([0-9.]+)", re.I),
+    re.compile(r"\bp-value\s*[:=]?\s*([0-9.]+)", re.I),
+]
+
+# One pass over the lower-cased text finds every position a keyword-led pattern can
+# start at. Each alternative begins with a literal (so the regex engine skips ahead
+# on its first character) and requires a word start, as the patterns' leading \b does.
+_W = "[a-z0-9_]"
+_KEYWORD_SCAN = re.compile(
+    rf"o(?<!{_W}o)(?:(?P<or>r)(?![a-z])|(?P<odds>dds))"
+    rf"|r(?<!{_W}r)(?:(?P<rr>r)(?![a-z])|(?P<relative>elative)|(?P<risk>isk))"
+    rf"|h(?<!{_W}h)(?:(?P<hr>r)(?![a-z])|(?P<hazard>azard))"
+    rf"|i(?<!{_W}i)(?P<incidence>ncidence)"
+    rf"|p(?<!{_W}p)(?P<p>)(?![a-z])"
+)
+# Starts of digit runs that are followed by what a number-led pattern needs next
+_NUMBER_SCAN = re.compile(r"[0-9](?<![0-9][0-9])(?=[0-9]*(?:\.[0-9]+)?\s*(?:%|/|times|fold|×))")
+# Characters that re.IGNORECASE equates with an ASCII letter but str.lower() does not
+# (or that lower-case to a different length); texts containing them use _FALLBACK_SCAN
+_CASE_FOLD_SPECIAL = re.compile("[\u017f\u212a\u0130\u0131]")
+_FALLBACK_SCAN = re.compile(
+    r"\b(?:(?P<or>or(?![a-z]))|(?P<odds>odds)|(?P<rr>rr(?![a-z]))|(?P<relative>relative)|(?P<risk>risk)"
+    r"|(?P<hr>hr(?![a-z]))|(?P<hazard>hazard)|(?P<incidence>incidence)|(?P<p>p(?![a-z])))"
+    r"|(?P<digit>(?<![0-9])[0-9])",
+    re.I
+)
+# Scan group -> patterns that can start at that position
+_START_GROUPS = {
+    "or": (0,), "odds": (0, 1), "rr": (2,), "relative": (2,), "risk": (3,),
+    "hr": (4,), "hazard": (4,), "incidence": (5,), "p": (10, 11), "digit": (6, 7, 8, 9)
+}
+_WORD_CHAR = re.compile(r"\w")
+# Patterns that begin with a digit run (a match can also resume mid-run)
+_DIGIT_START = {6, 7, 8, 9}
+
+_GROUP_SIZE = re.compile(r"([0-9]+)\s+(?:patients|subjects|participants)")
+_EVENT_COUNTS = [
+    re.compile(r"([0-9]+)\s+events"),
+    re.compile(r"([0-9]+)\s+cases"),
+    re.compile(r"([0-9]+)/[0-9]+")
+]
+
+
+class OutcomeSynonymIndex:
+    """
+    Ontology synonyms (and labels) per token, compiled into one automaton per requested token set.
+
+    Synonyms are matched on word boundaries in the lower-cased text, except
+    short upper-case abbreviations (e.g. "DL", "DMV"). Those are matched
+    case-sensitively in the original text so they do not fire inside units or
+    ordinary words. A token missing from the ontology falls back to its own
+    name ("POSTOP_DELIRIUM" -> "postop delirium"). Automata are cached by
+    token set, since a harvest asks for the same outcomes over and over.
+    """
+
+    def __init__(self, ontology=None):
+        if ontology is None:
+            from ..ontology.core_ontology import AnesthesiaOntology
+            ontology = AnesthesiaOntology()
+
+        # token -> (lower-case phrases, case-sensitive abbreviations)
+        self.synonyms: Dict[str, Tuple[set, set]] = {}
+        for term in ontology.terms.values():
+            for synonym in [term.plain_label, *(term.synonyms or [])]:
+                self._add(term.token, synonym)
+
+        self._automata: Dict[FrozenSet[str], tuple] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, token: str, synonym: str):
+        synonym = synonym.strip()
+        if not synonym:
+            return
+        phrases, abbreviations = self.synonyms.setdefault(token, (set(), set()))
+        if synonym.isupper() and len(synonym) <= 5:
+            abbreviations.add(synonym)
+        else:
+            phrases.add(synonym.lower())
+
+    def _automaton(self, tokens: FrozenSet[str]) -> tuple:
+        """Phrase regexes (lower-cased text, original text), phrase -> tokens, abbreviation regex and table."""
+        automaton = self._automata.get(tokens)
+        if automaton is None:
+            phrases: Dict[str, set] = {}
+            abbreviations: Dict[str, set] = {}
+            for token in tokens:
+                fallback = ({token.lower().replace("_", " ").strip()} - {""}, set())
+                token_phrases, token_abbreviations = self.synonyms.get(token, fallback)
+                for phrase in token_phrases:
+                    phrases.setdefault(phrase, set()).add(token)
+                for abbreviation in token_abbreviations:
+                    abbreviations.setdefault(abbreviation, set()).add(token)
+            automaton = (self._compile(phrases), self._compile(phrases, re.I), phrases,
+                         self._compile(abbreviations), abbreviations)
+            with self._lock:
+                self._automata[tokens] = automaton
+        return automaton
+
+    @staticmethod
+    def _compile(synonyms: Dict[str, set], flags: int = 0) -> Optional[re.Pattern]:
+        # No leading boundary in the regex: it would stop the engine skipping ahead on the first
+        # characters, so _scan checks word starts itself
+        if not synonyms:
+            return None
+        return re.compile(r"(?:" + trie_regex(sorted(synonyms)) + r")(?!\w)", flags)
+
+    def hits(self, text: str, tokens: Iterable[str], lowered: str = None) -> List[Tuple[int, int, str]]:
+        """(start, end, token) for every synonym of the given tokens in text, by start."""
+        phrase_regex, phrase_regex_i, phrases, abbreviation_regex, abbreviations = self._automaton(frozenset(tokens))
+        if lowered is None:
+            lowered = text.lower()
+        hits = []
+        if phrase_regex is not None:
+            if len(lowered) == len(text):
+                hits.extend(self._scan(phrase_regex, lowered, phrases))
+            else:
+                # Lower-casing changed offsets; match the original text case-insensitively instead
+                hits.extend(self._scan(phrase_regex_i, text, phrases, str.lower))
+        if abbreviation_regex is not None:
+            hits.extend(self._scan(abbreviation_regex, text, abbreviations))
+        hits.sort()
+        return hits
+
+    @staticmethod
+    def _scan(regex: re.Pattern, text: str, table: Dict[str, set], key=None) -> Iterator[Tuple[int, int, str]]:
+        pos = 0
+        while True:
+            match = regex.search(text, pos)
+            if match is None:
+                return
+            start = match.start()
+            if start and _WORD_CHAR.match(text, start - 1):
+                # Not a word start; a synonym may still begin inside this span
+                pos = start + 1
+                continue
+            for token in table.get(key(match.group(0)) if key else match.group(0), ()):
+                yield start, match.end(), token
+            pos = match.end()
+
+
+class EffectExtractor:
+    """
+    Extracts effect estimates from a paper's title and abstract.
+
+    extract() first runs one combined scan over the text, which collects for
+    each effect pattern the positions where it can begin. Each pattern is then
+    tried only at those positions, while keeping the non-overlapping,
+    left-to-right semantics of running finditer() per pattern. Matches come
+    out in the same order and with the same groups as before, so the
+    numbers, CIs and measures are unchanged. The text is lower-cased once and
+    every match's context is a slice of it.
+
+    Outcomes are resolved once per paper with OutcomeSynonymIndex. A match
+    is attributed to the requested outcome whose synonym lies inside its
+    context and closest to it. outcome_mode="keywords" keeps the original
+    rule instead: if any fixed keyword appears, the first requested token
+    wins. That mode reproduces estimates harvested before this change.
+    """
+
+    def __init__(self, outcome_mode: str = "ontology", synonym_index: OutcomeSynonymIndex = None):
+        if outcome_mode not in OUTCOME_MODES:
+            raise ValueError(f"Unknown outcome_mode {outcome_mode!r}; expected one of {OUTCOME_MODES}")
+        self.outcome_mode = outcome_mode
+        self.patterns = EFFECT_PATTERNS
+        self._synonyms = synonym_index
+        self._synonyms_lock = threading.Lock()
+
+    @property
+    def synonyms(self) -> OutcomeSynonymIndex:
+        if self._synonyms is None:
+            with self._synonyms_lock:
+                if self._synonyms is None:
+                    self._synonyms = OutcomeSynonymIndex()
+        return self._synonyms
+
+    def matches(self, text: str, lowered: str = None) -> Iterator[Tuple[int, re.Match]]:
+        """(pattern_index, match) for every effect pattern match, grouped by pattern as sequential finditer() would give."""
+        candidates: Dict[int, List[int]] = {}
+        for start, group in self._candidates(text, text.lower() if lowered is None else lowered):
+            for index in _START_GROUPS[group]:
+                candidates.setdefault(index, []).append(start)
+
+        for index, pattern in enumerate(self.patterns):
+            starts = candidates.get(index)
+            if starts:
+                yield from ((index, match) for match in self._finditer(index, pattern, text, starts))
+
+    @staticmethod
+    def _candidates(text: str, lowered: str) -> Iterator[Tuple[int, str]]:
+        """(position, scan group) for every place an effect pattern may start, in text order per group."""
+        if text.isascii() or not _CASE_FOLD_SPECIAL.search(text):
+            for scan in _KEYWORD_SCAN.finditer(lowered):
+                yield scan.start(), scan.lastgroup
+            for scan in _NUMBER_SCAN.finditer(lowered):
+                yield scan.start(), "digit"
+        else:
+            for scan in _FALLBACK_SCAN.finditer(text):
+                yield scan.start(), scan.lastgroup
+
+    @staticmethod
+    def _finditer(index: int, pattern: re.Pattern, text: str, starts: List[int]) -> Iterator[re.Match]:
+        """pattern.finditer(text), trying only the candidate start positions."""
+        pos = 0
+        for start in starts:
+            if start < pos:
+                continue
+            match = pattern.match(text, start)
+            while match:
+                yield match
+                pos = match.end()
+                # A match can end inside a digit run; the rest of that run is then a start of its own.
+                # If it fails there, it fails at every later digit of the run too.
+                if index in _DIGIT_START and 0 < pos < len(text) and "0" <= text[pos] <= "9" \
+                        and "0" <= text[pos - 1] <= "9":
+                    match = pattern.match(text, pos)
+                else:
+                    match = None
+
+    def extract(self, paper, outcome_tokens: List[str]) -> List[EffectEstimate]:
+        """Effect estimates for a paper (anything with pmid, title, abstract, time_horizon, quality and grade)."""
+        text = f"{paper.title} {paper.abstract}"
+        if not outcome_tokens:
+            return []
+
+        lowered = text.lower()
+        # Slices of the lower-cased text equal lower-cased slices unless case mapping changes
+        # length or depends on neighbours (final sigma)
+        sliceable = len(lowered) == len(text) and "Σ" not in text
+        hits = None
+        hit_starts = None
+
+        effects = []
+        for index, match in self.matches(text, lowered):
+            if hits is None and self.outcome_mode == "ontology":
+                hits = self.synonyms.hits(text, outcome_tokens, lowered)
+                hit_starts = [hit[0] for hit in hits]
+            a = max(0, match.start() - CONTEXT_WINDOW)
+            b = match.end() + CONTEXT_WINDOW
+            context = lowered[a:b] if sliceable else text[a:b].lower()
+            effect = self._effect(match, paper, outcome_tokens, context, a, min(b, len(text)), hits, hit_starts)
+            if effect:
+                effects.append(effect)
+        return effects
+
+    def _outcome(self, match: re.Match, outcome_tokens: List[str], context: str,
+                 a: int, b: int, hits, hit_starts) -> Optional[str]:
+        if self.outcome_mode == "keywords":
+            for keyword in LEGACY_OUTCOME_KEYWORDS:
+                if keyword in context:
+                    return outcome_tokens[0]
+            return None
+
+        if not hits:
+            return None
+        best = None
+        for position in range(bisect.bisect_left(hit_starts, a), len(hits)):
+            start, end, token = hits[position]
+            if start >= b:
+                break
+            if end > b:
+                continue
+            distance = max(match.start() - end, start - match.end(), 0)
+            rank = (distance, outcome_tokens.index(token))
+            if best is None or rank < best[0]:
+                best = (rank, token)
+        return best[1] if best else None
+
+    def _effect(self, match: re.Match, paper, outcome_tokens: List[str], context: str,
+                a: int, b: int, hits, hit_starts) -> Optional[EffectEstimate]:
+        groups = match.re.groups
+        try:
+            estimate = float(match.group(1))
+            if estimate <= 0 or estimate > 100:
+                return None
+
+            ci_low = ci_high = None
+            if groups >= 3 and match.group(2) and match.group(3):
+                ci_low = float(match.group(2))
+                ci_high = float(match.group(3))
+        except ValueError:
+            return None
+
+        matched = match.group(0)
+        if "odds ratio" in context or "or =" in context:
+            measure = "OR"
+        elif "relative risk" in context or "rr =" in context:
+            measure = "RR"
+        elif "hazard ratio" in context or "hr =" in context:
+            measure = "HR"
+        elif "%" in matched or "/" in matched:
+            measure = "INCIDENCE"
+        else:
+            measure = "OR"  # Default assumption
+
+        outcome_token = self._outcome(match, outcome_tokens, context, a, b, hits, hit_starts)
+        if not outcome_token:
+            return None
+
+        group_size = _GROUP_SIZE.search(context)
+        n_events = None
+        for pattern in _EVENT_COUNTS:
+            events = pattern.search(context)
+            if events:
+                n_events = int(events.group(1))
+                break
+
+        confidence = 1.0
+        if len(context.strip()) < 50:
+            confidence *= 0.8
+        if groups >= 3 and match.group(2):
+            confidence *= 1.2
+        if "p <" in context or "significant" in context or "ci" in context:
+            confidence *= 1.1
+
+        return EffectEstimate(
+            id=f"{paper.pmid}_{outcome_token}_{measure}_{estimate}",
+            pmid=paper.pmid,
+            outcome_token=outcome_token,
+            modifier_token=None,  # Will be determined later
+            measure=measure,
+            estimate=estimate,
+            ci_low=ci_low,
+            ci_high=ci_high,
+            adjusted="adjusted" in context or "multivariate" in context or "multivariable" in context,
+            n_group=int(group_size.group(1)) if group_size else None,
+            n_events=n_events,
+            definition_note=context[:200],
+            time_horizon=paper.time_horizon,
+            quality_weight=paper.study_quality_score,
+            evidence_grade=paper.evidence_grade,
+            population_match=1.0,  # Will be calculated
+            extraction_confidence=min(confidence, 1.0),
+            covariates=[term for term in COVARIATE_TERMS if term in context],
+            subgroup=""
+        )
+
+
+# Global extractor instances, one per outcome mode
+_extractor_instances: Dict[str, EffectExtractor] = {}
+_extractor_lock = threading.Lock()
+
+def get_effect_extractor(outcome_mode: str = "ontology") -> EffectExtractor:
+    """Get the shared effect extractor for an outcome mode."""
+    if outcome_mode not in _extractor_instances:
+        with _extractor_lock:
+            if outcome_mode not in _extractor_instances:
+                _extractor_instances[outcome_mode] = EffectExtractor(outcome_mode)
+    return _extractor_instances[outcome_mode]
+
+
+# Corpus extraction in worker processes: each task is a chunk of papers
+_worker_tokens: List[str] = []
+_worker_mode = "ontology"
+
+def init_extraction_worker(outcome_tokens: List[str], outcome_mode: str = "ontology"):
+    """Process pool initializer: build the extractor (and synonym automaton) once per worker."""
+    global _worker_tokens, _worker_mode
+    _worker_tokens, _worker_mode = list(outcome_tokens), outcome_mode
+    get_effect_extractor(outcome_mode).synonyms
+
+
+def extract_chunk(papers: list) -> List[EffectEstimate]:
+    extractor = get_effect_extractor(_worker_mode)
+    return [effect for paper in papers for effect in extractor.extract(paper, _worker_tokens)]
+
+
+def _chunks(papers: Iterable, chunk_size: int) -> Iterator[list]:
+    chunk = []
+    for paper in papers:
+        chunk.append(paper)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def extract_corpus(papers: Iterable, outcome_tokens: List[str], processes: int = 1,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE, outcome_mode: str = "ontology") -> Iterator[List[EffectEstimate]]:
+    """
+    Effects for a paper corpus, one list per chunk of `chunk_size` papers, in corpus order.
+
+    With processes > 1 chunks are extracted in a spawn-context process pool
+    (papers and effects are plain dataclasses, so they pickle cheaply). At most
+    two chunks per worker are in flight, so the corpus is read as results are
+    consumed rather than all at once.
+    """
+    if processes <= 1:
+        extractor = get_effect_extractor(outcome_mode)
+        for chunk in _chunks(papers, chunk_size):
+            yield [effect for paper in chunk for effect in extractor.extract(paper, outcome_tokens)]
+        return
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=init_extraction_worker,
+                             initargs=(outcome_tokens, outcome_mode)) as pool:
+        pending = deque()
+        for chunk in _chunks(papers, chunk_size):
+            pending.append(pool.submit(extract_chunk, chunk))
+            if len(pending) >= processes * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
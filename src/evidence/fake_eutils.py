@@ -0,0 +1,206 @@
+"""
+Local stand-in for the NCBI E-utilities esearch/efetch endpoints.
+Serves the stored raw PubMed batches so harvesting can be tested and benchmarked offline.
+"""
+
+import re
+import json
+import time
+import logging
+import argparse
+import threading
+import xml.etree.ElementTree as ET
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger(__name__)
+
+XML_HEADER = (b'<?xml version="1.0" ?>\n<!DOCTYPE PubmedArticleSet PUBLIC "-//NLM//DTD PubMedArticle, '
+              b'1st January 2025//EN" "https://dtd.nlm.nih.gov/ncbi/pubmed/out/pubmed_250101.dtd">\n'
+              b'<PubmedArticleSet>\n')
+XML_FOOTER = b'</PubmedArticleSet>\n'
+
+# Query syntax that is not search vocabulary
+_QUERY_STOPWORDS = {"and", "or", "not", "dp", "tiab", "mh", "pt"}
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class ArticleCorpus:
+    """PubmedArticle XML and searchable words, indexed by PMID, from raw efetch batches."""
+
+    def __init__(self, raw_dir: str = "database/raw_xml", max_files: Optional[int] = None):
+        self.articles: Dict[str, bytes] = {}
+        self.words: Dict[str, Set[str]] = {}
+
+        files = sorted(Path(raw_dir).glob("pubmed_batch_*.xml"))
+        if max_files is not None:
+            files = files[:max_files]
+        for path in files:
+            self._load(path)
+        logger.info(f"Fake E-utilities corpus: {len(self.articles)} articles from {len(files)} files")
+
+    def _load(self, path: Path):
+        root = None
+        try:
+            for event, elem in ET.iterparse(str(path), events=("start", "end")):
+                if root is None:
+                    root = elem
+                if event != "end" or elem.tag != "PubmedArticle":
+                    continue
+                pmid = elem.findtext(".//PMID")
+                if pmid and pmid not in self.articles:
+                    text = " ".join(filter(None, [
+                        elem.findtext(".//ArticleTitle"),
+                        *(a.text for a in elem.iter("AbstractText")),
+                        *(m.text for m in elem.iter("DescriptorName"))
+                    ]))
+                    self.articles[pmid] = ET.tostring(elem, encoding="utf-8", xml_declaration=False)
+                    self.words[pmid] = set(_WORD.findall(text.lower()))
+                root.clear()
+        except ET.ParseError as e:
+            logger.warning(f"Stopped reading truncated raw batch {path}: {e}")
+
+    def search(self, term: str, retmax: int) -> List[str]:
+        """PMIDs ranked by how many query words they contain (ties by PMID)."""
+        query = {w for w in _WORD.findall(term.lower()) if w not in _QUERY_STOPWORDS and not w.isdigit()}
+        scored = [(len(query & words), pmid) for pmid, words in self.words.items()]
+        ranked = sorted((s for s in scored if s[0] > 0), key=lambda s: (-s[0], s[1]))
+        return [pmid for _, pmid in ranked[:retmax]]
+
+    def fetch(self, pmids: List[str]) -> bytes:
+        return XML_HEADER + b"".join(self.articles[p] + b"\n" for p in pmids if p in self.articles) + XML_FOOTER
+
+
+class FakeEUtilsServer:
+    """
+    Threaded HTTP server answering /esearch.fcgi (JSON) and /efetch.fcgi (XML).
+
+    `latency` adds a per-request delay to mimic the network, `rate_limit`
+    answers 429 when more requests than that arrive within one second (as
+    NCBI does), and `fail_every` answers 503 to every Nth request so retry
+    paths can be exercised.
+    """
+
+    def __init__(self, corpus: ArticleCorpus, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, rate_limit: Optional[float] = None, fail_every: int = 0):
+        self.corpus = corpus
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.fail_every = fail_every
+
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self.stats = {"requests": 0, "esearch": 0, "efetch": 0, "rate_limited": 0, "failed": 0}
+
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-eutils", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _admit(self) -> Optional[int]:
+        """Error status for this request, if the simulated server rejects it."""
+        with self._lock:
+            self.stats["requests"] += 1
+            if self.fail_every and self.stats["requests"] % self.fail_every == 0:
+                self.stats["failed"] += 1
+                return 503
+            if self.rate_limit:
+                now = time.monotonic()
+                while self._recent and now - self._recent[0] >= 1.0:
+                    self._recent.popleft()
+                if len(self._recent) >= self.rate_limit:
+                    self.stats["rate_limited"] += 1
+                    return 429
+                self._recent.append(now)
+        return None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                if server.latency:
+                    time.sleep(server.latency)
+
+                status = server._admit()
+                if status is not None:
+                    self._send(status, b"", "text/plain", {"Retry-After": "1"} if status == 429 else None)
+                    return
+
+                if url.path.endswith("/esearch.fcgi"):
+                    with server._lock:
+                        server.stats["esearch"] += 1
+                    pmids = server.corpus.search(params.get("term", ""), int(params.get("retmax", 20)))
+                    body = json.dumps({"esearchresult": {"count": str(len(pmids)), "idlist": pmids}}).encode()
+                    self._send(200, body, "application/json")
+                elif url.path.endswith("/efetch.fcgi"):
+                    with server._lock:
+                        server.stats["efetch"] += 1
+                    pmids = [p for p in params.get("id", "").split(",") if p]
+                    self._send(200, server.corpus.fetch(pmids), "text/xml; charset=utf-8")
+                else:
+                    self._send(404, b"", "text/plain")
+
+            def _send(self, status: int, body: bytes, content_type: str, headers: Dict[str, str] = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve database/raw_xml as a fake NCBI E-utilities endpoint")
+    parser.add_argument("--raw-dir", default="database/raw_xml")
+    parser.add_argument("--max-files", type=int, default=None)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Requests/sec before answering 429")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = FakeEUtilsServer(ArticleCorpus(args.raw_dir, args.max_files), port=args.port,
+                              latency=args.latency, rate_limit=args.rate_limit)
+    print(f"Fake E-utilities at {server.base_url} (esearch.fcgi, efetch.fcgi)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
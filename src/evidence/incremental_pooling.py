@@ -0,0 +1,201 @@
+"""
+Incremental re-pooling of only the outcome/modifier/population groups whose estimates changed.
+Keys come from the estimates_dirty set, filled by writers and by a fingerprint sync of the estimates table; results publish with a new evidence version in one transaction.
+"""
+
+import json
+import uuid
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional, Set, Tuple
+
+import pandas as pd
+
+from ..core.database import get_database
+from .batch_pooling import BatchMetaAnalysisEngine, GENERAL_CONTEXT
+from .bulk_writer import EFFECTS_POOLED_TABLE, BASELINES_POOLED_TABLE, table_frame
+from .pooling_engine import MetaAnalysisEngine, PooledEffect, PooledBaseline
+
+logger = logging.getLogger(__name__)
+
+# estimates_dirty.modifier_token for baseline incidence rows
+BASELINE_MODIFIER = ""
+
+KEY_COLUMNS = ["outcome_token", "modifier_token", "population"]
+
+
+@dataclass
+class RepoolResult:
+    """One published incremental re-pool."""
+    version: str
+    dirty_keys: int
+    effects: List[PooledEffect] = field(default_factory=list)
+    baselines: List[PooledBaseline] = field(default_factory=list)
+    unpoolable: List[Tuple[str, str, str]] = field(default_factory=list)  # (outcome, modifier, context); pooled rows removed
+
+
+class IncrementalRepooler:
+    """
+    Drains estimates_dirty: every dirty (outcome, modifier, population) key re-pools that
+    modifier's 'general' group and its population group, plus any other context already
+    pooled for the pair; dirty baseline keys re-pool the outcome's baselines the same way.
+    Each run first syncs estimates_dirty with the estimates table, so writes that did not
+    mark their keys (raw SQL, deletes, scripts) are picked up too. Groups left below the
+    minimum number of studies have their previous pooled rows deleted. Pooled rows, the
+    new evidence_versions row and the removal of the consumed keys commit together, so
+    readers see either the previous version or the complete new one.
+    """
+
+    def __init__(self, db=None):
+        self.db = db or get_database()
+        self.effect_engine = BatchMetaAnalysisEngine(self.db)
+        self.baseline_engine = MetaAnalysisEngine(self.db)
+
+    def pending_keys(self) -> pd.DataFrame:
+        """Dirty keys not yet re-pooled, oldest mark first."""
+        return self.db.conn.execute("""
+            SELECT outcome_token, modifier_token, population, mark_seq
+            FROM estimates_dirty
+            ORDER BY mark_seq
+        """).df()
+
+    def repool_dirty(self, description: str = None) -> Optional[RepoolResult]:
+        """Re-pool every dirty group and publish a new current evidence version; None when nothing is dirty."""
+        fingerprints = self.db.sync_estimates_dirty()
+        dirty = self.pending_keys()
+        if dirty.empty:
+            logger.info("No dirty estimate keys to re-pool")
+            return None
+
+        # Keys marked after this snapshot (higher mark_seq) stay dirty for the next run
+        snapshot_seq = int(dirty["mark_seq"].max())
+        version = f"v{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        result = RepoolResult(version=version, dirty_keys=len(dirty))
+
+        is_baseline = dirty["modifier_token"] == BASELINE_MODIFIER
+        self._repool_effects(dirty[~is_baseline], result)
+        self._repool_baselines(dirty[is_baseline], result)
+        # Consumed keys record the estimates they were pooled from; later changes show up as new fingerprints
+        state = fingerprints.merge(dirty[KEY_COLUMNS], on=KEY_COLUMNS)
+        self._publish(result, snapshot_seq, dirty[KEY_COLUMNS], state,
+                      description or f"Incremental re-pool of {len(dirty)} dirty keys")
+
+        logger.info(f"Published {version}: {len(result.effects)} effects and {len(result.baselines)} baselines "
+                    f"re-pooled from {len(dirty)} dirty keys")
+        return result
+
+    def _repool_effects(self, dirty: pd.DataFrame, result: RepoolResult):
+        if dirty.empty:
+            return
+        pairs = set(zip(dirty["outcome_token"], dirty["modifier_token"]))
+        outcomes = sorted({outcome for outcome, _ in pairs})
+
+        wanted: Set[Tuple[str, str, str]] = set()
+        for outcome, modifier, population in zip(dirty["outcome_token"], dirty["modifier_token"], dirty["population"]):
+            wanted.add((outcome, modifier, GENERAL_CONTEXT))
+            wanted.add((outcome, modifier, population))
+        existing = self.db.conn.execute(f"""
+            SELECT DISTINCT outcome_token, modifier_token, context_label FROM effects_pooled
+            WHERE context_label IS NOT NULL AND context_label <> '{GENERAL_CONTEXT}'
+              AND outcome_token IN ({', '.join('?' for _ in outcomes)})
+        """, outcomes).fetchall()
+        wanted.update(key for key in existing if key[:2] in pairs)
+
+        estimates = self.effect_engine.load_effect_estimates(
+            outcome_tokens=outcomes,
+            context_labels=sorted({context for _, _, context in wanted}),
+            modifier_tokens=sorted({modifier for _, modifier in pairs})
+        )
+        keys = list(zip(estimates["outcome_token"], estimates["modifier_token"], estimates["context_label"]))
+        estimates = estimates[[key in wanted for key in keys]]
+
+        pooled = self.effect_engine.pool(estimates)
+        if pooled is not None:
+            groups, studies = pooled
+            result.effects = self.effect_engine._to_pooled_effects(groups, studies, result.version,
+                                                                   datetime.now().isoformat())
+        pooled_keys = {(e.outcome_token, e.modifier_token, e.context_label) for e in result.effects}
+        result.unpoolable.extend(sorted(wanted - pooled_keys))
+
+    def _repool_baselines(self, dirty: pd.DataFrame, result: RepoolResult):
+        wanted: Set[Tuple[str, str]] = set()
+        for outcome, population in zip(dirty["outcome_token"], dirty["population"]):
+            wanted.add((outcome, GENERAL_CONTEXT))
+            wanted.add((outcome, population))
+
+        for outcome, context in sorted(wanted):
+            baseline = self.baseline_engine.pool_baseline_risks(
+                outcome, None if context == GENERAL_CONTEXT else context, result.version, store=False)
+            if baseline is not None:
+                result.baselines.append(baseline)
+            else:
+                result.unpoolable.append((outcome, BASELINE_MODIFIER, context))
+
+    def _publish(self, result: RepoolResult, snapshot_seq: int, keys: pd.DataFrame, state: pd.DataFrame,
+                 description: str):
+        changelog = {
+            "effects": [[e.outcome_token, e.modifier_token, e.context_label] for e in result.effects],
+            "baselines": [[b.outcome_token, b.context_label] for b in result.baselines],
+            "unpoolable": [list(key) for key in result.unpoolable],
+        }
+        views = []
+        with self.db.writer() as conn:
+            try:
+                conn.execute("BEGIN TRANSACTION")
+                for table, records in ((EFFECTS_POOLED_TABLE, result.effects),
+                                       (BASELINES_POOLED_TABLE, result.baselines)):
+                    if not records:
+                        continue
+                    view = f"_repool_{table.name}_{uuid.uuid4().hex[:8]}"
+                    conn.register(view, table_frame(table, [table.row(record) for record in records]))
+                    views.append(view)
+                    column_list = ", ".join(name for name, _, _ in table.columns)
+                    conn.execute(f"INSERT OR REPLACE INTO {table.name} ({column_list}) SELECT {column_list} FROM {view}")
+
+                # Groups no longer poolable must not keep serving their previous pooled estimate
+                for outcome, modifier, context in result.unpoolable:
+                    if modifier == BASELINE_MODIFIER:
+                        conn.execute("DELETE FROM baselines_pooled WHERE outcome_token = ? AND context_label = ?",
+                                     [outcome, context])
+                    else:
+                        conn.execute("""
+                            DELETE FROM effects_pooled
+                            WHERE outcome_token = ? AND modifier_token = ? AND context_label = ?
+                        """, [outcome, modifier, context])
+
+                keys_view = f"_repool_keys_{uuid.uuid4().hex[:8]}"
+                state_view = f"_repool_state_{uuid.uuid4().hex[:8]}"
+                conn.register(keys_view, keys)
+                conn.register(state_view, state)
+                views.extend([keys_view, state_view])
+                conn.execute(f"""
+                    DELETE FROM estimates_key_state s USING {keys_view} k
+                    WHERE s.outcome_token = k.outcome_token AND s.modifier_token = k.modifier_token
+                      AND s.population = k.population
+                """)
+                conn.execute(f"""
+                    INSERT INTO estimates_key_state (outcome_token, modifier_token, population, fingerprint, n_estimates)
+                    SELECT outcome_token, modifier_token, population, fingerprint, n_estimates FROM {state_view}
+                """)
+
+                conn.execute("UPDATE evidence_versions SET is_current = FALSE WHERE is_current")
+                conn.execute("""
+                    INSERT INTO evidence_versions (version, description, pools_updated, changelog, is_current)
+                    VALUES (?, ?, ?, ?, TRUE)
+                """, [result.version, description, len(result.effects) + len(result.baselines), json.dumps(changelog)])
+                conn.execute("DELETE FROM estimates_dirty WHERE mark_seq <= ?", [snapshot_seq])
+                conn.execute("COMMIT")
+            except Exception:
+                try:
+                    conn.execute("ROLLBACK")
+                except Exception:
+                    pass
+                raise
+            finally:
+                for view in views:
+                    conn.unregister(view)
+
+        self.db.invalidate_evidence_version()
+        self.db.audit_sink.log_action("evidence_versions", result.version, "INCREMENTAL_REPOOL",
+                                      {"dirty_keys": result.dirty_keys, **changelog})
@@ -60,8 +60,8 @@ class MetaAnalysisEngine:
     and robust heterogeneity assessment.
     """
 
-    def __init__(self):
-        self.db = get_database()
+    def __init__(self, db=None):
+        self.db = db or get_database()
 
         # Minimum study requirements
         self.min_studies_baseline = 2
@@ -71,9 +71,10 @@ class MetaAnalysisEngine:
         self.min_quality_weight = 0.5
 
     def pool_baseline_risks(self, outcome_token: str, context_label: str = None,
-                           evidence_version: str = None) -> Optional[PooledBaseline]:
+                           evidence_version: str = None, store: bool = True) -> Optional[PooledBaseline]:
         """
         Pool baseline risk estimates for an outcome using logit transformation.
+        With store=False the caller persists the result (e.g. in its own transaction).
         """
 
         # Fetch baseline incidence estimates
@@ -135,7 +136,8 @@ class MetaAnalysisEngine:
         )
 
         # Store in database
-        self._store_pooled_baseline(baseline)
+        if store:
+            self._store_pooled_baseline(baseline)
 
         return baseline
 
@@ -434,7 +436,7 @@ class MetaAnalysisEngine:
         """Fetch baseline estimates from database."""
 
         query = """
-            SELECT outcome_token, context_label, baseline_risk, baseline_source
+            SELECT id, pmid, measure, estimate, n_group, n_events, quality_weight, evidence_grade, time_horizon
             FROM estimates
             WHERE outcome_token = ? AND modifier_token IS NULL AND measure = 'INCIDENCE'
         """
@@ -444,16 +446,17 @@ class MetaAnalysisEngine:
             query += " AND (definition_note LIKE ? OR pmid IN (SELECT pmid FROM papers WHERE procedure = ?))"
             params.extend([f"%{context_label}%", context_label])
 
-        query += " ORDER BY quality_weight DESC, year DESC"
+        query += " ORDER BY quality_weight DESC, id"
 
-        results = self.db.conn.execute(query, params).fetchall()
-        return [dict(row) for row in results]
+        cursor = self.db.conn.execute(query, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
     def _get_effect_estimates(self, outcome_token: str, modifier_token: str, context_label: str = None) -> List[Dict]:
         """Fetch effect modifier estimates from database."""
 
         query = """
-            SELECT outcome_token, context_label, baseline_risk, baseline_source
+            SELECT id, pmid, measure, estimate, ci_low, ci_high, adjusted, quality_weight, evidence_grade
             FROM estimates
             WHERE outcome_token = ? AND modifier_token = ? AND measure IN ('OR', 'RR', 'HR')
         """
@@ -463,10 +466,11 @@ class MetaAnalysisEngine:
             query += " AND (definition_note LIKE ? OR pmid IN (SELECT pmid FROM papers WHERE procedure = ?))"
             params.extend([f"%{context_label}%", context_label])
 
-        query += " ORDER BY quality_weight DESC, adjusted DESC, year DESC"
+        query += " ORDER BY quality_weight DESC, adjusted DESC, id"
 
-        results = self.db.conn.execute(query, params).fetchall()
-        return [dict(row) for row in results]
+        cursor = self.db.conn.execute(query, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
     def _determine_time_horizon(self, estimates: List[Dict]) -> str:
         """Determine most common time horizon from estimates."""
@@ -498,7 +502,7 @@ class MetaAnalysisEngine:
     def _store_pooled_baseline(self, baseline: PooledBaseline):
         """Store pooled baseline in database."""
         try:
-            self.db.conn.execute("""
+            self.db.execute_write("""
                 INSERT OR REPLACE INTO baselines_pooled
                 (id, outcome_token, context_label, k, p0_mean, p0_ci_low, p0_ci_high,
                  N_total, time_horizon, pmids, method, i_squared, evidence_version,
@@ -523,7 +527,7 @@ class MetaAnalysisEngine:
     def _store_pooled_effect(self, effect: PooledEffect):
         """Store pooled effect in database."""
         try:
-            self.db.conn.execute("""
+            self.db.execute_write("""
                 INSERT OR REPLACE INTO effects_pooled
                 (id, outcome_token, modifier_token, context_label, k, or_mean,
                  or_ci_low, or_ci_high, log_or_var, method, inputs, pmids,
@@ -568,8 +572,8 @@ class MetaAnalysisEngine:
                          context_label: str = None) -> Optional[PooledEffect]:
         """Retrieve pooled effect from database."""
 
-        query = """
-            SELECT * FROM effects_pooled
+        query = f"""
+            SELECT {', '.join(PooledEffect.__dataclass_fields__)} FROM effects_pooled
             WHERE outcome_token = ? AND modifier_token = ? AND context_label = ?
             ORDER BY updated_at DESC LIMIT 1
         """
@@ -578,7 +582,7 @@ class MetaAnalysisEngine:
                                             context_label or "general"]).fetchone()
 
         if result:
-            row_dict = dict(result)
+            row_dict = dict(zip(PooledEffect.__dataclass_fields__, result))
             row_dict['inputs'] = json.loads(row_dict['inputs'])
             row_dict['pmids'] = json.loads(row_dict['pmids'])
             row_dict['quality_summary'] = json.loads(row_dict['quality_summary'])
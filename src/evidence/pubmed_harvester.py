@@ -3,20 +3,22 @@ Evidence harvest system with PubMed integration.
 Outcome-first approach with comprehensive effect extraction and quality grading.
 """
 
+import io
 import requests
 import xml.etree.ElementTree as ET
-import json
 import re
 import time
 import logging
-from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Tuple, Any, Iterator, Union, BinaryIO
+from dataclasses import dataclass
 from pathlib import Path
 import hashlib
 from datetime import datetime, timedelta
 import os
 
 from ..core.database import get_database
+from .bulk_writer import BulkWriter
+from .effect_extractor import EffectEstimate, get_effect_extractor
 
 logger = logging.getLogger(__name__)
 
@@ -42,28 +44,6 @@ class PubMedPaper:
     study_quality_score: float = 0.0
     evidence_grade: str = "D"
 
-@dataclass
-class EffectEstimate:
-    id: str
-    pmid: str
-    outcome_token: str
-    modifier_token: Optional[str]
-    measure: str  # OR, RR, HR, INCIDENCE
-    estimate: float
-    ci_low: Optional[float]
-    ci_high: Optional[float]
-    adjusted: bool
-    n_group: Optional[int]
-    n_events: Optional[int]
-    definition_note: str
-    time_horizon: str
-    quality_weight: float
-    evidence_grade: str
-    population_match: float
-    extraction_confidence: float
-    covariates: List[str]
-    subgroup: str
-
 class PubMedHarvester:
     """
     Comprehensive PubMed evidence harvester with outcome-first queries,
@@ -81,8 +61,9 @@ class PubMedHarvester:
         self.requests_per_second = 10 if self.api_key else 3
         self.last_request_time = 0
 
-        # Effect pattern matchers
-        self.effect_patterns = self._build_effect_patterns()
+        # Effect extraction (compiled single-scan engine shared by every harvester)
+        self.effect_extractor = get_effect_extractor()
+        self.effect_patterns = self.effect_extractor.patterns
 
         # Quality scoring weights
         self.design_weights = {
@@ -98,35 +79,6 @@ class PubMedHarvester:
             "case report": 0.5
         }
 
-    def _build_effect_patterns(self) -> List[re.Pattern]:
-        """Build regex patterns for extracting effect estimates."""
-        patterns = [
-            # Odds ratios
-            re.compile(r"\b(?:OR|odds\s+ratio)\s*[:=]?\s*([0-9]+(?:\.[0-9]+)?)\s*(?:\(([0-9.]+)\s*[-–]\s*([0-9.]+)\))?", re.I),
-            re.compile(r"\bodds\s+ratio\s*[:=]?\s*([0-9]+(?:\.[0-9]+)?)", re.I),
-
-            # Relative risks
-            re.compile(r"\b(?:RR|relative\s+risk)\s*[:=]?\s*([0-9]+(?:\.[0-9]+)?)\s*(?:\(([0-9.]+)\s*[-–]\s*([0-9.]+)\))?", re.I),
-            re.compile(r"\brisk\s+ratio\s*[:=]?\s*([0-9]+(?:\.[0-9]+)?)", re.I),
-
-            # Hazard ratios
-            re.compile(r"\b(?:HR|hazard\s+ratio)\s*[:=]?\s*([0-9]+(?:\.[0-9]+)?)\s*(?:\(([0-9.]+)\s*[-–]\s*([0-9.]+)\))?", re.I),
-
-            # Incidence rates
-            re.compile(r"\bincidence\s*[:=]?\s*([0-9]+(?:\.[0-9]+)?)\s*%", re.I),
-            re.compile(r"([0-9]+(?:\.[0-9]+)?)\s*%\s*(?:of|in)", re.I),
-            re.compile(r"([0-9]+)\s*\/\s*([0-9]+)", re.I),  # n/N format
-
-            # Multiplier expressions
-            re.compile(r"\b([0-9]+(?:\.[0-9]+)?)\s*(?:times|fold)\s+(?:higher|increased|greater|more\s+likely)", re.I),
-            re.compile(r"\b([0-9]+(?:\.[0-9]+)?)\s*×\s*(?:higher|increased)", re.I),
-
-            # P-values and significance
-            re.compile(r"\bp\s*[<>=]\s*([0-9.]+)", re.I),
-            re.compile(r"\bp-value\s*[:=]?\s*([0-9.]+)", re.I),
-        ]
-        return patterns
-
     def _rate_limit(self):
         """Enforce rate limiting."""
         current_time = time.time()
@@ -236,21 +188,41 @@ class PubMedHarvester:
 
     def _parse_pubmed_xml(self, xml_content: str, raw_path: str) -> List[PubMedPaper]:
         """Parse PubMed XML into structured papers."""
-        papers = []
+        return list(self.iter_pubmed_xml(io.BytesIO(xml_content.encode('utf-8')), raw_path))
+
+    def iter_pubmed_xml(self, source: Union[str, Path, BinaryIO], raw_path: str = None) -> Iterator[PubMedPaper]:
+        """
+        Stream papers out of an efetch XML document (a file path or binary file object).
 
+        Uses incremental iterparse and drops each PubmedArticle subtree as soon
+        as it has been parsed, so memory stays flat however large the batch is.
+        A parse error ends the document; papers already yielded stand.
+        """
+        if raw_path is None:
+            raw_path = str(source) if isinstance(source, (str, Path)) else ""
+
+        root = None
         try:
-            root = ET.fromstring(xml_content)
-            articles = root.findall('.//PubmedArticle')
+            for event, elem in ET.iterparse(source, events=("start", "end")):
+                if root is None:
+                    root = elem
+                if event != "end" or elem.tag != "PubmedArticle":
+                    continue
 
-            for article in articles:
-                paper = self._parse_single_article(article, raw_path)
+                paper = self._parse_single_article(elem, raw_path)
+                # Completed articles are children of the root; release them
+                root.clear()
                 if paper:
-                    papers.append(paper)
+                    yield paper
 
         except ET.ParseError as e:
-            logger.error(f"XML parsing error: {e}")
+            logger.error(f"XML parsing error in {raw_path or 'response'}: {e}")
 
-        return papers
+    def iter_raw_directory(self, raw_dir: Union[str, Path] = "database/raw_xml",
+                           pattern: str = "pubmed_batch_*.xml") -> Iterator[PubMedPaper]:
+        """Stream papers from every stored raw batch in a directory, file by file."""
+        for path in raw_xml_files(raw_dir, pattern):
+            yield from self.iter_pubmed_xml(path)
 
     def _parse_single_article(self, article: ET.Element, raw_path: str) -> Optional[PubMedPaper]:
         """Parse a single PubMed article."""
@@ -499,170 +471,7 @@ class PubMedHarvester:
 
     def extract_effects(self, paper: PubMedPaper, outcome_tokens: List[str]) -> List[EffectEstimate]:
         """Extract effect estimates from a paper."""
-        effects = []
-        text = f"{paper.title} {paper.abstract}"
-
-        # Extract all numerical estimates
-        for pattern in self.effect_patterns:
-            for match in pattern.finditer(text):
-                effect = self._parse_effect_match(match, paper, outcome_tokens, text)
-                if effect:
-                    effects.append(effect)
-
-        return effects
-
-    def _parse_effect_match(self, match: re.Match, paper: PubMedPaper,
-                          outcome_tokens: List[str], text: str) -> Optional[EffectEstimate]:
-        """Parse a regex match into an effect estimate."""
-        try:
-            # Extract estimate value
-            estimate = float(match.group(1))
-
-            # Skip unreasonable values
-            if estimate <= 0 or estimate > 100:
-                return None
-
-            # Extract confidence interval if present
-            ci_low = ci_high = None
-            if len(match.groups()) >= 3 and match.group(2) and match.group(3):
-                ci_low = float(match.group(2))
-                ci_high = float(match.group(3))
-
-            # Determine measure type from context
-            context = text[max(0, match.start()-100):match.end()+100].lower()
-            if any(term in context for term in ["odds ratio", "or ="]):
-                measure = "OR"
-            elif any(term in context for term in ["relative risk", "rr ="]):
-                measure = "RR"
-            elif any(term in context for term in ["hazard ratio", "hr ="]):
-                measure = "HR"
-            elif "%" in match.group(0) or "/" in match.group(0):
-                measure = "INCIDENCE"
-            else:
-                measure = "OR"  # Default assumption
-
-            # Try to identify outcome from context
-            outcome_token = self._identify_outcome(context, outcome_tokens)
-            if not outcome_token:
-                return None
-
-            # Generate unique ID
-            effect_id = f"{paper.pmid}_{outcome_token}_{measure}_{estimate}"
-
-            # Determine if adjusted
-            adjusted = any(term in context for term in ["adjusted", "multivariate", "multivariable"])
-
-            # Extract sample information
-            n_group = self._extract_group_size(context)
-            n_events = self._extract_event_count(context)
-
-            effect = EffectEstimate(
-                id=effect_id,
-                pmid=paper.pmid,
-                outcome_token=outcome_token,
-                modifier_token=None,  # Will be determined later
-                measure=measure,
-                estimate=estimate,
-                ci_low=ci_low,
-                ci_high=ci_high,
-                adjusted=adjusted,
-                n_group=n_group,
-                n_events=n_events,
-                definition_note=context[:200],
-                time_horizon=paper.time_horizon,
-                quality_weight=paper.study_quality_score,
-                evidence_grade=paper.evidence_grade,
-                population_match=1.0,  # Will be calculated
-                extraction_confidence=self._calculate_extraction_confidence(match, context),
-                covariates=self._extract_covariates(context),
-                subgroup=""
-            )
-
-            return effect
-
-        except (ValueError, IndexError):
-            return None
-
-    def _identify_outcome(self, context: str, outcome_tokens: List[str]) -> Optional[str]:
-        """Identify which outcome this effect estimate refers to."""
-        context_lower = context.lower()
-
-        # Check for direct matches
-        for token in outcome_tokens:
-            # Get synonyms from ontology
-            # For now, simple keyword matching
-            if any(keyword in context_lower for keyword in [
-                "bronchospasm", "laryngospasm", "hypotension", "mortality",
-                "bleeding", "infection", "pneumonia"
-            ]):
-                return token
-
-        return None
-
-    def _extract_group_size(self, context: str) -> Optional[int]:
-        """Extract group size from context."""
-        # Simple pattern matching for group sizes
-        pattern = re.compile(r"([0-9]+)\s+(?:patients|subjects|participants)")
-        match = pattern.search(context)
-        if match:
-            try:
-                return int(match.group(1))
-            except ValueError:
-                pass
-        return None
-
-    def _extract_event_count(self, context: str) -> Optional[int]:
-        """Extract event count from context."""
-        # Look for "X events" or "X/Y" patterns
-        patterns = [
-            re.compile(r"([0-9]+)\s+events"),
-            re.compile(r"([0-9]+)\s+cases"),
-            re.compile(r"([0-9]+)/[0-9]+")
-        ]
-
-        for pattern in patterns:
-            match = pattern.search(context)
-            if match:
-                try:
-                    return int(match.group(1))
-                except ValueError:
-                    continue
-        return None
-
-    def _calculate_extraction_confidence(self, match: re.Match, context: str) -> float:
-        """Calculate confidence in the extraction."""
-        confidence = 1.0
-
-        # Reduce confidence if context is ambiguous
-        if len(context.strip()) < 50:
-            confidence *= 0.8
-
-        # Increase confidence if CI is present
-        if len(match.groups()) >= 3 and match.group(2):
-            confidence *= 1.2
-
-        # Check for statistical significance mentions
-        if any(term in context.lower() for term in ["p <", "significant", "ci"]):
-            confidence *= 1.1
-
-        return min(confidence, 1.0)
-
-    def _extract_covariates(self, context: str) -> List[str]:
-        """Extract covariates from adjustment description."""
-        covariates = []
-        context_lower = context.lower()
-
-        # Common covariates in anesthesia literature
-        covariate_terms = [
-            "age", "sex", "bmi", "asa", "emergency", "duration",
-            "comorbidities", "smoking", "diabetes", "hypertension"
-        ]
-
-        for term in covariate_terms:
-            if term in context_lower:
-                covariates.append(term)
-
-        return covariates
+        return self.effect_extractor.extract(paper, outcome_tokens)
 
     def harvest_outcome(self, outcome_token: str, population: str = "both") -> List[PubMedPaper]:
         """Harvest evidence for a specific outcome."""
@@ -683,7 +492,7 @@ class PubMedHarvester:
         # Store in database
         for paper in papers:
             paper.ingest_query_id = f"{outcome_token}_{population}_{datetime.now().isoformat()}"
-            self._store_paper(paper)
+        self.store_papers(papers)
 
         logger.info(f"Harvested {len(papers)} papers for outcome: {outcome_token}")
         return papers
@@ -725,49 +534,47 @@ class PubMedHarvester:
 
     def _store_paper(self, paper: PubMedPaper):
         """Store paper in database."""
-        try:
-            self.db.conn.execute("""
-                INSERT OR REPLACE INTO papers
-                (pmid, title, abstract, journal, year, design, n_total, population,
-                 procedure, time_horizon, url, raw_path, ingest_query_id, doi,
-                 authors, keywords, mesh_terms, study_quality_score, evidence_grade)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, [
-                paper.pmid, paper.title, paper.abstract, paper.journal, paper.year,
-                paper.design, paper.n_total, paper.population, paper.procedure,
-                paper.time_horizon, paper.url, paper.raw_path, paper.ingest_query_id,
-                paper.doi, json.dumps(paper.authors or []),
-                json.dumps(paper.keywords or []), json.dumps(paper.mesh_terms or []),
-                paper.study_quality_score, paper.evidence_grade
-            ])
-
-            # Log the action
-            self.db.log_action("papers", paper.pmid, "INSERT", asdict(paper))
+        self.store_papers([paper])
 
-        except Exception as e:
-            logger.error(f"Error storing paper {paper.pmid}: {e}")
+    def store_papers(self, papers: List[PubMedPaper]) -> int:
+        """Upsert papers in bulk (one statement and one audit row per batch). Returns rows written."""
+        with BulkWriter(self.db) as writer:
+            writer.add_papers(papers)
+        return writer.rows_written["papers"]
 
     def store_effect(self, effect: EffectEstimate):
         """Store effect estimate in database."""
-        try:
-            self.db.conn.execute("""
-                INSERT OR REPLACE INTO estimates
-                (id, pmid, outcome_token, modifier_token, measure, estimate,
-                 ci_low, ci_high, adjusted, n_group, n_events, definition_note,
-                 time_horizon, quality_weight, evidence_grade, population_match,
-                 extraction_confidence, covariates, subgroup)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, [
-                effect.id, effect.pmid, effect.outcome_token, effect.modifier_token,
-                effect.measure, effect.estimate, effect.ci_low, effect.ci_high,
-                effect.adjusted, effect.n_group, effect.n_events, effect.definition_note,
-                effect.time_horizon, effect.quality_weight, effect.evidence_grade,
-                effect.population_match, effect.extraction_confidence,
-                json.dumps(effect.covariates), effect.subgroup
-            ])
-
-            # Log the action
-            self.db.log_action("estimates", effect.id, "INSERT", asdict(effect))
+        self.store_effects([effect])
 
-        except Exception as e:
-            logger.error(f"Error storing effect {effect.id}: {e}")
\ No newline at end of file
+    def store_effects(self, effects: List[EffectEstimate]) -> int:
+        """Upsert effect estimates in bulk. Returns rows written."""
+        with BulkWriter(self.db) as writer:
+            writer.add_effects(effects)
+        return writer.rows_written["estimates"]
+
+
+def raw_xml_files(raw_dir: Union[str, Path] = "database/raw_xml", pattern: str = "pubmed_batch_*.xml") -> List[str]:
+    """Stored raw efetch batches, in a stable order."""
+    return sorted(str(path) for path in Path(raw_dir).glob(pattern))
+
+
+# Per-process harvester used by parse_raw_file in re-ingest worker processes
+_worker_harvester = None
+
+
+def init_reingest_worker():
+    """Process-pool initializer: a parse-only harvester with a private in-memory database."""
+    global _worker_harvester
+    from ..core.database import init_database
+
+    # Workers only parse; the parent process is the single writer of the real database
+    init_database(":memory:")
+    _worker_harvester = PubMedHarvester()
+
+
+def parse_raw_file(path: str) -> Tuple[str, List[PubMedPaper]]:
+    """Parse one stored raw batch (in a worker process) into papers."""
+    global _worker_harvester
+    if _worker_harvester is None:
+        _worker_harvester = PubMedHarvester()
+    return path, list(_worker_harvester.iter_pubmed_xml(path))
@@ -0,0 +1,225 @@
+"""
+Set-based temporal-weighting pooling: exp-decay recency weights, modern-era and guideline multipliers, inverse-variance pooling.
+Every outcome/modifier/population group and every (tau, modern_cutoff) pair is pooled in one DuckDB aggregate query.
+"""
+
+import json
+import uuid
+import logging
+from datetime import datetime
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+from ..core.database import get_database
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TAU = 7.0
+DEFAULT_MODERN_CUTOFF = 2015
+GUIDELINE_WEIGHT_MULTIPLIER = 1.5  # Extra weight for recent guidelines
+MODERN_PRACTICE_MULTIPLIER = 1.3  # Extra weight for modern cohorts
+INVALID_YEAR_WEIGHT = 0.1  # Temporal weight for missing or implausible publication years
+EARLIEST_VALID_YEAR = 1950
+DATA_AGE_WARNING_YEARS = 15
+ADJUSTMENT_THRESHOLD = 0.01  # |temporal - raw| above this counts as a temporal adjustment
+
+GUIDELINE_TYPES = ("guideline", "consensus", "recommendation")
+
+# Legacy risk_calculations layout (one row per group for one parameter set)
+RISK_CALCULATIONS_COLUMNS = (
+    "calculation_id", "outcome_token", "modifier_token", "population", "calculation_type",
+    "raw_estimate", "raw_standard_error", "raw_ci_lower", "raw_ci_upper",
+    "temporal_estimate", "temporal_standard_error", "temporal_ci_lower", "temporal_ci_upper",
+    "studies_count", "temporal_adjustment_applied", "average_publication_year", "data_age_warning",
+    "oldest_study", "newest_study", "calculation_timestamp", "temporal_parameters"
+)
+
+RISK_CALCULATIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS risk_calculations (
+        calculation_id TEXT PRIMARY KEY,
+        outcome_token TEXT NOT NULL,
+        modifier_token TEXT,
+        population TEXT NOT NULL,
+        calculation_type TEXT NOT NULL,
+        raw_estimate REAL,
+        raw_standard_error REAL,
+        raw_ci_lower REAL,
+        raw_ci_upper REAL,
+        temporal_estimate REAL,
+        temporal_standard_error REAL,
+        temporal_ci_lower REAL,
+        temporal_ci_upper REAL,
+        studies_count INTEGER,
+        temporal_adjustment_applied BOOLEAN,
+        average_publication_year REAL,
+        data_age_warning BOOLEAN,
+        oldest_study INTEGER,
+        newest_study INTEGER,
+        calculation_timestamp TEXT,
+        temporal_parameters TEXT
+    )
+"""
+
+# One row per (group, study): population-specific groups also take the 'mixed' studies.
+# Raw weight = inverse variance (from the 95% CI, else SE ~ 1/sqrt(n), else 1) x evidence grade weight.
+EVIDENCE_CTE = f"""
+    evidence AS (
+        SELECT e.outcome_token, e.modifier_token,
+               COALESCE(p.population, 'mixed') AS population,
+               e.estimate,
+               CASE WHEN e.ci_low IS NOT NULL AND e.ci_high > e.ci_low
+                        THEN 1.0 / power((e.ci_high - e.ci_low) / (2 * 1.96), 2)
+                    WHEN e.n_group > 0 THEN CAST(e.n_group AS DOUBLE)
+                    ELSE 1.0 END
+               * CASE e.evidence_grade WHEN 'A' THEN 4.0 WHEN 'B' THEN 3.0 WHEN 'C' THEN 2.0 ELSE 1.0 END
+                   AS raw_weight,
+               p.year AS publication_year,
+               lower(COALESCE(p.design, 'study')) IN {GUIDELINE_TYPES} AS is_guideline
+        FROM estimates e
+        LEFT JOIN papers p ON p.pmid = e.pmid
+        WHERE e.estimate IS NOT NULL
+    ),
+    groups AS (
+        SELECT DISTINCT outcome_token, modifier_token, population FROM evidence
+    ),
+    group_evidence AS (
+        SELECT g.outcome_token, g.modifier_token, g.population,
+               e.estimate, e.raw_weight, e.publication_year, e.is_guideline
+        FROM groups g
+        JOIN evidence e
+          ON e.outcome_token = g.outcome_token
+         AND e.modifier_token IS NOT DISTINCT FROM g.modifier_token
+         AND (e.population = g.population OR e.population = 'mixed')
+    )
+"""
+
+POOL_QUERY = """
+    WITH sweep(tau, modern_cutoff) AS (VALUES {sweep_values}),
+    {evidence_cte},
+    weighted AS (
+        SELECT x.*, s.tau, s.modern_cutoff,
+               x.raw_weight * CASE
+                   WHEN x.publication_year IS NULL OR x.publication_year < $earliest_year
+                        OR x.publication_year > $current_year THEN $invalid_weight
+                   ELSE exp(-($current_year - x.publication_year) / s.tau)
+                        * CASE WHEN x.is_guideline AND x.publication_year >= s.modern_cutoff
+                               THEN $guideline_multiplier ELSE 1.0 END
+                        * CASE WHEN x.publication_year >= s.modern_cutoff
+                               THEN $modern_multiplier ELSE 1.0 END
+               END AS temporal_weight
+        FROM group_evidence x
+        CROSS JOIN sweep s
+    )
+    SELECT outcome_token, modifier_token, population, tau, modern_cutoff,
+           CASE WHEN modifier_token IS NULL THEN 'baseline_risk' ELSE 'modifier_effect' END AS calculation_type,
+           sum(raw_weight * estimate) / sum(raw_weight) AS raw_estimate,
+           1.0 / sqrt(sum(raw_weight)) AS raw_standard_error,
+           sum(temporal_weight * estimate) / sum(temporal_weight) AS temporal_estimate,
+           1.0 / sqrt(sum(temporal_weight)) AS temporal_standard_error,
+           count(*) AS studies_count,
+           avg(publication_year) FILTER (WHERE publication_year <> 0) AS average_publication_year,
+           min(publication_year) FILTER (WHERE publication_year <> 0) AS oldest_study,
+           max(publication_year) FILTER (WHERE publication_year <> 0) AS newest_study
+    FROM weighted
+    GROUP BY outcome_token, modifier_token, population, tau, modern_cutoff
+    ORDER BY calculation_type, outcome_token, modifier_token NULLS FIRST, population, tau, modern_cutoff
+"""
+
+
+class TemporalPoolingEngine:
+    """
+    Temporal-weighting pooling over all outcomes at once.
+
+    Each study's raw weight (inverse variance x evidence grade) is multiplied by
+    exp(-(current_year - year) / tau), with modern-era and guideline multipliers
+    from modern_cutoff on. Raw and temporal pooled estimates come from the same
+    aggregate; several (tau, modern_cutoff) pairs are pooled in the same pass.
+    """
+
+    def __init__(self, db=None, current_year: int = None):
+        self.db = db or get_database()
+        self.current_year = current_year or datetime.now().year
+        self.guideline_weight_multiplier = GUIDELINE_WEIGHT_MULTIPLIER
+        self.modern_practice_multiplier = MODERN_PRACTICE_MULTIPLIER
+
+    def pool(self, taus: Sequence[float] = (DEFAULT_TAU,),
+             modern_cutoffs: Sequence[int] = (DEFAULT_MODERN_CUTOFF,)) -> pd.DataFrame:
+        """
+        Pool every baseline and modifier group for every (tau, modern_cutoff) combination.
+        Returns one row per group and parameter pair, with CIs and data-age flags.
+        """
+        sweep = [(float(tau), int(cutoff)) for tau in taus for cutoff in modern_cutoffs]
+        if not sweep or any(tau <= 0 for tau, _ in sweep):
+            raise ValueError("tau values must be positive and at least one parameter pair is required")
+
+        query = POOL_QUERY.format(
+            sweep_values=", ".join(f"({tau!r}::DOUBLE, {cutoff}::INTEGER)" for tau, cutoff in sweep),
+            evidence_cte=EVIDENCE_CTE
+        )
+        frame = self.db.conn.execute(query, {
+            "earliest_year": EARLIEST_VALID_YEAR,
+            "current_year": self.current_year,
+            "invalid_weight": INVALID_YEAR_WEIGHT,
+            "guideline_multiplier": self.guideline_weight_multiplier,
+            "modern_multiplier": self.modern_practice_multiplier,
+        }).df()
+
+        for prefix in ("raw", "temporal"):
+            estimate = frame[f"{prefix}_estimate"]
+            se = frame[f"{prefix}_standard_error"]
+            frame[f"{prefix}_ci_lower"] = estimate - 1.96 * se
+            frame[f"{prefix}_ci_upper"] = estimate + 1.96 * se
+        frame["temporal_adjustment_applied"] = (frame["temporal_estimate"] - frame["raw_estimate"]).abs() > ADJUSTMENT_THRESHOLD
+        age = self.current_year - frame["average_publication_year"].to_numpy(dtype=float, na_value=np.nan)
+        frame["data_age_warning"] = np.nan_to_num(age, nan=0.0) > DATA_AGE_WARNING_YEARS
+        return frame
+
+    def sensitivity(self, pooled: pd.DataFrame) -> pd.DataFrame:
+        """Per group: spread of the temporal estimate across the swept parameters."""
+        keys = ["calculation_type", "outcome_token", "modifier_token", "population"]
+        summary = pooled.groupby(keys, dropna=False, sort=True)["temporal_estimate"].agg(["min", "max", "std"])
+        summary["range"] = summary["max"] - summary["min"]
+        return summary.reset_index()
+
+    def parameters(self, tau: float, modern_cutoff: int) -> Dict:
+        return {
+            'tau': tau,
+            'modern_cutoff': modern_cutoff,
+            'guideline_weight_multiplier': self.guideline_weight_multiplier,
+            'modern_practice_multiplier': self.modern_practice_multiplier,
+            'calculation_date': datetime.now().isoformat()
+        }
+
+    def store(self, pooled: pd.DataFrame, tau: float = DEFAULT_TAU,
+              modern_cutoff: int = DEFAULT_MODERN_CUTOFF) -> int:
+        """Write one parameter pair's groups into risk_calculations with a single INSERT ... SELECT."""
+        rows = pooled[(pooled["tau"] == tau) & (pooled["modern_cutoff"] == modern_cutoff)].copy()
+        if rows.empty:
+            return 0
+
+        stamp = datetime.now()
+        suffix = stamp.strftime('%Y%m%d_%H%M%S')
+        rows["calculation_id"] = [
+            f"baseline_{outcome}_{population}_{suffix}" if modifier is None or modifier != modifier
+            else f"modifier_{outcome}_{modifier}_{population}_{suffix}"
+            for outcome, modifier, population in zip(rows["outcome_token"], rows["modifier_token"], rows["population"])
+        ]
+        rows["calculation_timestamp"] = stamp.isoformat()
+        rows["temporal_parameters"] = json.dumps(self.parameters(tau, modern_cutoff))
+        frame = rows[list(RISK_CALCULATIONS_COLUMNS)]
+
+        view = f"_temporal_{uuid.uuid4().hex[:8]}"
+        column_list = ", ".join(RISK_CALCULATIONS_COLUMNS)
+        with self.db.writer() as conn:
+            conn.execute(RISK_CALCULATIONS_DDL)
+            conn.register(view, frame)
+            try:
+                conn.execute(f"INSERT OR REPLACE INTO risk_calculations ({column_list}) SELECT {column_list} FROM {view}")
+            finally:
+                conn.unregister(view)
+
+        logger.info(f"Stored {len(frame)} temporal risk calculations (tau={tau}, cutoff={modern_cutoff})")
+        return len(frame)
+
@@ -368,6 +368,9 @@ def generate_plan():
         if not session_id:
             return jsonify({"error": "Session ID is required"}), 400
 
+        # The session row may still be queued in the audit sink
+        db.audit_sink.flush()
+
         # Retrieve session data
         session_data = db.conn.execute("""
             SELECT hpi_text, parsed_factors, risk_scores, medication_recommendations
@@ -31,7 +31,8 @@ class LearningItemGenerator:
                         mode: LearningMode,
                         n_items: int = 8,
                         seed: Optional[int] = None,
-                        guidelines: List[Dict[str, Any]] = None) -> LearningSession:
+                        guidelines: List[Dict[str, Any]] = None,
+                        case=None) -> LearningSession:
         """
         Generate a learning session from current case data
 
@@ -43,6 +44,7 @@ class LearningItemGenerator:
             n_items: Number of questions to generate
             seed: Random seed for reproducibility
             guidelines: Attached guidelines/citations
+            case: Shared ParsedCase for this HPI, if the request named one
 
         Returns:
             LearningSession with patient-anchored questions
@@ -54,7 +56,7 @@ class LearningItemGenerator:
 
         # Extract patient context
         context = self.context_extractor.extract_from_app_state(
-            parsed_hpi, risk_assessments, medication_plan, guidelines
+            parsed_hpi, risk_assessments, medication_plan, guidelines, case=case
         )
 
         # Validate sufficient case data
@@ -307,5 +309,6 @@ class LearningItemGenerator:
             medication_plan=app_state.get('medication_plan', {}),
             mode=mode,
             n_items=n_items,
-            guidelines=app_state.get('guidelines', [])
+            guidelines=app_state.get('guidelines', []),
+            case=app_state.get('case')
         )
\ No newline at end of file
@@ -16,7 +16,8 @@ class PatientContextExtractor:
                              parsed_hpi: Dict[str, Any],
                              risk_assessments: List[Dict[str, Any]],
                              medication_plan: Dict[str, Any],
-                             guidelines: List[Dict[str, Any]] = None) -> PatientContext:
+                             guidelines: List[Dict[str, Any]] = None,
+                             case=None) -> PatientContext:
         """
         Extract patient context from current app state
 
@@ -25,6 +26,7 @@ class PatientContextExtractor:
             risk_assessments: List of risk assessment results
             medication_plan: Medication recommendations
             guidelines: Attached guidelines/citations
+            case: Shared ParsedCase for this HPI; its text context is reused instead of re-extracted
 
         Returns:
             PatientContext object for learning item generation
@@ -39,9 +41,10 @@ class PatientContextExtractor:
         context.bmi = demographics.get('bmi')
 
         # Extract surgery information
-        context.surgery_domain = self._extract_surgery_domain(parsed_hpi.get('raw_text', ''))
-        context.procedure_keywords = self._extract_procedure_keywords(parsed_hpi.get('raw_text', ''))
-        context.urgency = self._extract_urgency(parsed_hpi.get('raw_text', ''))
+        text_context = case.context if case is not None else self.text_context(parsed_hpi.get('raw_text', ''))
+        context.surgery_domain = text_context['surgery_domain']
+        context.procedure_keywords = text_context['procedure_keywords']
+        context.urgency = text_context['urgency']
 
         # Extract parsed features
         context.extracted_factors = parsed_hpi.get('extracted_factors', [])
@@ -59,6 +62,14 @@ class PatientContextExtractor:
 
         return context
 
+    def text_context(self, hpi_text: str) -> Dict[str, Any]:
+        """Surgery domain, procedure keywords and urgency from the raw HPI text"""
+        return {
+            'surgery_domain': self._extract_surgery_domain(hpi_text),
+            'procedure_keywords': self._extract_procedure_keywords(hpi_text),
+            'urgency': self._extract_urgency(hpi_text)
+        }
+
     def _extract_surgery_domain(self, hpi_text: str) -> Optional[str]:
         """Extract surgery domain from HPI text"""
         domain_patterns = {
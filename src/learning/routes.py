@@ -15,6 +15,7 @@ from .generator import LearningItemGenerator
 from .scorer import LearningScorer
 from .schemas import LearningMode, UserResponse
 from .cme import CMEManager
+from ..core.case_store import get_case_store
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +37,8 @@ def generate_learning_session():
         mode: "basics" | "board",
         n_items: number,
         seed?: number,
-        case_context: true
+        case_context: true,
+        case_id?: string   (case from /api/analyze; defaults to the session's case data)
     }
     """
     try:
@@ -61,8 +63,12 @@ def generate_learning_session():
         if not case_context:
             return jsonify({'error': 'case_context must be true for patient-anchored learning'}), 400
 
-        # Get current app state from session or request
-        app_state = _get_current_app_state()
+        # Get current app state from the shared case store or the session
+        case_id = data.get('case_id')
+        app_state = _get_current_app_state(case_id)
+        if case_id and not app_state:
+            # Neither this worker's case store nor the session has the case
+            return jsonify({'error': f'Unknown case_id {case_id}'}), 404
         if not app_state:
             return jsonify({'error': 'No current patient case data available'}), 400
 
@@ -74,7 +80,8 @@ def generate_learning_session():
             mode=mode,
             n_items=n_items,
             seed=seed,
-            guidelines=app_state.get('guidelines', [])
+            guidelines=app_state.get('guidelines', []),
+            case=app_state.get('case')
         )
 
         # Convert to response format
@@ -295,10 +302,23 @@ def report_problem():
 
 # Helper functions
 
-def _get_current_app_state() -> Dict[str, Any]:
-    """Get current app state from session or global state"""
-    # In production, this would retrieve current case data
-    # For now, return mock data structure
+def _get_current_app_state(case_id: str = None) -> Dict[str, Any]:
+    """
+    Get current app state from the case store (by case_id) or the session.
+    The store is per worker process, so a case_id it does not hold (other
+    worker, evicted, expired) falls back to the session's case data.
+    """
+    if case_id:
+        case = get_case_store().get(case_id)
+        if case is None:
+            return flask_session.get('current_case_data', {})
+        return {
+            'parsed_hpi': {**case.analysis, 'raw_text': case.hpi_text},
+            'risk_assessments': case.get('risk_assessments', []),
+            'medication_plan': case.get('medication_plan', {}),
+            'guidelines': case.get('guidelines', []),
+            'case': case
+        }
     return flask_session.get('current_case_data', {})
 
 def _store_session(learning_session):
@@ -10,13 +10,18 @@ import uuid
 import logging
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Tuple, Union
-from dataclasses import dataclass, asdict, field
+from dataclasses import dataclass, asdict, field, replace
 from enum import Enum
 import duckdb
 import os
 
+from src.core.parse_cache import get_parse_cache, ruleset_version
+
 logger = logging.getLogger(__name__)
 
+# Bump when analysis logic changes in ways the pattern tables do not capture
+ANALYZER_VERSION = "1"
+
 class ConfidenceLevel(Enum):
     """Confidence levels for NLP extractions"""
     HIGH = "high"        # 0.8-1.0
@@ -156,8 +161,9 @@ class UnifiedMedicalNLP:
         # Load ontology mapping for standardization
         self.ontology_mapping = self._load_ontology()
 
-        # Analysis caching for performance
-        self._analysis_cache = {}
+        # Analysis caching for performance (shared, bounded, content-addressed)
+        self._analysis_cache = get_parse_cache()
+        self.cache_version = ruleset_version(ANALYZER_VERSION, self.medical_patterns, self.ontology_mapping)
 
         logger.info("Unified Medical NLP Engine initialized")
 
@@ -300,11 +306,12 @@ class UnifiedMedicalNLP:
         analysis_id = str(uuid.uuid4())
         session_id = session_id or f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
-        # Check cache first
-        cache_key = f"{session_id}_{hash(hpi_text)}"
-        if cache_key in self._analysis_cache:
+        # Check the shared parse cache first (keyed by text, not session)
+        cached = self._analysis_cache.get("UnifiedMedicalNLP", self.cache_version, hpi_text)
+        if cached is not None:
             logger.info(f"Returning cached analysis for session {session_id}")
-            return self._analysis_cache[cache_key]
+            return replace(cached, analysis_id=analysis_id, session_id=session_id,
+                           raw_hpi_text=hpi_text, analysis_timestamp=datetime.now())
 
         logger.info(f"Starting comprehensive HPI analysis for session {session_id}")
 
@@ -345,7 +352,7 @@ class UnifiedMedicalNLP:
         )
 
         # Cache the analysis
-        self._analysis_cache[cache_key] = analysis
+        self._analysis_cache.put("UnifiedMedicalNLP", self.cache_version, hpi_text, analysis)
 
         logger.info(f"Analysis complete - Confidence: {overall_confidence:.2f}, "
                    f"Entities: {len(symptoms + medications + risk_factors + procedures)}")
@@ -0,0 +1,31 @@
+"""
+Shared test fixtures: PubMedPaper and EffectEstimate factories for the evidence tests
+"""
+
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_paper(pmid, year=2020, title="t", design="cohort", n_total=100, population="adult",
+               procedure="general", authors=None):
+    # Imported here: pubmed_harvester needs `requests`, which unrelated test modules must not
+    from src.evidence.pubmed_harvester import PubMedPaper
+    return PubMedPaper(pmid=pmid, title=title, abstract="a", journal="j", year=year, design=design,
+                       n_total=n_total, population=population, procedure=procedure, time_horizon="30d",
+                       url="u", raw_path="r", ingest_query_id="q", authors=authors)
+
+
+def make_effect(effect_id, pmid, modifier="ASTHMA", estimate=2.0, ci=None, outcome="LARYNGOSPASM",
+                measure=None, grade="B", adjusted=False, quality=1.0, note="", n_group=None,
+                time_horizon="30d", covariates=None):
+    """Effect estimate; measure defaults to OR for a modifier and INCIDENCE for a baseline (modifier None)."""
+    from src.evidence.pubmed_harvester import EffectEstimate
+    return EffectEstimate(id=effect_id, pmid=pmid, outcome_token=outcome, modifier_token=modifier,
+                          measure=measure or ("OR" if modifier else "INCIDENCE"), estimate=estimate,
+                          ci_low=ci[0] if ci else None, ci_high=ci[1] if ci else None, adjusted=adjusted,
+                          n_group=n_group, n_events=None, definition_note=note, time_horizon=time_horizon,
+                          quality_weight=quality, evidence_grade=grade, population_match=1.0,
+                          extraction_confidence=0.9, covariates=covariates or [], subgroup=None)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the asyncio PubMed harvester against the local fake E-utilities server
+"""
+
+import time
+import asyncio
+import tempfile
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.database import init_database
+from src.evidence.async_harvester import AsyncPubMedHarvester, TokenBucket
+from src.evidence.fake_eutils import ArticleCorpus, FakeEUtilsServer
+
+
+def _article(pmid, title, abstract):
+    return (f"<PubmedArticle><MedlineCitation><PMID Version=\"1\">{pmid}</PMID><Article>"
+            f"<Journal><Title>Anesth Analg</Title><JournalIssue><PubDate><Year>2020</Year></PubDate></JournalIssue></Journal>"
+            f"<ArticleTitle>{title}</ArticleTitle><Abstract><AbstractText>{abstract}</AbstractText></Abstract>"
+            f"</Article></MedlineCitation></PubmedArticle>")
+
+
+class TestAsyncHarvester:
+    """Rate limiting, retries and checkpoint/resume of the async harvester"""
+
+    def setup_method(self):
+        self.db = init_database(":memory:")
+        self.raw_dir = tempfile.TemporaryDirectory()
+        articles = [
+            _article(str(1000 + i), f"Laryngospasm after pediatric anesthesia {i}",
+                     f"Children undergoing surgical anesthesia: laryngospasm OR 2.{i} (95% CI 1.1-3.{i}).")
+            for i in range(9)
+        ]
+        with open(os.path.join(self.raw_dir.name, "pubmed_batch_test.xml"), "w") as f:
+            f.write("<?xml version=\"1.0\" ?>\n<PubmedArticleSet>" + "".join(articles) + "</PubmedArticleSet>")
+        self.corpus = ArticleCorpus(self.raw_dir.name)
+
+    def teardown_method(self):
+        self.raw_dir.cleanup()
+
+    def _harvester(self, server, **kwargs):
+        options = dict(base_url=server.base_url, requests_per_second=50, backoff=0.01,
+                       fetch_batch_size=4, save_raw=False)
+        options.update(kwargs)
+        return AsyncPubMedHarvester(**options)
+
+    def test_token_bucket_rate(self):
+        async def take(n):
+            bucket = TokenBucket(rate=20)
+            start = time.monotonic()
+            await asyncio.gather(*(bucket.acquire() for _ in range(n)))
+            return time.monotonic() - start
+
+        # First token is immediate, the next 10 arrive at 20/s
+        assert asyncio.run(take(11)) >= 0.45
+
+    def test_harvest_retries_and_checkpoints(self):
+        with FakeEUtilsServer(self.corpus, fail_every=3) as server:
+            harvester = self._harvester(server)
+            result = asyncio.run(harvester.harvest_outcome("LARYNGOSPASM", "pediatric", max_results=50))
+            harvester.close()
+
+        assert result.status == "completed"
+        assert result.papers_found == 9 and result.papers_processed == 9
+        assert result.effects_extracted > 0
+        assert harvester.stats["retries"] >= 1 and server.stats["failed"] >= 1
+
+        row = self.db.conn.execute("""
+            SELECT status, papers_found, papers_processed, effects_extracted
+            FROM harvest_batches WHERE batch_id = ?
+        """, [result.batch_id]).fetchone()
+        assert row == ("completed", 9, 9, result.effects_extracted)
+
+    def test_rerun_skips_completed_and_resumes_failed(self):
+        with FakeEUtilsServer(self.corpus) as server:
+            harvester = self._harvester(server)
+            first = asyncio.run(harvester.harvest_outcome("LARYNGOSPASM", "pediatric"))
+            requests_made = server.stats["requests"]
+            again = asyncio.run(harvester.harvest_outcome("LARYNGOSPASM", "pediatric"))
+            assert again.skipped and server.stats["requests"] == requests_made
+
+            # Simulate an interrupted run: some papers lost, batch not completed
+            self.db.execute_write("DELETE FROM estimates")
+            self.db.execute_write("DELETE FROM papers WHERE pmid IN ('1007', '1008')")
+            self.db.execute_write("UPDATE harvest_batches SET status = 'failed' WHERE batch_id = ?", [first.batch_id])
+            fetched = server.stats["efetch"]
+
+            resumed = asyncio.run(harvester.harvest_outcome("LARYNGOSPASM", "pediatric"))
+            harvester.close()
+
+        assert resumed.resumed and resumed.status == "completed"
+        assert resumed.papers_fetched == 2 and server.stats["efetch"] == fetched + 1
+        assert resumed.papers_processed == 9
+
+    def test_checkpoint_covers_papers_stored_by_other_batches(self):
+        self.db.execute_write("INSERT INTO papers (pmid, title, ingest_query_id) VALUES ('1000', 'earlier', 'other_batch')")
+        with FakeEUtilsServer(self.corpus) as server:
+            harvester = self._harvester(server)
+            first = asyncio.run(harvester.harvest_outcome("LARYNGOSPASM", "pediatric"))
+            checkpointed = self.db.conn.execute(
+                "SELECT COUNT(*) FROM harvest_batch_pmids WHERE batch_id = ?", [first.batch_id]).fetchall()[0][0]
+
+            # Interrupted after every paper was stored; the pre-existing paper has no effects
+            self.db.execute_write("DELETE FROM estimates")
+            self.db.execute_write("UPDATE harvest_batches SET status = 'failed' WHERE batch_id = ?", [first.batch_id])
+            resumed = asyncio.run(harvester.harvest_outcome("LARYNGOSPASM", "pediatric"))
+            harvester.close()
+
+        assert checkpointed == 9
+        assert resumed.status == "completed" and resumed.papers_fetched == 0
+
+    def test_failed_fetch_cancels_sibling_batches(self):
+        cancelled = []
+
+        async def fetch_and_store(batch_id, outcome_token, pmids, result):
+            if pmids[0] == "1000":
+                raise RuntimeError("efetch failed")
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(pmids[0])
+                raise
+
+        with FakeEUtilsServer(self.corpus) as server:
+            harvester = self._harvester(server)
+            harvester._fetch_and_store = fetch_and_store
+            started = time.monotonic()
+            result = asyncio.run(harvester.harvest_outcome("LARYNGOSPASM", "pediatric"))
+            harvester.close()
+
+        assert result.status == "failed" and result.error_message == "efetch failed"
+        assert sorted(cancelled) == ["1004", "1008"]
+        assert time.monotonic() - started < 5
+
+    def test_fetch_gives_up_after_retries(self):
+        with FakeEUtilsServer(self.corpus, rate_limit=0.5) as server:
+            harvester = self._harvester(server, max_retries=0)
+            pmids = asyncio.run(harvester.search_pubmed("laryngospasm"))
+            papers = asyncio.run(harvester.fetch_papers(["1000"]))
+            harvester.close()
+
+        assert pmids == [str(1000 + i) for i in range(9)]
+        assert papers == [] and server.stats["rate_limited"] >= 1
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the batched background audit sink
+"""
+
+import json
+import tempfile
+import threading
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.database import CodexDatabase
+from src.core.audit_sink import AuditSink
+
+
+class TestAuditSink:
+    """Audit records must all reach DuckDB, batched, without blocking producers"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db = CodexDatabase(os.path.join(self.temp_dir.name, 'test.duckdb'))
+
+    def teardown_method(self):
+        self.db.close()
+        self.temp_dir.cleanup()
+
+    def _count(self, table):
+        return self.db.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def test_records_are_written_in_batches(self):
+        sink = AuditSink(self.db, batch_size=50, flush_interval=60)
+        for i in range(120):
+            sink.insert_case_session(f"s{i}", "hpi", "[]", None, "hpi")
+            sink.log_action("case_sessions", f"s{i}", "INSERT", {"i": i})
+
+        assert sink.flush()
+        assert self._count("case_sessions") == 120
+        assert self._count("audit_log") == 120
+        stats = sink.stats()
+        assert stats["flushed"] == 240
+        assert stats["batches"] <= 6
+        assert stats["flush_lag_seconds"] == 0.0
+        sink.close()
+
+    def test_updates_follow_their_session_row(self):
+        sink = AuditSink(self.db, batch_size=500, flush_interval=60)
+        sink.insert_case_session("s1", "hpi", "[]", "v1", "hpi")
+        sink.update_case_session("s1", "risk_scores", json.dumps({"risks": [1]}))
+        sink.flush()
+        sink.update_case_session("s1", "medication_recommendations", json.dumps({"meds": 2}))
+        sink.close()
+
+        row = self.db.conn.execute(
+            "SELECT risk_scores, medication_recommendations, evidence_version FROM case_sessions WHERE session_id = 's1'"
+        ).fetchone()
+        assert json.loads(row[0]) == {"risks": [1]}
+        assert json.loads(row[1]) == {"meds": 2}
+        assert row[2] == "v1"
+
+    def test_close_flushes_pending_records(self):
+        sink = AuditSink(self.db, batch_size=1000, flush_interval=60)
+        for i in range(10):
+            sink.log_action("risk_calculations", f"s{i}", "CALCULATE", {})
+        sink.close()
+
+        assert self._count("audit_log") == 10
+        # Writes after shutdown fall back to synchronous inserts
+        sink.log_action("risk_calculations", "late", "CALCULATE", {})
+        assert self._count("audit_log") == 11
+
+    def test_bad_row_does_not_lose_batch(self):
+        sink = AuditSink(self.db, batch_size=500, flush_interval=60)
+        sink.insert_case_session("dup", "hpi", "[]", None, "hpi")
+        sink.flush()
+        sink.insert_case_session("dup", "hpi", "[]", None, "hpi")
+        sink.insert_case_session("ok", "hpi", "[]", None, "hpi")
+        sink.close()
+
+        assert self._count("case_sessions") == 2
+        assert sink.stats()["failed"] == 1
+
+    def test_writer_error_keeps_the_sink_running(self):
+        sink = AuditSink(self.db, batch_size=500, flush_interval=60)
+        real_writer = self.db.writer
+        calls = []
+
+        def flaky_writer():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("database is locked")
+            return real_writer()
+
+        self.db.writer = flaky_writer
+        for i in range(3):
+            sink.log_action("risk_calculations", f"lost{i}", "CALCULATE", {})
+        assert sink.flush()
+        sink.log_action("risk_calculations", "kept", "CALCULATE", {})
+        assert sink.flush()
+
+        stats = sink.stats()
+        assert stats["running"]
+        assert stats["failed"] == 3
+        assert self._count("audit_log") == 1
+        sink.close()
+        self.db.writer = real_writer
+
+    def test_records_racing_close_are_written(self):
+        sink = AuditSink(self.db, batch_size=10, flush_interval=60, max_queue=20)
+        start = threading.Event()
+
+        def produce(worker):
+            start.wait()
+            for i in range(100):
+                sink.log_action("case_sessions", f"w{worker}_{i}", "INSERT", {})
+
+        producers = [threading.Thread(target=produce, args=(w,)) for w in range(4)]
+        for thread in producers:
+            thread.start()
+        start.set()
+        sink.close()
+        for thread in producers:
+            thread.join()
+
+        assert self._count("audit_log") == 400
+
+    def test_cached_evidence_version(self):
+        self.db.conn.execute("INSERT INTO evidence_versions (version, description, is_current) VALUES ('v1', 'first', TRUE)")
+        first = 'v1'
+        assert self.db.cached_evidence_version() == first
+        self.db.conn.execute("UPDATE evidence_versions SET is_current = FALSE")
+        # Served from the cache until it expires or this process creates a version
+        assert self.db.cached_evidence_version() == first
+        version = self.db.create_evidence_version("test")
+        assert self.db.cached_evidence_version() == version
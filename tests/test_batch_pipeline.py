@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the batch HPI analysis pipeline
+"""
+
+import threading
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.batch_pipeline import BatchAnalysisPipeline, AUDIT_KEY, clamp_batch_options, default_parse_processes
+
+
+class TestBatchAnalysisPipeline:
+    """Pipeline must return one result per case, isolate failures and bound concurrency"""
+
+    def setup_method(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_seen = 0
+
+    def _parse(self, hpi_text):
+        with self.lock:
+            self.in_flight += 1
+            self.max_seen = max(self.max_seen, self.in_flight)
+        return {"extracted_factors": [{"token": token} for token in hpi_text.split()], "demographics": {}}
+
+    def _analyze(self, parsed, case):
+        with self.lock:
+            self.in_flight -= 1
+        if any(f["token"] == "FAIL" for f in parsed["extracted_factors"]):
+            raise RuntimeError("risk engine failure")
+        return {"tokens": [f["token"] for f in parsed["extracted_factors"]],
+                "population": case.get("population")}
+
+    def test_every_case_has_a_result(self):
+        pipeline = BatchAnalysisPipeline(self._parse, self._analyze, analyze_threads=3)
+        cases = [{"id": f"case{i}", "hpi_text": f"ASTHMA OSA{i}", "population": "adult"} for i in range(25)]
+
+        results = {r["id"]: r for r in pipeline.run(cases)}
+
+        assert len(results) == 25
+        assert results["case7"]["status"] == "ok"
+        assert results["case7"]["index"] == 7
+        assert results["case7"]["result"] == {"tokens": ["ASTHMA", "OSA7"], "population": "adult"}
+
+    def test_failures_are_reported_per_case(self):
+        pipeline = BatchAnalysisPipeline(self._parse, self._analyze)
+        cases = [{"hpi_text": "ASTHMA"}, {"hpi_text": "   "}, {"id": "bad", "hpi_text": "FAIL"}]
+
+        results = {r["index"]: r for r in pipeline.run(cases)}
+
+        assert results[0]["status"] == "ok"
+        assert results[1]["status"] == "error"
+        assert results[1]["error"] == "HPI text required"
+        assert results[2]["id"] == "bad"
+        assert "risk engine failure" in results[2]["error"]
+
+    def test_in_flight_cases_are_bounded(self):
+        pipeline = BatchAnalysisPipeline(self._parse, self._analyze, analyze_threads=8, max_in_flight=4)
+        consumed = []
+
+        def cases():
+            for i in range(40):
+                consumed.append(i)
+                yield {"hpi_text": f"T{i}"}
+
+        yielded = 0
+        for result in pipeline.run(cases()):
+            yielded += 1
+            # Input is pulled lazily, never more than the window ahead of the output
+            assert len(consumed) <= yielded + 4
+
+        assert len(consumed) == 40
+        assert self.max_seen <= 4
+
+    def test_worker_audit_records_are_written_by_the_parent(self):
+        written = []
+
+        def parse_with_audit(hpi_text):
+            parsed = self._parse(hpi_text)
+            parsed[AUDIT_KEY] = {"session_id": f"hpi_{hpi_text}"}
+            return parsed
+
+        def parse_many_with_audit(hpi_texts):
+            return [parse_with_audit(text) for text in hpi_texts]
+
+        pipeline = BatchAnalysisPipeline(parse_with_audit, lambda parsed, case: sorted(parsed),
+                                         parse_many_fn=parse_many_with_audit, parse_batch_size=4,
+                                         audit_fn=written.append)
+        results = list(pipeline.run([{"hpi_text": f"T{i}"} for i in range(10)]))
+
+        assert sorted(r["session_id"] for r in written) == sorted(f"hpi_T{i}" for i in range(10))
+        # The audit payload never reaches the analyze stage or the response
+        assert all(AUDIT_KEY not in r["result"] for r in results)
+
+    def test_parse_processes_is_clamped_to_the_cpu_budget(self):
+        assert clamp_batch_options(500, 8, 64)[0] == default_parse_processes()
+        assert clamp_batch_options(-3, 8, 64)[0] == 0
+        # None still means "pick automatically from the batch size"
+        assert clamp_batch_options(None, 8, 64)[0] is None
+
+    def test_max_in_flight_is_clamped_to_the_server_cap(self):
+        assert clamp_batch_options(None, 10_000, 64)[1] == 64
+        assert clamp_batch_options(None, 0, 64)[1] == 1
+        assert clamp_batch_options(None, 16, 64)[1] == 16
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Unit tests for batch effect-modifier pooling
+"""
+
+import tempfile
+import sys
+import os
+
+import numpy as np
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.database import init_database
+from src.evidence.bulk_writer import BulkWriter
+from src.evidence.pooling_engine import MetaAnalysisEngine
+from src.evidence.batch_pooling import BatchMetaAnalysisEngine, paule_mandel_tau_squared
+from conftest import make_paper as _paper, make_effect as _effect
+
+
+class TestBatchPooling:
+    """Batch pooling must reproduce the per-pair engine for every group"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db = init_database(os.path.join(self.temp_dir.name, 'test.duckdb'))
+
+        papers = [_paper(str(i), procedure="tonsillectomy" if i % 2 else "general") for i in range(12)]
+        effects = [
+            # Heterogeneous, with and without CIs, mixed grades -> random effects + HK
+            _effect("a1", "0", "ASTHMA", 2.0, (1.2, 3.3), grade="A", quality=1.2),
+            _effect("a2", "1", "ASTHMA", 3.5, (2.0, 6.1), adjusted=True),
+            _effect("a3", "2", "ASTHMA", 0.9, grade=None),
+            _effect("a4", "3", "ASTHMA", 1.4, (0.8, 2.4), grade="C", quality=0.0, note="tonsillectomy cohort"),
+            # Two homogeneous studies -> fixed effects
+            _effect("u1", "4", "URI", 1.8, (1.2, 2.7)),
+            _effect("u2", "5", "URI", 1.9, (1.3, 2.8)),
+            # Only one usable study: excluded (zero estimate, and a CI too wide to keep)
+            _effect("s1", "6", "SMOKING", 1.5, (1.1, 2.0)),
+            _effect("s2", "7", "SMOKING", 0.0),
+            _effect("s3", "8", "SMOKING", 2.0, (0.0001, 9000.0)),
+            # Another outcome, and a baseline incidence row that must be ignored
+            _effect("h1", "9", "ASTHMA", 1.3, (1.0, 1.7), outcome="HYPOTENSION", measure="RR"),
+            _effect("h2", "10", "ASTHMA", 1.6, (1.1, 2.3), outcome="HYPOTENSION", measure="HR"),
+            _effect("i1", "11", None, 12.0, outcome="HYPOTENSION", measure="INCIDENCE"),
+        ]
+        with BulkWriter(self.db) as writer:
+            writer.add_papers(papers)
+            writer.add_effects(effects)
+
+        self.batch = BatchMetaAnalysisEngine(self.db)
+
+    def teardown_method(self):
+        self.db.close()
+        self.temp_dir.cleanup()
+
+    def test_matches_per_pair_engine(self):
+        pooled = self.batch.pool_all_effect_modifiers(context_labels=["tonsillectomy"], store=False)
+        assert [(e.outcome_token, e.modifier_token, e.context_label) for e in pooled] == [
+            ("HYPOTENSION", "ASTHMA", "general"),
+            ("LARYNGOSPASM", "ASTHMA", "general"),
+            ("LARYNGOSPASM", "ASTHMA", "tonsillectomy"),
+            ("LARYNGOSPASM", "URI", "general"),
+        ]
+
+        per_pair = MetaAnalysisEngine()
+        for effect in pooled:
+            context = None if effect.context_label == "general" else effect.context_label
+            reference = per_pair.pool_effect_modifiers(effect.outcome_token, effect.modifier_token, context)
+            assert (effect.method, effect.k, effect.inputs, effect.pmids) == \
+                (reference.method, reference.k, reference.inputs, reference.pmids)
+            assert effect.quality_summary == reference.quality_summary
+            for field in ("or_mean", "or_ci_low", "or_ci_high", "log_or_var"):
+                assert getattr(effect, field) == pytest.approx(getattr(reference, field), rel=1e-4)
+            assert effect.i_squared == pytest.approx(reference.i_squared, abs=1e-9)
+            assert effect.tau_squared == pytest.approx(reference.tau_squared, abs=1e-4)
+
+        asthma = pooled[1]
+        assert asthma.method == "random_effects_pm" and asthma.k == 4
+        assert asthma.inputs == ["a1", "a2", "a3", "a4"]
+        assert asthma.quality_summary["grade_distribution"] == {"A": 1, "B": 1, "D": 1, "C": 1}
+        assert pooled[3].method == "fixed_effects" and pooled[3].tau_squared == 0.0
+
+    def test_bulk_store_and_lookup(self):
+        pooled = self.batch.pool_all_effect_modifiers(outcome_tokens=["LARYNGOSPASM"], evidence_version="v_test")
+        assert len(pooled) == 2
+        assert self.db.conn.execute("SELECT COUNT(*) FROM effects_pooled WHERE evidence_version = 'v_test'").fetchone()[0] == 2
+
+        stored = MetaAnalysisEngine().get_pooled_effect("LARYNGOSPASM", "URI")
+        assert stored.inputs == ["u1", "u2"] and stored.or_mean == pytest.approx(pooled[1].or_mean, rel=1e-6)
+
+        self.db.audit_sink.flush()
+        assert self.db.conn.execute("SELECT COUNT(*) FROM audit_log WHERE entity = 'effects_pooled'").fetchone()[0] == 1
+
+    def test_paule_mandel_solves_each_group(self):
+        effects = np.array([0.1, 0.9, -0.4, 0.2, 0.25, 0.0, 10.0])
+        variances = np.array([0.04, 0.05, 0.06, 0.1, 0.1, 0.01, 0.01])
+        groups = np.array([0, 0, 0, 1, 1, 2, 2])
+        tau_sq = paule_mandel_tau_squared(effects, variances, groups, 3)
+
+        # Group 1 is homogeneous (Q < k - 1 at zero), group 2 needs more than the upper bound
+        assert tau_sq[1] == 0.0 and tau_sq[2] == 10.0
+        weights = 1 / (variances[:3] + tau_sq[0])
+        mean = np.sum(weights * effects[:3]) / np.sum(weights)
+        assert np.sum(weights * (effects[:3] - mean) ** 2) == pytest.approx(2.0, rel=1e-9)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the sentence-batched, cached BERT tagger
+"""
+
+import sys
+import os
+import re
+
+import numpy as np
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.parse_cache import ParseCache
+from nlp.bert_backend import BertTagger, aggregate_entities, load_bert_tagger, split_sentences
+
+ID2LABEL = {0: "O", 1: "B-DISEASE", 2: "I-DISEASE"}
+DISEASE_WORDS = {"asthma": 1, "sleep": 1, "apnea": 2}
+
+
+class WhitespaceTokenizer:
+    """Stands in for a fast tokenizer: one token per word, overflowing windows with `stride` overlap"""
+
+    def __init__(self):
+        self.vocab = {}
+
+    def __call__(self, sentences, truncation, max_length, stride, return_overflowing_tokens,
+                 return_offsets_mapping, padding, return_tensors):
+        windows = []
+        for index, sentence in enumerate(sentences):
+            tokens = [(m.start(), m.end()) for m in re.finditer(r"\w+", sentence)]
+            start = 0
+            while True:
+                window = tokens[start:start + max_length]
+                windows.append((index, [self.vocab.setdefault(sentence[s:e].lower(), len(self.vocab) + 1)
+                                        for s, e in window], window))
+                if start + max_length >= len(tokens):
+                    break
+                start += max_length - stride
+
+        width = max(len(ids) for _, ids, _ in windows)
+        input_ids = np.zeros((len(windows), width), dtype=np.int64)
+        offsets = np.zeros((len(windows), width, 2), dtype=np.int64)
+        for row, (_, ids, window) in enumerate(windows):
+            input_ids[row, :len(ids)] = ids
+            offsets[row, :len(window)] = window
+        return {
+            "input_ids": input_ids,
+            "attention_mask": (input_ids > 0).astype(np.int64),
+            "offset_mapping": offsets,
+            "overflow_to_sample_mapping": np.array([index for index, _, _ in windows])
+        }
+
+
+class FakeModel:
+    """Logits favour the DISEASE labels for known words; counts forward passes"""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.calls = []
+
+    def __call__(self, encoding):
+        self.calls.append(encoding["input_ids"].shape[0])
+        labels = {self.tokenizer.vocab[word]: label for word, label in DISEASE_WORDS.items()
+                  if word in self.tokenizer.vocab}
+        logits = np.zeros(encoding["input_ids"].shape + (len(ID2LABEL),), dtype=np.float32)
+        for (row, column), token_id in np.ndenumerate(encoding["input_ids"]):
+            logits[row, column, labels.get(token_id, 0)] = 5.0
+        return logits
+
+
+def make_tagger(batch_size=32, max_length=128, stride=16):
+    tokenizer = WhitespaceTokenizer()
+    model = FakeModel(tokenizer)
+    tagger = BertTagger(tokenizer, model, ID2LABEL, "test", batch_size=batch_size,
+                        max_length=max_length, stride=stride)
+    tagger.cache = ParseCache()
+    return tagger, model
+
+
+class TestSplitSentences:
+    """Sentences keep their offsets into the original text"""
+
+    def test_offsets_point_into_text(self):
+        text = "Patient has asthma. Uses albuterol!  Denies fever"
+        pieces = split_sentences(text)
+        assert [sentence for _, sentence in pieces] == ["Patient has asthma.", "Uses albuterol!", "Denies fever"]
+        assert all(text[offset:offset + len(sentence)] == sentence for offset, sentence in pieces)
+
+    def test_blank_text(self):
+        assert split_sentences("   ") == []
+
+
+class TestAggregateEntities:
+    """BIO tokens are grouped like aggregation_strategy='simple'"""
+
+    def test_groups_adjacent_tokens(self):
+        text = "has sleep apnea today"
+        offsets = np.array([[0, 0], [0, 3], [4, 9], [10, 15], [16, 21], [0, 0]])
+        probs = np.eye(3)[[0, 0, 1, 2, 0, 1]] * 0.9 + 0.03
+        entities = aggregate_entities(text, offsets, probs, ID2LABEL)
+        assert [(e["entity_group"], e["word"], e["start"], e["end"]) for e in entities] == \
+            [("DISEASE", "sleep apnea", 4, 15)]
+        assert entities[0]["score"] == pytest.approx(0.93)
+
+
+class TestBertTagger:
+    """Sentences are batched across documents, windowed when long, and cached"""
+
+    def test_batches_sentences_across_documents(self):
+        tagger, model = make_tagger(batch_size=3)
+        texts = ["Has asthma. No fever.", "Known sleep apnea. No fever.", "Healthy."]
+        results = tagger.tag_many(texts)
+
+        # 4 distinct sentences -> one pass of 3 and one of 1
+        assert model.calls == [3, 1]
+        assert [e["word"] for e in results[0]] == ["asthma"]
+        assert [(e["word"], e["start"]) for e in results[1]] == [("sleep apnea", 6)]
+        assert results[1][0]["start"] == texts[1].index("sleep")
+        assert results[2] == []
+
+    def test_cached_sentences_skip_the_model(self):
+        tagger, model = make_tagger()
+        first = tagger("Has asthma. No fever.")
+        assert tagger("Has asthma. No fever.") == first
+        assert model.calls == [2]
+
+    def test_long_sentences_use_overlapping_windows(self):
+        tagger, _ = make_tagger(max_length=4, stride=2)
+        text = "one two three four five asthma six seven eight sleep apnea nine"
+        windowed = tagger(text)
+        full, _ = make_tagger()
+        assert windowed == full(text)
+        assert [e["word"] for e in windowed] == ["asthma", "sleep apnea"]
+
+
+class TestLoadBertTagger:
+    """Loading never reaches the network"""
+
+    def test_missing_model_dir_returns_none(self, tmp_path):
+        assert load_bert_tagger(str(tmp_path / "missing")) is None
+
+    def test_exported_model_dir(self):
+        pytest.importorskip("transformers")
+        model_dir = os.getenv("MERIDIAN_BERT_MODEL_DIR")
+        if not model_dir:
+            pytest.skip("MERIDIAN_BERT_MODEL_DIR not set")
+        tagger = load_bert_tagger(model_dir)
+        assert tagger is not None
+        assert tagger.tag_many(["Patient with asthma.", ""])[1] == []
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Unit tests for bulk paper/estimate persistence
+"""
+
+import tempfile
+import sys
+import os
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.database import CodexDatabase
+from src.evidence.bulk_writer import BulkWriter
+from conftest import make_paper, make_effect
+
+
+def _paper(pmid, title="t", n_total=None):
+    return make_paper(pmid, title=title, design="rct", n_total=n_total, authors=["Smith J"])
+
+
+def _effect(effect_id, pmid, ci_low=None):
+    return make_effect(effect_id, pmid, ci=(ci_low, None), adjusted=True, time_horizon="24h", covariates=["age"])
+
+
+class TestBulkWriter:
+    """Bulk upserts must store what per-row INSERT OR REPLACE would"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db = CodexDatabase(os.path.join(self.temp_dir.name, 'test.duckdb'))
+
+    def teardown_method(self):
+        self.db.close()
+        self.temp_dir.cleanup()
+
+    def _audit_rows(self, entity):
+        self.db.audit_sink.flush()
+        return self.db.conn.execute("SELECT COUNT(*) FROM audit_log WHERE entity = ?", [entity]).fetchone()[0]
+
+    def test_batch_upsert_with_nulls_and_duplicates(self):
+        with BulkWriter(self.db) as writer:
+            writer.add_papers([_paper("1", "old"), _paper("2", n_total=40), _paper("1", "new")])
+            writer.add_effects([_effect("e1", "1", ci_low=1.2), _effect("e2", "2")])
+
+        assert self.db.conn.execute("SELECT pmid, title, n_total FROM papers ORDER BY pmid").fetchall() == \
+            [("1", "new", None), ("2", "t", 40)]
+        assert self.db.conn.execute("SELECT id, ci_low, ci_high, adjusted, covariates FROM estimates ORDER BY id").fetchall() == \
+            [("e1", 1.2000000476837158, None, True, '["age"]'), ("e2", None, None, True, '["age"]')]
+        assert writer.rows_written == {"papers": 2, "estimates": 2, "effects_pooled": 0}
+        assert self._audit_rows("papers") == 1 and self._audit_rows("estimates") == 1
+
+    def test_bad_row_falls_back_without_losing_batch(self):
+        with BulkWriter(self.db) as writer:
+            writer.add_papers([_paper("1")])
+            # Unknown pmid violates the estimates foreign key
+            writer.add_effects([_effect("e1", "1"), _effect("e2", "missing"), _effect("e3", "1")])
+
+        assert [r[0] for r in self.db.conn.execute("SELECT id FROM estimates ORDER BY id").fetchall()] == ["e1", "e3"]
+        assert writer.rows_written["estimates"] == 2
+
+    def test_error_in_with_body_discards_pending_rows(self):
+        with pytest.raises(RuntimeError, match="harvest failed"):
+            with BulkWriter(self.db) as writer:
+                writer.add_papers([_paper("1")])
+                raise RuntimeError("harvest failed")
+
+        assert self.db.conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0] == 0
+        assert writer.rows_written["papers"] == 0
+
+    def test_failed_rollback_raises_the_batch_error(self):
+        writer_context = self.db.writer
+
+        class FailingConnection:
+            def __init__(self, conn):
+                self.conn = conn
+
+            def execute(self, query, *args):
+                if query.startswith("INSERT OR REPLACE INTO papers") and "SELECT" in query:
+                    raise RuntimeError("batch insert failed")
+                if query == "ROLLBACK":
+                    raise RuntimeError("rollback failed")
+                return self.conn.execute(query, *args)
+
+            def __getattr__(self, name):
+                return getattr(self.conn, name)
+
+        class FailingWriter:
+            def __enter__(self):
+                self.context = writer_context()
+                return FailingConnection(self.context.__enter__())
+
+            def __exit__(self, *exc):
+                return self.context.__exit__(*exc)
+
+        self.db.writer = FailingWriter
+        writer = BulkWriter(self.db)
+        writer.add_papers([_paper("1")])
+        with pytest.raises(RuntimeError, match="batch insert failed"):
+            writer.flush()
+        del self.db.writer
+        assert writer.rows_written["papers"] == 0
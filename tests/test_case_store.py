@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the shared parsed-case store and the blueprints that resolve case_id
+"""
+
+import sys
+import os
+import hashlib
+
+import pytest
+from flask import Flask
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.core.case_store as case_store_module
+import src.core.text_keys as text_keys
+from src.core.case_store import CaseStore, case_id_for, get_case_store
+from src.learning.patient_context import PatientContextExtractor
+
+HPI = "5 year old male for tonsillectomy with asthma and recent URI"
+
+
+class CountingParser:
+    """Records the texts it parses"""
+
+    def __init__(self, parse):
+        self.parse = parse
+        self.texts = []
+
+    def __call__(self, text):
+        self.texts.append(text)
+        return self.parse(text)
+
+
+def fake_analysis(text):
+    return {
+        "extracted_factors": [{"token": "ASTHMA", "plain_label": "Asthma", "confidence": 0.9}],
+        "demographics": {"age": 5, "weight_kg": 19},
+        "session_id": "test",
+        "confidence_score": 0.8
+    }
+
+
+class TestCaseStore:
+    """One case per normalized text, each view parsed once"""
+
+    def setup_method(self):
+        self.store = CaseStore()
+        self.analysis = CountingParser(fake_analysis)
+        self.store.register_parser("analysis", self.analysis)
+
+    def test_case_id_is_content_hash(self):
+        assert case_id_for(HPI) == case_id_for(f"  {HPI.replace(' ', '   ')} ")
+        assert case_id_for(HPI) != case_id_for(HPI + " and OSA")
+        assert self.store.open(HPI) is self.store.open(HPI + "\n")
+
+    def test_case_id_is_keyed(self):
+        # Not recomputable from the text alone: an unkeyed hash of a guessed HPI does not match
+        unkeyed = hashlib.sha256(HPI.encode("utf-8")).hexdigest()[:24]
+        assert case_id_for(HPI) != f"case_{unkeyed}"
+
+    def test_case_id_follows_the_shared_secret(self, monkeypatch):
+        # Workers configured with the same secret agree on ids; another secret gives other ids
+        monkeypatch.setenv(text_keys.TEXT_KEY_SECRET_ENV, "shared")
+        text_keys.reset_text_key()
+        shared = case_id_for(HPI)
+        text_keys.reset_text_key()
+        assert case_id_for(HPI) == shared
+        monkeypatch.setenv(text_keys.TEXT_KEY_SECRET_ENV, "other")
+        text_keys.reset_text_key()
+        assert case_id_for(HPI) != shared
+        text_keys.reset_text_key()
+
+    def test_views_are_parsed_once(self):
+        case = self.store.open(HPI)
+        assert case.analysis["demographics"]["age"] == 5
+        assert self.store.resolve(case.case_id).analysis is case.analysis
+        assert self.store.resolve(None, HPI).analysis is case.analysis
+        assert self.analysis.texts == [HPI]
+        assert case.get("risk_assessments") is None
+
+    def test_resolve_errors(self):
+        with pytest.raises(KeyError):
+            self.store.resolve("case_unknown")
+        with pytest.raises(ValueError):
+            self.store.resolve(None, "  ")
+        # An unknown id with text re-creates the case
+        assert self.store.resolve("case_unknown", HPI).case_id == case_id_for(HPI)
+
+    def test_text_wins_over_mismatched_case_id(self):
+        stale = self.store.open("an earlier hpi")
+        case = self.store.resolve(stale.case_id, HPI)
+        assert case.case_id == case_id_for(HPI)
+        assert case.analysis is not None and self.analysis.texts == [HPI]
+        assert self.store.resolve(case.case_id, f" {HPI} ") is case
+
+    def test_derived_views_reuse_parsed_views(self):
+        self.store.register_view("analysis", lambda case: {"tokens": case.view("tokens")})
+        tokens = CountingParser(str.split)
+        self.store.register_parser("tokens", tokens)
+
+        case = self.store.open(HPI)
+        assert case.analysis == {"tokens": HPI.split()}
+        assert case.view("tokens") is case.analysis["tokens"]
+        assert tokens.texts == [HPI] and self.analysis.texts == []
+
+    def test_lru_and_ttl(self):
+        store = CaseStore(max_cases=2)
+        first = store.open("first hpi")
+        store.open("second hpi")
+        store.get(first.case_id)
+        store.open("third hpi")
+        assert store.get(first.case_id) is first
+        assert store.get(case_id_for("second hpi")) is None
+        assert store.stats()["evictions"] == 1
+
+        first.created_at -= store.ttl_seconds + 1
+        assert store.get(first.case_id) is None
+
+    def test_context_view_matches_extractor(self):
+        case = self.store.open(HPI)
+        extractor = PatientContextExtractor()
+        assert case.context == extractor.text_context(HPI)
+
+        context = extractor.extract_from_app_state(case.analysis, [], {}, case=case)
+        assert context.surgery_domain == "ent"
+        assert context.urgency == "elective"
+        assert context.procedure_keywords == ["tonsillectomy"]
+
+
+class TestBlueprintsShareCases:
+    """Follow-up calls by case_id reuse the case's parses"""
+
+    def setup_method(self):
+        from api.meds_api import meds_api
+        from api.qa_api import qa_bp
+        from src.learning.routes import learning_bp
+
+        self.store = CaseStore()
+        case_store_module._case_store_instance = self.store
+        self.analysis = CountingParser(fake_analysis)
+        self.nlp = CountingParser(case_store_module._parse_nlp)
+        self.store.register_parser("analysis", self.analysis)
+        self.store.register_parser("nlp", self.nlp)
+
+        app = Flask(__name__)
+        app.secret_key = "test"
+        for blueprint in (meds_api, qa_bp, learning_bp):
+            app.register_blueprint(blueprint)
+        self.app = app
+        self.client = app.test_client()
+
+    def teardown_method(self):
+        case_store_module._case_store_instance = None
+
+    def test_meds_recommend_by_case_id(self):
+        first = self.client.post("/api/meds/recommend", json={"hpi_text": HPI})
+        assert first.status_code == 200
+        case_id = first.get_json()["case_id"]
+        assert case_id == case_id_for(HPI)
+
+        second = self.client.post("/api/meds/recommend", json={"case_id": case_id})
+        assert second.status_code == 200
+        assert self.nlp.texts == [HPI]
+
+        missing = self.client.post("/api/meds/recommend", json={"case_id": "case_missing"})
+        assert missing.status_code == 404
+
+    def test_qa_bundle_and_learning_use_the_case(self):
+        from api.qa_api import _get_case_bundle
+        from src.learning.routes import _get_current_app_state
+
+        case = get_case_store().open(HPI)
+        case.put("risk_assessments", [{"outcome_label": "Bronchospasm", "adjusted_risk": 0.08}])
+
+        bundle = _get_case_bundle(case.case_id)
+        assert bundle["hpi_features"]["meridian_codes"] == ["ASTHMA"]
+        assert bundle["hpi_features"]["surgery_domain"] == "ent"
+        assert bundle["risk_summary"]["risks"][0]["outcome_label"] == "Bronchospasm"
+
+        state = _get_current_app_state(case.case_id)
+        assert state["parsed_hpi"]["raw_text"] == HPI
+        assert state["case"] is case
+        assert self.analysis.texts == [HPI]
+
+    def test_case_ids_from_another_worker_fall_back(self):
+        from flask import session
+        from src.learning.routes import _get_current_app_state
+
+        # Learning reads the session's case data when this worker does not hold the case
+        case_data = {"parsed_hpi": {"raw_text": HPI}, "risk_assessments": []}
+        with self.app.test_request_context():
+            session["current_case_data"] = case_data
+            assert _get_current_app_state("case_other_worker") == case_data
+        missing = self.client.post("/api/learning/generate",
+                                   json={"mode": "basics", "case_context": True, "case_id": "case_other_worker"})
+        assert missing.status_code == 404
+
+        # Contraindication checks re-parse the text instead of failing
+        response = self.client.post("/api/meds/check-contraindications",
+                                    json={"agents": ["Propofol"], "case_id": "case_other_worker", "hpi_text": HPI})
+        assert response.status_code == 200
+        assert self.nlp.texts == [HPI]
+        assert self.client.post("/api/meds/check-contraindications",
+                                json={"agents": ["Propofol"], "case_id": "case_other_worker"}).status_code == 404
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the per-process DuckDB connection manager
+"""
+
+import tempfile
+import threading
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.connection_manager import ConnectionManager
+
+
+class TestConnectionManager:
+    """Per-thread cursors over one handle, writes through a single writer"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.manager = ConnectionManager(os.path.join(self.temp_dir.name, 'test.duckdb'))
+        self.manager.execute_write("CREATE TABLE t (thread INTEGER, i INTEGER)")
+
+    def teardown_method(self):
+        self.manager.close()
+        self.temp_dir.cleanup()
+
+    def test_cursor_reused_within_thread(self):
+        assert self.manager.cursor() is self.manager.cursor()
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.manager.cursor()))
+        thread.start()
+        thread.join()
+        assert other[0] is not self.manager.cursor()
+
+    def test_concurrent_reads_and_writes(self):
+        errors = []
+
+        def work(n):
+            try:
+                for i in range(25):
+                    self.manager.execute_write("INSERT INTO t VALUES (?, ?)", [n, i])
+                    count = self.manager.cursor().execute("SELECT COUNT(*) FROM t WHERE thread = ?", [n]).fetchone()[0]
+                    assert count == i + 1
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not errors
+        assert self.manager.cursor().execute("SELECT COUNT(*) FROM t").fetchone()[0] == 200
+
+        stats = self.manager.stats()
+        assert stats['writes'] == 201 and stats['opens'] == 1
+        # Cursors of finished threads are reclaimed when new ones are created
+        assert stats['thread_cursors'] <= 9
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the compiled effect-estimate extractor
+"""
+
+import json
+import sys
+import os
+from types import SimpleNamespace
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.evidence.effect_extractor import EffectExtractor, EFFECT_PATTERNS, extract_corpus
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "effects")
+GOLDEN = os.path.join(FIXTURES, "golden_estimates.json")
+# Per-pattern finditer() output with ontology attribution (scripts/build_effect_golden_set.py --ontology)
+GOLDEN_ONTOLOGY = os.path.join(FIXTURES, "golden_estimates_ontology.json")
+
+
+def _paper(pmid, title, abstract):
+    return SimpleNamespace(pmid=pmid, title=title, abstract=abstract, time_horizon="intraop",
+                           study_quality_score=3.0, evidence_grade="B")
+
+
+class TestEffectExtractor:
+    """Single-scan extraction must reproduce stored estimates and resolve outcomes by synonym"""
+
+    def setup_method(self):
+        self.keywords = EffectExtractor("keywords")
+        self.ontology = EffectExtractor("ontology")
+
+    def test_scan_matches_per_pattern_finditer(self):
+        texts = [
+            "OR 2.1 (1.2-3.4); or=3; ODDS RATIO 4, hr=0.5, HR1.2, p<0.05, P = .01, p-value 0.2, 12/34/56",
+            "1.2.3% of a12/13 x5.5% in 1.5/2 ÉOR 2 éor 3 _or 4 2 TIMES higher 3×increased",
+            "İncidence 5% of RİSK ratio 2, riſk ratio 3 and Kelvin odds ratio 2",
+        ]
+        for text in texts:
+            expected = [(i, m.span(), m.groups()) for i, p in enumerate(EFFECT_PATTERNS) for m in p.finditer(text)]
+            assert [(i, m.span(), m.groups()) for i, m in self.keywords.matches(text)] == expected
+
+    @staticmethod
+    def _assert_rows(effects, expected, pmid):
+        # Stored rows are upserts by id: the last extraction for an id wins
+        rows = {e.id: e for e in effects}
+        assert sorted(rows) == [row["id"] for row in expected], pmid
+        for row in expected:
+            effect = rows[row["id"]]
+            assert (effect.measure, effect.adjusted, effect.n_group, effect.n_events,
+                    effect.definition_note, effect.covariates) == \
+                (row["measure"], row["adjusted"], row["n_group"], row["n_events"],
+                 row["definition_note"], row["covariates"])
+            # REAL columns round to float32
+            for field in ("estimate", "ci_low", "ci_high", "extraction_confidence"):
+                assert getattr(effect, field) == pytest.approx(row[field], rel=1e-6)
+
+    def test_golden_estimates(self):
+        with open(GOLDEN) as f:
+            cases = json.load(f)["cases"]
+        assert cases
+
+        for case in cases:
+            paper = SimpleNamespace(**{k: v for k, v in case.items() if k != "expected"})
+            for outcome_token, expected in case["expected"].items():
+                self._assert_rows(self.keywords.extract(paper, [outcome_token]), expected, case["pmid"])
+
+    def test_golden_estimates_ontology(self):
+        with open(GOLDEN_ONTOLOGY) as f:
+            golden = json.load(f)
+        assert sum(len(rows) for case in golden["cases"] for rows in case["expected"].values()) > 0
+
+        for case in golden["cases"]:
+            paper = SimpleNamespace(**{k: v for k, v in case.items() if k != "expected"})
+            expected = sorted((row for rows in case["expected"].values() for row in rows), key=lambda row: row["id"])
+            self._assert_rows(self.ontology.extract(paper, golden["outcome_tokens"]), expected, case["pmid"])
+
+    def test_ontology_outcome_resolution(self):
+        paper = _paper("1", "Airway events",
+                       "Laryngospasm occurred in 12/100 children. Separately, bronchospasm had an OR 2.5 (1.1-4.0).")
+        effects = self.ontology.extract(paper, ["LARYNGOSPASM", "BRONCHOSPASM"])
+        by_estimate = {e.estimate: e.outcome_token for e in effects}
+        assert by_estimate[12.0] == "LARYNGOSPASM"
+        assert by_estimate[2.5] == "BRONCHOSPASM"
+
+        # Abbreviations are case-sensitive: "DL" is difficult laryngoscopy, "mg/dL" is not
+        tokens = ["DIFFICULT_LARYNGOSCOPY"]
+        assert self.ontology.extract(_paper("2", "t", "Glucose 5 mg/dL; 3/40 had events."), tokens) == []
+        assert [e.outcome_token for e in self.ontology.extract(_paper("3", "t", "DL in 3/40 patients."), tokens)] == tokens
+
+        # No synonym of the requested outcome nearby: nothing is attributed to it
+        assert self.ontology.extract(paper, ["MORTALITY"]) == []
+        # The keyword rule attributes every estimate near any keyword to the first token
+        assert {e.outcome_token for e in self.keywords.extract(paper, ["MORTALITY"])} == {"MORTALITY"}
+
+    def test_corpus_chunks_match_serial(self):
+        papers = [_paper(str(i), "Hypotension after induction",
+                         f"Hypotension incidence 1{i}% in {i + 20} patients; OR {i + 1}.5 (1.1-9.0).")
+                  for i in range(7)]
+        serial = [e for p in papers for e in self.ontology.extract(p, ["HYPOTENSION"])]
+        chunked = list(extract_corpus(papers, ["HYPOTENSION"], processes=1, chunk_size=3))
+        assert [len(chunk) > 0 for chunk in chunked] == [True, True, True]
+        assert [e for chunk in chunked for e in chunk] == serial
+
+    def test_corpus_pool_reads_papers_lazily(self):
+        consumed = []
+
+        def papers():
+            for i in range(200):
+                consumed.append(i)
+                yield _paper(str(i), "Hypotension", f"Hypotension incidence {i % 50 + 1}% in 30 patients.")
+
+        chunks = extract_corpus(papers(), ["HYPOTENSION"], processes=2, chunk_size=5)
+        first = next(chunks)
+        # Two chunks per worker in flight: the first result arrives before the corpus is read
+        assert {e.pmid for e in first} == {str(i) for i in range(5)}
+        assert len(consumed) <= 5 * 4
+        chunks.close()
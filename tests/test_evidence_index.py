@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the preloaded evidence index used by the risk engine
+"""
+
+import pytest
+import tempfile
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.core.database as database
+from src.core.database import CodexDatabase
+from src.core.evidence_index import EvidenceIndex, EvidenceTableUnavailable
+from src.core.risk_engine import RiskEngine, MAX_RISK_MATRICES
+from src.core.hpi_parser import ExtractedFactor
+
+
+def _factor(token):
+    return ExtractedFactor(token=token, plain_label=token, confidence=0.8, evidence_text='',
+                           factor_type='risk_factor', category='test', severity_weight=1.0,
+                           context='perioperative')
+
+
+class TestEvidenceIndex:
+    """Evidence index must reproduce the risk engine's SQL lookups"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db = CodexDatabase(os.path.join(self.temp_dir.name, 'test.duckdb'))
+        self._previous_db = database._db_instance
+        database._db_instance = self.db
+
+        conn = self.db.conn
+        conn.execute("""
+            CREATE TABLE baseline_risks (
+                outcome_token VARCHAR, baseline_risk FLOAT, confidence_interval_lower FLOAT,
+                confidence_interval_upper FLOAT, evidence_grade VARCHAR, studies_count INTEGER,
+                last_updated VARCHAR, population VARCHAR)
+        """)
+        conn.execute("""
+            CREATE TABLE risk_modifiers (
+                id VARCHAR, outcome_token VARCHAR, modifier_token VARCHAR, effect_estimate FLOAT,
+                confidence_interval_lower FLOAT, confidence_interval_upper FLOAT,
+                evidence_grade VARCHAR, studies_count INTEGER, last_updated VARCHAR)
+        """)
+        conn.executemany("INSERT INTO baseline_risks VALUES (?, ?, NULL, NULL, ?, ?, '', ?)", [
+            ('LARYNGOSPASM', 0.02, 'B', 10, 'mixed'),
+            ('LARYNGOSPASM', 0.08, 'C', 5, 'pediatric'),
+            ('LARYNGOSPASM', 0.01, 'A', 3, 'adult'),
+            ('BRONCHOSPASM', 0.03, 'B', 20, 'mixed'),
+            ('BRONCHOSPASM', 0.04, 'B', 30, 'mixed'),
+            ('HYPOXEMIA', 0.9, 'A', 30, 'adult'),      # out of range -> mixed fallback
+            ('HYPOXEMIA', 0.05, 'C', 2, 'mixed'),
+        ])
+        conn.executemany("INSERT INTO risk_modifiers VALUES (?, ?, ?, ?, ?, ?, ?, ?, '')", [
+            ('m1', 'LARYNGOSPASM', 'ASTHMA', 2.0, 1.5, 2.7, 'C', 40),
+            ('m2', 'LARYNGOSPASM', 'ASTHMA', 3.0, 2.0, 4.5, 'A', 4),
+            ('m3', 'BRONCHOSPASM', 'ASTHMA', 4.0, None, None, 'B', 12),
+            ('m4', 'BRONCHOSPASM', 'OSA', 1.5, 1.1, 2.0, 'B', 6),
+            ('m5', 'HYPOXEMIA', 'OSA', 80.0, 60.0, 90.0, 'A', 9),   # outside OR bounds
+        ])
+        conn.execute("INSERT INTO papers (pmid, title) VALUES ('1', 't'), ('2', 't'), ('3', 't')")
+        conn.executemany("""
+            INSERT INTO estimates (id, pmid, outcome_token, modifier_token, measure, estimate,
+                                   ci_low, ci_high, quality_weight, evidence_grade, extraction_confidence)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            ('e1', '1', 'HYPOXEMIA', 'ASTHMA', 'OR', 1.8, 1.2, 2.6, 1.0, 'B', 0.9),
+            ('e2', '2', 'HYPOXEMIA', 'ASTHMA', 'RR', 2.2, None, 3.1, 0.5, 'A', 0.8),
+            ('e3', '3', 'HYPOXEMIA', 'ASTHMA', 'OR', 9.0, 4.0, 12.0, 2.0, 'C', 0.5),  # low confidence
+        ])
+
+    def teardown_method(self):
+        database._db_instance = self._previous_db
+        self.db.close()
+        self.temp_dir.cleanup()
+
+    def test_baseline_population_preference(self):
+        index = EvidenceIndex.load(self.db)
+        assert index.baseline_risk('LARYNGOSPASM', 'pediatric')[0] == pytest.approx(0.08)
+        assert index.baseline_risk('LARYNGOSPASM', 'obstetric')[0] == pytest.approx(0.02)
+        # Same grade: studies_count DESC wins
+        assert index.baseline_risk('BRONCHOSPASM', 'adult')[0] == pytest.approx(0.04)
+
+    def test_modifier_grade_ordering(self):
+        index = EvidenceIndex.load(self.db)
+        assert index.risk_modifier('LARYNGOSPASM', 'ASTHMA')[0] == pytest.approx(3.0)
+        assert index.risk_modifier('LARYNGOSPASM', 'OSA') is None
+        assert [row[0] for row in index.effect_estimates('HYPOXEMIA', 'ASTHMA')] == pytest.approx([1.8, 2.2])
+
+    def test_missing_table_raises_like_sql(self):
+        self.db.conn.execute("DROP TABLE risk_modifiers")
+        index = EvidenceIndex.load(self.db)
+        assert 'risk_modifiers' in index.stats()['unavailable_tables']
+        with pytest.raises(EvidenceTableUnavailable):
+            index.risk_modifier('LARYNGOSPASM', 'ASTHMA')
+
+    @pytest.mark.parametrize("tokens,population", [
+        ([], 'adult'),
+        (['ASTHMA'], 'pediatric'),
+        (['ASTHMA', 'OSA'], 'adult'),
+        (['OSA'], None),
+    ])
+    def test_engine_results_match_sql_path(self, tokens, population):
+        demographics = {'population': population} if population else {}
+        factors = [_factor(t) for t in tokens]
+
+        sql_engine = RiskEngine()
+        indexed_engine = RiskEngine(evidence_index=EvidenceIndex.load(self.db))
+
+        expected = sql_engine.calculate_risks(factors, demographics, session_id='sql')
+        actual = indexed_engine.calculate_risks(factors, demographics, session_id='idx')
+
+        def project(summary):
+            return [(r.outcome, r.baseline_risk, r.baseline_context, r.adjusted_risk,
+                     r.confidence_interval, r.evidence_grade, r.k_studies,
+                     r.contributing_factors, sorted(r.citations)) for r in summary.risks]
+
+        assert project(actual) == project(expected)
+        assert len(expected.risks) > 0
+
+    def test_vectorized_matches_per_outcome_path(self):
+        index = EvidenceIndex.load(self.db)
+        scalar_engine = RiskEngine(evidence_index=index, vectorized=False)
+        vector_engine = RiskEngine(evidence_index=index)
+        factors = [_factor('OSA'), _factor('ASTHMA'), _factor('OSA')]
+
+        expected = scalar_engine.calculate_risks(factors, {'population': 'adult'}, session_id='a')
+        actual = vector_engine.calculate_risks(factors, {'population': 'adult'}, session_id='b')
+
+        def project(summary):
+            return [(r.outcome, r.adjusted_risk, r.confidence_interval, r.risk_ratio,
+                     r.evidence_grade, r.contributing_factors, r.no_evidence) for r in summary.risks]
+
+        assert project(actual) == project(expected)
+
+    def test_cohort_scoring_matches_single_patient(self):
+        engine = RiskEngine(evidence_index=EvidenceIndex.load(self.db))
+        cohort = [['ASTHMA'], ['OSA', 'ASTHMA'], []]
+        scores = engine.score_cohort(cohort, population='pediatric')
+        outcome_index = scores['outcomes'].index('LARYNGOSPASM')
+
+        matrix = engine.get_risk_matrix('pediatric')
+        for row, tokens in enumerate(cohort):
+            single = matrix.compute(tokens)
+            assert scores['adjusted_risk'][row, outcome_index] == pytest.approx(single['adjusted_risk'][outcome_index])
+
+        # 0.08 baseline with OR 3.0 -> odds 0.2609 -> risk 0.2069
+        assert scores['adjusted_risk'][0, outcome_index] == pytest.approx(0.08 / 0.92 * 3.0 / (1 + 0.08 / 0.92 * 3.0), rel=1e-6)
+        assert scores['adjusted_risk'][2, outcome_index] == pytest.approx(0.08, rel=1e-6)
+
+    def test_risk_matrices_are_bounded_per_engine(self):
+        engine = RiskEngine(evidence_index=EvidenceIndex.load(self.db))
+        pediatric = engine.get_risk_matrix('pediatric')
+        for i in range(MAX_RISK_MATRICES * 3):
+            engine.get_risk_matrix(f'client-population-{i}')
+            engine.get_risk_matrix('pediatric')
+
+        # Client-chosen populations cannot grow the cache; hot entries stay warm
+        assert len(engine._risk_matrices) == MAX_RISK_MATRICES
+        assert engine.get_risk_matrix('pediatric') is pediatric
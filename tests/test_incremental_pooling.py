@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Unit tests for dirty-set tracking on estimates and incremental re-pooling
+"""
+
+import tempfile
+import json
+import sys
+import os
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.database import init_database
+from src.evidence.bulk_writer import BulkWriter
+from src.evidence.batch_pooling import BatchMetaAnalysisEngine
+from src.evidence.incremental_pooling import IncrementalRepooler
+from conftest import make_paper as _paper, make_effect as _effect
+
+
+class TestIncrementalPooling:
+    """Only dirty groups are re-pooled, and they match a full rebuild"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db = init_database(os.path.join(self.temp_dir.name, 'test.duckdb'))
+        self.repooler = IncrementalRepooler(self.db)
+
+        papers = [_paper(str(i), procedure="tonsillectomy" if i in (2, 3) else "general") for i in range(8)]
+        with BulkWriter(self.db) as writer:
+            writer.add_papers(papers)
+            writer.add_effects([
+                _effect("a1", "0", "ASTHMA", 2.0, (1.2, 3.3)),
+                _effect("a2", "1", "ASTHMA", 3.5, (2.0, 6.1)),
+                _effect("a3", "2", "ASTHMA", 1.6, (1.1, 2.3)),
+                _effect("a4", "3", "ASTHMA", 2.4, (1.3, 4.4)),
+                _effect("u1", "4", "URI", 1.8, (1.2, 2.7)),
+                _effect("u2", "5", "URI", 1.9, (1.3, 2.8)),
+                _effect("b1", "6", None, 0.02, outcome="BRONCHOSPASM", measure="INCIDENCE", n_group=500),
+                _effect("b2", "7", None, 0.03, outcome="BRONCHOSPASM", measure="INCIDENCE", n_group=800),
+            ])
+
+    def teardown_method(self):
+        self.db.close()
+        self.temp_dir.cleanup()
+
+    def _dirty(self):
+        return sorted(map(tuple, self.repooler.pending_keys()[["outcome_token", "modifier_token", "population"]]
+                          .itertuples(index=False)))
+
+    def test_writes_mark_old_and_new_keys(self):
+        assert self._dirty() == [
+            ("BRONCHOSPASM", "", "general"),
+            ("LARYNGOSPASM", "ASTHMA", "general"),
+            ("LARYNGOSPASM", "ASTHMA", "tonsillectomy"),
+            ("LARYNGOSPASM", "URI", "general"),
+        ]
+        self.db.execute_write("DELETE FROM estimates_dirty")
+
+        # Re-labelling an estimate dirties the group it left as well as the one it joined
+        with BulkWriter(self.db) as writer:
+            writer.add_effects([_effect("u2", "5", "SMOKING", 1.9, (1.3, 2.8))])
+        assert self._dirty() == [("LARYNGOSPASM", "SMOKING", "general"), ("LARYNGOSPASM", "URI", "general")]
+
+    def test_repool_matches_full_rebuild_and_publishes(self):
+        result = self.repooler.repool_dirty("daily")
+        full = BatchMetaAnalysisEngine(self.db).pool_all_effect_modifiers(context_labels=["tonsillectomy"],
+                                                                           store=False)
+
+        assert [(e.outcome_token, e.modifier_token, e.context_label) for e in result.effects] == \
+            [(e.outcome_token, e.modifier_token, e.context_label) for e in full]
+        for effect, reference in zip(result.effects, full):
+            assert effect.inputs == reference.inputs and effect.evidence_version == result.version
+            assert effect.or_mean == pytest.approx(reference.or_mean, rel=1e-12)
+        assert [(b.outcome_token, b.context_label, b.k) for b in result.baselines] == [("BRONCHOSPASM", "general", 2)]
+
+        version, is_current, pools, changelog = self.db.conn.execute(
+            "SELECT version, is_current, pools_updated, changelog FROM evidence_versions").fetchall()[0]
+        assert (version, is_current, pools) == (result.version, True, 4)
+        assert ["LARYNGOSPASM", "ASTHMA", "tonsillectomy"] in json.loads(changelog)["effects"]
+        assert self.db.get_current_evidence_version() == result.version
+        assert self.repooler.pending_keys().empty
+        assert self.repooler.repool_dirty() is None
+
+        # A new URI study re-pools URI only; the existing tonsillectomy context of ASTHMA is not touched
+        with BulkWriter(self.db) as writer:
+            writer.add_effects([_effect("u3", "0", "URI", 2.5, (1.4, 4.5))])
+        second = self.repooler.repool_dirty()
+        assert [(e.modifier_token, e.context_label, e.k) for e in second.effects] == [("URI", "general", 3)]
+        assert self.db.get_current_evidence_version() == second.version
+        assert self.db.conn.execute("SELECT COUNT(*) FROM evidence_versions WHERE is_current").fetchone()[0] == 1
+
+    def test_keys_marked_during_repool_stay_dirty(self):
+        pool = self.repooler.effect_engine.pool
+
+        def pool_during_harvest(estimates):
+            with BulkWriter(self.db) as writer:
+                writer.add_effects([_effect("u3", "0", "URI", 2.5, (1.4, 4.5)),
+                                    _effect("s1", "0", "SMOKING", 1.5, (1.1, 2.0))])
+            return pool(estimates)
+
+        self.repooler.effect_engine.pool = pool_during_harvest
+        result = self.repooler.repool_dirty()
+        assert ("LARYNGOSPASM", "ASTHMA", "general") in [(e.outcome_token, e.modifier_token, e.context_label)
+                                                         for e in result.effects]
+        assert self._dirty() == [("LARYNGOSPASM", "SMOKING", "general"), ("LARYNGOSPASM", "URI", "general")]
+
+    def test_unmarked_writes_are_repooled(self):
+        self.repooler.repool_dirty()
+
+        # Script-style SQL that bypasses BulkWriter still dirties the key it touched
+        self.db.execute_write("UPDATE estimates SET estimate = 2.6, ci_low = 1.5, ci_high = 4.5 WHERE id = 'u1'")
+        assert self.repooler.pending_keys().empty
+        result = self.repooler.repool_dirty()
+        assert [(e.modifier_token, e.context_label) for e in result.effects] == [("URI", "general")]
+        assert result.dirty_keys == 1
+        assert self.repooler.repool_dirty() is None
+
+    def test_groups_below_min_k_lose_pooled_rows(self):
+        self.repooler.repool_dirty()
+        uri_rows = "SELECT COUNT(*) FROM effects_pooled WHERE modifier_token = 'URI'"
+        assert self.db.conn.execute(uri_rows).fetchone()[0] == 1
+
+        self.db.execute_write("DELETE FROM estimates WHERE id = 'u2'")
+        self.db.execute_write("DELETE FROM estimates WHERE outcome_token = 'BRONCHOSPASM'")
+        result = self.repooler.repool_dirty()
+        assert ("LARYNGOSPASM", "URI", "general") in result.unpoolable
+        assert ("BRONCHOSPASM", "", "general") in result.unpoolable
+        assert self.db.conn.execute(uri_rows).fetchone()[0] == 0
+        assert self.db.conn.execute("SELECT COUNT(*) FROM baselines_pooled").fetchone()[0] == 0
+        assert self.db.conn.execute("SELECT COUNT(*) FROM effects_pooled WHERE modifier_token = 'ASTHMA'"
+                                    ).fetchone()[0] == 2
+
+        # The emptied baseline key is forgotten, not re-marked on every run
+        assert self.repooler.repool_dirty() is None
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the indexed medication tables and their hot reload
+"""
+
+import sys
+import os
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.meds_tables import CONFIG_FILES, MedTables, MedTablesLoader
+from services.meds_engine import MeridianMedsEngine, PatientParameters
+
+CONFIG_DIR = Path(__file__).parent.parent / "config"
+
+
+def copy_config(target: Path) -> Path:
+    for name in CONFIG_FILES:
+        shutil.copy(CONFIG_DIR / name, target / name)
+    return target
+
+
+def rewrite_formulary(config_dir: Path, edit):
+    path = config_dir / "formulary.json"
+    formulary = json.loads(path.read_text())
+    edit(formulary)
+    path.write_text(json.dumps(formulary))
+    # Make the change visible even on filesystems with coarse mtimes
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+class TestMedTables:
+    """Indexes match the nested config documents"""
+
+    def setup_method(self):
+        self.tables = MedTables.load(CONFIG_DIR)
+
+    def test_agent_index(self):
+        # An agent listed under several classes maps to the first one, as the formulary scan did
+        assert self.tables.agent_class("Epinephrine") == "Emergency_Bronchodilator"
+        assert self.tables.agent_class("Unknown") is None
+
+        albuterol = self.tables.agents["Albuterol"]
+        assert (albuterol.iv_strength, albuterol.iv_unit, albuterol.iv_per_ml) == ("1 mg/mL", "mg", 1.0)
+        assert self.tables.agents["Dexmedetomidine"].iv_unit == "mcg"
+        assert self.tables.agents["Aprepitant"].iv_strength is None
+
+    def test_rule_indexes(self):
+        assert self.tables.feature_rules["ASTHMA"].medication_classes == ("Beta2_Agonist", "Corticosteroid")
+        assert self.tables.risk_rules["BRONCHOSPASM"].threshold == 0.03
+        assert self.tables.outcome_classes["LARYNGOSPASM"] == ("Depolarizing_NMBD", "Non_Depolarizing_NMBD_High")
+        assert "Succinylcholine" in self.tables.absolute_contraindications["MH_HISTORY"]
+        assert self.tables.relative_contraindications["DIABETES_SEVERE"].class_reasons == {}
+        assert len(self.tables.class_citations["Corticosteroid"]) == 2
+
+    def test_records_use_slots(self):
+        with pytest.raises(AttributeError):
+            self.tables.agents["Albuterol"].extra = 1
+
+
+class TestHotReload:
+    """Changed config files are recompiled; broken ones keep the previous tables"""
+
+    def test_reload_on_change(self, tmp_path):
+        config_dir = copy_config(tmp_path)
+        loader = MedTablesLoader(config_dir, check_seconds=0)
+        assert loader.current().preferred_agent("5HT3_Antagonist") == "Ondansetron"
+
+        rewrite_formulary(config_dir, lambda f: f["medication_classes"]["5HT3_Antagonist"]
+                          .update(preferred_agent="Granisetron"))
+        assert loader.current().preferred_agent("5HT3_Antagonist") == "Granisetron"
+        assert loader.reloads == 1
+        assert loader.reload_if_changed() is False
+
+    def test_broken_config_keeps_previous_tables(self, tmp_path):
+        config_dir = copy_config(tmp_path)
+        loader = MedTablesLoader(config_dir, check_seconds=0)
+        tables = loader.current()
+
+        (config_dir / "dosing.json").write_text("{ not json")
+        assert loader.current() is tables
+        assert loader.reloads == 0
+
+    def test_engine_plans_with_reloaded_tables(self, tmp_path):
+        config_dir = copy_config(tmp_path)
+        engine = MeridianMedsEngine(config_dir, reload_check_seconds=0)
+        patient = PatientParameters(age_years=30, weight_kg=70)
+        risk = {"outcome": "PONV", "absolute_risk": 0.4}
+        rule = {"class": "5HT3_Antagonist", "priority": 1}
+        assert engine._create_candidate_from_risk(rule, risk, patient)["agent"] == "Ondansetron"
+
+        rewrite_formulary(config_dir, lambda f: f["medication_classes"]["5HT3_Antagonist"]
+                          .update(preferred_agent="Granisetron"))
+        assert engine._create_candidate_from_risk(rule, risk, patient)["agent"] == "Granisetron"
+        assert engine.formulary["medication_classes"]["5HT3_Antagonist"]["preferred_agent"] == "Granisetron"
+
+    def test_plan_reads_one_tables_snapshot(self, tmp_path):
+        config_dir = copy_config(tmp_path)
+        engine = MeridianMedsEngine(config_dir, reload_check_seconds=0)
+        loader = engine._tables_loader
+        current = loader.current
+        snapshots = []
+        loader.current = lambda: snapshots.append(1) or current()
+
+        plan = engine.generate_recommendations(
+            None, {"risks": {"PONV": {"absolute_risk": 0.4, "delta_vs_baseline": 0.2, "confidence": "A"}}},
+            PatientParameters(age_years=30, weight_kg=70))
+        assert not plan.get("error")
+        assert any(med["agent"] == "Ondansetron" for bucket in plan["meds"].values() for med in bucket)
+        assert len(snapshots) == 1
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Unit tests for lazy loading of optional NLP backends
+"""
+
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.nlp_backends import NLPBackends, PRELOAD_ENV
+
+
+class TestNLPBackends:
+    """Backends are only imported on first use or when preloaded"""
+
+    def setup_method(self):
+        self.backends = NLPBackends()
+
+    def test_availability_check_does_not_import(self):
+        assert self.backends.available("json") is True
+        assert self.backends.available("definitely_not_a_real_backend") is False
+        report = self.backends.report()
+        assert not any(backend["loaded"] for backend in report["backends"].values())
+
+    def test_module_loaded_once_and_reported(self):
+        module = self.backends.module("json")
+        assert module is sys.modules["json"]
+        assert self.backends.module("json") is module
+        assert self.backends.module("definitely_not_a_real_backend") is None
+        assert "definitely_not_a_real_backend" in self.backends._errors
+
+    def test_preload_from_env(self, monkeypatch):
+        monkeypatch.setenv(PRELOAD_ENV, "nltk, transformers")
+        assert self.backends.preload_requested("transformers")
+        assert not self.backends.preload_requested("spacy")
+        monkeypatch.setenv(PRELOAD_ENV, "none")
+        assert self.backends.preload_from_env() == []
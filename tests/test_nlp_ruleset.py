@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the compiled rules.yaml ruleset and one-pass ConText modifier scoping
+"""
+
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nlp.pipeline import MeridianNLPPipeline
+from nlp.ruleset import CompiledRuleset
+
+RULES = {
+    'negation_patterns': ["no", "denies", "negative for"],
+    'temporality_patterns': {'recent': ["recent", "current", "active", "days ago"],
+                             'historical': ["history of", "remote", "previous"]},
+    'risk_factor_patterns': {
+        'ASTHMA': ["asthma", "wheezing"],
+        'OSA': ["(?:obstructive )?sleep apnea", "OSA"],
+        'BROKEN': ["(unclosed"],
+    },
+    'urgency_patterns': {'emergency': ["emergent"], 'urgent': ["urgent"]},
+}
+
+
+class TestCompiledRuleset:
+    """Precompiled rules must scope modifiers like the per-span ConText checks"""
+
+    def setup_method(self):
+        self.ruleset = CompiledRuleset.from_rules(RULES)
+
+    def _modifiers(self, text, term):
+        start = text.index(term)
+        modifier = self.ruleset.resolve_modifiers(text, [(start, start + len(term))])[0]
+        return modifier.negated, modifier.temporality
+
+    def test_first_listed_pattern_wins_per_code(self):
+        hits = self.ruleset.match_risk_factors("Wheezing at night, asthma since 2019, sleep apnea on CPAP")
+        assert [(code, match.group(0)) for code, match in hits] == [("ASTHMA", "asthma"), ("OSA", "sleep apnea")]
+        assert [code for code, _, _ in self.ruleset.risk_factors] == ["ASTHMA", "OSA"]  # invalid pattern dropped
+        assert self.ruleset.match_risk_factors("healthy child") == []
+        assert self.ruleset.first_category(self.ruleset.urgency, "urgent and emergent") == "emergency"
+
+    def test_negation_scope(self):
+        assert self._modifiers("Denies asthma.", "asthma") == (True, None)
+        assert self._modifiers("Patient is negative for asthma", "asthma") == (True, None)
+        # Sentence breaks and positive indicators end the scope
+        assert self._modifiers("No fever. Known asthma since birth", "asthma") == (False, None)
+        assert self._modifiers("No allergies, history of asthma", "asthma") == (False, "historical")
+        # Triggers are whole words: "no" inside another word does not negate
+        assert self._modifiers("Snoring, diagnosed asthma", "asthma") == (False, None)
+        # Triggers more than 50 characters back are out of scope
+        assert self._modifiers("No " + "x" * 60 + " asthma", "asthma") == (False, None)
+
+    def test_temporality_triggers_match_word_starts(self):
+        # Triggers cover inflected forms, as the per-span substring checks did
+        assert self._modifiers("Recently had URI, now asthma", "asthma") == (False, "recent")
+        assert self._modifiers("Previously diagnosed asthma", "asthma") == (False, "historical")
+        assert self._modifiers("Currently wheezing", "wheezing") == (False, "recent")
+        # ...but not inside another word: "reactive" is not "active"
+        assert self._modifiers("Reactive airway disease, asthma", "asthma") == (False, None)
+
+    def test_all_spans_resolved_together(self):
+        text = "Remote asthma. No sleep apnea, recent cold 3 days ago."
+        spans = [(text.index("asthma"), text.index("asthma") + 6),
+                 (text.index("sleep apnea"), text.index("sleep apnea") + 11)]
+        asthma, osa = self.ruleset.resolve_modifiers(text, spans)
+        assert (asthma.negated, asthma.temporality) == (False, "historical")
+        # Both categories are in scope; the later rules.yaml category wins, as before
+        assert (osa.negated, osa.temporality) == (True, "historical")
+        assert self.ruleset.resolve_modifiers(text, []) == []
+
+
+class TestPipelineRules:
+    """The pipeline extracts rule features through the compiled ruleset"""
+
+    def test_parse_uses_compiled_rules(self):
+        pipeline = MeridianNLPPipeline()
+        parsed = pipeline.parse_hpi("5 year old boy for tonsillectomy. Snoring with obstructive sleep apnea. "
+                                    "Denies asthma. Recent URI 5 days ago.")
+        features = {f.code: f for f in parsed.features}
+        assert features["OSA"].text == "obstructive sleep apnea" and not features["OSA"].modifiers.negated
+        assert features["ASTHMA"].modifiers.negated
+        assert features["RECENT_URI_2W"].modifiers.temporality == "recent"
+        assert parsed.case_type == "ENT" and parsed.urgency == "elective"
+        assert pipeline._extract_modifiers("Denies asthma", 7, 13).negated
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the content-addressed HPI parse cache
+"""
+
+import hashlib
+import sqlite3
+import tempfile
+import time
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.core.database as database
+from src.core.parse_cache import ParseCache, cache_key
+from src.core.hpi_parser import MedicalTextProcessor
+
+
+class TestParseCache:
+    """Cache must be keyed by normalized text + ruleset and stay within its budget"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def teardown_method(self):
+        self.temp_dir.cleanup()
+
+    def test_normalized_text_and_version_key(self):
+        cache = ParseCache()
+        cache.put("parser", "v1", "asthma  and\nOSA ", {"tokens": ["ASTHMA", "OSA"]})
+
+        assert cache.get("parser", "v1", " asthma and OSA") == {"tokens": ["ASTHMA", "OSA"]}
+        assert cache.get("parser", "v2", "asthma and OSA") is None
+        assert cache.get("other", "v1", "asthma and OSA") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 2
+
+    def test_returned_values_are_copies(self):
+        cache = ParseCache()
+        cache.put("parser", "v1", "text", {"tokens": ["ASTHMA"]})
+        cache.get("parser", "v1", "text")["tokens"].append("MUTATED")
+        assert cache.get("parser", "v1", "text") == {"tokens": ["ASTHMA"]}
+
+    def test_lru_ttl_and_memory_budget(self):
+        cache = ParseCache(max_entries=2)
+        for text in ("a", "b"):
+            cache.put("parser", "v1", text, text)
+        cache.get("parser", "v1", "a")
+        cache.put("parser", "v1", "c", "c")
+        assert cache.get("parser", "v1", "b") is None  # least recently used
+        assert cache.get("parser", "v1", "a") == "a"
+
+        small = ParseCache(max_bytes=1000)
+        for i in range(20):
+            small.put("parser", "v1", str(i), "x" * 200)
+        assert small.stats()["bytes"] <= 1000
+        assert small.stats()["evictions"] > 0
+
+        expiring = ParseCache(ttl_seconds=0.05)
+        expiring.put("parser", "v1", "a", "a")
+        time.sleep(0.1)
+        assert expiring.get("parser", "v1", "a") is None
+        assert expiring.stats()["expirations"] == 1
+
+    def _disk_files(self, directory):
+        data = b""
+        for name in os.listdir(directory):
+            with open(os.path.join(directory, name), "rb") as f:
+                data += f.read()
+        return data
+
+    def test_disk_tier_survives_restart(self):
+        path = os.path.join(self.temp_dir.name, "cache", "parse_cache.sqlite")
+        dump = lambda text, value: [token.lower() for token in value]
+        load = lambda text, payload: [token.upper() for token in payload]
+        cache = ParseCache(disk_path=path)
+        cache.register_disk_codec("parser", dump, load)
+        cache.put("parser", "v1", "asthma", ["ASTHMA"])
+        cache.put("memory-only", "v1", "asthma", ["ASTHMA"])
+
+        restarted = ParseCache(disk_path=path)
+        restarted.register_disk_codec("parser", dump, load)
+        assert restarted.get("parser", "v1", "asthma") == ["ASTHMA"]
+        assert restarted.get("memory-only", "v1", "asthma") is None
+        assert restarted.stats()["disk_hits"] == 1
+        assert restarted.stats()["entries"] == 1
+
+    def test_disk_keys_are_keyed_hashes(self):
+        path = os.path.join(self.temp_dir.name, "cache", "parse_cache.sqlite")
+        cache = ParseCache(disk_path=path)
+        cache.register_disk_codec("parser", lambda text, value: value, lambda text, payload: payload)
+        cache.put("parser", "v1", "asthma", ["ASTHMA"])
+
+        # A row cannot be found by hashing a guessed HPI without the secret
+        unkeyed = hashlib.sha256("parser\0v1\0asthma".encode("utf-8")).hexdigest()
+        with sqlite3.connect(path) as conn:
+            keys = [row[0] for row in conn.execute("SELECT key FROM parse_payloads")]
+        assert keys == [cache_key("parser", "v1", "asthma")] and unkeyed not in keys
+
+    def test_disk_tier_is_private(self):
+        path = os.path.join(self.temp_dir.name, "cache", "parse_cache.sqlite")
+        ParseCache(disk_path=path)
+        assert os.stat(os.path.dirname(path)).st_mode & 0o777 == 0o700
+        assert os.stat(path).st_mode & 0o777 == 0o600
+
+    def test_processor_disk_payload_has_no_phi(self):
+        previous_db = database._db_instance
+        database.init_database(":memory:")
+        try:
+            cache_dir = os.path.join(self.temp_dir.name, "cache")
+            processor = MedicalTextProcessor()
+            processor.parse_cache = ParseCache(disk_path=os.path.join(cache_dir, "parse_cache.sqlite"))
+            processor.parse_cache.register_disk_codec("MedicalTextProcessor", processor._extraction_to_disk,
+                                                      processor._extraction_from_disk)
+            text = "John Smith, MRN 12345678, 5 year old male with asthma on albuterol and obstructive sleep apnea"
+            first = processor.parse_hpi(text, store_audit=False)
+
+            data = self._disk_files(cache_dir)
+            for phi in (b"John Smith", b"12345678", b"obstructive sleep apnea"):
+                assert phi not in data
+
+            processor.parse_cache = ParseCache(disk_path=os.path.join(cache_dir, "parse_cache.sqlite"))
+            processor.parse_cache.register_disk_codec("MedicalTextProcessor", processor._extraction_to_disk,
+                                                      processor._extraction_from_disk)
+            second = processor.parse_hpi(text, store_audit=False)
+
+            assert processor.parse_cache.stats()["disk_hits"] == 1
+            assert second.extracted_factors == first.extracted_factors
+            assert second.anonymized_text == first.anonymized_text
+            assert second.phi_locations == first.phi_locations
+        finally:
+            database._db_instance = previous_db
+
+    def test_processor_reuses_parse_with_fresh_session(self):
+        previous_db = database._db_instance
+        database.init_database(":memory:")
+        try:
+            processor = MedicalTextProcessor()
+            processor.parse_cache = ParseCache()
+            text = "5 year old male with asthma on albuterol and obstructive sleep apnea"
+
+            first = processor.parse_hpi(text, session_id="s1")
+            second = processor.parse_hpi(text + "  ", session_id="s2")
+
+            assert processor.parse_cache.stats()["hits"] == 1
+            assert second.session_id == "s2"
+            assert second.extracted_factors == first.extracted_factors
+            assert second.extracted_factors is not first.extracted_factors
+        finally:
+            database._db_instance = previous_db
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the anchor-gated multi-pattern matcher
+"""
+
+import re
+import random
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.pattern_matcher import MultiPatternMatcher, AnchorScanner, pattern_anchors
+
+
+class TestPatternMatcher:
+    """Gated matching must return exactly what the per-pattern loops return"""
+
+    def setup_method(self):
+        self.groups = {
+            "OSA": [re.compile(r"\bsleep apnea\b", re.I), re.compile(r"\bosa\b", re.I),
+                    re.compile(r"\bsleep.*breathing\b", re.I), re.compile(r"\bAHI (?:of )?(\d+)\b", re.I)],
+            "ASTHMA": [re.compile(r"\bwheez(?:e|ing)\b", re.I), re.compile(r"\bRAD\b")],
+            "URI": [re.compile(r"\b(?:1|2|one|two) weeks? ago\b", re.I), re.compile(r"\brecent.*(?:weeks?|days?)\b", re.I)],
+            "BETA_BLOCKERS": [re.compile(r"\bbeta.?blocker\b", re.I)],
+            "DS": [re.compile(r"\bDS\b")]
+        }
+        self.matcher = MultiPatternMatcher({"condition": self.groups})
+
+    def _loop_hits(self, text):
+        return [(token, match.span()) for token, patterns in self.groups.items()
+                for pattern in patterns for match in pattern.finditer(text)]
+
+    def test_anchor_derivation(self):
+        assert pattern_anchors(re.compile(r"\bsleep apnea\b", re.I)) == frozenset(["sleep apnea"])
+        assert pattern_anchors(re.compile(r"\bbeta.?blocker\b", re.I)) == frozenset(["blocker"])
+        assert pattern_anchors(re.compile(r"\b(?:1|2|one|two) weeks? ago\b", re.I)) == frozenset([" week"])
+        assert pattern_anchors(re.compile(r"\d+")) is None
+
+    def test_scanner_reports_overlapping_anchors(self):
+        scanner = AnchorScanner(["sleep", "sleep apnea", "apnea", "lee"])
+        assert scanner.scan("history of sleep apnea") == {"sleep", "sleep apnea", "apnea", "lee"}
+        assert scanner.scan("sleepy") == {"sleep", "lee"}
+
+    def test_hits_match_per_pattern_loops(self):
+        vocabulary = ["sleep", "apnea", "OSA", "osa", "AHI of 14", "wheezing", "RAD", "rad", "DS", "ds",
+                      "recent", "cold", "2 weeks ago", "days", "beta-blocker", "betablocker", "breathing",
+                      "Sleep Apnea", "the", "and", ",", "."]
+        rng = random.Random(7)
+        for _ in range(300):
+            text = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(0, 25)))
+            assert self.matcher.hits("condition", text) == self._loop_hits(text)
+
+        # Non-ASCII text bypasses the prefilter but must still match
+        text = "Patient était with OSA and wheeze"
+        assert self.matcher.hits("condition", text) == self._loop_hits(text)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Unit tests for batched REML and leave-one-out diagnostics in risk_engine.pool
+"""
+
+import sys
+import os
+
+import numpy as np
+import pytest
+from scipy import stats
+from scipy.optimize import minimize_scalar
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from risk_engine.pool import MetaAnalysisEngine, reml_tau_squared
+from risk_engine.schema import (RiskConfig, Study, StudyDesign, RiskOfBias, SurgeryType, Urgency,
+                                TimeWindow, EffectMeasure)
+
+
+def _reml_reference(effects_data, weights):
+    """Tightly converged bounded minimisation of the engine's REML criterion."""
+    def objective(tau_sq):
+        w = weights / (effects_data[:, 1] ** 2 + tau_sq)
+        pooled = np.sum(w * effects_data[:, 0]) / np.sum(w)
+        q = np.sum(w * (effects_data[:, 0] - pooled) ** 2)
+        return 0.5 * (q + np.sum(np.log(effects_data[:, 1] ** 2 + tau_sq)) + np.log(np.sum(w)))
+    return minimize_scalar(objective, bounds=(0, 2), method='bounded', options={'xatol': 1e-12}).x
+
+
+def _study(pmid, value, se, year=2015, design=StudyDesign.RCT, n_total=500):
+    return Study(pmid=pmid, title="t", first_author="a", pub_year=year, design=design,
+                 risk_of_bias=RiskOfBias.LOW, age_pop="adult", surgery_domain=SurgeryType.GENERAL,
+                 urgency=Urgency.ELECTIVE, outcome="HYPOTENSION", window=TimeWindow.INTRAOP,
+                 factor="SEPSIS", measure=EffectMeasure.OR, value=value, se=se, n_total=n_total)
+
+
+class TestPoolDiagnostics:
+    """Batched solves must agree with per-set optimisation and explicit refits"""
+
+    def setup_method(self):
+        self.engine = MetaAnalysisEngine(RiskConfig())
+        rng = np.random.default_rng(5)
+        self.sets = []
+        for k in (2, 3, 6, 12, 25):
+            effects = np.column_stack([rng.normal(0.5, 0.6, k), rng.uniform(0.1, 0.5, k)])
+            self.sets.append((effects, rng.uniform(0.5, 20, k)))
+        # Homogeneous set: REML optimum on the lower bound
+        self.sets.append((np.array([[0.3, 0.2], [0.31, 0.25], [0.29, 0.3]]), np.ones(3)))
+
+    def test_batched_reml_matches_bounded_minimisation(self):
+        tau_squared = self.engine._estimate_tau_squared_batch(self.sets)
+        for (effects_data, weights), tau_sq in zip(self.sets, tau_squared):
+            assert tau_sq == pytest.approx(_reml_reference(effects_data, weights), abs=1e-7)
+        assert tau_squared[-1] == 0.0
+
+        # A warm start anywhere in the interval reaches the same optimum
+        effects_data, weights = self.sets[3]
+        segments = np.zeros(len(weights), dtype=int)
+        for start in (0.0, 0.05, 1.9):
+            assert reml_tau_squared(effects_data[:, 0], effects_data[:, 1] ** 2, weights, segments, 1,
+                                    start=np.array([start]))[0] == pytest.approx(tau_squared[3], abs=1e-10)
+
+    def test_loo_matches_explicit_refits(self):
+        fits = [(e, w, self.engine._run_meta_analysis(e, w)) for e, w in self.sets]
+        deltas = self.engine._loo_diagnostics_batch(fits)
+
+        assert deltas[0] is None  # k = 2: nothing to leave out
+        for (effects_data, weights, full), delta in zip(fits[1:], deltas[1:]):
+            full_risk = self.engine._log_odds_to_prob(full.log_effect, 0.05)
+            expected = 0.0
+            for i in range(len(effects_data)):
+                loo_e, loo_w = np.delete(effects_data, i, axis=0), np.delete(weights, i)
+                tau_sq = _reml_reference(loo_e, loo_w)
+                loo = self.engine._run_meta_analysis(loo_e, loo_w, tau_squared=tau_sq)
+                expected = max(expected, abs(self.engine._log_odds_to_prob(loo.log_effect, 0.05) - full_risk) * 100)
+            assert delta == pytest.approx(expected, abs=1e-6)
+
+    def test_pool_studies_batch_with_diagnostics(self):
+        rng = np.random.default_rng(9)
+        large = [_study(str(i), float(np.exp(rng.normal(0.6, 0.3))), float(rng.uniform(0.15, 0.4)),
+                        year=2005 + i, n_total=100 + 50 * i) for i in range(12)]
+        small = [_study("a", 2.0, 0.3), _study("b", 1.5, 0.2)]
+        pairs = [(large, "SEPSIS", "HYPOTENSION", TimeWindow.INTRAOP),
+                 (small[:1], "ASTHMA", "BRONCHOSPASM", TimeWindow.INTRAOP),
+                 (small, "ASTHMA", "BRONCHOSPASM", TimeWindow.INTRAOP)]
+        pooled = self.engine.pool_studies_batch(pairs)
+
+        assert pooled[1] is None
+        assert pooled[0].k_studies == 12 and pooled[0].loo_max_delta_pp > 0 and pooled[0].egger_p is not None
+        assert pooled[2].loo_max_delta_pp is None
+        assert self.engine.pool_studies(*pairs[0]) == pooled[0]
+
+        # Closed-form Egger regression equals the weighted least squares matrix solve
+        effects_data = self.engine._prepare_effects(large)
+        weights = self.engine._calculate_weights(large, effects_data)
+        X = np.column_stack([np.ones(12), 1.0 / effects_data[:, 1]])
+        W = np.diag(weights)
+        XtWX_inv = np.linalg.inv(X.T @ W @ X)
+        beta = XtWX_inv @ X.T @ W @ effects_data[:, 0]
+        mse = np.sum(weights * (effects_data[:, 0] - X @ beta) ** 2) / 10
+        expected_p = 2 * (1 - stats.t.cdf(abs(beta[0] / np.sqrt(mse * XtWX_inv[0, 0])), 10))
+        assert self.engine._egger_test(effects_data, weights) == pytest.approx(expected_p, rel=1e-9)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Unit tests for streaming PubMed XML ingestion
+"""
+
+import io
+import tempfile
+import sys
+import os
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.database import init_database
+from src.evidence.pubmed_harvester import PubMedHarvester, raw_xml_files
+
+
+def _article(pmid, title, abstract):
+    return (f"<PubmedArticle><MedlineCitation><PMID Version=\"1\">{pmid}</PMID><Article>"
+            f"<Journal><Title>Anesth Analg</Title><JournalIssue><PubDate><Year>2020</Year></PubDate></JournalIssue></Journal>"
+            f"<ArticleTitle>{title}</ArticleTitle><Abstract><AbstractText Label=\"RESULTS\">{abstract}</AbstractText></Abstract>"
+            f"<AuthorList><Author><LastName>Smith</LastName><Initials>J</Initials></Author></AuthorList>"
+            f"</Article></MedlineCitation><PubmedData><ArticleIdList><ArticleId IdType=\"doi\">10.1/{pmid}</ArticleId>"
+            f"</ArticleIdList></PubmedData></PubmedArticle>")
+
+
+class TestPubMedIterparse:
+    """Streaming parse must yield the same papers as the whole-document parse"""
+
+    def setup_method(self):
+        init_database(":memory:")
+        self.harvester = PubMedHarvester()
+        self.xml = ("<?xml version=\"1.0\" ?>\n<PubmedArticleSet>"
+                    + _article("111", "Laryngospasm in children", "Randomized controlled trial of 120 children.")
+                    + _article("222", "Adult bronchospasm", "Retrospective cohort; OR 2.1 (95% CI 1.2-3.4).")
+                    + "</PubmedArticleSet>")
+
+    def test_stream_matches_batch_parse(self):
+        papers = list(self.harvester.iter_pubmed_xml(io.BytesIO(self.xml.encode()), "batch.xml"))
+        assert [p.pmid for p in papers] == ["111", "222"]
+        assert papers[0].doi == "10.1/111" and papers[0].authors == ["Smith J"]
+        assert papers[1].abstract.startswith("RESULTS: ")
+        assert self.harvester._parse_pubmed_xml(self.xml, "batch.xml") == papers
+
+    def test_directory_stream_and_truncated_file(self):
+        with tempfile.TemporaryDirectory() as raw_dir:
+            with open(os.path.join(raw_dir, "pubmed_batch_a.xml"), "w") as f:
+                f.write(self.xml)
+            with open(os.path.join(raw_dir, "pubmed_batch_b.xml"), "w") as f:
+                # Truncated download: the complete article still comes through
+                f.write(self.xml[:self.xml.index("<PubmedArticle>", 60)] + "<PubmedArticle><Medline")
+
+            assert len(raw_xml_files(raw_dir)) == 2
+            papers = list(self.harvester.iter_raw_directory(raw_dir))
+            assert [p.pmid for p in papers] == ["111", "222", "111"]
+            assert papers[2].raw_path.endswith("pubmed_batch_b.xml")
+
+    def test_dry_run_reingest_leaves_database_untouched(self):
+        from scripts.reingest_raw_xml import reingest
+
+        with tempfile.TemporaryDirectory() as raw_dir:
+            with open(os.path.join(raw_dir, "pubmed_batch_a.xml"), "w") as f:
+                f.write(self.xml)
+            db_path = os.path.join(raw_dir, "evidence.duckdb")
+
+            report = reingest(raw_dir, db_path, processes=1, dry_run=True)
+            assert (report["articles"], report["stored"]) == (2, 0)
+            assert not os.path.exists(db_path)
+
+            assert reingest(raw_dir, db_path, processes=1)["stored"] == 2
+            assert os.path.exists(db_path)
+            init_database(":memory:")  # do not leave the global database in the deleted directory
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Unit tests for compiling and memory-mapping risk artifact bundles
+"""
+
+import tempfile
+import sys
+import os
+
+import numpy as np
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.database import init_database
+from src.evidence.bulk_writer import BulkWriter
+from src.evidence.pooling_engine import PooledEffect as EvidencePooledEffect
+import risk_engine.bundle as bundle_module
+from risk_engine.bundle import compile_risk_bundle, get_risk_bundle, RiskBundle, BUNDLE_ENV, CURRENT_FILE
+from risk_engine.baseline import BaselineRiskEngine
+from risk_engine.confidence import ConfidenceScorer
+from risk_engine.convert import RiskConverter
+from risk_engine.schema import RiskConfig, TimeWindow, AgeBand, SurgeryType, Urgency
+
+
+def _pooled(outcome, modifier, or_mean, ci, version, k=4, i_squared=0.3, context="general"):
+    return EvidencePooledEffect(
+        id=f"{outcome}_{modifier}_{context}_{version}", outcome_token=outcome, modifier_token=modifier,
+        context_label=context, k=k, or_mean=or_mean, or_ci_low=ci[0], or_ci_high=ci[1],
+        log_or_var=((np.log(ci[1]) - np.log(ci[0])) / 3.92) ** 2, method="random_effects_pm",
+        inputs=[f"e{i}" for i in range(k)], pmids=[f"{modifier}{i}" for i in range(k)], i_squared=i_squared,
+        tau_squared=0.05, evidence_version=version, quality_summary={})
+
+
+class TestRiskBundle:
+    """Bundles must round-trip the evidence and score like the live engines"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db = init_database(os.path.join(self.temp_dir.name, 'test.duckdb'))
+        self.output = os.path.join(self.temp_dir.name, 'bundle')
+        self.config = RiskConfig()
+        with BulkWriter(self.db) as writer:
+            writer.add_pooled_effects([
+                _pooled("LARYNGOSPASM", "ASTHMA", 2.0, (1.4, 2.9), "v1"),
+                _pooled("LARYNGOSPASM", "RECENT_URI_2W", 3.0, (1.9, 4.7), "v1", k=12, i_squared=0.0),
+                _pooled("LARYNGOSPASM", "OSA", 1.8, (1.0, 3.2), "v1", k=2),
+                _pooled("BRONCHOSPASM", "ASTHMA", 2.5, (1.5, 4.2), "v1"),
+                _pooled("LARYNGOSPASM", "ASTHMA", 9.0, (2.0, 40.0), "v1", context="tonsillectomy"),
+            ])
+
+    def teardown_method(self):
+        self.db.close()
+        self.temp_dir.cleanup()
+
+    def test_scores_match_live_engines(self):
+        manifest = compile_risk_bundle(self.db, self.output, self.config)
+        bundle = RiskBundle(self.output, verify=True)
+
+        assert bundle.artifact_hash == manifest.artifact_hash
+        assert manifest.total_outcomes == 2 and manifest.total_factors == 3
+        assert manifest.coverage_stats["pooled_effects"] == 4  # context-specific pool excluded
+        assert isinstance(bundle.effects["log_effect_raw"], np.memmap)
+
+        factors = ["ASTHMA", "RECENT_URI_2W", "UNKNOWN"]
+        effects = bundle.pooled_effects("LARYNGOSPASM", TimeWindow.INTRAOP, factors)
+        assert [e.factor for e in effects] == ["ASTHMA", "RECENT_URI_2W"]
+        assert effects[0].log_effect_raw == pytest.approx(np.log(2.0))
+        assert effects[1].i_squared == 0.0 and effects[1].k_studies == 12
+
+        # The combination index and the per-effect path give the same interval
+        baseline = BaselineRiskEngine(self.config).get_baseline_risk(
+            "LARYNGOSPASM", TimeWindow.INTRAOP, AgeBand.ONE_TO_3, SurgeryType.ENT, Urgency.ELECTIVE)
+        log_effect, variance, matched = bundle.combined_effect("LARYNGOSPASM", factors)
+        assert matched == ["ASTHMA", "RECENT_URI_2W"]
+        indexed = RiskConverter(2000, seed=1).calculate_combined_risk_ci_batch(
+            np.array([log_effect]), np.array([variance]), [baseline])[0]
+        live = RiskConverter(2000, seed=1).calculate_absolute_risk_ci(effects, baseline, factors)
+        assert indexed == pytest.approx(live, rel=1e-12)
+
+        # Three factors exceed the precomputed size-2 index and fall back to summing columns
+        three = bundle.combined_effect("LARYNGOSPASM", ["OSA", "ASTHMA", "RECENT_URI_2W"])
+        assert three[0] == pytest.approx(sum(e.log_effect_shrunk for e in
+                                             bundle.pooled_effects("LARYNGOSPASM", TimeWindow.INTRAOP,
+                                                                   ["OSA", "ASTHMA", "RECENT_URI_2W"])))
+        assert bundle.combined_effect("MORTALITY_24H", ["ASTHMA"]) is None
+
+        assert bundle.confidence("LARYNGOSPASM", "ASTHMA") == ConfidenceScorer(self.config).calculate_confidence(effects[0])
+        assert bundle.baseline_risks() == list(BaselineRiskEngine(self.config).baseline_data.values())
+
+    def test_versions_and_integrity(self):
+        first = compile_risk_bundle(self.db, self.output, self.config)
+        assert compile_risk_bundle(self.db, self.output, self.config).artifact_hash == first.artifact_hash
+
+        with BulkWriter(self.db) as writer:
+            writer.add_pooled_effects([_pooled("LARYNGOSPASM", "ASTHMA", 2.2, (1.5, 3.2), "v2")])
+        second = compile_risk_bundle(self.db, self.output, self.config)
+        assert second.artifact_hash != first.artifact_hash
+        assert RiskBundle(self.output).pooled_effects(
+            "LARYNGOSPASM", TimeWindow.INTRAOP, ["ASTHMA"])[0].log_effect_raw == pytest.approx(np.log(2.2))
+
+        # Pinning an evidence version compiles only its pools
+        pinned = compile_risk_bundle(self.db, self.output, self.config, evidence_version="v2")
+        assert pinned.coverage_stats["pooled_effects"] == 1
+
+        # A modified column no longer matches the manifest hash
+        with open(os.path.join(self.output, CURRENT_FILE)) as f:
+            version_dir = os.path.join(self.output, f.read().strip())
+        path = os.path.join(version_dir, "pooled_effects", "log_effect_raw.npy")
+        data = np.load(path)
+        np.save(path, data + 1)
+        RiskBundle(self.output)  # unverified loads stay lazy
+        with pytest.raises(ValueError):
+            RiskBundle(self.output, verify=True)
+
+    def test_process_bundle_follows_current_pointer(self, monkeypatch):
+        monkeypatch.setenv(BUNDLE_ENV, self.output)
+        monkeypatch.setattr(bundle_module, "_bundle_state", (None, None))
+        loads = []
+        monkeypatch.setattr(bundle_module, "RiskBundle", lambda path: loads.append(path) or RiskBundle(path))
+
+        # A failed load is cached until the pointer changes
+        os.makedirs(self.output)
+        with open(os.path.join(self.output, CURRENT_FILE), "w") as f:
+            f.write("missing-version")
+        assert get_risk_bundle() is None and get_risk_bundle() is None
+        assert len(loads) == 1
+
+        first = compile_risk_bundle(self.db, self.output, self.config)
+        assert get_risk_bundle().artifact_hash == first.artifact_hash
+        assert get_risk_bundle() is get_risk_bundle() and len(loads) == 2
+
+        with BulkWriter(self.db) as writer:
+            writer.add_pooled_effects([_pooled("LARYNGOSPASM", "ASTHMA", 2.2, (1.5, 3.2), "v2")])
+        second = compile_risk_bundle(self.db, self.output, self.config)
+        assert get_risk_bundle().artifact_hash == second.artifact_hash and len(loads) == 3
+
+    def test_api_baselines_follow_current_pointer(self, monkeypatch):
+        flask = pytest.importorskip("flask")
+        import api.risk_api as risk_api
+
+        monkeypatch.setenv(BUNDLE_ENV, self.output)
+        monkeypatch.setattr(bundle_module, "_bundle_state", (None, None))
+        monkeypatch.setattr(risk_api, "_meta_engine", None)
+        monkeypatch.setattr(risk_api, "_baseline_state", (None, None))
+        app = flask.Flask(__name__)
+        app.register_blueprint(risk_api.risk_bp)
+        client = app.test_client()
+        request = {"outcome": "LARYNGOSPASM", "window": "intraop", "age_band": "1-3", "surgery": "ENT",
+                   "urgency": "elective", "factors": ["ASTHMA"]}
+
+        def score():
+            response = client.post("/api/risk/score", json=request)
+            assert response.status_code == 200
+            body = response.get_json()
+            return body["baseline"]["p0"], body["diagnostics"]["artifact_hash"]
+
+        first = compile_risk_bundle(self.db, self.output, self.config)
+        first_p0, first_hash = score()
+        assert first_hash == first.artifact_hash
+
+        # A recompile with different baseline strata swaps the pointer; the next score uses its baselines
+        with BulkWriter(self.db) as writer:
+            writer.add_pooled_effects([_pooled("LARYNGOSPASM", "ASTHMA", 2.2, (1.5, 3.2), "v2")])
+        second = compile_risk_bundle(self.db, self.output, self.config)
+        with open(os.path.join(self.output, CURRENT_FILE)) as f:
+            p0_path = os.path.join(self.output, f.read().strip(), "baseline_risks", "p0.npy")
+        np.save(p0_path, np.load(p0_path) * 2)
+
+        second_p0, second_hash = score()
+        assert second_hash == second.artifact_hash
+        assert second_p0 == pytest.approx(first_p0 * 2)
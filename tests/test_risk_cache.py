@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the risk engine's result cache
+"""
+
+import json
+import tempfile
+import sys
+import os
+from datetime import datetime
+from types import SimpleNamespace
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.core.database as database
+from src.core.database import CodexDatabase
+from src.core.risk_cache import RiskResultCache, order_contributing_factors
+from src.core.risk_engine import RiskEngine, RiskSummary
+from src.core.hpi_parser import ExtractedFactor
+
+
+def _factor(token):
+    return ExtractedFactor(token=token, plain_label=token, confidence=0.8, evidence_text='',
+                           factor_type='risk_factor', category='test', severity_weight=1.0,
+                           context='perioperative')
+
+
+class TestRiskResultCache:
+    """Cached entries must be isolated from the objects callers hold"""
+
+    def _summary(self):
+        return RiskSummary(session_id='s1', evidence_version='v1', mode='model_based', risks=[],
+                           summary={'outcomes': ['LARYNGOSPASM']}, calculated_at=datetime(2024, 1, 1))
+
+    def test_key_ignores_factor_order(self):
+        assert RiskResultCache.make_key(['OSA', 'ASTHMA'], 'ctx', None, 'model_based', 'v1') == \
+            RiskResultCache.make_key(['ASTHMA', 'OSA'], 'ctx', None, 'model_based', 'v1')
+
+    def test_order_contributing_factors_follows_tokens(self):
+        risk = SimpleNamespace(contributing_factors=[{'factor': 'OSA'}, {'factor': 'ASTHMA'}, {'factor': 'OSA'}])
+        order_contributing_factors(SimpleNamespace(risks=[risk]), ['ASTHMA', 'OSA', 'OSA'])
+        assert [f['factor'] for f in risk.contributing_factors] == ['ASTHMA', 'OSA', 'OSA']
+
+    def test_put_and_get_copy_the_summary(self):
+        cache = RiskResultCache()
+        key = cache.make_key(['ASTHMA'], 'ctx', None, 'model_based', 'v1')
+        summary = self._summary()
+        cache.put(key, summary)
+
+        summary.summary['outcomes'].append('put-side mutation')
+        first = cache.get(key)
+        first.summary['outcomes'].append('get-side mutation')
+        second = cache.get(key)
+
+        assert second.summary == {'outcomes': ['LARYNGOSPASM']}
+        assert first is not second
+
+    def test_version_change_drops_entries(self):
+        cache = RiskResultCache()
+        cache.put(cache.make_key(['ASTHMA'], 'ctx', None, 'model_based', 'v1'), self._summary())
+
+        assert cache.get(cache.make_key(['ASTHMA'], 'ctx', None, 'model_based', 'v2')) is None
+        assert cache.stats()['invalidations'] == 1 and cache.stats()['profiles'] == 0
+
+
+class TestRiskEngineResultCache:
+    """Repeated factor profiles are served from the cache with per-request fields"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db = CodexDatabase(os.path.join(self.temp_dir.name, 'test.duckdb'))
+        self._previous_db = database._db_instance
+        database._db_instance = self.db
+
+        conn = self.db.conn
+        conn.execute("""
+            CREATE TABLE baseline_risks (
+                outcome_token VARCHAR, baseline_risk FLOAT, confidence_interval_lower FLOAT,
+                confidence_interval_upper FLOAT, evidence_grade VARCHAR, studies_count INTEGER,
+                last_updated VARCHAR, population VARCHAR)
+        """)
+        conn.execute("""
+            CREATE TABLE risk_modifiers (
+                id VARCHAR, outcome_token VARCHAR, modifier_token VARCHAR, effect_estimate FLOAT,
+                confidence_interval_lower FLOAT, confidence_interval_upper FLOAT,
+                evidence_grade VARCHAR, studies_count INTEGER, last_updated VARCHAR)
+        """)
+        conn.executemany("INSERT INTO baseline_risks VALUES (?, ?, NULL, NULL, ?, ?, '', ?)", [
+            ('LARYNGOSPASM', 0.02, 'B', 10, 'mixed'),
+            ('LARYNGOSPASM', 0.08, 'C', 5, 'pediatric'),
+            ('BRONCHOSPASM', 0.03, 'B', 20, 'mixed'),
+        ])
+        conn.executemany("INSERT INTO risk_modifiers VALUES (?, ?, ?, ?, ?, ?, ?, ?, '')", [
+            ('m1', 'LARYNGOSPASM', 'ASTHMA', 2.0, 1.5, 2.7, 'C', 40),
+            ('m3', 'BRONCHOSPASM', 'ASTHMA', 4.0, None, None, 'B', 12),
+            ('m4', 'BRONCHOSPASM', 'OSA', 1.5, 1.1, 2.0, 'B', 6),
+        ])
+
+    def teardown_method(self):
+        database._db_instance = self._previous_db
+        self.db.close()
+        self.temp_dir.cleanup()
+
+    def test_result_cache_serves_permutations_with_fresh_session(self):
+        engine = RiskEngine()
+        first = engine.calculate_risks([_factor('OSA'), _factor('ASTHMA')], {'population': 'adult'}, session_id='s1')
+        second = engine.calculate_risks([_factor('ASTHMA'), _factor('OSA')], {'population': 'adult'}, session_id='s2')
+
+        assert engine.result_cache.stats()['hits'] == 1
+        assert second.session_id == 's2' and first.session_id == 's1'
+        assert second.summary == first.summary
+        assert [r.adjusted_risk for r in second.risks] == [r.adjusted_risk for r in first.risks]
+        # A hit reports contributing factors in this request's order, not the first caller's
+        bronchospasm = next(risk for risk in second.risks if risk.outcome == 'BRONCHOSPASM')
+        assert [f['factor'] for f in bronchospasm.contributing_factors] == ['ASTHMA', 'OSA']
+        assert second.calculated_at >= first.calculated_at
+
+        # Duplicates and other populations are distinct profiles
+        engine.calculate_risks([_factor('OSA'), _factor('OSA'), _factor('ASTHMA')], {'population': 'adult'})
+        engine.calculate_risks([_factor('OSA'), _factor('ASTHMA')], {'population': 'pediatric'})
+        assert engine.result_cache.stats()['hits'] == 1
+
+    def test_cache_hit_audit_payload_matches_the_response(self):
+        engine = RiskEngine()
+        payloads = []
+        engine._store_risk_assessment = lambda summary, payload=None: payloads.append(json.loads(payload))
+        engine.calculate_risks([_factor('OSA'), _factor('ASTHMA')], {'population': 'adult'})
+        second = engine.calculate_risks([_factor('ASTHMA'), _factor('OSA')], {'population': 'adult'})
+
+        assert engine.result_cache.stats()['hits'] == 1
+        assert payloads[1]['calculated_at'] == second.calculated_at.isoformat() != payloads[0]['calculated_at']
+        bronchospasm = next(risk for risk in payloads[1]['risks'] if risk['outcome'] == 'BRONCHOSPASM')
+        assert [f['factor'] for f in bronchospasm['contributing_factors']] == ['ASTHMA', 'OSA']
+
+    def test_cache_hits_do_not_share_assessments(self):
+        engine = RiskEngine()
+        first = engine.calculate_risks([_factor('ASTHMA')], {'population': 'adult'})
+        first.risks[0].adjusted_risk = -1.0
+        first.risks[0].citations.append('mutated')
+        first.risks.clear()
+
+        second = engine.calculate_risks([_factor('ASTHMA')], {'population': 'adult'})
+        third = engine.calculate_risks([_factor('ASTHMA')], {'population': 'adult'})
+
+        assert engine.result_cache.stats()['hits'] == 2
+        assert second.risks and all(risk.adjusted_risk >= 0 for risk in second.risks)
+        assert all('mutated' not in risk.citations for risk in second.risks)
+        assert second.risks[0] is not third.risks[0]
+
+    def test_miss_keeps_caller_factor_order(self):
+        engine = RiskEngine()
+        factors = [_factor('OSA'), _factor('ASTHMA')]
+        result = engine.calculate_risks(factors, {'population': 'adult'})
+
+        assert [f.token for f in factors] == ['OSA', 'ASTHMA']
+        bronchospasm = next(risk for risk in result.risks if risk.outcome == 'BRONCHOSPASM')
+        assert [f['factor'] for f in bronchospasm.contributing_factors] == ['OSA', 'ASTHMA']
+
+    def test_result_cache_invalidated_by_evidence_version(self):
+        engine = RiskEngine()
+        factors = [_factor('ASTHMA')]
+        engine.calculate_risks(factors, {'population': 'pediatric'})
+
+        self.db.conn.execute("UPDATE evidence_versions SET is_current = FALSE")
+        self.db.conn.execute("INSERT INTO evidence_versions (version, description, is_current) VALUES ('v2', 'test', TRUE)")
+        refreshed = engine.calculate_risks(factors, {'population': 'pediatric'})
+
+        stats = engine.result_cache.stats()
+        assert stats['hits'] == 0 and stats['invalidations'] == 1
+        assert refreshed.evidence_version == 'v2'
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the array-based Monte Carlo absolute-risk CI
+"""
+
+import sys
+import os
+
+import numpy as np
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from risk_engine.convert import RiskConverter
+from risk_engine.schema import PooledEffect, BaselineRisk, RiskConfig, TimeWindow, AgeBand, SurgeryType, Urgency
+
+
+def _effect(factor, log_effect, se):
+    return PooledEffect(factor=factor, outcome="LARYNGOSPASM", window=TimeWindow.INTRAOP, log_effect_raw=log_effect,
+                        se_raw=se, k_studies=4, tau_squared=0.0, i_squared=0.0, q_statistic=1.0,
+                        p_heterogeneity=0.5, total_weight=1.0, studies=[])
+
+
+def _baseline(p0, ci=(None, None)):
+    return BaselineRisk(outcome="LARYNGOSPASM", window=TimeWindow.INTRAOP, age_band=AgeBand.ONE_TO_3,
+                        surgery=SurgeryType.ENT, urgency=Urgency.ELECTIVE, p0=p0, p0_ci_lower=ci[0],
+                        p0_ci_upper=ci[1], p_ref=0.01, delta_pp=0.0, fold_ratio=1.0)
+
+
+class TestRiskConverterMonteCarlo:
+    """Vectorized simulation must match the per-draw computation and batch consistently"""
+
+    def setup_method(self):
+        self.effects = [_effect("ASTHMA", 0.693, 0.2), _effect("RECENT_URI_2W", 1.099, 0.25)]
+        self.baseline = _baseline(0.02, (0.012, 0.033))
+
+    def test_matches_per_draw_loop(self):
+        for baseline in (self.baseline, _baseline(0.05)):
+            converter = RiskConverter(mc_draws=2000, seed=7)
+            point, low, high = converter.calculate_absolute_risk_ci(self.effects, baseline, ["ASTHMA", "RECENT_URI_2W"])
+
+            # Per-draw reference on the same RandomState stream
+            rng = np.random.RandomState(7)
+            effect_draws = rng.normal(0.693 + 1.099, np.sqrt(0.2 ** 2 + 0.25 ** 2), 2000)
+            if baseline.p0_ci_lower:
+                se = (np.log(0.033 / 0.967) - np.log(0.012 / 0.988)) / (2 * 1.96)
+                baselines = np.clip(1 / (1 + np.exp(-rng.normal(np.log(0.02 / 0.98), se, 2000))), 0.0001, 0.9999)
+            else:
+                baselines = np.full(2000, baseline.p0)
+            risks = [np.clip(converter.log_or_to_prob(e, b), 0.0001, 0.9999) for e, b in zip(effect_draws, baselines)]
+
+            assert point == pytest.approx(converter.log_or_to_prob(0.693 + 1.099, baseline.p0), rel=1e-12)
+            assert low == pytest.approx(np.percentile(risks, 2.5), rel=1e-9)
+            assert high == pytest.approx(np.percentile(risks, 97.5), rel=1e-9)
+
+        # Buffers are reused: the same request gives the same interval
+        assert converter.calculate_absolute_risk_ci(self.effects, baseline, ["ASTHMA"]) == \
+            converter.calculate_absolute_risk_ci(self.effects, baseline, ["ASTHMA"])
+
+    def test_batch_rows_match_single_calls(self):
+        converter = RiskConverter(mc_draws=1000, seed=3)
+        baselines = [self.baseline, _baseline(0.2), _baseline(0.001, (0.0005, 0.002))]
+        factor_sets = [["ASTHMA"], ["ASTHMA", "RECENT_URI_2W"], ["OSA"]]
+        batch = converter.calculate_absolute_risk_ci_batch(self.effects, baselines, factor_sets)
+
+        assert batch[2] == (0.001, 0.001, 0.001)  # no matching effects
+        for row, (baseline, factors) in enumerate(zip(baselines, factor_sets)):
+            assert batch[row] == pytest.approx(converter.calculate_absolute_risk_ci(self.effects, baseline, factors))
+
+    def test_sobol_mode(self):
+        converter = RiskConverter(mc_draws=1000, seed=11, sampling="sobol")
+        assert converter.mc_draws == 1024
+        point, low, high = converter.calculate_absolute_risk_ci(self.effects, self.baseline, ["ASTHMA"])
+
+        reference = RiskConverter(mc_draws=200000, seed=11).calculate_absolute_risk_ci(
+            self.effects, self.baseline, ["ASTHMA"])
+        assert low < point < high
+        assert (low, high) == pytest.approx(reference[1:], rel=0.03)
+
+        with pytest.raises(ValueError):
+            RiskConverter(sampling="halton")
+        assert RiskConfig(monte_carlo={"n_draws": 256, "sampling": "sobol"}).monte_carlo.sampling == "sobol"
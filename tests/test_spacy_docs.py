@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Unit tests for batched spaCy Doc building and chunked batch parsing
+"""
+
+import sys
+import os
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.core.database as database
+from src.core.parse_cache import ParseCache
+from src.core.hpi_parser import MedicalTextProcessor
+from src.core.batch_pipeline import BatchAnalysisPipeline
+from src.core.spacy_docs import DocBatch, make_doc
+from nlp.pipeline import MeridianNLPPipeline
+
+
+class RecordingNLP:
+    """Stands in for a spaCy Language: records pipe() calls and returns tokenized texts"""
+
+    pipe_names = ["tok2vec", "tagger", "parser", "ner", "context"]
+
+    def __init__(self):
+        self.calls = []
+
+    def pipe(self, texts, batch_size, n_process, disable):
+        self.calls.append((list(texts), batch_size, n_process, sorted(disable)))
+        return (text.split() for text in texts)
+
+    def make_doc(self, text):
+        return text.split()
+
+
+class TestDocBatch:
+    """Each distinct text is piped once per model, with unneeded pipes disabled"""
+
+    def test_shared_docs_and_disabled_pipes(self):
+        nlp, other = RecordingNLP(), RecordingNLP()
+        docs = DocBatch(batch_size=8, n_process=2)
+        docs.request(nlp, ["asthma and osa", "healthy", "asthma and osa"])
+        docs.request(nlp, ["healthy", "recent uri"], keep=["context"])
+        docs.request(other, ["healthy"])
+        docs.request(None, ["ignored"])
+        docs.run()
+
+        assert nlp.calls == [(["asthma and osa", "healthy", "recent uri"], 8, 2,
+                              ["ner", "parser", "tagger", "tok2vec"])]
+        assert other.calls == [(["healthy"], 8, 2, sorted(RecordingNLP.pipe_names))]
+        assert docs.get(nlp, "healthy") is docs.get(nlp, "healthy")
+        assert docs.get(nlp, "healthy") is not docs.get(other, "healthy")
+        assert docs.get(nlp, "never requested") is None and len(docs) == 4
+
+        # Built Docs are not piped again
+        docs.request(nlp, ["healthy", "new text"])
+        docs.run()
+        assert nlp.calls[-1][0] == ["new text"]
+        assert make_doc(nlp, "tokenizer only") == ["tokenizer", "only"]
+
+    def test_real_spacy_pipe(self):
+        spacy = pytest.importorskip("spacy")
+        nlp = spacy.blank("en")
+        docs = DocBatch(batch_size=2)
+        docs.request(nlp, ["History of asthma.", "No OSA.", "History of asthma."])
+        docs.run()
+        assert [t.lower_ for t in docs.get(nlp, "History of asthma.")] == ["history", "of", "asthma", "."]
+
+
+class TestParseMany:
+    """Bulk parsing must match one-at-a-time parsing, in input order"""
+
+    def setup_method(self):
+        self.previous_db = database._db_instance
+        database.init_database(":memory:")
+        self.texts = [
+            "5 year old male with asthma on albuterol and obstructive sleep apnea",
+            "Healthy 30 year old female for laparoscopic cholecystectomy",
+            "5 year old male with asthma on albuterol and obstructive sleep apnea",
+            "70 yo M with CAD s/p CABG and COPD",
+        ]
+
+    def teardown_method(self):
+        database._db_instance = self.previous_db
+
+    def test_processor_parse_many(self):
+        processor = MedicalTextProcessor()
+        processor.parse_cache = ParseCache()
+        single = [processor.parse_hpi(text) for text in self.texts]
+
+        processor.parse_cache = ParseCache()
+        bulk = processor.parse_many(self.texts, docs=DocBatch())
+        assert [p.raw_text for p in bulk] == self.texts
+        assert [p.extracted_factors for p in bulk] == [p.extracted_factors for p in single]
+        assert [p.demographics for p in bulk] == [p.demographics for p in single]
+        assert processor.parse_cache.stats()["entries"] == 3
+
+        # Cached texts are served without re-parsing
+        processor._extract_all = None
+        assert [p.confidence_score for p in processor.parse_many(self.texts)] == [p.confidence_score for p in single]
+
+    def test_processor_parse_many_falls_back_when_pipe_fails(self):
+        class FailingNLP(RecordingNLP):
+            def pipe(self, texts, batch_size, n_process, disable):
+                raise RuntimeError("worker died")
+
+        processor = MedicalTextProcessor()
+        processor.parse_cache = ParseCache()
+        single = [processor.parse_hpi(text) for text in self.texts]
+
+        nlp = FailingNLP()
+        processor._nlp, processor._nlp_loaded, processor.matcher = nlp, True, lambda doc: []
+        processor.parse_cache = ParseCache()
+        bulk = processor.parse_many(self.texts)
+        assert [p.extracted_factors for p in bulk] == [p.extracted_factors for p in single]
+
+    def test_pipeline_parse_many(self):
+        pipeline = MeridianNLPPipeline()
+        pipeline.parse_cache = ParseCache()
+        bulk = pipeline.parse_many(self.texts)
+        pipeline.parse_cache = ParseCache()
+        assert bulk == [pipeline.parse_hpi(text) for text in self.texts]
+
+
+class TestChunkedBatchParsing:
+    """The batch pipeline hands chunks of cases to parse_many_fn"""
+
+    def _parse(self, text):
+        return {"extracted_factors": [{"token": token} for token in text.split()], "demographics": {}}
+
+    def _analyze(self, parsed, case):
+        return [f["token"] for f in parsed["extracted_factors"]]
+
+    def test_chunks_and_fallback(self):
+        chunks = []
+
+        def parse_many(texts):
+            chunks.append(list(texts))
+            if "BROKEN" in texts:
+                raise RuntimeError("chunk failed")
+            return [self._parse(text) for text in texts]
+
+        pipeline = BatchAnalysisPipeline(self._parse, self._analyze, parse_many_fn=parse_many,
+                                         parse_batch_size=4, max_in_flight=6)
+        cases = [{"id": i, "hpi_text": f"T{i}"} for i in range(9)]
+        cases[5]["hpi_text"] = "BROKEN"
+        cases[7]["hpi_text"] = " "
+
+        results = {r["id"]: r for r in pipeline.run(cases)}
+        assert len(results) == 9
+        assert all(len(chunk) <= 4 for chunk in chunks) and sum(map(len, chunks)) == 8
+        assert results[5]["result"] == ["BROKEN"]  # re-parsed one at a time
+        assert results[7]["status"] == "error" and results[8]["result"] == ["T8"]
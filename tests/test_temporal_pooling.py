@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Unit tests for set-based temporal-weighting pooling and tau/cutoff sweeps
+"""
+
+import tempfile
+import json
+import math
+import sys
+import os
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.database import init_database
+from src.evidence.bulk_writer import BulkWriter
+from conftest import make_paper as _paper, make_effect as _effect
+from src.evidence.temporal_pooling import TemporalPoolingEngine
+
+CURRENT_YEAR = 2026
+
+
+def _reference(studies, tau, cutoff):
+    """Per-study loop of the original temporal weighting formula"""
+    raw, temporal = [], []
+    for estimate, weight, year, design in studies:
+        if year < 1950 or year > CURRENT_YEAR:
+            factor = 0.1
+        else:
+            factor = math.exp(-(CURRENT_YEAR - year) / tau)
+            if design == "guideline" and year >= cutoff:
+                factor *= 1.5
+            if year >= cutoff:
+                factor *= 1.3
+        raw.append(weight)
+        temporal.append(weight * factor)
+    estimates = [s[0] for s in studies]
+    return (sum(e * w for e, w in zip(estimates, raw)) / sum(raw),
+            sum(e * w for e, w in zip(estimates, temporal)) / sum(temporal),
+            1.0 / math.sqrt(sum(temporal)))
+
+
+class TestTemporalPooling:
+    """The set-based engine must reproduce the per-row temporal weighting"""
+
+    def setup_method(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db = init_database(os.path.join(self.temp_dir.name, 'test.duckdb'))
+        self.engine = TemporalPoolingEngine(self.db, current_year=CURRENT_YEAR)
+
+        with BulkWriter(self.db) as writer:
+            writer.add_papers([
+                _paper("0", 2000), _paper("1", 2012), _paper("2", 2022, design="guideline"),
+                _paper("3", 2019, population="pediatric"), _paper("4", 2005), _paper("5", 2021),
+            ])
+            writer.add_effects([
+                _effect("a0", "0", "ASTHMA", 1.5, (1.0, 2.25)),
+                _effect("a1", "1", "ASTHMA", 2.0, (1.2, 3.3)),
+                _effect("a2", "2", "ASTHMA", 3.0, (1.8, 5.0), grade="A"),
+                _effect("a3", "3", "ASTHMA", 2.6, (1.5, 4.5)),
+                _effect("b0", "4", None, 0.04, outcome="BRONCHOSPASM", n_group=400, grade="C"),
+                _effect("b1", "5", None, 0.02, outcome="BRONCHOSPASM", n_group=900),
+            ])
+
+    def teardown_method(self):
+        self.db.close()
+        self.temp_dir.cleanup()
+
+    def test_matches_per_study_formula_across_sweep(self):
+        pooled = self.engine.pool(taus=[3.0, 7.0], modern_cutoffs=[2015, 2020])
+        assert len(pooled) == 3 * 4  # two ASTHMA populations and one baseline, four parameter pairs
+
+        def ci_weight(low, high, grade=3.0):
+            return grade / ((high - low) / 3.92) ** 2
+
+        adult = [(1.5, ci_weight(1.0, 2.25), 2000, "cohort"), (2.0, ci_weight(1.2, 3.3), 2012, "cohort"),
+                 (3.0, ci_weight(1.8, 5.0, 4.0), 2022, "guideline")]
+        groups = {
+            ("ASTHMA", "adult"): adult,
+            ("ASTHMA", "pediatric"): [(2.6, ci_weight(1.5, 4.5), 2019, "cohort")],
+            (None, "adult"): [(0.04, 400 * 2.0, 2005, "cohort"), (0.02, 900 * 3.0, 2021, "cohort")],
+        }
+        # estimates are stored as REAL, so compare at single precision
+        for row in pooled.itertuples():
+            modifier = None if row.modifier_token != row.modifier_token else row.modifier_token
+            raw, temporal, temporal_se = _reference(groups[(modifier, row.population)], row.tau, row.modern_cutoff)
+            assert row.raw_estimate == pytest.approx(raw, rel=1e-6)
+            assert row.temporal_estimate == pytest.approx(temporal, rel=1e-6)
+            assert row.temporal_standard_error == pytest.approx(temporal_se, rel=1e-6)
+            assert row.temporal_ci_upper == pytest.approx(temporal + 1.96 * temporal_se, rel=1e-6)
+
+        asthma = pooled[(pooled["modifier_token"] == "ASTHMA") & (pooled["population"] == "adult")]
+        assert asthma["oldest_study"].tolist() == [2000] * 4 and asthma["newest_study"].tolist() == [2022] * 4
+        assert asthma["temporal_adjustment_applied"].all()
+        assert not asthma["data_age_warning"].any()  # mean year 2011.3 is under 15 years old
+
+        summary = self.engine.sensitivity(pooled)
+        assert len(summary) == 3
+        assert (summary["range"] >= 0).all()
+
+    def test_store_writes_one_parameter_pair(self):
+        pooled = self.engine.pool(taus=[5.0, 7.0], modern_cutoffs=[2015])
+        assert self.engine.store(pooled, tau=7.0, modern_cutoff=2015) == 3
+        assert self.engine.store(pooled, tau=10.0, modern_cutoff=2015) == 0
+
+        rows = self.db.conn.execute("""
+            SELECT calculation_id, modifier_token, calculation_type, temporal_estimate, temporal_parameters
+            FROM risk_calculations ORDER BY calculation_id
+        """).fetchall()
+        assert [r[0].rsplit("_", 2)[0] for r in rows] == [
+            "baseline_BRONCHOSPASM_adult", "modifier_LARYNGOSPASM_ASTHMA_adult",
+            "modifier_LARYNGOSPASM_ASTHMA_pediatric"]
+        assert rows[0][1] is None and rows[0][2] == "baseline_risk"
+        assert json.loads(rows[1][4])["tau"] == 7.0
+        expected = pooled[(pooled["tau"] == 7.0) & (pooled["modifier_token"] == "ASTHMA")
+                          & (pooled["population"] == "adult")]["temporal_estimate"].iloc[0]
+        assert rows[1][3] == pytest.approx(expected)
+
+    def test_rejects_non_positive_tau(self):
+        with pytest.raises(ValueError):
+            self.engine.pool(taus=[0.0])